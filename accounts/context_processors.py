@@ -1,5 +1,4 @@
-from django.db import models
-from .models import SystemModule, ModulePermission, Organization, Subscription
+from .sidebar import get_sidebar_data
 
 
 def sidebar_modules(request):
@@ -21,87 +20,8 @@ def sidebar_modules(request):
         if not subscription:
             return {'sidebar_modules': [], 'user_subscription': None}
         
-        # Get all available modules for this user and subscription
-        available_modules = SystemModule.objects.filter(
-            is_active=True,
-            parent_module__isnull=True  # Only top-level modules
-        ).prefetch_related('submodules')
-        
-        # Filter modules based on user permissions and subscription
-        user_modules = []
-        for module in available_modules:
-            # Check if module is available for current subscription plan
-            if not module.is_available_for_plan(subscription.plan):
-                continue
-            
-            # Check if module is available for current user
-            if not module.is_available_for_user(request.user):
-                continue
-            
-            # Check if organization has this module enabled
-            try:
-                module_permission = ModulePermission.objects.get(
-                    organization=organization,
-                    module=module
-                )
-                if not module_permission.is_enabled:
-                    continue
-            except ModulePermission.DoesNotExist:
-                # If no specific permission exists, use default availability
-                pass
-            
-            # Get submodules if any
-            submodules = []
-            for submodule in module.submodules.filter(is_active=True):
-                if (submodule.is_available_for_plan(subscription.plan) and 
-                    submodule.is_available_for_user(request.user)):
-                    submodules.append(submodule)
-            
-            module_data = {
-                'module': module,
-                'submodules': submodules
-            }
-            user_modules.append(module_data)
-        
-        # Group modules by category
-        grouped_modules = {}
-        for module_data in user_modules:
-            category = module_data['module'].category
-            if category not in grouped_modules:
-                grouped_modules[category] = []
-            grouped_modules[category].append(module_data)
-        
-        # Add sidebar-specific context variables
-        from patients.models import Patient
-        from appointments.models import Appointment
-        from .models import Notification
-        from django.utils import timezone
-        
-        today = timezone.now().date()
-        
-        # Get real notification counts
-        unread_notifications = Notification.objects.filter(
-            user=request.user,
-            is_read=False,
-            is_dismissed=False
-        ).count()
-        
-        unread_messages = Notification.objects.filter(
-            user=request.user,
-            notification_type='message',
-            is_read=False,
-            is_dismissed=False
-        ).count()
-        
-        sidebar_context = {
-            'total_patients': Patient.objects.filter(organization=organization, is_active=True).count(),
-            'todays_appointments': Appointment.objects.filter(
-                organization=organization,
-                start_datetime__date=today
-            ).count(),
-            'pending_notifications': unread_notifications,
-            'unread_messages': unread_messages,
-        }
+        # El árbol de módulos y los contadores salen de la caché en una sola lectura
+        grouped_modules, sidebar_context = get_sidebar_data(organization, subscription, request.user)
         
         return {
             'sidebar_modules': grouped_modules,
@@ -0,0 +1,144 @@
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts import tenancy
+from accounts.models import User
+from accounts.query_budget import QueryRecorder
+from api import views
+from billing.models import Invoice, Payment
+from patients.models import Patient
+
+
+PAGE_SIZES = [20, 100, 1000]
+
+SEED_BATCH_SIZE = 10000
+
+VIEWSETS = {
+    'patients': views.PatientViewSet,
+    'appointments': views.AppointmentViewSet,
+    'medical-records': views.MedicalRecordViewSet,
+    'invoices': views.InvoiceViewSet,
+    'payments': views.PaymentViewSet,
+}
+
+# Variantes del listado: atributos que se cambian en el viewset
+VARIANTS = [
+    ('sin select_related', {'list_serializer_class': None, 'eager_loading': False}),
+    ('anterior', {'list_serializer_class': None}),
+    ('values', {}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el rendimiento de los listados de la API con los serializers '
+        'de modelo anteriores contra los serializers de values(), por tamaño de página'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Facturas a generar, con un pago cada una (p. ej. 100000)',
+        )
+        parser.add_argument(
+            '--resource',
+            choices=sorted(VIEWSETS),
+            action='append',
+            dest='resources',
+            help='Listado a medir; se puede repetir (por defecto: todos)',
+        )
+        parser.add_argument(
+            '--username',
+            help='Usuario de las peticiones; los listados son los de su organización',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Peticiones por medición; se informa la mediana (por defecto: 5)',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True, profile__isnull=False).select_related('profile__organization')
+        if options['username']:
+            users = users.filter(username=options['username'])
+        user = users.order_by('id').first()
+        if not user:
+            raise CommandError('No hay usuarios con organización para autenticar las peticiones.')
+        if options['seed']:
+            self.seed(options['seed'], user)
+
+        factory = APIRequestFactory()
+        self.stdout.write(f'Listados de {user.profile.organization} como {user.username}')
+        # Las peticiones no pasan por TenantMiddleware
+        with tenancy.tenant_scope(user.profile.organization):
+            for resource in options['resources'] or sorted(VIEWSETS):
+                viewset = VIEWSETS[resource]
+                self.stdout.write('')
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f'{resource} ({viewset.queryset.model.scoped.count()} filas)'
+                ))
+                for page_size in PAGE_SIZES:
+                    for name, attributes in VARIANTS:
+                        view = type(viewset.__name__, (viewset,), attributes).as_view({'get': 'list'})
+                        result = self.measure(factory, view, user, resource, page_size, options['repeat'])
+                        self.stdout.write(f'  {page_size:>5} por página   {name:<18} {result}')
+
+    def measure(self, factory, view, user, resource, page_size, repeat):
+        timings = []
+        for _ in range(max(repeat, 1)):
+            request = factory.get(f'/api/v1/{resource}/', {'cursor': '', 'page_size': page_size})
+            force_authenticate(request, user=user)
+            with QueryRecorder() as recorder:
+                started = time.perf_counter()
+                response = view(request)
+                response.render()
+                timings.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise CommandError(f'{resource}: respuesta {response.status_code}')
+        elapsed = statistics.median(timings)
+        rows = len(response.data['results'])
+        rate = rows / elapsed if elapsed else 0
+        return (
+            f'{elapsed * 1000:9.1f} ms   {rate:10.0f} filas/s   '
+            f'{recorder.count:4d} consultas'
+        )
+
+    def seed(self, total, user):
+        """Genera ``total`` facturas de los pacientes existentes, cada una con un pago"""
+        patients = list(Patient.objects.values_list('id', 'organization_id')[:total])
+        if not patients:
+            raise CommandError('No hay pacientes. Use benchmark_exports --seed para generarlos.')
+        start = Invoice.objects.count()
+        today = timezone.localdate()
+        self.stdout.write(f'Generando {total} facturas y pagos...')
+        for offset in range(0, total, SEED_BATCH_SIZE):
+            numbers = range(start + offset, start + min(offset + SEED_BATCH_SIZE, total))
+            with transaction.atomic():
+                invoices = Invoice.objects.bulk_create([
+                    Invoice(
+                        invoice_number=f'BAPI-{number:09d}', patient_id=patients[number % len(patients)][0],
+                        organization_id=patients[number % len(patients)][1],
+                        issue_date=today - timedelta(days=number % 365), due_date=today - timedelta(days=number % 365 - 30),
+                        status='sent', subtotal=Decimal('500.00'), total_amount=Decimal('580.00'),
+                        amount_paid=Decimal('100.00'), amount_pending=Decimal('480.00'), created_by=user
+                    )
+                    for number in numbers
+                ])
+                Payment.objects.bulk_create([
+                    Payment(
+                        invoice=invoice, payment_number=f'BAPI-{number:09d}', amount=Decimal('100.00'),
+                        payment_method='cash', status='completed', processed_by=user
+                    )
+                    for number, invoice in zip(numbers, invoices)
+                ])
+            self.stdout.write(f'  {min(offset + SEED_BATCH_SIZE, total)}/{total}')
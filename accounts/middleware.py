@@ -1,9 +1,18 @@
 """
 TopicTales Biomédica - Custom Middleware
 """
+import logging
+import time
+
 from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
 
+from . import tenancy
+from .query_budget import QueryRecorder
+
+
+logger = logging.getLogger(__name__)
+
 
 class DisableCacheMiddleware(MiddlewareMixin):
     """
@@ -14,4 +23,63 @@ class DisableCacheMiddleware(MiddlewareMixin):
             response['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
             response['Pragma'] = 'no-cache'
             response['Expires'] = '0'
-        return response
\ No newline at end of file
+        return response
+
+
+class QueryBudgetMiddleware:
+    """
+    Registra las consultas de cada petición. Las vistas con más de
+    QUERY_BUDGET consultas o que repiten una sentencia QUERY_REPEAT_LIMIT
+    veces (un probable N+1) quedan en el log, salvo las de
+    QUERY_BUDGET_EXCLUDED_VIEWS, y QUERY_BUDGET_SERVER_TIMING agrega un
+    encabezado Server-Timing con el número de consultas, el tiempo en base
+    de datos y el tiempo total.
+
+    Las consultas que se ejecutan al consumir una respuesta por bloques
+    ocurren después de que el middleware regresa y no se cuentan.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else request.path
+        if view_name not in settings.QUERY_BUDGET_EXCLUDED_VIEWS:
+            self.check_budget(view_name, recorder)
+
+        if settings.QUERY_BUDGET_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={recorder.duration_ms:.1f};desc="{recorder.count} queries", '
+                f'total;dur={total_ms:.1f}'
+            )
+        return response
+
+    def check_budget(self, view_name, recorder):
+        if recorder.count > settings.QUERY_BUDGET:
+            logger.warning(
+                'Query budget exceeded by %s: %d queries (budget %d), %.1f ms in the database',
+                view_name, recorder.count, settings.QUERY_BUDGET, recorder.duration_ms
+            )
+        for sql, count in recorder.duplicates(settings.QUERY_REPEAT_LIMIT):
+            logger.warning('Possible N+1 in %s: query repeated %d times: %s', view_name, count, sql)
+
+
+class TenantMiddleware:
+    """
+    Liga la petición para los managers ``scoped`` (accounts.tenancy), que
+    filtran por la organización del usuario de la petición
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = tenancy.bind_request(request)
+        try:
+            return self.get_response(request)
+        finally:
+            tenancy.unbind_request(token)
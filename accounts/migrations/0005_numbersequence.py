@@ -0,0 +1,29 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=150, unique=True)),
+                ('name', models.CharField(max_length=50, verbose_name='Secuencia')),
+                ('year', models.IntegerField(blank=True, null=True, verbose_name='Año')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Último valor')),
+                ('organization', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='number_sequences', to='accounts.organization')),
+            ],
+            options={
+                'verbose_name': 'Secuencia Numérica',
+                'verbose_name_plural': 'Secuencias Numéricas',
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_numbersequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='Modelo')),
+                ('object_id', models.BigIntegerField(verbose_name='ID del registro')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Eliminado el')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_tombstones', to='accounts.organization')),
+            ],
+            options={
+                'verbose_name': 'Registro Eliminado',
+                'verbose_name_plural': 'Registros Eliminados',
+                'indexes': [models.Index(fields=['organization', 'model', 'deleted_at'], name='tombstone_org_model_idx')],
+            },
+        ),
+    ]
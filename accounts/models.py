@@ -408,3 +408,48 @@ class Notification(models.Model):
         verbose_name = "Notificación"
         verbose_name_plural = "Notificaciones"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_dismissed', 'created_at'], name='notif_user_dismissed_idx'),
+            models.Index(fields=['user', 'is_read'], name='notif_user_read_idx'),
+        ]
+
+
+class NumberSequence(models.Model):
+    """
+    Contador detrás de los números legibles (IDs de pacientes, facturas,
+    pagos, reclamaciones). ``key`` combina nombre, organización y año.
+    """
+    key = models.CharField(max_length=150, unique=True)
+    name = models.CharField(max_length=50, verbose_name="Secuencia")
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, null=True, blank=True, related_name='number_sequences')
+    year = models.IntegerField(null=True, blank=True, verbose_name="Año")
+    value = models.BigIntegerField(default=0, verbose_name="Último valor")
+    
+    class Meta:
+        verbose_name = "Secuencia Numérica"
+        verbose_name_plural = "Secuencias Numéricas"
+    
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+
+class SyncTombstone(models.Model):
+    """
+    Una fila borrada, que se conserva para que los clientes de la
+    sincronización incremental (``accounts.sync``) también la borren. Se
+    guarda SYNC_TOMBSTONE_DAYS días.
+    """
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='sync_tombstones')
+    model = models.CharField(max_length=100, verbose_name="Modelo")  # app_label.ModelName
+    object_id = models.BigIntegerField(verbose_name="ID del registro")
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name="Eliminado el")
+    
+    class Meta:
+        verbose_name = "Registro Eliminado"
+        verbose_name_plural = "Registros Eliminados"
+        indexes = [
+            models.Index(fields=['organization', 'model', 'deleted_at'], name='tombstone_org_model_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.model} #{self.object_id}"
@@ -0,0 +1,189 @@
+"""
+TopicTales Biomédica - Paginación por cursor
+Listas recorridas con un cursor opaco sobre (campo de orden, id) en lugar
+de OFFSET: cada página es un recorrido de rango sobre un índice que cuesta
+lo mismo sin importar qué tan profunda sea, y no hace falta COUNT(*). La
+usan las listas HTML grandes y los viewsets de la API (api.pagination).
+"""
+import base64
+import binascii
+import json
+from functools import cached_property
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+
+# Los conteos estimados se detienen en estas filas (se muestra "10000+")
+ESTIMATE_LIMIT = 10000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def keyset_ordering(queryset):
+    """
+    ``(campo, descendente)`` del primer término de orden del queryset, que
+    debe ser un campo no nulo del propio modelo; ``id`` desempata
+    """
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    if not ordering:
+        return queryset.model._meta.pk, False
+    term = ordering[0]
+    if not isinstance(term, str) or '__' in term or term.startswith('?'):
+        raise ValueError(f'Keyset pagination needs a plain field ordering, got {term!r}')
+    name = term.lstrip('-')
+    field = queryset.model._meta.pk if name == 'pk' else queryset.model._meta.get_field(name)
+    return field, term.startswith('-')
+
+
+def encode_cursor(field, obj):
+    """Cursor después de ``obj``, una instancia o una fila de ``values()`` con el campo y la pk"""
+    if isinstance(obj, dict):
+        pk = field.model._meta.pk
+        obj = field.model(**{field.attname: obj[field.attname], pk.attname: obj[pk.attname]})
+    values = [obj.pk] if field.primary_key else [field.value_to_string(obj), obj.pk]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(field, cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        pk = field.model._meta.pk.to_python(values[-1])
+        value = pk if field.primary_key else field.to_python(values[0])
+    except (binascii.Error, ValueError, TypeError, IndexError, ValidationError):
+        raise InvalidCursor(cursor)
+    return value, pk
+
+
+def estimate_count(queryset, limit=ESTIMATE_LIMIT):
+    """
+    ``(conteo, calificador)`` sin un COUNT(*) completo: la estimación del
+    planificador en PostgreSQL (calificador ``'~'``); en otras bases, un
+    conteo que se detiene en ``limit`` filas (``'+'`` si se detuvo, ``''``
+    si es exacto)
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), '~'
+    count = queryset.order_by()[:limit].count()
+    return count, '+' if count >= limit else ''
+
+
+class KeysetPaginator:
+    """
+    Paginador de ``queryset`` ordenado por su primer término de orden más el
+    id. Con ``estimate_count`` la lista también recibe ``count`` y
+    ``count_label`` ("~52000", "10000+") de ``estimate_count()``; si no,
+    quedan vacíos.
+    """
+
+    def __init__(self, queryset, per_page, estimate_count=False):
+        self.field, self.descending = keyset_ordering(queryset)
+        direction = '-' if self.descending else ''
+        if self.field.primary_key:
+            ordering = [f'{direction}pk']
+        else:
+            ordering = [f'{direction}{self.field.name}', f'{direction}pk']
+        self.queryset = queryset.order_by(*ordering)
+        self.per_page = max(int(per_page), 1)
+        self.estimate_count = estimate_count
+
+    @cached_property
+    def _count(self):
+        if not self.estimate_count:
+            return None, ''
+        return estimate_count(self.queryset)
+
+    @property
+    def count(self):
+        return self._count[0]
+
+    @property
+    def count_label(self):
+        count, qualifier = self._count
+        if count is None:
+            return ''
+        return f'{qualifier}{count}' if qualifier == '~' else f'{count}{qualifier}'
+
+    def page(self, cursor=None):
+        """Página después de ``cursor`` (la primera sin él); InvalidCursor si no se puede leer"""
+        queryset = self.queryset
+        if cursor:
+            value, pk = decode_cursor(self.field, cursor)
+            lookup = 'lt' if self.descending else 'gt'
+            if self.field.primary_key:
+                queryset = queryset.filter(**{f'pk__{lookup}': pk})
+            else:
+                # La cota inclusiva sobre el campo solo es la que permite al
+                # índice saltar al cursor; el OR descarta después los empates
+                queryset = queryset.filter(**{f'{self.field.name}__{lookup}e': value}).filter(
+                    Q(**{f'{self.field.name}__{lookup}': value}) | Q(**{f'pk__{lookup}': pk})
+                )
+        rows = list(queryset[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        next_cursor = encode_cursor(self.field, rows[-1]) if has_next else None
+        return KeysetPage(rows, self, cursor or None, next_cursor)
+
+    def get_page(self, cursor=None):
+        """Como ``page()``, pero un cursor ilegible da la primera página"""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+
+class KeysetPage:
+    """
+    Una página de KeysetPaginator. Sigue las partes de la Page de Django que
+    usan las plantillas de listas; ``has_previous`` significa "no es la
+    primera página", porque el recorrido por cursor solo avanza.
+    """
+
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, cursor, next_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def paginate(request, queryset, per_page, estimate_count=True):
+    """
+    Página de ``queryset`` para una vista de lista: por cursor cuando la
+    petición trae el parámetro ``cursor`` (vacío en la primera página), por
+    número de página en otro caso. Devuelve ``(paginator, page)``.
+    """
+    if 'cursor' in request.GET:
+        paginator = KeysetPaginator(queryset, per_page, estimate_count=estimate_count)
+        return paginator, paginator.get_page(request.GET.get('cursor'))
+    paginator = Paginator(queryset, per_page)
+    return paginator, paginator.get_page(request.GET.get('page'))
@@ -0,0 +1,79 @@
+"""
+TopicTales Biomédica - Presupuesto de consultas
+Registra el SQL que se ejecuta al atender una petición (conteo, tiempo en
+base de datos y sentencias repetidas) con ``connection.execute_wrapper``,
+así que funciona también con DEBUG apagado. Lo usan QueryBudgetMiddleware y
+las pruebas de presupuesto de consultas de las vistas.
+"""
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+
+class QueryRecorder:
+    """
+    Context manager que registra cada consulta ejecutada en las conexiones
+    del hilo actual, como pares ``(sql, segundos)``.
+
+    El SQL conserva sus marcadores, así que la misma sentencia con distintos
+    parámetros comparte una firma; una firma repetida muchas veces en una
+    petición es la forma típica de un N+1.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration_ms(self):
+        return sum(seconds for _, seconds in self.queries) * 1000
+
+    def duplicates(self, threshold=2):
+        """Firmas ejecutadas al menos ``threshold`` veces, las más repetidas primero"""
+        counts = Counter(sql for sql, _ in self.queries)
+        return [(sql, count) for sql, count in counts.most_common() if count >= threshold]
+
+
+class QueryBudgetMixin:
+    """Mixin de TestCase con ``assertQueryBudget``"""
+
+    @contextmanager
+    def assertQueryBudget(self, max_queries, max_repeats=None):
+        """
+        Falla si el bloque ejecuta más de ``max_queries`` consultas o, con
+        ``max_repeats``, repite una sentencia más de esas veces
+        """
+        with QueryRecorder() as recorder:
+            yield recorder
+        if recorder.count > max_queries:
+            self.fail(
+                f'{recorder.count} queries over a budget of {max_queries}:\n'
+                + '\n'.join(f'{index}. {sql}' for index, (sql, _) in enumerate(recorder.queries, 1))
+            )
+        if max_repeats is not None:
+            repeated = recorder.duplicates(max_repeats + 1)
+            if repeated:
+                sql, count = repeated[0]
+                self.fail(f'Query repeated {count} times (limit {max_repeats}): {sql}')
@@ -0,0 +1,69 @@
+"""
+TopicTales Biomédica - Secuencias de números
+Asigna los números de pacientes, facturas, pagos y reclamaciones desde una
+fila contador en lugar de contar los registros existentes en cada alta
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Length
+
+from .models import NumberSequence
+
+
+def sequence_key(name, organization=None, year=None):
+    organization_id = getattr(organization, 'id', organization)
+    return f"{name}:{organization_id or '-'}:{year or '-'}"
+
+
+def allocate_block(name, count=1, organization=None, year=None, seed=None):
+    """
+    Reserva ``count`` valores consecutivos de una secuencia y los devuelve
+    como un ``range``.
+
+    La fila contador se incrementa antes de leerse, así que el UPDATE
+    retiene el bloqueo de la fila (el de la base de datos en SQLite) hasta
+    que termina la transacción: las escrituras concurrentes esperan en la
+    fila y nunca ven el mismo valor, y una transacción revertida devuelve
+    sus valores. ``seed`` devuelve el último valor ya usado y solo se llama
+    cuando se crea la fila contador.
+    """
+    if count < 1:
+        raise ValueError('count must be at least 1')
+    key = sequence_key(name, organization, year)
+    sequences = NumberSequence.objects.filter(key=key)
+
+    with transaction.atomic():
+        if not sequences.update(value=F('value') + count):
+            try:
+                with transaction.atomic():
+                    NumberSequence.objects.create(
+                        key=key,
+                        name=name,
+                        organization_id=getattr(organization, 'id', organization),
+                        year=year,
+                        value=(seed() if seed else 0) + count
+                    )
+            except IntegrityError:
+                # Otra escritura creó la fila primero
+                sequences.update(value=F('value') + count)
+        last = sequences.values_list('value', flat=True).get()
+    return range(last - count + 1, last + 1)
+
+
+def next_value(name, organization=None, year=None, seed=None):
+    """Reserva un solo valor de una secuencia"""
+    return allocate_block(name, 1, organization, year, seed)[0]
+
+
+def last_number(queryset, field, prefix):
+    """
+    Sufijo numérico del mayor valor de ``field`` con el prefijo ``prefix``;
+    inicializa una secuencia a partir de los registros existentes
+    """
+    value = queryset.filter(**{f'{field}__startswith': prefix}).order_by(
+        Length(field).desc(), f'-{field}'
+    ).values_list(field, flat=True).first()
+    try:
+        return int(value[len(prefix):])
+    except (TypeError, ValueError):
+        return 0
@@ -0,0 +1,132 @@
+"""
+TopicTales Biomédica - Caché de la barra lateral
+Árbol de módulos y contadores que usa el context processor de la barra lateral
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Prefetch, Q
+from django.utils import timezone
+
+from .models import User, Organization, Subscription, SystemModule, ModulePermission, Notification
+
+
+MODULES_KEY = 'sidebar:modules:{organization_id}:{plan}:{role}'
+COUNTERS_KEY = 'sidebar:counters:{user_id}'
+
+
+def modules_cache_key(organization_id, plan, role):
+    return MODULES_KEY.format(organization_id=organization_id, plan=plan, role=role)
+
+
+def counters_cache_key(user_id):
+    return COUNTERS_KEY.format(user_id=user_id)
+
+
+def build_module_tree(organization, plan, user):
+    """
+    Módulos de la barra lateral agrupados por categoría para una
+    organización, plan y rol de usuario. Cuesta tres consultas sin importar
+    el número de módulos.
+    """
+    available_modules = SystemModule.objects.filter(
+        is_active=True,
+        parent_module__isnull=True  # Solo módulos de primer nivel
+    ).prefetch_related(
+        Prefetch('submodules', queryset=SystemModule.objects.filter(is_active=True))
+    )
+
+    # Ajustes de la organización, por id de módulo
+    enabled_by_module = dict(
+        ModulePermission.objects.filter(organization=organization).values_list('module_id', 'is_enabled')
+    )
+
+    grouped_modules = {}
+    for module in available_modules:
+        if not module.is_available_for_plan(plan):
+            continue
+        if not module.is_available_for_user(user):
+            continue
+        # Sin permiso específico se usa la disponibilidad por defecto
+        if not enabled_by_module.get(module.id, True):
+            continue
+
+        submodules = [
+            submodule for submodule in module.submodules.all()
+            if submodule.is_available_for_plan(plan) and submodule.is_available_for_user(user)
+        ]
+        grouped_modules.setdefault(module.category, []).append({
+            'module': module,
+            'submodules': submodules
+        })
+
+    return grouped_modules
+
+
+def build_counters(organization, user):
+    """
+    Números de los indicadores de la barra lateral en tres consultas agregadas
+    """
+    from patients.models import Patient
+    from appointments.models import Appointment
+
+    today = timezone.now().date()
+
+    notifications = Notification.objects.filter(
+        user=user,
+        is_read=False,
+        is_dismissed=False
+    ).aggregate(
+        pending=Count('id'),
+        messages=Count('id', filter=Q(notification_type='message'))
+    )
+
+    return {
+        'total_patients': Patient.objects.filter(organization=organization, is_active=True).count(),
+        'todays_appointments': Appointment.objects.filter(
+            organization=organization,
+            start_datetime__date=today
+        ).count(),
+        'pending_notifications': notifications['pending'],
+        'unread_messages': notifications['messages'],
+    }
+
+
+def get_sidebar_data(organization, subscription, user):
+    """
+    Devuelve ``(grouped_modules, counters)`` de un usuario; lee ambos de la
+    caché en un solo viaje y reconstruye solo lo que falta.
+    """
+    modules_key = modules_cache_key(organization.id, subscription.plan, user.role)
+    counters_key = counters_cache_key(user.id)
+    cached = cache.get_many([modules_key, counters_key])
+
+    grouped_modules = cached.get(modules_key)
+    if grouped_modules is None:
+        grouped_modules = build_module_tree(organization, subscription.plan, user)
+        cache.set(modules_key, grouped_modules, settings.SIDEBAR_MODULES_CACHE_TIMEOUT)
+
+    counters = cached.get(counters_key)
+    if counters is None:
+        counters = build_counters(organization, user)
+        cache.set(counters_key, counters, settings.SIDEBAR_COUNTERS_CACHE_TIMEOUT)
+
+    return grouped_modules, counters
+
+
+def invalidate_module_trees(organization_ids=None):
+    """
+    Borra de la caché los árboles de módulos de las organizaciones indicadas
+    (todas si se omiten)
+    """
+    if organization_ids is None:
+        organization_ids = Organization.objects.values_list('id', flat=True)
+    cache.delete_many([
+        modules_cache_key(organization_id, plan, role)
+        for organization_id in organization_ids
+        for plan, _ in Subscription.PLAN_CHOICES
+        for role, _ in User.ROLE_CHOICES
+    ])
+
+
+def invalidate_counters(user_id):
+    cache.delete(counters_cache_key(user_id))
@@ -0,0 +1,34 @@
+"""
+TopicTales Biomédica - Señales de cuentas
+"""
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from . import sync
+from .models import SystemModule, ModulePermission, Subscription, Notification
+from .sidebar import invalidate_module_trees, invalidate_counters
+
+
+@receiver([post_save, post_delete], sender=SystemModule)
+def system_module_changed(sender, instance, **kwargs):
+    """Los módulos son compartidos por todas las organizaciones"""
+    invalidate_module_trees()
+
+
+@receiver([post_save, post_delete], sender=ModulePermission)
+def module_permission_changed(sender, instance, **kwargs):
+    invalidate_module_trees([instance.organization_id])
+
+
+@receiver([post_save, post_delete], sender=Subscription)
+def subscription_changed(sender, instance, **kwargs):
+    invalidate_module_trees([instance.organization_id])
+
+
+@receiver([post_save, post_delete], sender=Notification)
+def notification_changed(sender, instance, **kwargs):
+    invalidate_counters(instance.user_id)
+
+
+for label in sync.ORGANIZATION_LOOKUPS:
+    pre_delete.connect(sync.record_deletion, sender=label, dispatch_uid=f'sync_tombstone_{label}')
@@ -0,0 +1,114 @@
+"""
+TopicTales Biomédica - Sincronización incremental
+Cambios que sirven los endpoints de sincronización de la API: las filas de
+una organización cuyo ``updated_at`` pasó la marca de agua del cliente, más
+las lápidas de las filas borradas desde entonces.
+
+Las marcas de agua son fechas del servidor. Cada sincronización vuelve a leer
+SYNC_OVERLAP_SECONDS antes de su marca, así que no se pierde una fila que
+guardó una transacción confirmada después de la lectura anterior; los
+clientes hacen upsert, de modo que ver una fila dos veces no hace daño. Los
+clientes aplican las lápidas antes que las filas cambiadas.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Organization, SyncTombstone
+
+# Nombre del recurso: (modelo, lookup del modelo a su organización)
+RESOURCES = {
+    'patients': ('patients.Patient', 'organization'),
+    'appointments': ('appointments.Appointment', 'organization'),
+    'medical-records': ('medical_records.MedicalRecord', 'organization'),
+    'invoices': ('billing.Invoice', 'organization'),
+    'payments': ('billing.Payment', 'invoice__organization'),
+}
+
+ORGANIZATION_LOOKUPS = {label: lookup for label, lookup in RESOURCES.values()}
+
+
+class FullSyncRequired(Exception):
+    """La marca de agua es más antigua que las lápidas que se conservan"""
+
+
+def issue_watermark():
+    return timezone.now()
+
+
+def format_watermark(value):
+    # UTC con sufijo "Z": un "+00:00" enviado sin codificar en la query
+    # string llegaría con un espacio en lugar del "+"
+    return value.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def parse_watermark(value):
+    """Marca de agua de una respuesta anterior; ValueError si no se puede leer"""
+    parsed = parse_datetime(value)
+    if parsed is None or timezone.is_naive(parsed):
+        raise ValueError(f'Invalid watermark {value!r}')
+    return parsed
+
+
+def check_watermark(since, now=None):
+    horizon = (now or timezone.now()) - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    if since - _overlap() < horizon:
+        raise FullSyncRequired(since)
+
+
+def _overlap():
+    return timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+
+
+def changed(resource, organization, since, until):
+    """
+    Filas de ``resource`` guardadas antes de ``until`` y, salvo que ``since``
+    sea ``None`` (sincronización completa), después de ``since`` menos el
+    traslape; las más antiguas primero
+    """
+    label, lookup = RESOURCES[resource]
+    queryset = apps.get_model(label)._default_manager.filter(**{lookup: organization}, updated_at__lt=until)
+    if since is not None:
+        queryset = queryset.filter(updated_at__gte=since - _overlap())
+    return queryset.order_by('updated_at')
+
+
+def deleted(resource, organization, since, until):
+    """Ids de las filas de ``resource`` borradas entre ``since`` (menos el traslape) y ``until``"""
+    return SyncTombstone.objects.filter(
+        organization=organization, model=RESOURCES[resource][0],
+        deleted_at__gte=since - _overlap(), deleted_at__lt=until
+    ).values_list('object_id', flat=True).distinct()
+
+
+def _organization_id(instance, lookup):
+    head, _, rest = lookup.partition('__')
+    field = instance._meta.get_field(head)
+    value = getattr(instance, field.attname)
+    if not rest or value is None:
+        return value
+    return field.related_model._default_manager.filter(pk=value).values_list(rest, flat=True).first()
+
+
+def record_deletion(sender, instance, origin=None, **kwargs):
+    """
+    Receptor de pre_delete: las filas relacionadas por las que se lee la
+    organización todavía existen y la lápida se escribe en la misma
+    transacción que el borrado. No se registra nada cuando se borra la
+    organización misma.
+    """
+    if isinstance(origin, Organization) or getattr(origin, 'model', None) is Organization:
+        return
+    organization_id = _organization_id(instance, ORGANIZATION_LOOKUPS[sender._meta.label])
+    if organization_id is not None:
+        SyncTombstone.objects.create(organization_id=organization_id, model=sender._meta.label, object_id=instance.pk)
+
+
+def prune(max_age=None):
+    """Borra las lápidas con más de ``max_age`` días"""
+    cutoff = timezone.now() - timedelta(days=max_age or settings.SYNC_TOMBSTONE_DAYS)
+    deleted_count, _ = SyncTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted_count
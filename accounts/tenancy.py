@@ -0,0 +1,92 @@
+"""
+TopicTales Biomédica - Multiorganización
+Acota los querysets a una organización. TenantMiddleware liga cada petición
+al contexto actual y el manager ``scoped`` de los modelos por organización
+filtra cada queryset que crea por la organización del usuario de la
+petición, así que una vista no puede olvidar el filtro y sus consultas
+parten de los índices compuestos que empiezan por organization_id.
+
+``objects`` sigue siendo el manager por defecto sin filtro: el admin, la
+validación de modelos, las señales y los comandos de administración
+trabajan entre organizaciones. El código que corre fuera de una petición
+liga una organización con ``tenant_scope()``.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import models
+
+_request = ContextVar('tenant_request', default=None)
+_organization = ContextVar('tenant_organization', default=None)
+
+
+class NoTenant(LookupError):
+    """Se construyó un queryset acotado sin petición ni organización ligadas"""
+
+
+def bind_request(request):
+    return _request.set(request)
+
+
+def unbind_request(token):
+    _request.reset(token)
+
+
+@contextmanager
+def tenant_scope(organization):
+    """Liga ``organization`` (instancia o id) durante el bloque"""
+    token = _organization.set(getattr(organization, 'pk', organization))
+    try:
+        yield
+    finally:
+        _organization.reset(token)
+
+
+def organization_id_for(request):
+    """
+    Id de la organización del usuario de la petición, o None para usuarios
+    anónimos o sin perfil. Se resuelve en el primer uso, así que también ve
+    al usuario que una vista de la API autentica por token.
+    """
+    organization_id = getattr(request, '_tenant_organization_id', None)
+    if organization_id is None:
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return None
+        profile = getattr(user, 'profile', None)
+        if profile is None:
+            return None
+        organization_id = request._tenant_organization_id = profile.organization_id
+    return organization_id
+
+
+def current_organization_id():
+    organization_id = _organization.get()
+    if organization_id is not None:
+        return organization_id
+    request = _request.get()
+    if request is None:
+        raise NoTenant('No request or organization is bound; use tenant_scope() outside requests')
+    return organization_id_for(request)
+
+
+class TenantManager(models.Manager):
+    """
+    Manager cuyos querysets solo ven las filas de la organización actual.
+    ``lookup`` va del modelo a su organización, p. ej.
+    ``'patient__organization'`` en los modelos que pertenecen a un paciente.
+    Sin organización (petición anónima) el queryset queda vacío.
+    """
+
+    def __init__(self, lookup='organization'):
+        super().__init__()
+        self.lookup = lookup
+
+    def get_queryset(self):
+        return self.for_organization(current_organization_id())
+
+    def for_organization(self, organization):
+        queryset = super().get_queryset()
+        if organization is None:
+            return queryset.none()
+        return queryset.filter(**{self.lookup: organization})
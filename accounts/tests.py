@@ -1,3 +1,496 @@
-from django.test import TestCase
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.http import Http404, HttpResponse
+from django.test import TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import sidebar, tenancy
+from .middleware import QueryBudgetMiddleware
+from .context_processors import sidebar_modules
+from .models import User, Organization, Subscription, UserProfile, SystemModule, ModulePermission, Notification
+from .query_budget import QueryBudgetMixin
+from .sequences import allocate_block, next_value
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SidebarModulesContextProcessorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(
+            name='Clínica Test', legal_name='Clínica Test SA', tax_id='TEST010101',
+            address='Calle 1', phone='5550000000', email='clinica@test.com',
+            director_name='Director', director_license='123456'
+        )
+        Subscription.objects.create(
+            organization=cls.organization, plan='MEDIUM',
+            end_date=timezone.now() + timedelta(days=30)
+        )
+        cls.user = User.objects.create_user(username='doctor', password='x', role='doctor')
+        UserProfile.objects.create(user=cls.user, organization=cls.organization)
+
+        cls.patients_module = SystemModule.objects.create(
+            name='patients', display_name='Pacientes', description='Pacientes',
+            url_name='patients:list', allowed_roles=['doctor']
+        )
+        SystemModule.objects.create(
+            name='patients_list', display_name='Lista', description='Lista',
+            parent_module=cls.patients_module, allowed_roles=['doctor']
+        )
+        SystemModule.objects.create(
+            name='billing', display_name='Facturación', description='Facturación',
+            category='admin', min_plan_required='ADVANCED'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _request(self):
+        request = RequestFactory().get('/')
+        request.user = User.objects.get(pk=self.user.pk)
+        # Views load the profile, organization and subscription before rendering
+        request.user.profile.organization.subscription
+        return request
+
+    def _module_names(self, context):
+        return [
+            module_data['module'].name
+            for modules in context['sidebar_modules'].values()
+            for module_data in modules
+        ]
+
+    def test_builds_tree_for_plan_and_role(self):
+        context = sidebar_modules(self._request())
+
+        self.assertEqual(self._module_names(context), ['patients'])
+        submodules = context['sidebar_modules']['core'][0]['submodules']
+        self.assertEqual([submodule.name for submodule in submodules], ['patients_list'])
+
+    def test_warm_cache_costs_one_read_and_no_queries(self):
+        sidebar_modules(self._request())
+        request = self._request()
+
+        with mock.patch.object(sidebar, 'cache', wraps=cache) as spy:
+            with self.assertNumQueries(0):
+                context = sidebar_modules(request)
+
+        self.assertEqual(spy.get_many.call_count, 1)
+        self.assertEqual(spy.get.call_count, 0)
+        self.assertEqual(self._module_names(context), ['patients'])
+
+    def test_cold_cache_queries_are_bounded(self):
+        request = self._request()
+
+        with self.assertNumQueries(6):
+            sidebar_modules(request)
+
+    def test_module_permission_change_invalidates_tree(self):
+        sidebar_modules(self._request())
+        ModulePermission.objects.create(
+            organization=self.organization, module=self.patients_module, is_enabled=False
+        )
+
+        self.assertEqual(self._module_names(sidebar_modules(self._request())), [])
+
+    def test_subscription_change_invalidates_tree(self):
+        sidebar_modules(self._request())
+        subscription = self.organization.subscription
+        subscription.plan = 'ADVANCED'
+        subscription.save()
+
+        self.assertEqual(sorted(self._module_names(sidebar_modules(self._request()))), ['billing', 'patients'])
+
+    def test_notification_change_invalidates_counters(self):
+        self.assertEqual(sidebar_modules(self._request())['pending_notifications'], 0)
+        Notification.objects.create(user=self.user, title='Aviso', message='Mensaje', notification_type='message')
+
+        context = sidebar_modules(self._request())
+        self.assertEqual(context['pending_notifications'], 1)
+        self.assertEqual(context['unread_messages'], 1)
+
+
+class NumberSequenceTests(TestCase):
+
+    def test_values_are_consecutive_per_key(self):
+        organization = Organization.objects.create(
+            name='Clínica Test', legal_name='Clínica Test SA', tax_id='TEST010101',
+            address='Calle 1', phone='5550000000', email='clinica@test.com',
+            director_name='Director', director_license='123456'
+        )
+
+        self.assertEqual(next_value('invoice', year=2026), 1)
+        self.assertEqual(next_value('invoice', year=2026), 2)
+        self.assertEqual(next_value('invoice', year=2027), 1)
+        self.assertEqual(next_value('invoice', organization=organization, year=2026), 1)
+
+    def test_block_allocation(self):
+        self.assertEqual(allocate_block('payment', 50), range(1, 51))
+        self.assertEqual(next_value('payment'), 51)
+
+    def test_seed_is_only_used_on_creation(self):
+        seed = mock.Mock(return_value=41)
+
+        self.assertEqual(next_value('claim', seed=seed), 42)
+        self.assertEqual(next_value('claim', seed=seed), 43)
+        seed.assert_called_once_with()
+
+
+class NumberSequenceLoadTests(TransactionTestCase):
+
+    WRITERS = 50
+    VALUES_PER_WRITER = 20
+
+    def test_parallel_writers_get_unique_values(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Threads cannot share an in-memory SQLite test database')
+        barrier = threading.Barrier(self.WRITERS)
+        allocated = []
+        errors = []
+
+        def write(worker):
+            try:
+                barrier.wait()
+                for index in range(self.VALUES_PER_WRITER):
+                    if index % 2:
+                        allocated.append(next_value('load', year=2026))
+                    else:
+                        allocated.extend(allocate_block('load', 3, year=2026))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=write, args=(worker,)) for worker in range(self.WRITERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(allocated), list(range(1, len(allocated) + 1)))
+
+
+def create_view_fixtures(rows=5):
+    """An organization with a doctor and ``rows`` records of each kind the top views list"""
+    from appointments.models import Appointment, AppointmentType
+    from billing.models import Invoice, Payment
+    from equipment.models import Equipment, EquipmentAlert, EquipmentCategory, Location, Supplier
+    from medical_records.models import Consultation, MedicalRecord
+    from patients.models import Patient
+    from psychology.models import PsychologicalEvaluation, PsychologicalTest, TestResult
+    from reports.models import Report
+
+    organization = Organization.objects.create(
+        name='Clínica Test', legal_name='Clínica Test SA', tax_id='TEST010101',
+        address='Calle 1', phone='5550000000', email='clinica@test.com',
+        director_name='Director', director_license='123456'
+    )
+    Subscription.objects.create(
+        organization=organization, plan='ADVANCED', end_date=timezone.now() + timedelta(days=30)
+    )
+    user = User.objects.create_user(username='doctor', password='x', role='doctor', first_name='Ana', last_name='Ruiz')
+    UserProfile.objects.create(user=user, organization=organization)
+
+    now = timezone.now()
+    appointment_type = AppointmentType.objects.create(name='Consulta', organization=organization, duration_minutes=30)
+    category = EquipmentCategory.objects.create(name='Diagnóstico')
+    location = Location.objects.create(name='Consultorio 1')
+    supplier = Supplier.objects.create(name='Proveedor')
+    test = PsychologicalTest.objects.create(
+        name='Beck', category='depression', description='Inventario', age_range_min=18, age_range_max=80,
+        administration_time=15, scoring_method='Suma', interpretation_guide='Guía'
+    )
+
+    patients = []
+    for index in range(rows):
+        patient = Patient.objects.create(
+            patient_id=f'PAC{index:03d}', first_name='Paciente', last_name=str(index),
+            birth_date=date(1990, 1, 1), gender='F', phone_number='5551234567', email=f'paciente{index}@test.com',
+            address='Calle 2', city='CDMX', state='CDMX', postal_code='01000',
+            emergency_contact_name='Contacto', emergency_contact_relationship='Familiar',
+            emergency_contact_phone='5551234567', organization=organization
+        )
+        patients.append(patient)
+        Appointment.objects.create(
+            patient=patient, doctor=user, appointment_type=appointment_type, organization=organization,
+            start_datetime=now + timedelta(hours=index + 1), reason='Revisión'
+        )
+        MedicalRecord.objects.create(patient=patient, organization=organization)
+        Consultation.objects.create(
+            patient=patient, doctor=user, organization=organization, chief_complaint='Dolor de cabeza'
+        )
+        invoice = Invoice.objects.create(
+            invoice_number=f'FAC{index:03d}', patient=patient,
+            due_date=now.date() + timedelta(days=30), created_by=user, total_amount=Decimal('100.00')
+        )
+        Payment.objects.create(
+            invoice=invoice, payment_number=f'PAG{index:03d}', amount=Decimal('50.00'),
+            payment_method='cash', processed_by=user
+        )
+        equipment = Equipment.objects.create(
+            name=f'Equipo {index}', model='M1', brand='Marca', serial_number=f'SN{index:03d}',
+            category=category, supplier=supplier, location=location, created_by=user,
+            organization=organization
+        )
+        EquipmentAlert.objects.create(
+            equipment=equipment, alert_type='maintenance', title='Mantenimiento', message='Pendiente'
+        )
+        evaluation = PsychologicalEvaluation.objects.create(
+            patient=patient, psychologist=user, evaluation_type='initial', evaluation_date=now,
+            referral_source='Médico', referral_reason='Ansiedad', chief_complaint='Ansiedad',
+            recommendations='Terapia'
+        )
+        TestResult.objects.create(
+            evaluation=evaluation, test=test, administered_by=user, administration_date=now,
+            interpretation='Leve'
+        )
+        Report.objects.create(title=f'Reporte {index}', report_type='patients', created_by=user)
+    return organization, user, patients
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Query budgets of the most used views, with several rows of each kind so
+    that a per-row query (N+1) shows up as a budget overrun
+    """
+
+    ROWS = 5
+
+    # (url name, fixture used for the URL argument, query string, budget); the
+    # budgets are measured with cold caches and include session, user,
+    # profile and sidebar queries
+    BUDGETS = [
+        ('dashboard:index', None, '', 16),
+        ('dashboard:quick_stats', None, '', 8),
+        ('patients:list', None, '', 16),
+        ('patients:search', None, 'q=Paciente', 10),
+        ('patients:picker', None, 'q=Paciente', 6),
+        ('patients:detail', 'patient', '', 12),
+        ('appointments:calendar', None, '', 14),
+        ('appointments:list', None, '', 14),
+        ('appointments:todays_appointments', None, '', 16),
+        ('appointments:detail', 'appointment', '', 17),
+        ('appointments:calendar_events', None, '', 6),
+        ('medical_records:index', None, '', 18),
+        ('medical_records:all_consultations', None, '', 15),
+        ('medical_records:patient_records', 'patient', '', 20),
+        ('billing:index', None, '', 14),
+        ('billing:invoices', None, '', 13),
+        ('billing:services', None, '', 11),
+        ('equipment:list', None, '', 17),
+        ('equipment:maintenance_list', None, '', 11),
+        ('equipment:api_alerts', 'equipment', '', 5),
+        ('psychology:dashboard', None, '', 14),
+        ('psychology:evaluation_list', None, '', 11),
+        ('psychology:evaluation_detail', 'evaluation', '', 13),
+        ('psychology:session_list', None, '', 11),
+        ('psychology:test_list', None, '', 11),
+        ('nutrition:dashboard', None, '', 15),
+        ('nutrition:assessment_list', None, '', 11),
+        ('reports:index', None, '', 15),
+        ('reports:patients', None, 'gender=F', 19),
+        ('specialties:index', None, '', 20),
+        ('specialties:doctor_list', None, '', 12),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        from appointments.models import Appointment
+        from billing.models import Invoice
+        from equipment.models import Equipment
+        from psychology.models import PsychologicalEvaluation
+
+        cls.organization, cls.user, patients = create_view_fixtures(cls.ROWS)
+        cls.url_objects = {
+            'patient': patients[0],
+            'appointment': Appointment.objects.first(),
+            'invoice': Invoice.objects.first(),
+            'equipment': Equipment.objects.first(),
+            'evaluation': PsychologicalEvaluation.objects.first(),
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def _url(self, name, fixture, query):
+        args = [self.url_objects[fixture].pk] if fixture else []
+        url = reverse(name, args=args)
+        return f'{url}?{query}' if query else url
+
+    def test_view_query_budgets(self):
+        for name, fixture, query, budget in self.BUDGETS:
+            with self.subTest(view=name):
+                cache.clear()
+                with self.assertQueryBudget(budget, max_repeats=self.ROWS - 1):
+                    response = self.client.get(self._url(name, fixture, query))
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class QueryBudgetMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.user, _ = create_view_fixtures(rows=3)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    @override_settings(QUERY_BUDGET_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('patients:list'))
+
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", total;dur=[\d.]+$')
+
+    @override_settings(QUERY_BUDGET_SERVER_TIMING=False)
+    def test_server_timing_can_be_disabled(self):
+        response = self.client.get(reverse('patients:list'))
+
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(QUERY_BUDGET=2)
+    def test_logs_views_over_budget(self):
+        with self.assertLogs('accounts.middleware', 'WARNING') as logs:
+            self.client.get(reverse('patients:list'))
+
+        self.assertIn('Query budget exceeded by patients:list', logs.output[0])
+
+    @override_settings(QUERY_REPEAT_LIMIT=3)
+    def test_logs_repeated_queries(self):
+        from patients.models import Patient
+
+        def view_with_n_plus_one(request):
+            for patient in Patient.objects.all():
+                patient.organization.name
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        with self.assertLogs('accounts.middleware', 'WARNING') as logs:
+            QueryBudgetMiddleware(view_with_n_plus_one)(request)
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Possible N+1 in /: query repeated 3 times', logs.output[0])
+
+    @override_settings(QUERY_BUDGET=2, QUERY_BUDGET_EXCLUDED_VIEWS=['patients:list'])
+    def test_excluded_views_are_not_logged(self):
+        with self.assertNoLogs('accounts.middleware', 'WARNING'):
+            self.client.get(reverse('patients:list'))
+
+
+class TenantScopingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.user, cls.patients = create_view_fixtures(rows=2)
+        cls.other = Organization.objects.create(
+            name='Otra Clínica', legal_name='Otra Clínica SA', tax_id='OTRA010101',
+            address='Calle 3', phone='5550000001', email='otra@test.com',
+            director_name='Directora', director_license='654321'
+        )
+        cls.other_user = User.objects.create_user(username='otro', password='x', role='doctor')
+        UserProfile.objects.create(user=cls.other_user, organization=cls.other)
+
+    def test_scoped_manager_needs_a_tenant(self):
+        from billing.models import Invoice
+        from patients.models import Patient
+
+        with self.assertRaises(tenancy.NoTenant):
+            Patient.scoped.count()
+        with tenancy.tenant_scope(self.organization):
+            self.assertEqual(Patient.scoped.count(), 2)
+            self.assertEqual(Invoice.scoped.with_overdue().count(), 2)
+        with tenancy.tenant_scope(self.other):
+            self.assertEqual(Patient.scoped.count(), 0)
+
+    def test_api_only_sees_the_users_organization(self):
+        self.client.force_login(self.other_user)
+
+        self.assertEqual(self.client.get('/api/v1/patients/').json()['results'], [])
+        self.assertEqual(self.client.get(f'/api/v1/patients/{self.patients[0].pk}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/v1/dashboard/stats/').json()['total_patients'], 0)
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/api/v1/dashboard/stats/').json()['total_patients'], 2)
+
+    def test_recent_activity_only_lists_the_users_organization(self):
+        self.client.force_login(self.other_user)
+        activity = self.client.get('/api/v1/dashboard/recent-activity/').json()
+        self.assertEqual((activity['recent_appointments'], activity['recent_patients']), ([], []))
+
+        self.client.force_login(self.user)
+        activity = self.client.get('/api/v1/dashboard/recent-activity/').json()
+        self.assertEqual((len(activity['recent_appointments']), len(activity['recent_patients'])), (2, 2))
+
+    def test_global_search_only_finds_the_users_organization(self):
+        self.client.force_login(self.other_user)
+        results = self.client.get('/api/v1/search/', {'q': 'Paciente'}).json()
+        self.assertEqual((results['patients'], results['appointments']), ([], []))
+
+        self.client.force_login(self.user)
+        results = self.client.get('/api/v1/search/', {'q': 'Paciente'}).json()
+        self.assertEqual((len(results['patients']), len(results['appointments'])), (2, 2))
+
+    def _equipment_dashboard(self):
+        # The dashboard template is not part of this tree; the context is enough
+        with mock.patch('equipment.views.render', return_value=HttpResponse()) as render:
+            self.client.get(reverse('equipment:dashboard'))
+        context = render.call_args.args[2]
+        return context['stats']['total_equipment'], len(context['active_alerts'])
+
+    def test_equipment_dashboard_only_counts_the_users_organization(self):
+        self.client.force_login(self.other_user)
+        self.assertEqual(self._equipment_dashboard(), (0, 0))
+
+        self.client.force_login(self.user)
+        self.assertEqual(self._equipment_dashboard(), (2, 2))
+
+    def test_billing_views_404_on_another_organizations_invoice(self):
+        from billing.models import Invoice, Payment
+
+        from billing import views
+
+        invoice = Invoice.objects.get(patient=self.patients[0])
+        # The 404 template is not part of this tree, so the views are called directly
+        for name in ('invoice_detail', 'edit_invoice', 'add_invoice_item', 'create_payment', 'create_insurance_claim'):
+            request = RequestFactory().post('/', {'amount': '10.00', 'payment_method': 'cash'})
+            request.user = self.other_user
+            with tenancy.tenant_scope(self.other), self.assertRaises(Http404, msg=name):
+                getattr(views, name)(request, invoice.pk)
+        self.assertEqual(Payment.objects.filter(invoice=invoice).count(), 1)
+
+        self.client.force_login(self.other_user)
+        response = self.client.get(reverse('billing:api_invoice_totals', args=[invoice.pk]))
+        self.assertEqual(response.status_code, 404)
+
+        with mock.patch('billing.views.render', return_value=HttpResponse()) as render:
+            self.client.get(reverse('billing:invoices'))
+            self.client.get(reverse('billing:payments'))
+        invoices, payments = (call.args[2] for call in render.call_args_list)
+        self.assertEqual(len(invoices['invoices']), 0)
+        self.assertEqual(len(payments['payments']), 0)
+
+    def _csv_rows(self, url):
+        response = self.client.get(url)
+        return b''.join(response.streaming_content).decode('utf-8').splitlines()[1:]
+
+    def test_exports_only_include_the_users_organization(self):
+        self.client.force_login(self.other_user)
+        self.assertEqual(self._csv_rows(reverse('equipment:export')), [])
+        self.assertEqual(self._csv_rows(reverse('billing:export_payments')), [])
+
+        self.client.force_login(self.user)
+        self.assertEqual(len(self._csv_rows(reverse('equipment:export'))), 2)
+        self.assertEqual(len(self._csv_rows(reverse('billing:export_payments'))), 2)
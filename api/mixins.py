@@ -0,0 +1,89 @@
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from django.core.exceptions import FieldDoesNotExist
+
+_eager_paths = {}
+
+
+def eager_paths(serializer_class, model):
+    """
+    ``(select_related, prefetch_related)`` que necesita ``serializer_class``
+    sobre ``model``: se recorre la ``source`` de cada campo mientras pase
+    por relaciones del modelo, incluidos los serializers anidados. Se
+    calcula una vez por serializer.
+    """
+    key = (serializer_class, model)
+    if key not in _eager_paths:
+        select, prefetch = set(), set()
+        _collect_paths(serializer_class(), model, '', False, select, prefetch)
+        _eager_paths[key] = (sorted(select), sorted(prefetch))
+    return _eager_paths[key]
+
+
+def _collect_paths(serializer, model, prefix, prefetching, select, prefetch):
+    for field in serializer.fields.values():
+        if field.write_only or not field.source_attrs:
+            continue
+        path, current, nested = prefix, model, prefetching
+        for index, attr in enumerate(field.source_attrs):
+            try:
+                relation = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                break
+            if not relation.is_relation:
+                break
+            last = index == len(field.source_attrs) - 1
+            if last and isinstance(field, serializers.PrimaryKeyRelatedField) and relation.concrete:
+                # El id ya está en la fila: no hace falta el JOIN
+                break
+            path = f'{path}__{attr}' if path else attr
+            nested = nested or relation.many_to_many or relation.one_to_many
+            (prefetch if nested else select).add(path)
+            current = relation.related_model
+        else:
+            child = field.child if isinstance(field, serializers.ListSerializer) else field
+            if isinstance(child, serializers.Serializer) and path != prefix:
+                _collect_paths(child, current, path, nested, select, prefetch)
+
+
+class EagerLoadingMixin:
+    """
+    Agrega al queryset del viewset los ``select_related`` y
+    ``prefetch_related`` que se derivan de los campos del serializer, para
+    que serializar una página no consulte la BD fila por fila. Las
+    relaciones que solo lee un SerializerMethodField o una propiedad del
+    modelo no se ven; esas se cargan en ``get_queryset()``.
+    """
+    eager_loading = True
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if not self.eager_loading:
+            return queryset
+        select, prefetch = eager_paths(self.get_serializer_class(), queryset.model)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+
+class ValuesListMixin:
+    """
+    ``list()`` con un serializer de ``values()`` (``list_serializer_class``,
+    un ValuesSerializer) en lugar del serializer del detalle; el resto de
+    las acciones no cambian.
+    """
+    list_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.list_serializer_class is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).select_related(None).prefetch_related(None)
+        rows = self.list_serializer_class.values(queryset)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            serializer = self.list_serializer_class(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        return Response(self.list_serializer_class(rows, many=True).data)
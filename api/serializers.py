@@ -1,5 +1,10 @@
+from functools import cached_property
+
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db.models import CharField, DurationField, ExpressionWrapper, F, Q, Value, When, Case
+from django.db.models.functions import Cast, Concat, Trim
+from django.utils import timezone
 
 from patients.models import Patient
 from appointments.models import Appointment
@@ -26,14 +31,15 @@ class UserSerializer(serializers.ModelSerializer):
 class PatientSerializer(serializers.ModelSerializer):
     """Serializer para pacientes"""
     full_name = serializers.CharField(source='get_full_name', read_only=True)
-    age = serializers.IntegerField(read_only=True)
+    age = serializers.IntegerField(source='get_age', read_only=True)
     
     class Meta:
         model = Patient
         fields = [
-            'id', 'first_name', 'last_name', 'full_name', 'email', 'phone',
-            'birth_date', 'age', 'gender', 'address', 'city', 'state',
-            'emergency_contact', 'emergency_phone', 'insurance_info',
+            'id', 'patient_id', 'first_name', 'last_name', 'mother_last_name', 'full_name',
+            'email', 'phone_number', 'birth_date', 'age', 'gender', 'address', 'city', 'state',
+            'emergency_contact_name', 'emergency_contact_phone',
+            'insurance_company', 'insurance_policy',
             'is_active', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
@@ -42,7 +48,7 @@ class DoctorSerializer(serializers.ModelSerializer):
     """Serializer para doctores"""
     user = UserSerializer(read_only=True)
     specialties = serializers.StringRelatedField(many=True, read_only=True)
-    full_name = serializers.CharField(source='full_name', read_only=True)
+    full_name = serializers.CharField(read_only=True)
     
     class Meta:
         model = Doctor
@@ -72,15 +78,16 @@ class AppointmentSerializer(serializers.ModelSerializer):
     patient_id = serializers.IntegerField(write_only=True)
     doctor = UserSerializer(read_only=True)
     doctor_id = serializers.IntegerField(write_only=True)
-    patient_name = serializers.CharField(source='patient.full_name', read_only=True)
+    patient_name = serializers.CharField(source='patient.get_full_name', read_only=True)
     doctor_name = serializers.CharField(source='doctor.get_full_name', read_only=True)
+    duration = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Appointment
         fields = [
             'id', 'patient', 'patient_id', 'patient_name', 'doctor', 'doctor_id', 'doctor_name',
-            'appointment_date', 'appointment_type', 'status', 'duration', 'notes',
-            'is_urgent', 'created_at', 'updated_at'
+            'start_datetime', 'end_datetime', 'appointment_type', 'status', 'duration', 'notes',
+            'priority', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
@@ -88,18 +95,16 @@ class MedicalRecordSerializer(serializers.ModelSerializer):
     """Serializer para expedientes médicos"""
     patient = PatientSerializer(read_only=True)
     patient_id = serializers.IntegerField(write_only=True)
-    doctor = UserSerializer(read_only=True)
-    doctor_id = serializers.IntegerField(write_only=True)
-    patient_name = serializers.CharField(source='patient.full_name', read_only=True)
-    doctor_name = serializers.CharField(source='doctor.get_full_name', read_only=True)
+    patient_name = serializers.CharField(source='patient.get_full_name', read_only=True)
     
     class Meta:
         model = MedicalRecord
         fields = [
-            'id', 'patient', 'patient_id', 'patient_name', 'doctor', 'doctor_id', 'doctor_name',
-            'consultation_date', 'chief_complaint', 'symptoms', 'physical_examination',
-            'diagnosis', 'treatment_plan', 'medications', 'follow_up_date',
-            'notes', 'created_at', 'updated_at'
+            'id', 'patient', 'patient_id', 'patient_name', 'blood_type', 'allergies',
+            'chronic_conditions', 'current_medications', 'family_history',
+            'smoking_status', 'alcohol_consumption', 'exercise_frequency',
+            'emergency_contact_name', 'emergency_contact_phone', 'emergency_contact_relationship',
+            'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
@@ -129,6 +134,7 @@ class ReportSerializer(serializers.ModelSerializer):
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     type_display = serializers.CharField(source='get_report_type_display', read_only=True)
     file_size_mb = serializers.SerializerMethodField()
+    is_ready = serializers.BooleanField(read_only=True)
     
     class Meta:
         model = Report
@@ -149,24 +155,30 @@ class InvoiceSerializer(serializers.ModelSerializer):
     """Serializer para facturas"""
     patient = PatientSerializer(read_only=True)
     patient_id = serializers.IntegerField(write_only=True)
-    patient_name = serializers.CharField(source='patient.full_name', read_only=True)
+    patient_name = serializers.CharField(source='patient.get_full_name', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
+    is_overdue = serializers.BooleanField(read_only=True)
+    days_overdue = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Invoice
         fields = [
             'id', 'invoice_number', 'patient', 'patient_id', 'patient_name',
             'issue_date', 'due_date', 'subtotal', 'tax_amount', 'total_amount',
+            'amount_paid', 'amount_pending', 'is_overdue', 'days_overdue',
             'status', 'status_display', 'payment_terms', 'notes',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'invoice_number', 'created_at', 'updated_at']
+        read_only_fields = [
+            'id', 'invoice_number', 'amount_paid', 'amount_pending',
+            'created_at', 'updated_at'
+        ]
 
 class PaymentSerializer(serializers.ModelSerializer):
     """Serializer para pagos"""
     invoice = InvoiceSerializer(read_only=True)
     invoice_id = serializers.IntegerField(write_only=True)
-    patient_name = serializers.CharField(source='invoice.patient.get_full_name()', read_only=True)
+    patient_name = serializers.CharField(source='invoice.patient.get_full_name', read_only=True)
     payment_method_display = serializers.CharField(source='get_payment_method_display', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     
@@ -175,11 +187,207 @@ class PaymentSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'payment_number', 'invoice', 'invoice_id', 'patient_name',
             'amount', 'payment_date', 'payment_method', 'payment_method_display',
-            'status', 'status_display', 'transaction_id', 'notes',
+            'status', 'status_display', 'reference_number', 'notes',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'payment_number', 'created_at', 'updated_at']
 
+# Serializers de sincronización incremental: filas planas, relaciones como id
+class PatientSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Patient
+        exclude = ['search_text']
+
+class AppointmentSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Appointment
+        fields = '__all__'
+
+class MedicalRecordSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MedicalRecord
+        fields = '__all__'
+
+class InvoiceSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Invoice
+        fields = '__all__'
+
+class PaymentSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Payment
+        fields = '__all__'
+
+# Serializers de listados: leen los diccionarios de ``values()``
+class DisplayField(serializers.Field):
+    """Etiqueta de un campo con ``choices``, como ``get_FOO_display()``"""
+
+    def __init__(self, choices, **kwargs):
+        self.labels = {value: str(label) for value, label in choices}
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return self.labels.get(value, value)
+
+class AgeField(serializers.ReadOnlyField):
+    """Edad en años a partir de la fecha de nacimiento, como ``Patient.get_age()``"""
+
+    def to_representation(self, value):
+        today = timezone.now().date()
+        return today.year - value.year - ((today.month, today.day) < (value.month, value.day))
+
+class MinutesField(serializers.ReadOnlyField):
+    """Minutos de un timedelta"""
+
+    def to_representation(self, value):
+        return int(value.total_seconds() / 60)
+
+class DaysField(serializers.ReadOnlyField):
+    """Días de un timedelta; 0 cuando no hay"""
+    empty_value = 0
+
+    def to_representation(self, value):
+        return value.days
+
+def full_name(prefix=''):
+    """Nombre completo de un paciente calculado en la BD, como ``Patient.get_full_name()``"""
+    first, last, mother = (f'{prefix}first_name', f'{prefix}last_name', f'{prefix}mother_last_name')
+    return Case(
+        When(Q(**{mother: ''}), then=Concat(first, Value(' '), last)),
+        default=Concat(first, Value(' '), last, Value(' '), mother),
+        output_field=CharField()
+    )
+
+def user_full_name(prefix=''):
+    """Nombre completo de un usuario calculado en la BD, como ``User.get_full_name()``"""
+    return Trim(Concat(f'{prefix}first_name', Value(' '), f'{prefix}last_name', output_field=CharField()))
+
+class ValuesSerializer(serializers.Serializer):
+    """
+    Serializer de solo lectura para listados: trabaja con los diccionarios
+    de ``QuerySet.values()``, sin construir instancias de modelo ni seguir
+    relaciones fila por fila.
+
+    La ``source`` de cada campo es una columna de ``values()``
+    (``patient__first_name``); ``Meta.expressions`` agrega las que calcula
+    la BD (nombres completos, duraciones). Los listados con cursor necesitan
+    ``id`` y el campo de orden entre los campos.
+    """
+
+    class Meta:
+        expressions = {}
+
+    @classmethod
+    def values(cls, queryset):
+        """``queryset.values()`` con las columnas que lee el serializer"""
+        expressions = getattr(cls.Meta, 'expressions', {})
+        columns = dict.fromkeys(
+            field.source for field in cls().fields.values() if field.source not in expressions
+        )
+        return queryset.values(*columns, **expressions)
+
+    @cached_property
+    def _readers(self):
+        return [
+            (name, field.source, field.to_representation, getattr(field, 'empty_value', None))
+            for name, field in self.fields.items()
+        ]
+
+    def to_representation(self, row):
+        data = {}
+        for name, source, to_representation, empty_value in self._readers:
+            value = row[source]
+            data[name] = empty_value if value is None else to_representation(value)
+        return data
+
+class PatientListSerializer(ValuesSerializer):
+    id = serializers.ReadOnlyField()
+    patient_id = serializers.ReadOnlyField()
+    full_name = serializers.ReadOnlyField()
+    email = serializers.ReadOnlyField()
+    phone_number = serializers.ReadOnlyField()
+    birth_date = serializers.DateField(read_only=True)
+    age = AgeField(source='birth_date')
+    gender = serializers.ReadOnlyField()
+    city = serializers.ReadOnlyField()
+    is_active = serializers.ReadOnlyField()
+    created_at = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        expressions = {'full_name': full_name()}
+
+class AppointmentListSerializer(ValuesSerializer):
+    id = serializers.ReadOnlyField()
+    patient_id = serializers.ReadOnlyField()
+    patient_name = serializers.ReadOnlyField()
+    doctor_id = serializers.ReadOnlyField()
+    doctor_name = serializers.ReadOnlyField()
+    start_datetime = serializers.DateTimeField(read_only=True)
+    end_datetime = serializers.DateTimeField(read_only=True)
+    appointment_type = serializers.ReadOnlyField(source='appointment_type_id')
+    status = serializers.ReadOnlyField()
+    status_display = DisplayField(Appointment.STATUS_CHOICES, source='status')
+    priority = serializers.ReadOnlyField()
+    duration = MinutesField(source='duration_delta')
+
+    class Meta:
+        expressions = {
+            'patient_name': full_name('patient__'),
+            'doctor_name': user_full_name('doctor__'),
+            'duration_delta': ExpressionWrapper(F('end_datetime') - F('start_datetime'), output_field=DurationField()),
+        }
+
+class MedicalRecordListSerializer(ValuesSerializer):
+    id = serializers.ReadOnlyField()
+    patient_id = serializers.ReadOnlyField()
+    patient_name = serializers.ReadOnlyField()
+    blood_type = serializers.ReadOnlyField()
+    allergies = serializers.ReadOnlyField()
+    chronic_conditions = serializers.ReadOnlyField()
+    created_at = serializers.DateTimeField(read_only=True)
+    updated_at = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        expressions = {'patient_name': full_name('patient__')}
+
+class InvoiceListSerializer(ValuesSerializer):
+    id = serializers.ReadOnlyField()
+    invoice_number = serializers.ReadOnlyField()
+    patient_id = serializers.ReadOnlyField()
+    patient_name = serializers.ReadOnlyField()
+    issue_date = serializers.DateField(read_only=True)
+    due_date = serializers.DateField(read_only=True)
+    total_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    amount_paid = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    amount_pending = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    is_overdue = serializers.BooleanField(source='overdue', read_only=True)
+    days_overdue = DaysField(source='overdue_by')
+    status = serializers.ReadOnlyField()
+    status_display = DisplayField(Invoice.STATUS_CHOICES, source='status')
+    created_at = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        # ``overdue`` y ``overdue_by`` vienen de ``Invoice.objects.with_overdue()``
+        expressions = {'patient_name': full_name('patient__')}
+
+class PaymentListSerializer(ValuesSerializer):
+    id = serializers.ReadOnlyField()
+    payment_number = serializers.ReadOnlyField()
+    invoice_id = serializers.ReadOnlyField()
+    invoice_number = serializers.ReadOnlyField(source='invoice__invoice_number')
+    patient_name = serializers.ReadOnlyField()
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    payment_date = serializers.DateTimeField(read_only=True)
+    payment_method = serializers.ReadOnlyField()
+    payment_method_display = DisplayField(Payment.PAYMENT_METHOD_CHOICES, source='payment_method')
+    status = serializers.ReadOnlyField()
+    status_display = DisplayField(Payment.STATUS_CHOICES, source='status')
+    reference_number = serializers.ReadOnlyField()
+
+    class Meta:
+        expressions = {'patient_name': full_name('invoice__patient__')}
+
 # Serializers adicionales para casos específicos
 class PatientSummarySerializer(serializers.ModelSerializer):
     """Serializer resumido para pacientes"""
@@ -187,24 +395,33 @@ class PatientSummarySerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Patient
-        fields = ['id', 'full_name', 'email', 'phone', 'is_active']
+        fields = ['id', 'full_name', 'email', 'phone_number', 'is_active']
 
-class AppointmentCalendarSerializer(serializers.ModelSerializer):
+class AppointmentCalendarSerializer(ValuesSerializer):
     """Serializer para eventos del calendario"""
-    title = serializers.SerializerMethodField()
-    start = serializers.DateTimeField(source='appointment_date')
-    end = serializers.SerializerMethodField()
-    
+    STATUS_COLORS = {'scheduled': '#007bff'}
+    DEFAULT_COLOR = '#28a745'
+
+    id = serializers.ReadOnlyField()
+    title = serializers.ReadOnlyField()
+    start = serializers.DateTimeField(source='start_datetime', read_only=True)
+    end = serializers.DateTimeField(source='end_datetime', read_only=True)
+    status = serializers.ReadOnlyField()
+
     class Meta:
-        model = Appointment
-        fields = ['id', 'title', 'start', 'end', 'status']
-    
-    def get_title(self, obj):
-        return f"{obj.patient.get_full_name()} - {obj.appointment_type}"
-    
-    def get_end(self, obj):
-        from django.utils import timezone
-        return obj.appointment_date + timezone.timedelta(minutes=obj.duration)
+        expressions = {
+            'title': Concat(
+                full_name('patient__'), Value(' - '), 'appointment_type__name', Value(' ('),
+                Cast('appointment_type__duration_minutes', CharField()), Value(' min)'),
+                output_field=CharField()
+            ),
+        }
+
+    def to_representation(self, row):
+        data = super().to_representation(row)
+        color = self.STATUS_COLORS.get(data['status'], self.DEFAULT_COLOR)
+        data.update(backgroundColor=color, borderColor=color, textColor='#fff')
+        return data
 
 class DashboardStatsSerializer(serializers.Serializer):
     """Serializer para estadísticas del dashboard"""
@@ -0,0 +1,244 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts import sync
+from accounts.models import Organization, SyncTombstone
+from accounts.pagination import InvalidCursor, KeysetPaginator
+from accounts.query_budget import QueryBudgetMixin
+from accounts.tests import LOCMEM_CACHE, create_view_fixtures
+from api.mixins import eager_paths
+from api.serializers import DoctorSerializer, PaymentSerializer
+from appointments.models import Appointment
+from billing.models import Invoice, Payment
+from patients.models import Patient
+from reports import counters
+from reports.models import DashboardCounters
+from specialties.models import Doctor
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.user, _ = create_view_fixtures(rows=5)
+        # Equal ordering values, so the pages depend on the id tie-break
+        Patient.objects.update(registration_date=timezone.now())
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_walk_covers_every_row_once(self):
+        queryset = Patient.objects.order_by('-registration_date')
+        paginator = KeysetPaginator(queryset, 2)
+        seen, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            seen += [patient.pk for patient in page]
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+
+        self.assertEqual(seen, list(queryset.order_by('-registration_date', '-pk').values_list('pk', flat=True)))
+
+    def test_invalid_cursor(self):
+        paginator = KeysetPaginator(Patient.objects.all(), 2)
+
+        with self.assertRaises(InvalidCursor):
+            paginator.page('not-a-cursor')
+        self.assertEqual(len(paginator.get_page('not-a-cursor')), 2)
+
+    def test_list_view_cursor_mode(self):
+        response = self.client.get(reverse('patients:list'), {'cursor': '', 'per_page': 2})
+
+        page = response.context['page_obj']
+        self.assertTrue(page.is_keyset)
+        self.assertEqual(page.paginator.count_label, '5')
+        self.assertContains(response, f'?per_page=2&cursor={page.next_cursor}"')
+
+    def test_api_cursor_mode(self):
+        url = reverse('api:appointment-list')
+        response = self.client.get(url, {'cursor': '', 'page_size': 3})
+
+        self.assertEqual(set(response.json()), {'next', 'results'})
+        self.assertEqual(len(response.json()['results']), 3)
+        response = self.client.get(response.json()['next'])
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertIsNone(response.json()['next'])
+        self.assertEqual(self.client.get(url, {'cursor': 'x'}).status_code, 404)
+
+
+class IncrementalSyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.user, cls.patients = create_view_fixtures(rows=3)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _sync(self, resource, **params):
+        response = self.client.get(reverse('api:sync_changes', args=[resource]), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_full_then_incremental_sync(self):
+        full = self._sync('patients')
+        self.assertEqual(len(full['changed']), 3)
+        self.assertEqual(full['deleted'], [])
+
+        changed, removed = self.patients[0], self.patients[1]
+        changed.notes = 'Actualizado'
+        changed.save()
+        removed_id, invoice_id = removed.pk, Invoice.objects.get(patient=removed).pk
+        removed.delete()
+
+        with override_settings(SYNC_OVERLAP_SECONDS=0):
+            patients = self._sync('patients', since=full['watermark'])
+            invoices = self._sync('invoices', since=full['watermark'])
+        self.assertEqual([row['id'] for row in patients['changed']], [changed.pk])
+        self.assertEqual(patients['deleted'], [removed_id])
+        self.assertEqual(invoices['changed'], [])
+        self.assertEqual(invoices['deleted'], [invoice_id])
+
+    def test_pages_share_the_watermark(self):
+        first = self._sync('appointments', page_size=2)
+        second = self.client.get(first['next']).json()
+
+        self.assertEqual(second['watermark'], first['watermark'])
+        self.assertEqual(len(first['changed']) + len(second['changed']), 3)
+        self.assertIsNone(second['next'])
+
+    def test_expired_watermark_needs_full_sync(self):
+        since = sync.format_watermark(timezone.now() - timedelta(days=365))
+        response = self.client.get(reverse('api:sync_changes', args=['patients']), {'since': since})
+
+        self.assertEqual(response.status_code, 410)
+
+    def test_no_tombstones_when_the_organization_is_deleted(self):
+        sync.record_deletion(Patient, self.patients[0], origin=self.organization)
+        sync.record_deletion(Patient, self.patients[1], origin=Organization.objects.all())
+        self.assertFalse(SyncTombstone.objects.exists())
+
+        sync.record_deletion(Patient, self.patients[2], origin=self.patients[2])
+        self.assertTrue(SyncTombstone.objects.filter(object_id=self.patients[2].pk).exists())
+
+
+class ApiListSerializerTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.user, cls.patients = create_view_fixtures(rows=3)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_list_rows_match_the_detail(self):
+        for resource, fields in [
+            ('patients', ['full_name', 'age', 'birth_date']),
+            ('appointments', ['patient_name', 'doctor_name', 'start_datetime', 'duration']),
+            ('invoices', ['patient_name', 'total_amount', 'is_overdue', 'days_overdue', 'status_display']),
+            ('payments', ['patient_name', 'amount', 'payment_date', 'payment_method_display']),
+        ]:
+            # Session, user, profile, COUNT(*) and the page
+            with self.assertQueryBudget(5, max_repeats=1):
+                rows = self.client.get(f'/api/v1/{resource}/').json()['results']
+            self.assertEqual(len(rows), 3)
+            detail = self.client.get(f'/api/v1/{resource}/{rows[0]["id"]}/').json()
+            self.assertEqual({field: rows[0][field] for field in fields}, {field: detail[field] for field in fields})
+
+    def test_cursor_pages_over_values_rows(self):
+        first = self.client.get('/api/v1/appointments/', {'cursor': '', 'page_size': 2}).json()
+        second = self.client.get(first['next']).json()
+
+        ids = [row['id'] for row in first['results'] + second['results']]
+        self.assertEqual(len(set(ids)), 3)
+        self.assertIsNone(second['next'])
+
+    def test_eager_paths_follow_serializer_fields(self):
+        self.assertEqual(eager_paths(PaymentSerializer, Payment), (['invoice', 'invoice__patient'], []))
+        self.assertEqual(eager_paths(DoctorSerializer, Doctor), (['user'], ['specialties']))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DashboardCountersTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.user, cls.patients = create_view_fixtures(rows=2)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def _stats(self, **headers):
+        return self.client.get('/api/v1/dashboard/stats/', headers=headers)
+
+    def test_counters_follow_saves_and_deletes(self):
+        stats = self._stats().json()
+        self.assertEqual(stats['total_patients'], 2)
+        self.assertEqual(stats['pending_appointments'], 2)
+        self.assertEqual(Decimal(stats['total_revenue']), 0)
+
+        invoice = Invoice.objects.get(patient=self.patients[0])
+        invoice.status = 'paid'
+        invoice.save()
+        self.patients[1].delete()
+
+        stats = self._stats().json()
+        self.assertEqual(stats['total_patients'], 1)
+        self.assertEqual(stats['total_appointments'], 1)
+        self.assertEqual(Decimal(stats['total_revenue']), Decimal('100.00'))
+        self.assertEqual(DashboardCounters.objects.count(), 1)
+
+    def test_if_none_match_and_long_poll(self):
+        etag = self._stats()['ETag']
+        self.assertEqual(self._stats(**{'If-None-Match': etag}).status_code, 304)
+
+        def add_patient(seconds):
+            patient = self.patients[0]
+            patient.pk, patient.patient_id = None, 'PAC999'
+            with self.captureOnCommitCallbacks(execute=True):
+                patient.save()
+
+        with mock.patch('reports.counters.time.sleep', side_effect=add_patient) as sleep:
+            response = self.client.get('/api/v1/dashboard/stats/', {'wait': 5}, headers={'If-None-Match': etag})
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['total_patients'], Patient.objects.count())
+
+    def test_wait_must_be_a_finite_number(self):
+        etag = self._stats()['ETag']
+        for wait in ('nan', 'inf', '-inf', 'soon'):
+            with self.assertLogs('django.request', 'WARNING'):
+                response = self.client.get('/api/v1/dashboard/stats/', {'wait': wait}, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 400, wait)
+
+    @override_settings(DASHBOARD_LONG_POLL_INTERVAL=0.01)
+    def test_long_poll_waits_on_the_cache(self):
+        etag = self._stats()['ETag']
+        with mock.patch.object(counters, 'stats', wraps=counters.stats) as stats, \
+                mock.patch.object(counters, 'version', wraps=counters.version) as version:
+            response = self.client.get('/api/v1/dashboard/stats/', {'wait': 0.1}, headers={'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 304)
+        # One read before waiting and one when the wait runs out
+        self.assertEqual(stats.call_count, 2)
+        self.assertGreater(version.call_count, 5)
+
+    def test_reconcile_fixes_changes_without_signals(self):
+        self._stats()
+        Appointment.objects.update(status='completed')
+        self.assertEqual(self._stats().json()['pending_appointments'], 2)
+
+        self.assertEqual(counters.reconcile_stale(), 0)
+        DashboardCounters.objects.update(reconciled_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(counters.reconcile_stale(), 1)
+        self.assertEqual(self._stats().json()['pending_appointments'], 0)
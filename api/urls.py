@@ -53,6 +53,9 @@ urlpatterns = [
     path('upload/document/', views.upload_document, name='upload_document'),
     path('upload/profile-image/', views.upload_profile_image, name='upload_profile_image'),
     
+    # Sincronización incremental
+    path('sync/<str:resource>/', views.sync_changes, name='sync_changes'),
+    
     # Configuración del sistema
     path('system/modules/', views.system_modules, name='system_modules'),
     path('system/settings/', views.system_settings, name='system_settings'),
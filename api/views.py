@@ -1,62 +1,70 @@
+import hashlib
+import json
+import math
+import time
+
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
-from django.db.models import Q, Count, Sum
-from django.utils import timezone
+from django.db.models import Q, Count
 from django.http import JsonResponse, HttpResponse
 from django.conf import settings
+from django.urls import reverse
+from django.utils.http import parse_etags, quote_etag
 
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
 
 from .serializers import (
     PatientSerializer, AppointmentSerializer, MedicalRecordSerializer,
     SpecialtySerializer, DoctorSerializer, SpecialtyConsultationSerializer,
-    ReportSerializer, InvoiceSerializer, PaymentSerializer, UserSerializer
+    ReportSerializer, InvoiceSerializer, PaymentSerializer, UserSerializer,
+    PatientSyncSerializer, AppointmentSyncSerializer, MedicalRecordSyncSerializer,
+    InvoiceSyncSerializer, PaymentSyncSerializer,
+    PatientListSerializer, AppointmentListSerializer, MedicalRecordListSerializer,
+    InvoiceListSerializer, PaymentListSerializer, AppointmentCalendarSerializer
 )
 
 from patients.models import Patient
+from patients.search import filter_patients, rank_patients
 from appointments.models import Appointment
 from medical_records.models import MedicalRecord
 from specialties.models import Specialty, Doctor, SpecialtyConsultation, SpecialtyProcedure
+from reports import counters, jobs
 from reports.models import Report
 from billing.models import Invoice, Payment
+from accounts import sync, tenancy
 from accounts.models import User, SystemModule
+from accounts.pagination import InvalidCursor, KeysetPaginator
+from .mixins import EagerLoadingMixin, ValuesListMixin
+from .pagination import StandardResultsSetPagination, KeysetResultsSetPagination
 
 User = get_user_model()
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 20
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
 # ViewSets principales
-class PatientViewSet(viewsets.ModelViewSet):
+class PatientViewSet(ValuesListMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     """ViewSet para gestión de pacientes"""
     queryset = Patient.objects.all()
     serializer_class = PatientSerializer
+    list_serializer_class = PatientListSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetResultsSetPagination
     
     def get_queryset(self):
-        queryset = Patient.objects.all()
+        queryset = Patient.scoped.all()
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search) |
-                Q(email__icontains=search) |
-                Q(phone__icontains=search)
-            )
+            queryset = filter_patients(queryset, search)
         return queryset.order_by('-created_at')
     
     @action(detail=True, methods=['get'])
     def appointments(self, request, pk=None):
         """Obtener citas de un paciente"""
         patient = self.get_object()
-        appointments = Appointment.objects.filter(patient=patient).order_by('-appointment_date')
+        appointments = Appointment.objects.filter(patient=patient).order_by('-start_datetime')
         serializer = AppointmentSerializer(appointments, many=True)
         return Response(serializer.data)
     
@@ -68,15 +76,16 @@ class PatientViewSet(viewsets.ModelViewSet):
         serializer = MedicalRecordSerializer(records, many=True)
         return Response(serializer.data)
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+class AppointmentViewSet(ValuesListMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     """ViewSet para gestión de citas"""
     queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializer
+    list_serializer_class = AppointmentListSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetResultsSetPagination
     
     def get_queryset(self):
-        queryset = Appointment.objects.select_related('patient', 'doctor')
+        queryset = Appointment.scoped.all()
         
         # Filtros
         status_filter = self.request.query_params.get('status', None)
@@ -87,13 +96,13 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         if date_from:
-            queryset = queryset.filter(appointment_date__date__gte=date_from)
+            queryset = queryset.filter(start_datetime__date__gte=date_from)
         if date_to:
-            queryset = queryset.filter(appointment_date__date__lte=date_to)
+            queryset = queryset.filter(start_datetime__date__lte=date_to)
         if doctor_id:
             queryset = queryset.filter(doctor_id=doctor_id)
             
-        return queryset.order_by('-appointment_date')
+        return queryset.order_by('-start_datetime')
     
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
@@ -103,15 +112,16 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         appointment.save()
         return Response({'status': 'appointment completed'})
 
-class MedicalRecordViewSet(viewsets.ModelViewSet):
+class MedicalRecordViewSet(ValuesListMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     """ViewSet para expedientes médicos"""
     queryset = MedicalRecord.objects.all()
     serializer_class = MedicalRecordSerializer
+    list_serializer_class = MedicalRecordListSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetResultsSetPagination
     
     def get_queryset(self):
-        queryset = MedicalRecord.objects.select_related('patient', 'doctor')
+        queryset = MedicalRecord.scoped.all()
         patient_id = self.request.query_params.get('patient', None)
         if patient_id:
             queryset = queryset.filter(patient_id=patient_id)
@@ -149,13 +159,13 @@ class SpecialtyViewSet(viewsets.ModelViewSet):
         ]
         return Response(procedures_data)
 
-class DoctorViewSet(viewsets.ModelViewSet):
+class DoctorViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """ViewSet para doctores"""
     queryset = Doctor.objects.filter(is_active=True)
     serializer_class = DoctorSerializer
     permission_classes = [IsAuthenticated]
 
-class SpecialtyConsultationViewSet(viewsets.ModelViewSet):
+class SpecialtyConsultationViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """ViewSet para consultas de especialidad"""
     queryset = SpecialtyConsultation.objects.all()
     serializer_class = SpecialtyConsultationSerializer
@@ -163,7 +173,7 @@ class SpecialtyConsultationViewSet(viewsets.ModelViewSet):
     pagination_class = StandardResultsSetPagination
     
     def get_queryset(self):
-        queryset = SpecialtyConsultation.objects.select_related('patient', 'doctor', 'specialty')
+        queryset = SpecialtyConsultation.scoped.all()
         specialty_id = self.request.query_params.get('specialty', None)
         patient_id = self.request.query_params.get('patient', None)
         
@@ -174,7 +184,7 @@ class SpecialtyConsultationViewSet(viewsets.ModelViewSet):
             
         return queryset.order_by('-date')
 
-class ReportViewSet(viewsets.ModelViewSet):
+class ReportViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """ViewSet para reportes"""
     queryset = Report.objects.all()
     serializer_class = ReportSerializer
@@ -182,26 +192,26 @@ class ReportViewSet(viewsets.ModelViewSet):
     pagination_class = StandardResultsSetPagination
     
     def get_queryset(self):
-        return Report.objects.filter(created_by=self.request.user).order_by('-created_at')
+        # file_size_mb lee la entrada de caché del reporte
+        return Report.objects.filter(created_by=self.request.user).select_related('cache_entry').order_by('-created_at')
     
     @action(detail=True, methods=['post'])
     def generate(self, request, pk=None):
         """Generar un reporte"""
         report = self.get_object()
-        # Aquí iría la lógica de generación del reporte
-        report.status = 'processing'
-        report.save()
-        return Response({'status': 'report generation started'})
+        jobs.enqueue(report)
+        return Response({'status': 'report generation queued'})
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceViewSet(ValuesListMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     """ViewSet para facturas"""
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
+    list_serializer_class = InvoiceListSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetResultsSetPagination
     
     def get_queryset(self):
-        queryset = Invoice.objects.select_related('patient')
+        queryset = Invoice.scoped.with_overdue()
         status_filter = self.request.query_params.get('status', None)
         if status_filter:
             queryset = queryset.filter(status=status_filter)
@@ -224,17 +234,18 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         invoice.save()
         return Response({'status': 'invoice marked as paid'})
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(ValuesListMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     """ViewSet para pagos"""
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
+    list_serializer_class = PaymentListSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetResultsSetPagination
     
     def get_queryset(self):
-        return Payment.objects.select_related('invoice', 'invoice__patient').order_by('-payment_date')
+        return Payment.scoped.order_by('-payment_date')
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """ViewSet para usuarios"""
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -258,33 +269,49 @@ def current_user(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def dashboard_stats(request):
-    """Estadísticas para el dashboard"""
-    stats = {
-        'total_patients': Patient.objects.count(),
-        'total_appointments': Appointment.objects.count(),
-        'appointments_today': Appointment.objects.filter(
-            appointment_date__date=timezone.now().date()
-        ).count(),
-        'pending_appointments': Appointment.objects.filter(
-            status='scheduled'
-        ).count(),
-        'total_consultations': SpecialtyConsultation.objects.count(),
-        'pending_invoices': Invoice.objects.filter(status='sent').count(),
-        'total_revenue': Invoice.objects.filter(status='paid').aggregate(
-            total=Sum('total_amount')
-        )['total'] or 0,
-    }
-    return Response(stats)
+    """
+    Estadísticas para el dashboard, servidas desde los contadores de la
+    organización (reports.counters) en lugar de contar las tablas.
+
+    Responde con un ``ETag``: con ``If-None-Match`` igual responde 304. Con
+    además ``wait=<segundos>`` (hasta DASHBOARD_LONG_POLL_SECONDS) la
+    respuesta espera a que cambie algún contador y, si no cambia en ese
+    tiempo, responde 304. La espera solo consulta la versión de los
+    contadores en la caché; la BD se lee de nuevo cuando cambia.
+    """
+    try:
+        wait = float(request.query_params.get('wait', 0))
+    except ValueError:
+        return Response({'error': 'Invalid wait'}, status=400)
+    # NaN pasaría por min()/max() y la espera no vencería nunca
+    if not math.isfinite(wait):
+        return Response({'error': 'Invalid wait'}, status=400)
+    wait = min(max(wait, 0), settings.DASHBOARD_LONG_POLL_SECONDS)
+    organization_id = tenancy.current_organization_id()
+    known = {tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))}
+    deadline = time.monotonic() + wait
+    while True:
+        seen = counters.version(organization_id)
+        stats = counters.stats(organization_id)
+        etag = quote_etag(hashlib.md5(
+            json.dumps(stats, default=str, sort_keys=True).encode(), usedforsecurity=False
+        ).hexdigest())
+        if etag not in known and '*' not in known:
+            return Response(stats, headers={'ETag': etag})
+        if time.monotonic() >= deadline:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        # Al vencer la espera se leen una última vez (p. ej. sin caché compartida)
+        counters.wait_for_change(organization_id, seen, deadline)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def recent_activity(request):
     """Actividad reciente del sistema"""
-    recent_appointments = Appointment.objects.select_related(
+    recent_appointments = Appointment.scoped.select_related(
         'patient', 'doctor'
     ).order_by('-created_at')[:5]
     
-    recent_patients = Patient.objects.order_by('-created_at')[:5]
+    recent_patients = Patient.scoped.order_by('-created_at')[:5]
     
     activity_data = {
         'recent_appointments': AppointmentSerializer(recent_appointments, many=True).data,
@@ -301,14 +328,11 @@ def global_search(request):
         return Response({'error': 'Query parameter required'}, status=400)
     
     # Buscar en pacientes
-    patients = Patient.objects.filter(
-        Q(first_name__icontains=query) |
-        Q(last_name__icontains=query) |
-        Q(email__icontains=query)
-    )[:5]
+    organization_id = tenancy.current_organization_id()
+    patients = rank_patients(organization_id, query, limit=5) if organization_id else []
     
     # Buscar en citas
-    appointments = Appointment.objects.select_related('patient').filter(
+    appointments = Appointment.scoped.select_related('patient').filter(
         Q(patient__first_name__icontains=query) |
         Q(patient__last_name__icontains=query) |
         Q(notes__icontains=query)
@@ -332,8 +356,8 @@ def global_search(request):
 @permission_classes([IsAuthenticated])
 def patient_appointments(request, patient_id):
     """Obtener citas de un paciente específico"""
-    patient = get_object_or_404(Patient, pk=patient_id)
-    appointments = Appointment.objects.filter(patient=patient).order_by('-appointment_date')
+    patient = get_object_or_404(Patient.scoped, pk=patient_id)
+    appointments = Appointment.objects.filter(patient=patient).select_related('patient', 'doctor').order_by('-start_datetime')
     serializer = AppointmentSerializer(appointments, many=True)
     return Response(serializer.data)
 
@@ -341,7 +365,7 @@ def patient_appointments(request, patient_id):
 @permission_classes([IsAuthenticated])
 def patient_medical_records(request, patient_id):
     """Obtener expedientes médicos de un paciente"""
-    patient = get_object_or_404(Patient, pk=patient_id)
+    patient = get_object_or_404(Patient.scoped, pk=patient_id)
     records = MedicalRecord.objects.filter(patient=patient).order_by('-created_at')
     serializer = MedicalRecordSerializer(records, many=True)
     return Response(serializer.data)
@@ -362,26 +386,15 @@ def appointments_calendar(request):
     date_from = request.GET.get('start')
     date_to = request.GET.get('end')
     
-    appointments = Appointment.objects.select_related('patient', 'doctor')
+    appointments = Appointment.objects.all()
     
     if date_from:
-        appointments = appointments.filter(appointment_date__date__gte=date_from)
+        appointments = appointments.filter(start_datetime__date__gte=date_from)
     if date_to:
-        appointments = appointments.filter(appointment_date__date__lte=date_to)
-    
-    calendar_events = []
-    for apt in appointments:
-        calendar_events.append({
-            'id': apt.id,
-            'title': f'{apt.patient.get_full_name()} - {apt.appointment_type}',
-            'start': apt.appointment_date.isoformat(),
-            'end': (apt.appointment_date + timezone.timedelta(minutes=apt.duration)).isoformat(),
-            'backgroundColor': '#007bff' if apt.status == 'scheduled' else '#28a745',
-            'borderColor': '#007bff' if apt.status == 'scheduled' else '#28a745',
-            'textColor': '#fff'
-        })
-    
-    return Response(calendar_events)
+        appointments = appointments.filter(start_datetime__date__lte=date_to)
+    
+    rows = AppointmentCalendarSerializer.values(appointments.order_by('start_datetime'))
+    return Response(AppointmentCalendarSerializer(rows, many=True).data)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -418,10 +431,8 @@ def specialty_procedures(request, specialty_id):
 def generate_report(request, report_id):
     """Generar un reporte"""
     report = get_object_or_404(Report, pk=report_id, created_by=request.user)
-    # Aquí iría la lógica de generación del reporte
-    report.status = 'processing'
-    report.save()
-    return Response({'status': 'report generation started'})
+    jobs.enqueue(report)
+    return Response({'status': 'report generation queued'})
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -431,8 +442,7 @@ def download_report_api(request, report_id):
     if not report.is_ready:
         return Response({'error': 'Report not ready'}, status=400)
     
-    # Aquí iría la lógica de descarga
-    return Response({'download_url': f'/api/reports/{report_id}/file/'})
+    return Response({'download_url': reverse('reports:download', args=[report.pk])})
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -514,4 +524,68 @@ def system_settings(request):
         'max_file_size': getattr(settings, 'FILE_UPLOAD_MAX_MEMORY_SIZE', 2621440),
         'allowed_file_types': ['.pdf', '.doc', '.docx', '.jpg', '.png'],
     }
-    return Response(settings_data)
\ No newline at end of file
+    return Response(settings_data)
+
+
+# Sincronización incremental
+SYNC_SERIALIZERS = {
+    'patients': PatientSyncSerializer,
+    'appointments': AppointmentSyncSerializer,
+    'medical-records': MedicalRecordSyncSerializer,
+    'invoices': InvoiceSyncSerializer,
+    'payments': PaymentSyncSerializer,
+}
+SYNC_PAGE_SIZE = 500
+SYNC_MAX_PAGE_SIZE = 5000
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_changes(request, resource):
+    """
+    Cambios de la organización del usuario desde la marca ``since`` que
+    devolvió la sincronización anterior (sin ella, todas las filas).
+
+    Responde ``watermark`` (la marca para la siguiente sincronización, que
+    se guarda al terminar de recorrer ``next``), ``deleted`` (ids borrados,
+    solo en la primera página) y ``changed``. Una marca más vieja que los
+    registros de borrado guardados responde 410: hay que sincronizar todo.
+    """
+    if resource not in SYNC_SERIALIZERS:
+        raise NotFound('Unknown sync resource')
+    organization = request.user.profile.organization
+    params = request.query_params
+    try:
+        since = sync.parse_watermark(params['since']) if params.get('since') else None
+        until = sync.parse_watermark(params['until']) if params.get('until') else sync.issue_watermark()
+    except ValueError:
+        return Response({'error': 'Invalid watermark'}, status=400)
+    if since is not None:
+        try:
+            sync.check_watermark(since)
+        except sync.FullSyncRequired:
+            return Response({'error': 'Watermark expired, full sync required'}, status=410)
+    try:
+        page_size = min(int(params.get('page_size', SYNC_PAGE_SIZE)), SYNC_MAX_PAGE_SIZE)
+    except ValueError:
+        page_size = SYNC_PAGE_SIZE
+
+    paginator = KeysetPaginator(sync.changed(resource, organization, since, until), page_size)
+    try:
+        page = paginator.page(params.get('cursor'))
+    except InvalidCursor:
+        raise NotFound('Invalid cursor')
+
+    deleted = []
+    if since is not None and page.cursor is None:
+        deleted = list(sync.deleted(resource, organization, since, until))
+    next_url = None
+    if page.has_next():
+        next_url = replace_query_param(request.build_absolute_uri(), 'until', sync.format_watermark(until))
+        next_url = replace_query_param(next_url, 'cursor', page.next_cursor)
+    serializer = SYNC_SERIALIZERS[resource](page.object_list, many=True, context={'request': request})
+    return Response({
+        'watermark': sync.format_watermark(until),
+        'deleted': deleted,
+        'changed': serializer.data,
+        'next': next_url,
+    })
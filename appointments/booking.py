@@ -0,0 +1,121 @@
+"""
+TopicTales Biomédica - Agendado de citas
+Guarda las citas dejando que la base de datos rechace los empalmes de un
+médico, en lugar de revisar y luego escribir por separado en cada vista
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import Appointment, DoctorDayLock
+from .slots import BUSY_STATUSES
+
+
+# Restricción de exclusión que agrega la migración 0002 en PostgreSQL; la
+# 0008 agrega 'rescheduled' a su condición
+EXCLUSION_CONSTRAINT = 'appointments_no_doctor_overlap'
+
+
+class AppointmentConflict(Exception):
+    """El médico ya tiene una cita ocupada que se traslapa con el nuevo horario"""
+    code = 'schedule_conflict'
+    message = 'El médico ya tiene una cita programada en este horario'
+
+    def __init__(self, conflicts):
+        super().__init__(self.message)
+        self.conflicts = conflicts
+
+    def as_dict(self):
+        """Respuesta JSON para los componentes del calendario"""
+        return {
+            'success': False,
+            'error': self.code,
+            'message': self.message,
+            'conflicts': [
+                {
+                    'id': conflict['id'],
+                    'start': conflict['start_datetime'].isoformat(),
+                    'end': conflict['end_datetime'].isoformat(),
+                }
+                for conflict in self.conflicts
+            ],
+        }
+
+
+def uses_exclusion_constraint():
+    return connection.vendor == 'postgresql'
+
+
+def find_conflicts(appointment):
+    """Citas ocupadas del mismo médico que se traslapan con ``appointment``"""
+    return list(Appointment.objects.filter(
+        doctor_id=appointment.doctor_id,
+        start_datetime__lt=appointment.end_datetime,
+        end_datetime__gt=appointment.start_datetime,
+        status__in=BUSY_STATUSES
+    ).exclude(pk=appointment.pk).values('id', 'start_datetime', 'end_datetime'))
+
+
+def _local_days(start, end):
+    """Fechas locales que toca ``[start, end)``"""
+    first = timezone.localdate(start) if timezone.is_aware(start) else start.date()
+    last_moment = end - timedelta(microseconds=1)
+    last = timezone.localdate(last_moment) if timezone.is_aware(last_moment) else last_moment.date()
+    return [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+
+
+def _lock_doctor_days(doctor_id, days):
+    """
+    Bloquea las filas de día del médico hasta que termina la transacción.
+    Se bloquean en orden de fecha para que dos citas que cruzan la
+    medianoche no se bloqueen mutuamente.
+    """
+    DoctorDayLock.objects.bulk_create(
+        [DoctorDayLock(doctor_id=doctor_id, date=day) for day in days],
+        ignore_conflicts=True
+    )
+    locks = DoctorDayLock.objects.filter(doctor_id=doctor_id, date__in=days).order_by('date')
+    if connection.features.has_select_for_update:
+        list(locks.select_for_update())
+    else:
+        # SQLite ignora FOR UPDATE; una escritura toma su bloqueo de base de datos
+        locks.update(acquired_at=timezone.now())
+
+
+def save_appointment(appointment):
+    """
+    Guarda ``appointment`` y lanza ``AppointmentConflict`` si se traslapa
+    con otra cita ocupada del mismo médico.
+
+    En PostgreSQL la restricción de exclusión rechaza la fila, así que no
+    hace falta leer antes de escribir. En otras bases primero se bloquean
+    las filas de día del médico, lo que vuelve atómicas la revisión y la
+    escritura.
+    """
+    if not appointment.end_datetime:
+        appointment.end_datetime = appointment.start_datetime + timedelta(
+            minutes=appointment.appointment_type.duration_minutes
+        )
+
+    with transaction.atomic():
+        if appointment.status not in BUSY_STATUSES:
+            appointment.save()
+        elif uses_exclusion_constraint():
+            try:
+                with transaction.atomic():
+                    appointment.save()
+            except IntegrityError as exc:
+                if EXCLUSION_CONSTRAINT not in str(exc):
+                    raise
+                raise AppointmentConflict(find_conflicts(appointment))
+        else:
+            _lock_doctor_days(
+                appointment.doctor_id,
+                _local_days(appointment.start_datetime, appointment.end_datetime)
+            )
+            conflicts = find_conflicts(appointment)
+            if conflicts:
+                raise AppointmentConflict(conflicts)
+            appointment.save()
+    return appointment
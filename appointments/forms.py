@@ -6,6 +6,7 @@ from .models import (
     Appointment, AppointmentType, AppointmentTemplate, 
     AppointmentNote, DoctorSchedule, AppointmentBlock
 )
+from .slots import BUSY_STATUSES
 from accounts.models import User
 from patients.models import Patient
 
@@ -112,7 +113,7 @@ class AppointmentForm(forms.ModelForm):
                 doctor=doctor,
                 start_datetime__lt=end_datetime,
                 end_datetime__gt=start_datetime,
-                status__in=['scheduled', 'confirmed', 'in_progress']
+                status__in=BUSY_STATUSES
             )
             
             # Exclude current appointment for updates
@@ -127,7 +128,7 @@ class AppointmentForm(forms.ModelForm):
                 patient=patient,
                 start_datetime__lt=end_datetime,
                 end_datetime__gt=start_datetime,
-                status__in=['scheduled', 'confirmed', 'in_progress']
+                status__in=BUSY_STATUSES
             )
             
             # Exclude current appointment for updates
@@ -0,0 +1,289 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import User, Organization, UserProfile, Notification
+from appointments.models import Appointment, AppointmentType
+from appointments.slots import BUSY_STATUSES
+from billing.models import Invoice
+from medical_records.models import Consultation
+from patients.models import Patient
+
+
+BENCHMARK_TAX_ID = 'BENCH-INDEXES'
+
+INDEXED_MODELS = [Appointment, Patient, Consultation, Invoice, Notification]
+
+# Índices compuestos de los filtros frecuentes de las vistas, los únicos que
+# elimina el benchmark; los índices por organización reemplazaron a
+# appt_org_start_idx y a los de estado/vencimiento y creación de facturas. Los
+# índices de cursor, sincronización y demás se quedan mientras se mide.
+HOT_FILTER_INDEXES = {
+    'appt_org_start_id_idx', 'appt_doctor_start_status_idx', 'appt_org_status_idx',
+    'patient_org_active_idx', 'patient_org_registered_idx',
+    'consult_org_date_idx', 'consult_patient_date_idx',
+    'invoice_org_status_due_idx', 'invoice_org_created_idx',
+    'notif_user_dismissed_idx', 'notif_user_read_idx',
+}
+
+SEED_BATCH_SIZE = 10000
+
+# Las citas generadas empiezan en esta cuadrícula; el tiempo ocupado de cada
+# médico se marca por celda para que las citas ocupadas nunca se traslapen
+SEED_GRID_MINUTES = 15
+SEED_DAYS = 730
+
+
+def hot_queries(organization, doctor, patient):
+    """
+    Filtros tomados de las vistas que se ejecutan en cada carga de página,
+    con la vista de la que sale cada uno
+    """
+    now = timezone.now()
+    today = timezone.localdate()
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    return [
+        ('appointments.calendar_events: month window',
+         Appointment.objects.filter(
+             organization=organization,
+             start_datetime__gte=month_start,
+             start_datetime__lt=month_start + timedelta(days=31)
+         ).values('id', 'start_datetime')),
+        ('appointments.slots: doctor busy intervals',
+         Appointment.objects.filter(
+             doctor=doctor,
+             start_datetime__gte=day_start,
+             start_datetime__lt=day_start + timedelta(days=7),
+             status__in=BUSY_STATUSES
+         ).values_list('start_datetime', 'end_datetime')),
+        ('appointments.appointment_list: status filter',
+         Appointment.objects.filter(organization=organization, status='scheduled').order_by().values('id')),
+        ('dashboard.metrics: active appointments (30 days)',
+         Appointment.objects.filter(
+             organization=organization,
+             start_datetime__gte=now - timedelta(days=30)
+         ).values('patient').distinct()),
+        ('patients.patient_list: active patients',
+         Patient.objects.filter(organization=organization, is_active=True).order_by().values('id')),
+        ('patients.index: registered this month',
+         Patient.objects.filter(organization=organization, registration_date__gte=month_start).values('id')),
+        ('medical_records.index: recent consultations',
+         Consultation.objects.filter(organization=organization).order_by('-consultation_date').values('id')[:10]),
+        ('medical_records.clinical_history: patient consultations',
+         Consultation.objects.filter(patient=patient).order_by('-consultation_date').values('id')[:20]),
+        ('billing.index: overdue invoices',
+         Invoice.objects.filter(
+             organization=organization, status='sent', due_date__lt=today
+         ).order_by('due_date').values('id')[:5]),
+        ('accounts.notifications_list: latest notifications',
+         Notification.objects.filter(user=doctor, is_dismissed=False).order_by('-created_at').values('id')[:10]),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara los planes y tiempos de los filtros frecuentes de las vistas con y sin '
+        'los índices compuestos. Elimina y vuelve a crear esos índices (los demás no se '
+        'tocan): ejecútelo sobre una copia de la base de datos para benchmark, nunca en '
+        'producción.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Citas a generar en una organización dedicada al benchmark (p. ej. 1000000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Ejecuciones por consulta; se informa la mediana (por defecto: 5)',
+        )
+        parser.add_argument(
+            '--no-drop',
+            action='store_true',
+            help='Solo mide el esquema actual sin eliminar los índices',
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'])
+
+        organization = (
+            Organization.objects.filter(tax_id=BENCHMARK_TAX_ID).first()
+            or Organization.objects.first()
+        )
+        if not organization:
+            raise CommandError('No hay organizaciones. Use --seed para generar datos.')
+        doctor = User.objects.filter(doctor_appointments__organization=organization).first()
+        if not doctor:
+            raise CommandError(f'La organización {organization} no tiene citas. Use --seed para generar datos.')
+
+        self.stdout.write(
+            f'Midiendo {organization} '
+            f'({Appointment.objects.filter(organization=organization).count()} citas, '
+            f'{Patient.objects.filter(organization=organization).count()} pacientes)'
+        )
+
+        before = None
+        if not options['no_drop']:
+            self.stdout.write('Eliminando índices compuestos...')
+            self.set_indexes(enabled=False)
+            try:
+                before = self.measure(organization, doctor, options['repeat'])
+            finally:
+                self.stdout.write('Recreando índices compuestos...')
+                self.set_indexes(enabled=True)
+        after = self.measure(organization, doctor, options['repeat'])
+
+        self.report(before, after)
+
+    def set_indexes(self, enabled):
+        with connection.schema_editor() as schema_editor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    if index.name not in HOT_FILTER_INDEXES:
+                        continue
+                    if enabled:
+                        schema_editor.add_index(model, index)
+                    else:
+                        schema_editor.remove_index(model, index)
+        if connection.vendor in ('sqlite', 'postgresql'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def measure(self, organization, doctor, repeat):
+        results = {}
+        patient = Patient.objects.filter(organization=organization).first()
+        for label, queryset in hot_queries(organization, doctor, patient):
+            timings = []
+            for _ in range(max(repeat, 1)):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[label] = (statistics.median(timings), queryset.explain())
+        return results
+
+    def report(self, before, after):
+        for label, (after_ms, after_plan) in after.items():
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            if before:
+                before_ms, before_plan = before[label]
+                speedup = before_ms / after_ms if after_ms else 0
+                self.stdout.write(f'  antes:   {before_ms:9.2f} ms')
+                self.stdout.write(f'  después: {after_ms:9.2f} ms  ({speedup:.1f}x)')
+                self.stdout.write('  plan antes:')
+                self.stdout.write(self.indent(before_plan))
+            else:
+                self.stdout.write(f'  tiempo:  {after_ms:9.2f} ms')
+            self.stdout.write('  plan después:' if before else '  plan:')
+            self.stdout.write(self.indent(after_plan))
+
+    def indent(self, plan):
+        return '\n'.join(f'    {line}' for line in plan.splitlines())
+
+    def seed(self, total):
+        """Genera ``total`` citas repartidas en dos años con inserciones en lote"""
+        organization, _ = Organization.objects.get_or_create(
+            tax_id=BENCHMARK_TAX_ID,
+            defaults={
+                'name': 'Benchmark', 'legal_name': 'Benchmark', 'address': 'N/A',
+                'phone': '0000000000', 'email': 'benchmark@example.com',
+                'director_name': 'Benchmark', 'director_license': 'N/A',
+            }
+        )
+        doctors = []
+        for number in range(20):
+            doctor, created = User.objects.get_or_create(
+                username=f'bench_doctor_{number}',
+                defaults={'role': 'doctor', 'first_name': 'Doctor', 'last_name': str(number)}
+            )
+            if created:
+                UserProfile.objects.create(user=doctor, organization=organization)
+            doctors.append(doctor)
+        appointment_types = [
+            AppointmentType.objects.get_or_create(
+                name=f'Benchmark {minutes} min', organization=organization,
+                defaults={'duration_minutes': minutes}
+            )[0]
+            for minutes in (20, 30, 45)
+        ]
+
+        patient_count = max(total // 20, 1)
+        existing = Patient.objects.filter(organization=organization).count()
+        self.stdout.write(f'Generando {max(patient_count - existing, 0)} pacientes...')
+        for offset in range(existing, patient_count, SEED_BATCH_SIZE):
+            Patient.objects.bulk_create([
+                Patient(
+                    patient_id=f'BENCH{number:09d}', first_name='Paciente', last_name=str(number),
+                    birth_date=date(1950, 1, 1) + timedelta(days=number % 25000), gender=random.choice('MF'),
+                    phone_number='5550000000', address='N/A', city='N/A', state='N/A', postal_code='00000',
+                    emergency_contact_name='N/A', emergency_contact_relationship='N/A',
+                    emergency_contact_phone='5550000000', organization=organization,
+                    is_active=number % 10 != 0
+                )
+                for number in range(offset, min(offset + SEED_BATCH_SIZE, patient_count))
+            ])
+        patient_ids = list(Patient.objects.filter(organization=organization).values_list('id', flat=True))
+
+        statuses = [status for status, _ in Appointment.STATUS_CHOICES]
+        free_statuses = [status for status in statuses if status not in BUSY_STATUSES]
+        grid = timedelta(minutes=SEED_GRID_MINUTES)
+        first_day = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=600)
+        cells = SEED_DAYS * 24 * 60 // SEED_GRID_MINUTES
+        busy = {doctor.pk: bytearray(cells) for doctor in doctors}
+
+        def cell_range(start, end):
+            first = max((start - first_day) // grid, 0)
+            last = min(-((first_day - end) // grid), cells)
+            return range(first, last)
+
+        # Tampoco se deben traslapar las citas ocupadas de una generación anterior
+        for doctor_id, start, end in Appointment.objects.filter(
+            doctor__in=doctors, status__in=BUSY_STATUSES,
+            start_datetime__lt=first_day + timedelta(days=SEED_DAYS), end_datetime__gt=first_day
+        ).values_list('doctor_id', 'start_datetime', 'end_datetime').iterator():
+            for cell in cell_range(start, end):
+                busy[doctor_id][cell] = 1
+
+        self.stdout.write(f'Generando {total} citas...')
+        for offset in range(0, total, SEED_BATCH_SIZE):
+            batch = []
+            for _ in range(min(SEED_BATCH_SIZE, total - offset)):
+                appointment_type = random.choice(appointment_types)
+                doctor = random.choice(doctors)
+                start = first_day + grid * random.randrange(cells)
+                end = start + timedelta(minutes=appointment_type.duration_minutes)
+                status = random.choice(statuses)
+                if status in BUSY_STATUSES:
+                    occupied = busy[doctor.pk]
+                    span = cell_range(start, end)
+                    if any(occupied[cell] for cell in span):
+                        # Se conserva la fila para las estadísticas del índice, pero como tiempo libre
+                        status = random.choice(free_statuses)
+                    else:
+                        for cell in span:
+                            occupied[cell] = 1
+                batch.append(Appointment(
+                    patient_id=random.choice(patient_ids),
+                    doctor=doctor,
+                    appointment_type=appointment_type,
+                    organization=organization,
+                    start_datetime=start,
+                    end_datetime=end,
+                    status=status,
+                    reason='Benchmark'
+                ))
+            with transaction.atomic():
+                Appointment.objects.bulk_create(batch)
+            self.stdout.write(f'  {offset + len(batch)}/{total}')
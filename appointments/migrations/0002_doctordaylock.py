@@ -0,0 +1,101 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Mantener en sincronía con appointments.booking.EXCLUSION_CONSTRAINT / BUSY_STATUSES
+CONSTRAINT_NAME = 'appointments_no_doctor_overlap'
+
+# Pares traslapados que se listan cuando los datos existentes violarían la restricción
+MAX_REPORTED_OVERLAPS = 50
+
+
+def find_overlapping_appointments(connection, limit=MAX_REPORTED_OVERLAPS):
+    """Pares de citas ocupadas del mismo médico cuyos horarios se traslapan"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT a.id, b.id, a.doctor_id, a.start_datetime, a.end_datetime, "
+            "b.start_datetime, b.end_datetime "
+            "FROM appointments_appointment a "
+            "JOIN appointments_appointment b ON b.doctor_id = a.doctor_id AND b.id > a.id "
+            "AND b.start_datetime < a.end_datetime AND a.start_datetime < b.end_datetime "
+            "WHERE a.status IN ('scheduled', 'confirmed', 'in_progress') "
+            "AND b.status IN ('scheduled', 'confirmed', 'in_progress') "
+            "ORDER BY a.doctor_id, a.start_datetime, a.id, b.id "
+            "LIMIT %s",
+            [limit + 1]
+        )
+        return cursor.fetchall()
+
+
+def check_existing_overlaps(connection):
+    """
+    Se detiene antes de que ALTER TABLE falle con datos que violan la
+    restricción, con la lista de citas en conflicto que hay que resolver
+    """
+    overlaps = find_overlapping_appointments(connection)
+    if not overlaps:
+        return
+    lines = [
+        f'  médico {doctor_id}: la cita {first_id} ({first_start} - {first_end}) '
+        f'se traslapa con la cita {second_id} ({second_start} - {second_end})'
+        for first_id, second_id, doctor_id, first_start, first_end, second_start, second_end
+        in overlaps[:MAX_REPORTED_OVERLAPS]
+    ]
+    if len(overlaps) > MAX_REPORTED_OVERLAPS:
+        lines.append(f'  ... y más (se muestran los primeros {MAX_REPORTED_OVERLAPS})')
+    raise RuntimeError(
+        f'No se puede agregar la restricción de exclusión {CONSTRAINT_NAME}: '
+        'un médico tiene citas programadas, confirmadas o en curso que se traslapan.\n'
+        + '\n'.join(lines)
+        + '\nMueva una cita de cada par o cambie su estado a "cancelled" y '
+        'vuelva a ejecutar migrate.'
+    )
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    check_existing_overlaps(schema_editor.connection)
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        f"ALTER TABLE appointments_appointment ADD CONSTRAINT {CONSTRAINT_NAME} "
+        "EXCLUDE USING gist (doctor_id WITH =, tstzrange(start_datetime, end_datetime, '[)') WITH &&) "
+        "WHERE (status IN ('scheduled', 'confirmed', 'in_progress'))"
+    )
+
+
+def drop_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'ALTER TABLE appointments_appointment DROP CONSTRAINT IF EXISTS {CONSTRAINT_NAME}'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('appointments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorDayLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('acquired_at', models.DateTimeField(blank=True, null=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_locks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Bloqueo de Agenda',
+                'verbose_name_plural': 'Bloqueos de Agenda',
+                'unique_together': {('doctor', 'date')},
+            },
+        ),
+        migrations.RunPython(add_exclusion_constraint, drop_exclusion_constraint),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_doctordaylock'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['organization', 'start_datetime'], name='appt_org_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'start_datetime', 'status'], name='appt_doctor_start_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['organization', 'status'], name='appt_org_status_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['start_datetime', 'id'], name='appt_start_id_idx'),
+        ),
+    ]
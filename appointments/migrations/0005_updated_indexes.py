@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['organization', 'updated_at', 'id'], name='appt_org_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0005_updated_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_org_start_idx',
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['organization', 'start_datetime', 'id'], name='appt_org_start_id_idx'),
+        ),
+    ]
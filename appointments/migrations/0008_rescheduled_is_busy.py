@@ -0,0 +1,91 @@
+# Generated by Django 4.2.16 on 2026-10-18 14:02
+
+from django.db import migrations
+
+
+# Mantener en sincronía con appointments.booking.EXCLUSION_CONSTRAINT / BUSY_STATUSES
+CONSTRAINT_NAME = 'appointments_no_doctor_overlap'
+
+PREVIOUS_BUSY_STATUSES = "('scheduled', 'confirmed', 'in_progress')"
+BUSY_STATUSES = "('scheduled', 'confirmed', 'in_progress', 'rescheduled')"
+
+# Pares traslapados que se listan cuando los datos existentes violarían la restricción
+MAX_REPORTED_OVERLAPS = 50
+
+
+def find_overlapping_appointments(connection, limit=MAX_REPORTED_OVERLAPS):
+    """Pares de citas ocupadas, incluidas las reprogramadas, cuyos horarios se traslapan"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT a.id, b.id, a.doctor_id, a.start_datetime, a.end_datetime, "
+            "b.start_datetime, b.end_datetime "
+            "FROM appointments_appointment a "
+            "JOIN appointments_appointment b ON b.doctor_id = a.doctor_id AND b.id > a.id "
+            "AND b.start_datetime < a.end_datetime AND a.start_datetime < b.end_datetime "
+            f"WHERE a.status IN {BUSY_STATUSES} "
+            f"AND b.status IN {BUSY_STATUSES} "
+            "ORDER BY a.doctor_id, a.start_datetime, a.id, b.id "
+            "LIMIT %s",
+            [limit + 1]
+        )
+        return cursor.fetchall()
+
+
+def check_existing_overlaps(connection):
+    """
+    Se detiene antes de que ALTER TABLE falle por citas reprogramadas que se
+    traslapan con otra cita ocupada, con la lista de pares que hay que resolver
+    """
+    overlaps = find_overlapping_appointments(connection)
+    if not overlaps:
+        return
+    lines = [
+        f'  médico {doctor_id}: la cita {first_id} ({first_start} - {first_end}) '
+        f'se traslapa con la cita {second_id} ({second_start} - {second_end})'
+        for first_id, second_id, doctor_id, first_start, first_end, second_start, second_end
+        in overlaps[:MAX_REPORTED_OVERLAPS]
+    ]
+    if len(overlaps) > MAX_REPORTED_OVERLAPS:
+        lines.append(f'  ... y más (se muestran los primeros {MAX_REPORTED_OVERLAPS})')
+    raise RuntimeError(
+        f'No se puede extender la restricción de exclusión {CONSTRAINT_NAME} a las citas '
+        'reprogramadas: un médico tiene citas ocupadas que se traslapan.\n'
+        + '\n'.join(lines)
+        + '\nMueva una cita de cada par o cambie su estado a "cancelled" y '
+        'vuelva a ejecutar migrate.'
+    )
+
+
+def replace_constraint(schema_editor, statuses):
+    schema_editor.execute(
+        f'ALTER TABLE appointments_appointment DROP CONSTRAINT IF EXISTS {CONSTRAINT_NAME}'
+    )
+    schema_editor.execute(
+        f"ALTER TABLE appointments_appointment ADD CONSTRAINT {CONSTRAINT_NAME} "
+        "EXCLUDE USING gist (doctor_id WITH =, tstzrange(start_datetime, end_datetime, '[)') WITH &&) "
+        f"WHERE (status IN {statuses})"
+    )
+
+
+def include_rescheduled(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    check_existing_overlaps(schema_editor.connection)
+    replace_constraint(schema_editor, BUSY_STATUSES)
+
+
+def exclude_rescheduled(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    replace_constraint(schema_editor, PREVIOUS_BUSY_STATUSES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0007_drop_untenanted_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(include_rescheduled, exclude_rescheduled),
+    ]
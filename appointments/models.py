@@ -3,6 +3,7 @@ from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from accounts.models import User, Organization
 from patients.models import Patient
+from accounts.tenancy import TenantManager
 
 
 class AppointmentType(models.Model):
@@ -130,10 +131,19 @@ class Appointment(models.Model):
             
         super().save(*args, **kwargs)
     
+    objects = models.Manager()
+    scoped = TenantManager()
+    
     class Meta:
         verbose_name = "Cita"
         verbose_name_plural = "Citas"
         ordering = ['start_datetime']
+        indexes = [
+            models.Index(fields=['organization', 'start_datetime', 'id'], name='appt_org_start_id_idx'),
+            models.Index(fields=['doctor', 'start_datetime', 'status'], name='appt_doctor_start_status_idx'),
+            models.Index(fields=['organization', 'status'], name='appt_org_status_idx'),
+            models.Index(fields=['organization', 'updated_at', 'id'], name='appt_org_updated_idx'),
+        ]
 
 
 class AppointmentTemplate(models.Model):
@@ -356,3 +366,22 @@ class AppointmentBlock(models.Model):
         verbose_name = "Bloqueo de Citas"
         verbose_name_plural = "Bloqueos de Citas"
         ordering = ['start_datetime']
+
+
+class DoctorDayLock(models.Model):
+    """
+    Una fila por médico y día, bloqueada mientras se escribe una cita de ese
+    día para que las citas concurrentes se serialicen en las bases de datos
+    sin restricción de exclusión
+    """
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='day_locks')
+    date = models.DateField(verbose_name="Fecha")
+    acquired_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.doctor_id} - {self.date}"
+    
+    class Meta:
+        verbose_name = "Bloqueo de Agenda"
+        verbose_name_plural = "Bloqueos de Agenda"
+        unique_together = ['doctor', 'date']
@@ -0,0 +1,156 @@
+"""
+TopicTales Biomédica - Motor de horarios disponibles
+Resuelve en memoria la disponibilidad de los médicos para rangos de fechas completos
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Appointment, AppointmentBlock, DoctorSchedule
+
+
+# Estados de cita que ocupan el tiempo del médico; una cita reprogramada
+# sigue ocurriendo en su nuevo horario
+BUSY_STATUSES = ['scheduled', 'confirmed', 'in_progress', 'rescheduled']
+
+# Distancia entre los inicios de dos horarios candidatos
+SLOT_STEP_MINUTES = 30
+
+# Rango máximo que puede cubrir una consulta de disponibilidad
+MAX_RANGE_DAYS = 31
+
+
+def _localize(value):
+    """Asigna la zona horaria actual a las fechas sin zona cuando USE_TZ está activo"""
+    if settings.USE_TZ and timezone.is_naive(value):
+        return timezone.make_aware(value)
+    return value
+
+
+class IntervalIndex:
+    """
+    Lista ordenada y fusionada de los intervalos ocupados [inicio, fin) de
+    un médico.
+
+    Los horarios candidatos se consultan en orden ascendente de inicio; el
+    índice guarda un cursor, así que un rango completo se resuelve en una
+    sola pasada sobre ambas listas.
+    """
+
+    def __init__(self, intervals=()):
+        self._intervals = [(start, end) for start, end in intervals if start < end]
+        self._merged = None
+        self._cursor = 0
+
+    def add(self, start, end):
+        if start < end:
+            self._intervals.append((start, end))
+            self._merged = None
+
+    def _merge(self):
+        merged = []
+        for start, end in sorted(self._intervals):
+            if merged and start <= merged[-1][1]:
+                if end > merged[-1][1]:
+                    merged[-1][1] = end
+            else:
+                merged.append([start, end])
+        self._merged = merged
+        self._cursor = 0
+
+    def is_free(self, start, end):
+        """Indica si [start, end) no se traslapa con ningún intervalo ocupado"""
+        if self._merged is None:
+            self._merge()
+        merged = self._merged
+        while self._cursor < len(merged) and merged[self._cursor][1] <= start:
+            self._cursor += 1
+        return self._cursor == len(merged) or merged[self._cursor][0] >= end
+
+
+def _daterange(date_from, date_to):
+    current = date_from
+    while current <= date_to:
+        yield current
+        current += timedelta(days=1)
+
+
+def find_available_slots(doctor_ids, date_from, date_to, duration_minutes,
+                         step_minutes=SLOT_STEP_MINUTES, exclude_appointment_id=None):
+    """
+    Devuelve ``{doctor_id: [inicio, ...]}`` con cada horario libre de
+    ``duration_minutes`` entre ``date_from`` y ``date_to`` (inclusive).
+
+    Horarios, citas y bloqueos se cargan con una consulta cada uno para todos
+    los médicos, así que el costo no crece con el número de candidatos. Los
+    descansos del horario cuentan como tiempo ocupado.
+    """
+    doctor_ids = list(doctor_ids)
+    slots = {doctor_id: [] for doctor_id in doctor_ids}
+    if not doctor_ids or date_to < date_from:
+        return slots
+
+    range_start = _localize(datetime.combine(date_from, datetime.min.time()))
+    range_end = _localize(datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+
+    schedules = defaultdict(list)
+    for schedule in DoctorSchedule.objects.filter(
+        doctor_id__in=doctor_ids,
+        is_active=True
+    ).order_by('start_time').only(
+        'doctor_id', 'day_of_week', 'start_time', 'end_time', 'break_start', 'break_end'
+    ):
+        schedules[(schedule.doctor_id, schedule.day_of_week)].append(schedule)
+
+    busy = {doctor_id: IntervalIndex() for doctor_id in doctor_ids}
+
+    appointments = Appointment.objects.filter(
+        doctor_id__in=doctor_ids,
+        start_datetime__lt=range_end,
+        end_datetime__gt=range_start,
+        status__in=BUSY_STATUSES
+    )
+    if exclude_appointment_id:
+        appointments = appointments.exclude(id=exclude_appointment_id)
+    for doctor_id, start, end in appointments.values_list('doctor_id', 'start_datetime', 'end_datetime'):
+        busy[doctor_id].add(start, end)
+
+    for doctor_id, start, end in AppointmentBlock.objects.filter(
+        doctor_id__in=doctor_ids,
+        start_datetime__lt=range_end,
+        end_datetime__gt=range_start
+    ).values_list('doctor_id', 'start_datetime', 'end_datetime'):
+        busy[doctor_id].add(start, end)
+
+    # Los descansos son intervalos ocupados por día que salen del horario semanal
+    days = list(_daterange(date_from, date_to))
+    for doctor_id in doctor_ids:
+        for day in days:
+            for schedule in schedules.get((doctor_id, day.weekday()), []):
+                if schedule.break_start and schedule.break_end:
+                    busy[doctor_id].add(
+                        _localize(datetime.combine(day, schedule.break_start)),
+                        _localize(datetime.combine(day, schedule.break_end))
+                    )
+
+    slot_duration = timedelta(minutes=duration_minutes)
+    step = timedelta(minutes=step_minutes)
+
+    for doctor_id in doctor_ids:
+        index = busy[doctor_id]
+        candidates = []
+        for day in days:
+            for schedule in schedules.get((doctor_id, day.weekday()), []):
+                current = datetime.combine(day, schedule.start_time)
+                window_end = datetime.combine(day, schedule.end_time)
+                while current + slot_duration <= window_end:
+                    candidates.append(_localize(current))
+                    current += step
+        # Horarios traslapados pueden dar candidatos desordenados o repetidos
+        for start in sorted(set(candidates)):
+            if index.is_free(start, start + slot_duration):
+                slots[doctor_id].append(start)
+
+    return slots
@@ -1,3 +1,378 @@
-from django.test import TestCase
+import json
+import threading
+from datetime import date, datetime, time, timedelta
+from importlib import import_module
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User, Organization, UserProfile
+from patients.models import Patient
+from .booking import AppointmentConflict, save_appointment
+from .models import Appointment, AppointmentBlock, AppointmentType, DoctorSchedule
+from .slots import IntervalIndex, find_available_slots
+
+
+def create_booking_fixtures():
+    organization = Organization.objects.create(
+        name='Clínica Test', legal_name='Clínica Test SA', tax_id='TEST010101',
+        address='Calle 1', phone='5550000000', email='clinica@test.com',
+        director_name='Director', director_license='123456'
+    )
+    doctor = User.objects.create_user(username='doctor', password='x', role='doctor')
+    appointment_type = AppointmentType.objects.create(
+        name='Consulta', organization=organization, duration_minutes=30
+    )
+    patients = [
+        Patient.objects.create(
+            patient_id=f'PAC{index:03d}', first_name='Paciente', last_name=str(index),
+            birth_date=date(1990, 1, 1), gender='F', phone_number='5551234567',
+            address='Calle 2', city='CDMX', state='CDMX', postal_code='01000',
+            emergency_contact_name='Contacto', emergency_contact_relationship='Familiar',
+            emergency_contact_phone='5551234567', organization=organization
+        )
+        for index in range(8)
+    ]
+    return organization, doctor, appointment_type, patients
+
+
+def build_appointment(organization, doctor, appointment_type, patient, start):
+    return Appointment(
+        patient=patient, doctor=doctor, appointment_type=appointment_type,
+        organization=organization, start_datetime=start,
+        end_datetime=start + timedelta(minutes=30), reason='Consulta'
+    )
+
+
+class IntervalIndexTests(TestCase):
+
+    def test_overlapping_and_touching_intervals_are_merged(self):
+        index = IntervalIndex([(10, 20), (15, 30), (30, 40), (50, 60), (5, 5)])
+        index.add(55, 70)
+
+        index._merge()
+        self.assertEqual(index._merged, [[10, 40], [50, 70]])
+
+    def test_is_free_probes_in_ascending_order(self):
+        index = IntervalIndex([(10, 20), (40, 50)])
+
+        self.assertEqual(
+            [index.is_free(start, start + 10) for start in (0, 5, 20, 30, 35, 50, 90)],
+            [True, False, True, True, False, True, True]
+        )
+
+    def test_add_resets_the_cursor(self):
+        index = IntervalIndex([(10, 20)])
+        self.assertTrue(index.is_free(30, 40))
+
+        index.add(0, 5)
+        self.assertFalse(index.is_free(0, 10))
+        self.assertTrue(index.is_free(5, 10))
+
+
+class FindAvailableSlotsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.doctor, cls.appointment_type, cls.patients = create_booking_fixtures()
+        today = timezone.localdate()
+        cls.day = today + timedelta(days=7 - today.weekday())
+        DoctorSchedule.objects.create(
+            doctor=cls.doctor, organization=cls.organization, day_of_week=cls.day.weekday(),
+            start_time=time(9), end_time=time(12), break_start=time(10, 30), break_end=time(11)
+        )
+
+    def _at(self, hour, minute=0):
+        return timezone.make_aware(datetime.combine(self.day, time(hour, minute)))
+
+    def _slots(self, **kwargs):
+        return find_available_slots([self.doctor.pk], self.day, self.day, 30, **kwargs)[self.doctor.pk]
+
+    def test_schedule_minus_break(self):
+        self.assertEqual(self._slots(), [
+            self._at(9), self._at(9, 30), self._at(10), self._at(11), self._at(11, 30)
+        ])
+
+    def test_appointments_and_blocks_are_busy(self):
+        appointment = build_appointment(
+            self.organization, self.doctor, self.appointment_type, self.patients[0], self._at(9, 15)
+        )
+        appointment.save()
+        cancelled = build_appointment(
+            self.organization, self.doctor, self.appointment_type, self.patients[1], self._at(11)
+        )
+        cancelled.status = 'cancelled'
+        cancelled.save()
+        AppointmentBlock.objects.create(
+            doctor=self.doctor, organization=self.organization, block_type='personal', title='Trámite',
+            start_datetime=self._at(11, 30), end_datetime=self._at(12)
+        )
+
+        self.assertEqual(self._slots(), [self._at(10), self._at(11)])
+        self.assertEqual(
+            self._slots(exclude_appointment_id=appointment.pk),
+            [self._at(9), self._at(9, 30), self._at(10), self._at(11)]
+        )
+
+    def test_rescheduled_appointments_are_busy(self):
+        appointment = build_appointment(
+            self.organization, self.doctor, self.appointment_type, self.patients[0], self._at(9)
+        )
+        appointment.status = 'rescheduled'
+        appointment.save()
+
+        self.assertEqual(self._slots(), [self._at(9, 30), self._at(10), self._at(11), self._at(11, 30)])
+
+    def test_days_without_schedule_have_no_slots(self):
+        other_day = self.day + timedelta(days=1)
+
+        self.assertEqual(find_available_slots([self.doctor.pk], other_day, other_day, 30), {self.doctor.pk: []})
+        self.assertEqual(find_available_slots([], self.day, self.day, 30), {})
+
+
+class SaveAppointmentTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.doctor, cls.appointment_type, cls.patients = create_booking_fixtures()
+        cls.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+
+    def _appointment(self, patient, start):
+        return build_appointment(self.organization, self.doctor, self.appointment_type, patient, start)
+
+    def test_overlap_raises_structured_conflict(self):
+        existing = save_appointment(self._appointment(self.patients[0], self.start))
+
+        with self.assertRaises(AppointmentConflict) as raised:
+            save_appointment(self._appointment(self.patients[1], self.start + timedelta(minutes=15)))
+
+        payload = raised.exception.as_dict()
+        self.assertFalse(payload['success'])
+        self.assertEqual(payload['error'], 'schedule_conflict')
+        self.assertEqual([conflict['id'] for conflict in payload['conflicts']], [existing.id])
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_adjacent_and_inactive_appointments_do_not_conflict(self):
+        save_appointment(self._appointment(self.patients[0], self.start))
+        cancelled = self._appointment(self.patients[1], self.start + timedelta(minutes=30))
+        cancelled.status = 'cancelled'
+        save_appointment(cancelled)
+
+        save_appointment(self._appointment(self.patients[2], self.start + timedelta(minutes=30)))
+        self.assertEqual(Appointment.objects.count(), 3)
+
+    def test_rescheduled_appointments_conflict(self):
+        rescheduled = self._appointment(self.patients[0], self.start)
+        rescheduled.status = 'rescheduled'
+        save_appointment(rescheduled)
+
+        with self.assertRaises(AppointmentConflict):
+            save_appointment(self._appointment(self.patients[1], self.start + timedelta(minutes=15)))
+
+    def test_moving_an_appointment_ignores_itself(self):
+        appointment = save_appointment(self._appointment(self.patients[0], self.start))
+        appointment.start_datetime += timedelta(minutes=10)
+        appointment.end_datetime += timedelta(minutes=10)
+
+        save_appointment(appointment)
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.start_datetime, self.start + timedelta(minutes=10))
+
+
+class RescheduleViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.doctor, cls.appointment_type, patients = create_booking_fixtures()
+        UserProfile.objects.create(user=cls.doctor, organization=cls.organization)
+        today = timezone.localdate()
+        cls.day = today + timedelta(days=7 - today.weekday())
+        DoctorSchedule.objects.create(
+            doctor=cls.doctor, organization=cls.organization, day_of_week=cls.day.weekday(),
+            start_time=time(9), end_time=time(12)
+        )
+        cls.first, cls.second = [
+            save_appointment(build_appointment(
+                cls.organization, cls.doctor, cls.appointment_type, patient, cls._at(hour)
+            ))
+            for patient, hour in zip(patients, (9, 10))
+        ]
+
+    @classmethod
+    def _at(cls, hour):
+        return timezone.make_aware(datetime.combine(cls.day, time(hour)))
+
+    def setUp(self):
+        self.client.force_login(self.doctor)
+
+    def _reschedule(self, appointment, hour):
+        return self.client.post(reverse('appointments:reschedule', args=[appointment.pk]), {
+            'patient': appointment.patient_id, 'doctor': self.doctor.pk,
+            'appointment_type': self.appointment_type.pk,
+            'start_datetime': self._at(hour).strftime('%Y-%m-%dT%H:%M'),
+            'reason': 'Consulta', 'priority': 'normal',
+        })
+
+    def test_the_new_slot_stays_busy(self):
+        response = self._reschedule(self.first, 11)
+
+        self.assertRedirects(response, reverse('appointments:detail', args=[self.first.pk]),
+                             fetch_redirect_response=False)
+        self.first.refresh_from_db()
+        self.assertEqual((self.first.status, self.first.start_datetime), ('rescheduled', self._at(11)))
+        self.assertTrue(self.first.notes.startswith('Reprogramada desde: '))
+        slots = find_available_slots([self.doctor.pk], self.day, self.day, 30)[self.doctor.pk]
+        self.assertNotIn(self._at(11), slots)
+        self.assertIn(self._at(9), slots)
+
+        response = self._reschedule(self.second, 11)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].non_field_errors())
+        self.second.refresh_from_db()
+        self.assertEqual((self.second.status, self.second.start_datetime), ('scheduled', self._at(10)))
+
+
+class CalendarEventsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.doctor, cls.appointment_type, patients = create_booking_fixtures()
+        UserProfile.objects.create(user=cls.doctor, organization=cls.organization)
+        start = timezone.make_aware(datetime(2026, 3, 2, 9))
+        cls.appointments = [
+            Appointment.objects.create(
+                patient=patient, doctor=cls.doctor, appointment_type=cls.appointment_type,
+                organization=cls.organization, start_datetime=start + timedelta(hours=index),
+                reason='Consulta ' * 10
+            )
+            for index, patient in enumerate(patients[:3])
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.doctor)
+
+    def _events(self, **headers):
+        return self.client.get(
+            reverse('appointments:calendar_events'),
+            {'start': '2026-03-01T00:00:00', 'end': '2026-04-01T00:00:00'}, headers=headers
+        )
+
+    def test_feed_and_etag(self):
+        response = self._events()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        events = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([event['id'] for event in events], [appointment.pk for appointment in self.appointments])
+        self.assertEqual(events[0]['title'], 'Paciente 0 - Consulta')
+        self.assertEqual(events[0]['extendedProps']['status'], 'Programada')
+        self.assertTrue(events[0]['extendedProps']['reason'].endswith('...'))
+
+        not_modified = self._events(**{'If-None-Match': response['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+    def test_edit_changes_the_etag(self):
+        etag = self._events()['ETag']
+        appointment = self.appointments[1]
+        appointment.status = 'confirmed'
+        appointment.save()
+
+        response = self._events(**{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_delete_changes_the_etag(self):
+        etag = self._events()['ETag']
+        latest_update = Appointment.objects.order_by('-updated_at').values_list('updated_at', flat=True).first()
+
+        self.appointments[0].delete()
+
+        # The latest updated_at is unchanged; only the row count moves the tag
+        self.assertEqual(Appointment.objects.order_by('-updated_at').values_list('updated_at', flat=True).first(),
+                         latest_update)
+        response = self._events(**{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content))), 2)
+
+
+class ExistingOverlapCheckTests(TestCase):
+    """Migrations 0002 and 0008 refuse to add the exclusion constraint over overlapping data"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.doctor, cls.appointment_type, cls.patients = create_booking_fixtures()
+        cls.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+
+    def _create(self, patient, start, status='scheduled'):
+        appointment = build_appointment(self.organization, self.doctor, self.appointment_type, patient, start)
+        appointment.status = status
+        appointment.save()
+        return appointment
+
+    def test_lists_the_overlapping_pairs(self):
+        migration = import_module('appointments.migrations.0002_doctordaylock')
+        first = self._create(self.patients[0], self.start)
+        adjacent = self._create(self.patients[1], self.start + timedelta(minutes=30))
+        self._create(self.patients[2], self.start + timedelta(minutes=10), status='cancelled')
+        migration.check_existing_overlaps(connection)
+
+        second = self._create(self.patients[3], self.start + timedelta(minutes=15), status='confirmed')
+        with self.assertRaisesMessage(RuntimeError, f'la cita {first.pk} ('):
+            migration.check_existing_overlaps(connection)
+        self.assertEqual(
+            [pair[:2] for pair in migration.find_overlapping_appointments(connection)],
+            [(first.pk, second.pk), (adjacent.pk, second.pk)]
+        )
+
+
+    def test_rescheduled_overlaps_block_migration_0008(self):
+        migration = import_module('appointments.migrations.0008_rescheduled_is_busy')
+        first = self._create(self.patients[0], self.start)
+        migration.check_existing_overlaps(connection)
+
+        rescheduled = self._create(self.patients[1], self.start + timedelta(minutes=15), status='rescheduled')
+        with self.assertRaisesMessage(RuntimeError, f'la cita {rescheduled.pk} ('):
+            migration.check_existing_overlaps(connection)
+        self.assertEqual(
+            [pair[:2] for pair in migration.find_overlapping_appointments(connection)], [(first.pk, rescheduled.pk)]
+        )
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+
+    WRITERS = 8
+
+    def setUp(self):
+        self.organization, self.doctor, self.appointment_type, self.patients = create_booking_fixtures()
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+
+    def test_parallel_bookings_for_the_same_slot(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Threads cannot share an in-memory SQLite test database')
+        barrier = threading.Barrier(self.WRITERS)
+        outcomes = []
+
+        def book(patient):
+            try:
+                barrier.wait()
+                save_appointment(build_appointment(
+                    self.organization, self.doctor, self.appointment_type, patient, self.start
+                ))
+                outcomes.append('booked')
+            except AppointmentConflict:
+                outcomes.append('conflict')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(patient,)) for patient in self.patients[:self.WRITERS]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(outcomes), ['booked'] + ['conflict'] * (self.WRITERS - 1))
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor).count(), 1)
@@ -1,8 +1,7 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.core.paginator import Paginator
+from django.http import JsonResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.db.models import Q, Count
 from django.utils import timezone
 from datetime import datetime, timedelta, date
@@ -10,13 +9,17 @@ from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 import json
 
-from .models import Appointment, AppointmentType, AppointmentNote, DoctorSchedule, AppointmentBlock
+from .models import Appointment, AppointmentType, AppointmentNote, DoctorSchedule
+from .slots import find_available_slots, MAX_RANGE_DAYS
+from .booking import save_appointment, AppointmentConflict
+from .calendar import parse_bound, calendar_queryset, calendar_etag, stream_events
 from .forms import (
     AppointmentForm, AppointmentTypeForm, AppointmentNoteForm, 
     DoctorScheduleForm, AppointmentBlockForm, AppointmentFilterForm,
     QuickAppointmentForm
 )
 from accounts.models import User
+from accounts.pagination import paginate
 from patients.models import Patient
 
 
@@ -220,16 +223,24 @@ def appointment_reschedule(request, appointment_id):
     appointment = get_object_or_404(Appointment, id=appointment_id, organization=organization)
     
     if request.method == 'POST':
+        # La validación copia los nuevos valores a la instancia
+        old_datetime = appointment.start_datetime
         form = AppointmentForm(request.POST, instance=appointment, organization=organization)
         if form.is_valid():
-            old_datetime = appointment.start_datetime
-            appointment = form.save()
+            appointment = form.save(commit=False)
+            appointment.end_datetime = appointment.start_datetime + timedelta(
+                minutes=appointment.appointment_type.duration_minutes
+            )
+            # 'rescheduled' es un estado ocupado, así que se revisan los empalmes
             appointment.status = 'rescheduled'
             appointment.notes = f"{appointment.notes}\n\nReprogramada desde: {old_datetime.strftime('%d/%m/%Y %H:%M')}" if appointment.notes else f"Reprogramada desde: {old_datetime.strftime('%d/%m/%Y %H:%M')}"
-            appointment.save()
-            
-            messages.success(request, 'Cita reprogramada exitosamente.')
-            return redirect('appointments:detail', appointment_id=appointment.id)
+            try:
+                save_appointment(appointment)
+            except AppointmentConflict as conflict:
+                form.add_error(None, conflict.message)
+            else:
+                messages.success(request, 'Cita reprogramada exitosamente.')
+                return redirect('appointments:detail', appointment_id=appointment.id)
     else:
         form = AppointmentForm(instance=appointment, organization=organization)
     
@@ -302,7 +313,9 @@ def appointment_list(request):
     organization = request.user.profile.organization
     
     # Get all appointments for this organization
-    appointments = Appointment.objects.filter(organization=organization).order_by('-start_datetime')
+    appointments = Appointment.objects.filter(organization=organization).select_related(
+        'patient', 'doctor__profile', 'appointment_type'
+    ).order_by('-start_datetime')
     
     # Apply filters
     filter_form = AppointmentFilterForm(request.GET, organization=organization)
@@ -330,9 +343,7 @@ def appointment_list(request):
             )
     
     # Pagination
-    paginator = Paginator(appointments, 25)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator, page_obj = paginate(request, appointments, 25)
     
     context = {
         'title': 'Lista de Citas',
@@ -349,122 +360,75 @@ def appointment_list(request):
 def calendar_events(request):
     """
     AJAX endpoint for calendar events
+
+    Envía por bloques los eventos de FullCalendar desde filas planas de
+    ``values()`` y responde 304 si la etiqueta ``If-None-Match`` aún
+    corresponde a la ventana pedida.
     """
     organization = request.user.profile.organization
-    start_date = request.GET.get('start')
-    end_date = request.GET.get('end')
     doctor_id = request.GET.get('doctor_id')
+    start_dt = parse_bound(request.GET.get('start'))
+    end_dt = parse_bound(request.GET.get('end'))
     
-    print(f"Calendar events request - start: {start_date}, end: {end_date}, doctor: {doctor_id}")  # Debug
+    appointments = calendar_queryset(organization, start_dt, end_dt, doctor_id)
+    etag = calendar_etag(appointments, organization.id, start_dt, end_dt, doctor_id)
     
-    # Build query
-    appointments = Appointment.objects.filter(organization=organization)
-    
-    if start_date:
-        try:
-            start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-            appointments = appointments.filter(start_datetime__gte=start_dt)
-            print(f"Filtering by start_date >= {start_dt}")
-        except ValueError:
-            print(f"Invalid start_date format: {start_date}")
-    if end_date:
-        try:
-            end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-            appointments = appointments.filter(start_datetime__lt=end_dt)
-            print(f"Filtering by end_date < {end_dt}")
-        except ValueError:
-            print(f"Invalid end_date format: {end_date}")
-    if doctor_id:
-        appointments = appointments.filter(doctor_id=doctor_id)
-    
-    print(f"Found {appointments.count()} appointments")  # Debug
-    
-    # Convert to FullCalendar format
-    events = []
-    for appointment in appointments:
-        event = {
-            'id': appointment.id,
-            'title': f"{appointment.patient.get_full_name()} - {appointment.appointment_type.name}",
-            'start': appointment.start_datetime.isoformat(),
-            'end': appointment.end_datetime.isoformat(),
-            'backgroundColor': appointment.appointment_type.color,
-            'borderColor': appointment.appointment_type.color,
-            'textColor': '#ffffff',
-            'extendedProps': {
-                'patient': appointment.patient.get_full_name(),
-                'doctor': appointment.doctor.get_full_name(),
-                'status': appointment.get_status_display(),
-                'priority': appointment.get_priority_display(),
-                'reason': appointment.reason[:50] + '...' if len(appointment.reason) > 50 else appointment.reason
-            }
-        }
-        events.append(event)
-        print(f"Added event: {event['title']} at {event['start']}")  # Debug
-    
-    print(f"Returning {len(events)} events")  # Debug
-    return JsonResponse(events, safe=False)
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = StreamingHttpResponse(stream_events(appointments), content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 @login_required
 def available_slots(request):
     """
     AJAX endpoint for available time slots
+
+    ``doctor_id`` acepta una lista separada por comas y ``date_to`` extiende
+    la búsqueda a un rango de fechas, así que el widget de citas puede
+    resolver varios médicos y días en una sola llamada.
     """
     organization = request.user.profile.organization
     doctor_id = request.GET.get('doctor_id')
     date_str = request.GET.get('date')
+    date_to_str = request.GET.get('date_to')
     appointment_type_id = request.GET.get('appointment_type_id')
     
     if not all([doctor_id, date_str, appointment_type_id]):
         return JsonResponse({'slots': []})
     
     try:
-        doctor = User.objects.get(id=doctor_id, profile__organization=organization)
+        doctor_ids = list(User.objects.filter(
+            id__in=[value for value in doctor_id.split(',') if value.strip()],
+            profile__organization=organization
+        ).values_list('id', flat=True))
         appointment_type = AppointmentType.objects.get(id=appointment_type_id, organization=organization)
         selected_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-    except (User.DoesNotExist, AppointmentType.DoesNotExist, ValueError):
+        end_date = datetime.strptime(date_to_str, '%Y-%m-%d').date() if date_to_str else selected_date
+    except (AppointmentType.DoesNotExist, ValueError):
         return JsonResponse({'slots': []})
     
-    # Get doctor's schedule for the day
-    day_of_week = selected_date.weekday()
-    schedule = DoctorSchedule.objects.filter(
-        doctor=doctor,
-        day_of_week=day_of_week,
-        is_active=True
-    ).first()
-    
-    if not schedule:
+    if not doctor_ids:
         return JsonResponse({'slots': []})
     
-    # Generate time slots
-    slots = []
-    current_time = datetime.combine(selected_date, schedule.start_time)
-    end_time = datetime.combine(selected_date, schedule.end_time)
-    slot_duration = timedelta(minutes=appointment_type.duration_minutes)
+    end_date = min(end_date, selected_date + timedelta(days=MAX_RANGE_DAYS - 1))
+    free_slots = find_available_slots(
+        doctor_ids, selected_date, end_date, appointment_type.duration_minutes
+    )
     
-    while current_time + slot_duration <= end_time:
-        # Check if slot is available
-        conflicts = Appointment.objects.filter(
-            doctor=doctor,
-            start_datetime__lt=current_time + slot_duration,
-            end_datetime__gt=current_time,
-            status__in=['scheduled', 'confirmed', 'in_progress']
-        ).exists()
-        
-        # Check for blocks
-        blocks = AppointmentBlock.objects.filter(
-            doctor=doctor,
-            start_datetime__lt=current_time + slot_duration,
-            end_datetime__gt=current_time
-        ).exists()
-        
-        if not conflicts and not blocks:
+    slots = []
+    for doctor_pk in doctor_ids:
+        for slot_start in free_slots[doctor_pk]:
+            local_start = timezone.localtime(slot_start) if timezone.is_aware(slot_start) else slot_start
             slots.append({
-                'time': current_time.strftime('%H:%M'),
-                'datetime': current_time.isoformat()
+                'doctor_id': doctor_pk,
+                'date': local_start.date().isoformat(),
+                'time': local_start.strftime('%H:%M'),
+                'datetime': local_start.isoformat()
             })
-        
-        current_time += timedelta(minutes=30)  # 30-minute intervals
     
     return JsonResponse({'slots': slots})
 
@@ -515,23 +479,8 @@ def quick_appointment(request):
         # Calculate end datetime
         end_datetime = start_datetime + timedelta(minutes=appointment_type.duration_minutes)
         
-        # Check for conflicts
-        conflicts = Appointment.objects.filter(
-            doctor=doctor,
-            organization=organization,
-            start_datetime__lt=end_datetime,
-            end_datetime__gt=start_datetime,
-            status__in=['scheduled', 'confirmed', 'in_progress']
-        )
-        
-        if conflicts.exists():
-            return JsonResponse({
-                'success': False,
-                'message': 'El médico ya tiene una cita programada en este horario'
-            }, status=400)
-        
-        # Create appointment
-        appointment = Appointment.objects.create(
+        # Crear la cita; los empalmes del médico se rechazan al escribir
+        appointment = Appointment(
             patient=patient,
             doctor=doctor,
             appointment_type=appointment_type,
@@ -541,6 +490,10 @@ def quick_appointment(request):
             organization=organization,
             created_by=request.user
         )
+        try:
+            save_appointment(appointment)
+        except AppointmentConflict as conflict:
+            return JsonResponse(conflict.as_dict(), status=409)
         
         print(f"Quick appointment created successfully: ID {appointment.id}")  # Debug line
         
@@ -593,20 +546,6 @@ def update_appointment_time(request):
             new_start_dt = timezone.localtime(new_start_dt)
             new_end_dt = timezone.localtime(new_end_dt)
         
-        # Check for conflicts
-        conflicts = Appointment.objects.filter(
-            doctor=appointment.doctor,
-            organization=organization,
-            start_datetime__lt=new_end_dt,
-            end_datetime__gt=new_start_dt
-        ).exclude(id=appointment.id)
-        
-        if conflicts.exists():
-            return JsonResponse({
-                'success': False,
-                'message': 'Conflicto de horario con otra cita existente'
-            })
-        
         # Check doctor availability
         weekday = new_start_dt.weekday()
         doctor_schedule = DoctorSchedule.objects.filter(
@@ -623,10 +562,13 @@ def update_appointment_time(request):
                 'message': 'El médico no está disponible en este horario'
             })
         
-        # Update appointment
+        # Actualizar la cita; los empalmes del médico se rechazan al escribir
         appointment.start_datetime = new_start_dt
         appointment.end_datetime = new_end_dt
-        appointment.save()
+        try:
+            save_appointment(appointment)
+        except AppointmentConflict as conflict:
+            return JsonResponse(conflict.as_dict(), status=409)
         
         return JsonResponse({
             'success': True,
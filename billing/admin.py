@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import Service, Invoice, InvoiceItem, Payment, InsuranceClaim
+from .models import Service, Invoice, InvoiceItem, Payment, InsuranceClaim, BulkInvoiceJob
 
 @admin.register(Service)
 class ServiceAdmin(admin.ModelAdmin):
@@ -200,3 +200,9 @@ class InsuranceClaimAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related(
             'invoice__patient', 'created_by'
         )
+
+@admin.register(BulkInvoiceJob)
+class BulkInvoiceJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'service', 'status', 'processed', 'total', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'created_at']
+    readonly_fields = ['patient_ids', 'total', 'processed', 'error', 'created_at', 'started_at', 'finished_at']
@@ -0,0 +1,162 @@
+"""
+TopicTales Biomédica - Facturación en lote
+Crea facturas e items con bulk_create, totales calculados en memoria y
+números reservados en bloque; los lotes grandes se ejecutan en segundo plano
+"""
+import logging
+import threading
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from patients.models import Patient
+
+from .models import Invoice, InvoiceItem, BulkInvoiceJob
+
+
+logger = logging.getLogger(__name__)
+
+# Facturas insertadas por transacción al ejecutar un lote en segundo plano
+CHUNK_SIZE = 500
+
+
+def build_invoice(patient, service, issue_date, payment_terms, notes, user, invoice_number):
+    """Factura y su item sin guardar, con los totales ya calculados"""
+    invoice = Invoice(
+        invoice_number=invoice_number,
+        patient=patient,
+        organization_id=patient.organization_id,
+        issue_date=issue_date,
+        payment_terms=payment_terms,
+        notes=notes,
+        discount_amount=Decimal('0.00'),
+        created_by=user
+    )
+    invoice.due_date = invoice.calculate_due_date()
+    item = InvoiceItem(
+        service=service,
+        quantity=Decimal('1.00'),
+        unit_price=service.price,
+        tax_rate=service.tax_rate,
+        discount_rate=Decimal('0.00')
+    )
+    invoice.subtotal = item.total
+    invoice.tax_amount = item.tax_amount
+    invoice.total_amount = invoice.subtotal + invoice.tax_amount - invoice.discount_amount
+    invoice.amount_paid = Decimal('0.00')
+    invoice.amount_pending = invoice.total_amount
+    return invoice, item
+
+
+def _insert(pairs):
+    """Inserta facturas e items; los items necesitan la PK de su factura"""
+    invoices = Invoice.objects.bulk_create([invoice for invoice, _ in pairs])
+    if invoices and invoices[0].pk is None:
+        # Backends sin RETURNING en inserciones masivas
+        ids = dict(Invoice.objects.filter(
+            invoice_number__in=[invoice.invoice_number for invoice in invoices]
+        ).values_list('invoice_number', 'id'))
+        for invoice in invoices:
+            invoice.pk = ids[invoice.invoice_number]
+    items = []
+    for invoice, item in pairs:
+        item.invoice = invoice
+        items.append(item)
+    InvoiceItem.objects.bulk_create(items)
+
+
+def create_invoices(patients, service, issue_date, payment_terms, notes, user):
+    """
+    Crea una factura con un item de ``service`` por paciente en una sola
+    transacción y devuelve cuántas se crearon
+    """
+    patients = list(patients)
+    if not patients:
+        return 0
+    with transaction.atomic():
+        numbers = Invoice.allocate_invoice_numbers(len(patients))
+        _insert([
+            build_invoice(patient, service, issue_date, payment_terms, notes, user, number)
+            for patient, number in zip(patients, numbers)
+        ])
+    return len(patients)
+
+
+def requeue_stale(timeout=None):
+    """Devuelve a pendientes los lotes de procesos que murieron a la mitad"""
+    cutoff = timezone.now() - timedelta(seconds=timeout or settings.BULK_INVOICE_JOB_TIMEOUT)
+    return BulkInvoiceJob.objects.filter(status='running', started_at__lt=cutoff).update(status='pending')
+
+
+def run_job(job_id):
+    """
+    Ejecuta un lote pendiente. Los números se reservan de una vez y cada
+    bloque de ``CHUNK_SIZE`` facturas se confirma por separado para poder
+    reportar el avance en ``processed``. Un lote reencolado por
+    ``requeue_stale`` omite los pacientes que ya tienen su factura del lote.
+    """
+    started_at = timezone.now()
+    claimed = BulkInvoiceJob.objects.filter(pk=job_id, status='pending').update(
+        status='running', started_at=started_at, error='', finished_at=None
+    )
+    if not claimed:
+        return
+    job = BulkInvoiceJob.objects.select_related('service', 'created_by').get(pk=job_id)
+    # Sólo quien reclamó el lote con este started_at puede seguir escribiendo;
+    # si se reencoló por tiempo excedido, otro proceso lo continúa
+    lease = BulkInvoiceJob.objects.filter(pk=job.pk, status='running', started_at=started_at)
+
+    try:
+        invoiced = set(Invoice.objects.filter(bulk_job=job).values_list('patient_id', flat=True))
+        patients = {
+            patient.pk: patient
+            for patient in Patient.objects.filter(pk__in=job.patient_ids)
+        }
+        patients = [patients[pk] for pk in job.patient_ids if pk in patients]
+        done = sum(1 for patient in patients if patient.pk in invoiced)
+        patients = [patient for patient in patients if patient.pk not in invoiced]
+        lease.update(total=done + len(patients), processed=done)
+        numbers = Invoice.allocate_invoice_numbers(len(patients)) if patients else []
+
+        for start in range(0, len(patients), CHUNK_SIZE):
+            chunk = patients[start:start + CHUNK_SIZE]
+            with transaction.atomic():
+                if not lease.update(processed=done + start + len(chunk)):
+                    logger.warning('Bulk invoice job %s was requeued while running; stopping', job_id)
+                    return
+                pairs = []
+                for patient, number in zip(chunk, numbers[start:start + CHUNK_SIZE]):
+                    invoice, item = build_invoice(
+                        patient, job.service, job.issue_date, job.payment_terms,
+                        job.notes, job.created_by, number
+                    )
+                    invoice.bulk_job = job
+                    pairs.append((invoice, item))
+                _insert(pairs)
+
+        lease.update(status='completed', finished_at=timezone.now())
+    except Exception as exc:
+        logger.exception('Bulk invoice job %s failed', job_id)
+        lease.update(status='failed', error=str(exc), finished_at=timezone.now())
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        connection.close()
+
+
+def start_job(job):
+    """Lanza el lote en un hilo cuando la transacción actual se confirma"""
+    transaction.on_commit(
+        lambda: threading.Thread(target=_run_in_thread, args=(job.pk,), daemon=True).start()
+    )
+
+
+def should_run_in_background(count):
+    return count > settings.BULK_INVOICE_ASYNC_THRESHOLD
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from billing.bulk import requeue_stale, run_job
+from billing.models import BulkInvoiceJob
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta las facturaciones en lote pendientes, por ejemplo las que '
+        'quedaron sin procesar al reiniciar el servidor; los lotes en proceso '
+        'por más de BULK_INVOICE_JOB_TIMEOUT segundos se reencolan y se reanudan'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--job',
+            type=int,
+            action='append',
+            dest='jobs',
+            help='ID del lote a ejecutar; se puede repetir (por defecto: todos los pendientes)',
+        )
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'{requeued} lotes reencolados por tiempo excedido'))
+
+        jobs = BulkInvoiceJob.objects.filter(status='pending').order_by('created_at')
+        if options['jobs']:
+            jobs = jobs.filter(pk__in=options['jobs'])
+
+        for job_id in jobs.values_list('pk', flat=True):
+            run_job(job_id)
+            job = BulkInvoiceJob.objects.get(pk=job_id)
+            if job.status == 'completed':
+                self.stdout.write(self.style.SUCCESS(f'Lote #{job.pk}: {job.processed} facturas creadas'))
+            else:
+                self.stdout.write(self.style.ERROR(f'Lote #{job.pk}: {job.get_status_display()} - {job.error}'))
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('billing', '0002_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkInvoiceJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('patient_ids', models.JSONField(default=list, verbose_name='Pacientes')),
+                ('issue_date', models.DateField(verbose_name='Fecha de Emisión')),
+                ('payment_terms', models.CharField(choices=[('immediate', 'Inmediato'), ('15_days', '15 días'), ('30_days', '30 días'), ('60_days', '60 días'), ('90_days', '90 días')], max_length=20, verbose_name='Términos de Pago')),
+                ('notes', models.TextField(blank=True, verbose_name='Notas')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En proceso'), ('completed', 'Completado'), ('failed', 'Fallido')], default='pending', max_length=20, verbose_name='Estado')),
+                ('total', models.IntegerField(default=0, verbose_name='Total')),
+                ('processed', models.IntegerField(default=0, verbose_name='Procesadas')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Inicio')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Creado por')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='billing.service', verbose_name='Servicio')),
+            ],
+            options={
+                'verbose_name': 'Facturación en Lote',
+                'verbose_name_plural': 'Facturaciones en Lote',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
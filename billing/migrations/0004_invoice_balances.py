@@ -0,0 +1,41 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:37
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_balances(apps, schema_editor):
+    Invoice = apps.get_model('billing', 'Invoice')
+    Payment = apps.get_model('billing', 'Payment')
+    paid = Payment.objects.filter(
+        invoice=OuterRef('pk'), status='completed'
+    ).order_by().values('invoice').annotate(total=Sum('amount')).values('total')
+    paid = Coalesce(
+        Subquery(paid), Value(Decimal('0.00')),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2)
+    )
+    Invoice.objects.update(amount_paid=paid, amount_pending=F('total_amount') - paid)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0003_bulkinvoicejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='amount_paid',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=10, verbose_name='Monto Pagado'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='amount_pending',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=10, verbose_name='Monto Pendiente'),
+        ),
+        migrations.RunPython(fill_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:20
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def organization_from_patient(apps, schema_editor):
+    Invoice = apps.get_model('billing', 'Invoice')
+    Patient = apps.get_model('patients', 'Patient')
+    Invoice.objects.update(organization=Subquery(
+        Patient.objects.filter(pk=OuterRef('patient')).values('organization')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_synctombstone'),
+        ('patients', '0006_tenant_indexes'),
+        ('billing', '0006_payment_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='organization',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='invoices', to='accounts.organization'),
+        ),
+        migrations.RunPython(organization_from_patient, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='invoice',
+            name='organization',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='invoices', to='accounts.organization'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['organization', 'created_at', 'id'], name='invoice_org_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['organization', 'status', 'due_date'], name='invoice_org_status_due_idx'),
+        ),
+    ]
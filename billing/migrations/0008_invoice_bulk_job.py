@@ -0,0 +1,19 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0007_invoice_organization'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='bulk_job',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='invoices', to='billing.bulkinvoicejob'),
+        ),
+    ]
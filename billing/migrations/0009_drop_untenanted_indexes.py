@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-18 12:06
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0008_invoice_bulk_job'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='invoice',
+            name='invoice_status_due_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='invoice',
+            name='invoice_created_idx',
+        ),
+    ]
@@ -1,9 +1,13 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, DecimalField, DurationField, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from decimal import Decimal
 from patients.models import Patient
 from appointments.models import Appointment
+from accounts.sequences import allocate_block, next_value, last_number
+from accounts.tenancy import TenantManager
 
 User = get_user_model()
 
@@ -34,6 +38,62 @@ class Service(models.Model):
         tax_amount = self.price * (self.tax_rate / 100)
         return self.price + tax_amount
 
+class InvoiceQuerySet(models.QuerySet):
+    """Consultas de facturas con saldo y vencimiento resueltos en SQL"""
+    
+    def _overdue_q(self, today=None):
+        return Q(status='sent', due_date__lt=today or timezone.localdate())
+    
+    def overdue(self, today=None):
+        """Facturas enviadas con fecha de vencimiento pasada"""
+        return self.filter(self._overdue_q(today))
+    
+    def with_overdue(self, today=None):
+        """
+        Anota ``overdue`` y ``overdue_by`` (timedelta); ``is_overdue`` y
+        ``days_overdue`` los usan en lugar de calcularlos por instancia
+        """
+        today = today or timezone.localdate()
+        return self.annotate(
+            overdue=Case(
+                When(self._overdue_q(today), then=Value(True)),
+                default=Value(False),
+                output_field=models.BooleanField()
+            ),
+            overdue_by=Case(
+                When(self._overdue_q(today), then=Value(today, output_field=models.DateField()) - F('due_date')),
+                default=None,
+                output_field=DurationField()
+            )
+        )
+    
+    def balance_summary(self, today=None):
+        """Conteos y montos del dashboard de facturación en una sola consulta"""
+        overdue = self._overdue_q(today)
+        summary = self.aggregate(
+            total_invoices=Count('id'),
+            pending_invoices=Count('id', filter=Q(status='sent')),
+            overdue_invoices=Count('id', filter=overdue),
+            total_revenue=Sum('total_amount', filter=Q(status='paid')),
+            pending_payments=Sum('amount_pending', filter=Q(status__in=['sent', 'overdue'])),
+            overdue_amount=Sum('amount_pending', filter=overdue),
+        )
+        for key in ('total_revenue', 'pending_payments', 'overdue_amount'):
+            summary[key] = summary[key] or 0
+        return summary
+    
+    def refresh_balances(self):
+        """Recalcula ``amount_paid`` y ``amount_pending`` desde los pagos completados"""
+        paid = Payment.objects.filter(
+            invoice=OuterRef('pk'), status='completed'
+        ).order_by().values('invoice').annotate(total=Sum('amount')).values('total')
+        paid = Coalesce(
+            Subquery(paid), Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        )
+        # update() no pasa por auto_now; la sincronización incremental lee updated_at
+        return self.update(amount_paid=paid, amount_pending=F('total_amount') - paid, updated_at=timezone.now())
+
 class Invoice(models.Model):
     """Facturas emitidas"""
     STATUS_CHOICES = [
@@ -54,7 +114,11 @@ class Invoice(models.Model):
     
     invoice_number = models.CharField(max_length=50, unique=True, verbose_name="Número de Factura")
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, verbose_name="Paciente")
+    # Copia de la organización del paciente, para filtrar e indexar sin JOIN
+    organization = models.ForeignKey('accounts.Organization', on_delete=models.CASCADE, related_name='invoices', editable=False)
     appointment = models.ForeignKey(Appointment, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Cita")
+    # Lote que creó la factura, para reanudar un lote interrumpido sin duplicar
+    bulk_job = models.ForeignKey('BulkInvoiceJob', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='invoices')
     
     issue_date = models.DateField(default=timezone.now, verbose_name="Fecha de Emisión")
     due_date = models.DateField(verbose_name="Fecha de Vencimiento")
@@ -68,6 +132,10 @@ class Invoice(models.Model):
     discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name="Descuento")
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name="Total")
     
+    # Saldo mantenido por Payment.save/delete
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name="Monto Pagado")
+    amount_pending = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name="Monto Pendiente")
+    
     # Información adicional
     notes = models.TextField(blank=True, verbose_name="Notas")
     terms_conditions = models.TextField(blank=True, verbose_name="Términos y Condiciones")
@@ -76,15 +144,28 @@ class Invoice(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
     
+    objects = InvoiceQuerySet.as_manager()
+    scoped = TenantManager.from_queryset(InvoiceQuerySet)('organization')
+    
     class Meta:
         verbose_name = "Factura"
         verbose_name_plural = "Facturas"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='invoice_updated_idx'),
+            models.Index(fields=['organization', 'created_at', 'id'], name='invoice_org_created_idx'),
+            models.Index(fields=['organization', 'status', 'due_date'], name='invoice_org_status_due_idx'),
+        ]
+    
+    # Campos que solo actualiza refresh_balances()
+    BALANCE_FIELDS = ('amount_paid', 'amount_pending')
     
     def __str__(self):
         return f"Factura {self.invoice_number} - {self.patient.get_full_name()}"
     
     def save(self, *args, **kwargs):
+        if self.organization_id is None:
+            self.organization_id = self.patient.organization_id
         if not self.invoice_number:
             self.invoice_number = self.generate_invoice_number()
         
@@ -92,13 +173,37 @@ class Invoice(models.Model):
         if not self.due_date:
             self.due_date = self.calculate_due_date()
         
-        super().save(*args, **kwargs)
+        if self._state.adding:
+            self.amount_pending = Decimal(self.total_amount) - Decimal(self.amount_paid)
+            super().save(*args, **kwargs)
+            return
+        
+        # Los saldos los escriben los pagos; una instancia cargada antes de un
+        # pago no debe sobrescribirlos, así que se recalculan sobre la fila
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+        kwargs['update_fields'] = [name for name in update_fields if name not in self.BALANCE_FIELDS]
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if 'total_amount' in kwargs['update_fields']:
+                Invoice.objects.filter(pk=self.pk).refresh_balances()
+                self.refresh_from_db(fields=self.BALANCE_FIELDS)
     
     def generate_invoice_number(self):
         """Genera número de factura automático"""
+        return self.allocate_invoice_numbers(1)[0]
+    
+    @classmethod
+    def allocate_invoice_numbers(cls, count):
+        """Reserva ``count`` números de factura consecutivos del año en curso"""
         year = timezone.now().year
-        count = Invoice.objects.filter(created_at__year=year).count() + 1
-        return f"INV-{year}-{count:05d}"
+        prefix = f"INV-{year}-"
+        numbers = allocate_block(
+            'invoice', count, year=year,
+            seed=lambda: last_number(cls.objects.all(), 'invoice_number', prefix)
+        )
+        return [f"{prefix}{number:05d}" for number in numbers]
     
     def calculate_due_date(self):
         """Calcula fecha de vencimiento según términos de pago"""
@@ -135,24 +240,18 @@ class Invoice(models.Model):
     @property
     def is_overdue(self):
         """Verifica si la factura está vencida"""
-        return self.status in ['sent'] and timezone.now().date() > self.due_date
+        if 'overdue' in self.__dict__:
+            return self.overdue
+        return self.status in ['sent'] and timezone.localdate() > self.due_date
     
     @property
     def days_overdue(self):
         """Días de retraso"""
+        if 'overdue_by' in self.__dict__:
+            return self.overdue_by.days if self.overdue_by else 0
         if self.is_overdue:
-            return (timezone.now().date() - self.due_date).days
+            return (timezone.localdate() - self.due_date).days
         return 0
-    
-    @property
-    def amount_paid(self):
-        """Total pagado"""
-        return sum(payment.amount for payment in self.payments.filter(status='completed'))
-    
-    @property
-    def amount_pending(self):
-        """Monto pendiente de pago"""
-        return self.total_amount - self.amount_paid
 
 class InvoiceItem(models.Model):
     """Elementos/líneas de una factura"""
@@ -232,11 +331,19 @@ class Payment(models.Model):
     notes = models.TextField(blank=True, verbose_name="Notas")
     processed_by = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Procesado por")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
+    
+    objects = models.Manager()
+    scoped = TenantManager('invoice__organization')
     
     class Meta:
         verbose_name = "Pago"
         verbose_name_plural = "Pagos"
         ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['payment_date', 'id'], name='payment_date_id_idx'),
+            models.Index(fields=['updated_at', 'id'], name='payment_updated_idx'),
+        ]
     
     def __str__(self):
         return f"Pago {self.payment_number} - ${self.amount}"
@@ -244,13 +351,34 @@ class Payment(models.Model):
     def save(self, *args, **kwargs):
         if not self.payment_number:
             self.payment_number = self.generate_payment_number()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            previous_invoice_id = None
+            if self.pk:
+                previous_invoice_id = Payment.objects.filter(pk=self.pk).values_list('invoice_id', flat=True).first()
+            super().save(*args, **kwargs)
+            self.refresh_invoice_balance({self.invoice_id, previous_invoice_id} - {None})
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.refresh_invoice_balance({self.invoice_id})
+        return result
+    
+    def refresh_invoice_balance(self, invoice_ids):
+        """Actualiza el saldo de las facturas afectadas y de la instancia en memoria"""
+        Invoice.objects.filter(pk__in=invoice_ids).refresh_balances()
+        if Payment.invoice.is_cached(self):
+            self.invoice.refresh_from_db(fields=['amount_paid', 'amount_pending'])
     
     def generate_payment_number(self):
         """Genera número de pago automático"""
         year = timezone.now().year
-        count = Payment.objects.filter(created_at__year=year).count() + 1
-        return f"PAY-{year}-{count:05d}"
+        prefix = f"PAY-{year}-"
+        number = next_value(
+            'payment', year=year,
+            seed=lambda: last_number(Payment.objects.all(), 'payment_number', prefix)
+        )
+        return f"{prefix}{number:05d}"
 
 class InsuranceClaim(models.Model):
     """Reclamos a seguros médicos"""
@@ -299,5 +427,48 @@ class InsuranceClaim(models.Model):
     def generate_claim_number(self):
         """Genera número de reclamo automático"""
         year = timezone.now().year
-        count = InsuranceClaim.objects.filter(created_at__year=year).count() + 1
-        return f"CLM-{year}-{count:05d}"
+        prefix = f"CLM-{year}-"
+        number = next_value(
+            'claim', year=year,
+            seed=lambda: last_number(InsuranceClaim.objects.all(), 'claim_number', prefix)
+        )
+        return f"{prefix}{number:05d}"
+
+
+class BulkInvoiceJob(models.Model):
+    """Facturación en lote ejecutada en segundo plano"""
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('running', 'En proceso'),
+        ('completed', 'Completado'),
+        ('failed', 'Fallido'),
+    ]
+    
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, verbose_name="Servicio")
+    patient_ids = models.JSONField(default=list, verbose_name="Pacientes")
+    issue_date = models.DateField(verbose_name="Fecha de Emisión")
+    payment_terms = models.CharField(max_length=20, choices=Invoice.PAYMENT_TERMS_CHOICES, verbose_name="Términos de Pago")
+    notes = models.TextField(blank=True, verbose_name="Notas")
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Estado")
+    total = models.IntegerField(default=0, verbose_name="Total")
+    processed = models.IntegerField(default=0, verbose_name="Procesadas")
+    error = models.TextField(blank=True, verbose_name="Error")
+    
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Creado por")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Inicio")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Fin")
+    
+    class Meta:
+        verbose_name = "Facturación en Lote"
+        verbose_name_plural = "Facturaciones en Lote"
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Lote #{self.pk} - {self.processed}/{self.total}"
+    
+    @property
+    def progress(self):
+        """Porcentaje completado"""
+        return round(self.processed / self.total * 100, 1) if self.total else 100.0
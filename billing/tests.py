@@ -1,3 +1,245 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import User, Organization
+from patients.models import Patient
+from . import bulk
+from .models import BulkInvoiceJob, Invoice, InvoiceItem, Payment, Service
+
+
+class BulkInvoiceTests(TestCase):
+
+    PATIENTS = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(
+            name='Clínica Test', legal_name='Clínica Test SA', tax_id='TEST010101',
+            address='Calle 1', phone='5550000000', email='clinica@test.com',
+            director_name='Director', director_license='123456'
+        )
+        cls.user = User.objects.create_user(username='admin', password='x', role='admin')
+        cls.service = Service.objects.create(
+            name='Consulta', code='CON', price=Decimal('500.00'), tax_rate=Decimal('16.00')
+        )
+        cls.patients = [
+            Patient.objects.create(
+                patient_id=f'PAC{index:03d}', first_name='Paciente', last_name=str(index),
+                birth_date=date(1990, 1, 1), gender='F', phone_number='5551234567',
+                address='Calle 2', city='CDMX', state='CDMX', postal_code='01000',
+                emergency_contact_name='Contacto', emergency_contact_relationship='Familiar',
+                emergency_contact_phone='5551234567', organization=cls.organization
+            )
+            for index in range(cls.PATIENTS)
+        ]
+
+    def _job(self, **fields):
+        return BulkInvoiceJob.objects.create(
+            service=self.service, patient_ids=[patient.pk for patient in self.patients],
+            issue_date=date(2026, 1, 15), payment_terms='30_days', total=self.PATIENTS,
+            created_by=self.user, **fields
+        )
+
+    def test_totals_match_calculate_totals(self):
+        bulk.create_invoices(self.patients[:2], self.service, date(2026, 1, 15), '30_days', '', self.user)
+
+        for invoice in Invoice.objects.all():
+            stored = (invoice.subtotal, invoice.tax_amount, invoice.total_amount, invoice.amount_pending)
+            totals = invoice.calculate_totals()
+            self.assertEqual(stored, (
+                totals['subtotal'], totals['tax_amount'], totals['total_amount'], totals['total_amount']
+            ))
+            self.assertEqual(invoice.due_date, date(2026, 2, 14))
+            self.assertEqual(invoice.organization, self.organization)
+        self.assertEqual(InvoiceItem.objects.count(), 2)
+
+    def test_job_runs_in_chunks(self):
+        job = self._job()
+        progress = []
+        insert = bulk._insert
+
+        def record_insert(pairs):
+            progress.append(BulkInvoiceJob.objects.get(pk=job.pk).processed)
+            insert(pairs)
+
+        with mock.patch.object(bulk, 'CHUNK_SIZE', 2), mock.patch.object(bulk, '_insert', side_effect=record_insert):
+            bulk.run_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.total, job.processed), ('completed', 5, 5))
+        self.assertEqual(progress, [2, 4, 5])
+        self.assertEqual(job.invoices.count(), 5)
+        numbers = sorted(job.invoices.values_list('invoice_number', flat=True))
+        self.assertEqual(len(set(numbers)), 5)
+
+    def test_failure_keeps_committed_chunks_and_a_rerun_skips_them(self):
+        job = self._job()
+        insert = bulk._insert
+        calls = []
+
+        def fail_second_chunk(pairs):
+            calls.append(len(pairs))
+            if len(calls) == 2:
+                raise RuntimeError('disk full')
+            insert(pairs)
+
+        with mock.patch.object(bulk, 'CHUNK_SIZE', 2), mock.patch.object(bulk, '_insert', side_effect=fail_second_chunk):
+            with self.assertLogs('billing.bulk', 'ERROR'):
+                bulk.run_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.error), ('failed', 2, 'disk full'))
+        self.assertEqual(job.invoices.count(), 2)
+
+        BulkInvoiceJob.objects.filter(pk=job.pk).update(status='pending')
+        bulk.run_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.error), ('completed', 5, ''))
+        self.assertEqual(sorted(job.invoices.values_list('patient_id', flat=True)),
+                         [patient.pk for patient in self.patients])
+
+    def test_stale_running_job_is_requeued_and_resumed(self):
+        job = self._job()
+        bulk.create_invoices(self.patients[:3], self.service, job.issue_date, job.payment_terms, '', self.user)
+        Invoice.objects.update(bulk_job=job)
+        BulkInvoiceJob.objects.filter(pk=job.pk).update(
+            status='running', processed=3, started_at=timezone.now() - timedelta(hours=2)
+        )
+        fresh = self._job(status='running', started_at=timezone.now())
+
+        output = StringIO()
+        call_command('run_bulk_invoice_jobs', stdout=output)
+
+        job.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((job.status, job.processed), ('completed', 5))
+        self.assertEqual(job.invoices.count(), 5)
+        self.assertEqual(fresh.status, 'running')
+        self.assertIn('1 lotes reencolados', output.getvalue())
+
+    def test_requeued_job_stops_the_previous_runner(self):
+        job = self._job()
+        insert = bulk._insert
+
+        def requeue_after_first_chunk(pairs):
+            insert(pairs)
+            BulkInvoiceJob.objects.filter(pk=job.pk).update(status='pending')
+
+        with mock.patch.object(bulk, 'CHUNK_SIZE', 2), \
+                mock.patch.object(bulk, '_insert', side_effect=requeue_after_first_chunk):
+            with self.assertLogs('billing.bulk', 'WARNING'):
+                bulk.run_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'pending')
+        self.assertEqual(job.invoices.count(), 2)
+
+
+class InvoiceBalanceTests(TestCase):
+
+    TODAY = date(2026, 3, 10)
+
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(
+            name='Clínica Test', legal_name='Clínica Test SA', tax_id='TEST010101',
+            address='Calle 1', phone='5550000000', email='clinica@test.com',
+            director_name='Director', director_license='123456'
+        )
+        cls.user = User.objects.create_user(username='admin', password='x', role='admin')
+        cls.patient = Patient.objects.create(
+            patient_id='PAC001', first_name='Paciente', last_name='Uno',
+            birth_date=date(1990, 1, 1), gender='F', phone_number='5551234567',
+            address='Calle 2', city='CDMX', state='CDMX', postal_code='01000',
+            emergency_contact_name='Contacto', emergency_contact_relationship='Familiar',
+            emergency_contact_phone='5551234567', organization=organization
+        )
+
+    def _invoice(self, total='100.00', status='sent', due_date=date(2026, 3, 1)):
+        return Invoice.objects.create(
+            patient=self.patient, status=status, due_date=due_date,
+            total_amount=Decimal(total), created_by=self.user
+        )
+
+    def _pay(self, invoice, amount, status='completed'):
+        return Payment.objects.create(
+            invoice=invoice, amount=Decimal(amount), payment_method='cash', status=status, processed_by=self.user
+        )
+
+    def _balances(self, invoice):
+        return tuple(Invoice.objects.filter(pk=invoice.pk).values_list('amount_paid', 'amount_pending').get())
+
+    def test_payment_save_and_delete_update_the_balance(self):
+        invoice = self._invoice()
+        payment = self._pay(invoice, '30.00', status='pending')
+        self.assertEqual(self._balances(invoice), (Decimal('0.00'), Decimal('100.00')))
+
+        payment.status = 'completed'
+        payment.save()
+        self.assertEqual(self._balances(invoice), (Decimal('30.00'), Decimal('70.00')))
+        self.assertEqual(payment.invoice.amount_pending, Decimal('70.00'))
+
+        other = self._invoice(total='80.00')
+        payment.invoice = other
+        payment.save()
+        self.assertEqual(self._balances(invoice), (Decimal('0.00'), Decimal('100.00')))
+        self.assertEqual(self._balances(other), (Decimal('30.00'), Decimal('50.00')))
+
+        payment.delete()
+        self.assertEqual(self._balances(other), (Decimal('0.00'), Decimal('80.00')))
+
+    def test_stale_invoice_keeps_the_stored_balance(self):
+        invoice = self._invoice()
+        stale = Invoice.objects.get(pk=invoice.pk)
+        self._pay(invoice, '50.00')
+
+        stale.notes = 'Editada'
+        stale.save()
+        self.assertEqual(self._balances(invoice), (Decimal('50.00'), Decimal('50.00')))
+        self.assertEqual((stale.amount_paid, stale.amount_pending), (Decimal('50.00'), Decimal('50.00')))
+
+        stale.total_amount = Decimal('120.00')
+        stale.save(update_fields=['total_amount'])
+        self.assertEqual(self._balances(invoice), (Decimal('50.00'), Decimal('70.00')))
+        self.assertEqual(Invoice.objects.get(pk=invoice.pk).notes, 'Editada')
+
+    def test_refresh_balances_recomputes_from_completed_payments(self):
+        invoice = self._invoice()
+        self._pay(invoice, '40.00')
+        self._pay(invoice, '25.00', status='failed')
+        Invoice.objects.filter(pk=invoice.pk).update(amount_paid=0, amount_pending=0)
+
+        self.assertEqual(Invoice.objects.filter(pk=invoice.pk).refresh_balances(), 1)
+        self.assertEqual(self._balances(invoice), (Decimal('40.00'), Decimal('60.00')))
+
+    def test_overdue_and_balance_summary(self):
+        overdue = self._invoice()
+        self._pay(overdue, '10.00')
+        current = self._invoice(total='200.00', due_date=self.TODAY)
+        self._invoice(total='300.00', status='paid')
+        self._invoice(total='50.00', status='draft')
+
+        self.assertEqual(list(Invoice.objects.overdue(self.TODAY)), [overdue])
+        annotated = {invoice.pk: invoice for invoice in Invoice.objects.with_overdue(self.TODAY)}
+        self.assertEqual((annotated[overdue.pk].is_overdue, annotated[overdue.pk].days_overdue), (True, 9))
+        self.assertEqual((annotated[current.pk].is_overdue, annotated[current.pk].days_overdue), (False, 0))
 
-# Create your tests here.
+        self.assertEqual(Invoice.objects.balance_summary(self.TODAY), {
+            'total_invoices': 4,
+            'pending_invoices': 2,
+            'overdue_invoices': 1,
+            'total_revenue': Decimal('300.00'),
+            'pending_payments': Decimal('290.00'),
+            'overdue_amount': Decimal('90.00'),
+        })
+        self.assertEqual(Invoice.objects.filter(status='draft').balance_summary(self.TODAY), {
+            'total_invoices': 1, 'pending_invoices': 0, 'overdue_invoices': 0,
+            'total_revenue': 0, 'pending_payments': 0, 'overdue_amount': 0,
+        })
@@ -31,4 +31,5 @@ urlpatterns = [
     # API endpoints
     path('api/services/<int:pk>/price/', views.api_service_price, name='api_service_price'),
     path('api/invoices/<int:pk>/totals/', views.api_invoice_totals, name='api_invoice_totals'),
+    path('api/bulk-jobs/<int:pk>/', views.api_bulk_invoice_job, name='api_bulk_invoice_job'),
 ]
\ No newline at end of file
@@ -2,49 +2,35 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse, Http404
-from django.db.models import Sum, Count, Q
+from django.db.models import Count, Q
 from django.core.paginator import Paginator
-from django.utils import timezone
 from decimal import Decimal
 import json
 
-from .models import Service, Invoice, InvoiceItem, Payment, InsuranceClaim
+from . import bulk
+from .models import Service, Invoice, Payment, InsuranceClaim, BulkInvoiceJob
 from .forms import (
     ServiceForm, InvoiceForm, InvoiceItemForm, PaymentForm, 
     InsuranceClaimForm, InvoiceFilterForm, PaymentFilterForm, BulkInvoiceForm
 )
 from patients.models import Patient
+from accounts.pagination import paginate
+from reports import exports
 
 @login_required  
 def index(request):
     """Dashboard principal de facturación"""
     # Estadísticas generales
-    stats = {
-        'total_invoices': Invoice.objects.count(),
-        'pending_invoices': Invoice.objects.filter(status='sent').count(),
-        'overdue_invoices': Invoice.objects.filter(
-            status='sent',
-            due_date__lt=timezone.now().date()
-        ).count(),
-        'total_revenue': Invoice.objects.filter(status='paid').aggregate(
-            total=Sum('total_amount')
-        )['total'] or 0,
-        'pending_payments': Invoice.objects.filter(
-            status__in=['sent', 'overdue']
-        ).aggregate(total=Sum('total_amount'))['total'] or 0,
-    }
+    stats = Invoice.scoped.balance_summary()
     
     # Facturas recientes
-    recent_invoices = Invoice.objects.select_related('patient').order_by('-created_at')[:10]
+    recent_invoices = Invoice.scoped.select_related('patient').order_by('-created_at')[:10]
     
     # Pagos recientes
-    recent_payments = Payment.objects.select_related('invoice__patient').order_by('-payment_date')[:10]
+    recent_payments = Payment.scoped.select_related('invoice__patient').order_by('-payment_date')[:10]
     
     # Facturas vencidas
-    overdue_invoices = Invoice.objects.filter(
-        status='sent',
-        due_date__lt=timezone.now().date()
-    ).select_related('patient').order_by('due_date')[:5]
+    overdue_invoices = Invoice.scoped.overdue().with_overdue().select_related('patient').order_by('due_date')[:5]
     
     context = {
         'title': 'Dashboard de Facturación',
@@ -60,7 +46,7 @@ def index(request):
 def invoices(request):
     """Lista de facturas con filtros"""
     form = InvoiceFilterForm(request.GET or None)
-    invoices_list = Invoice.objects.select_related('patient').order_by('-created_at')
+    invoices_list = Invoice.scoped.with_overdue().select_related('patient').order_by('-created_at')
     
     # Aplicar filtros
     if form.is_valid():
@@ -73,15 +59,10 @@ def invoices(request):
         if form.cleaned_data.get('date_to'):
             invoices_list = invoices_list.filter(issue_date__lte=form.cleaned_data['date_to'])
         if form.cleaned_data.get('overdue_only'):
-            invoices_list = invoices_list.filter(
-                status='sent',
-                due_date__lt=timezone.now().date()
-            )
+            invoices_list = invoices_list.overdue()
     
     # Paginación
-    paginator = Paginator(invoices_list, 20)
-    page_number = request.GET.get('page')
-    invoices = paginator.get_page(page_number)
+    paginator, invoices = paginate(request, invoices_list, 20)
     
     context = {
         'title': 'Facturas',
@@ -94,7 +75,7 @@ def invoices(request):
 @login_required
 def invoice_detail(request, pk):
     """Detalle de una factura específica"""
-    invoice = get_object_or_404(Invoice, pk=pk)
+    invoice = get_object_or_404(Invoice.scoped, pk=pk)
     
     context = {
         'title': f'Factura {invoice.invoice_number}',
@@ -128,7 +109,7 @@ def create_invoice(request):
 @login_required
 def edit_invoice(request, pk):
     """Editar factura existente"""
-    invoice = get_object_or_404(Invoice, pk=pk)
+    invoice = get_object_or_404(Invoice.scoped, pk=pk)
     
     if invoice.status not in ['draft']:
         messages.error(request, 'Solo se pueden editar facturas en borrador.')
@@ -154,7 +135,7 @@ def edit_invoice(request, pk):
 @login_required
 def add_invoice_item(request, invoice_pk):
     """Agregar elemento a factura"""
-    invoice = get_object_or_404(Invoice, pk=invoice_pk)
+    invoice = get_object_or_404(Invoice.scoped, pk=invoice_pk)
     
     if invoice.status not in ['draft']:
         messages.error(request, 'Solo se pueden agregar elementos a facturas en borrador.')
@@ -188,7 +169,7 @@ def add_invoice_item(request, invoice_pk):
 def payments(request):
     """Lista de pagos con filtros"""
     form = PaymentFilterForm(request.GET or None)
-    payments_list = Payment.objects.select_related('invoice__patient').order_by('-payment_date')
+    payments_list = Payment.scoped.select_related('invoice__patient').order_by('-payment_date')
     
     # Aplicar filtros
     if form.is_valid():
@@ -217,7 +198,7 @@ def payments(request):
 @login_required
 def create_payment(request, invoice_pk):
     """Crear pago para una factura"""
-    invoice = get_object_or_404(Invoice, pk=invoice_pk)
+    invoice = get_object_or_404(Invoice.scoped, pk=invoice_pk)
     
     if invoice.amount_pending <= 0:
         messages.error(request, 'Esta factura ya está completamente pagada.')
@@ -332,7 +313,7 @@ def edit_service(request, pk):
 @login_required
 def create_insurance_claim(request, invoice_pk):
     """Crear reclamo de seguro para una factura"""
-    invoice = get_object_or_404(Invoice, pk=invoice_pk)
+    invoice = get_object_or_404(Invoice.scoped, pk=invoice_pk)
     
     if request.method == 'POST':
         form = InsuranceClaimForm(request.POST, invoice=invoice, user=request.user)
@@ -357,34 +338,29 @@ def bulk_invoice(request):
     if request.method == 'POST':
         form = BulkInvoiceForm(request.POST)
         if form.is_valid():
-            created_count = 0
-            service = form.cleaned_data['service']
+            patients = form.cleaned_data['patients']
+            options = {
+                'service': form.cleaned_data['service'],
+                'issue_date': form.cleaned_data['issue_date'],
+                'payment_terms': form.cleaned_data['payment_terms'],
+                'notes': form.cleaned_data['notes'],
+            }
             
-            for patient in form.cleaned_data['patients']:
-                # Crear factura
-                invoice = Invoice.objects.create(
-                    patient=patient,
-                    issue_date=form.cleaned_data['issue_date'],
-                    payment_terms=form.cleaned_data['payment_terms'],
-                    notes=form.cleaned_data['notes'],
-                    created_by=request.user
+            if bulk.should_run_in_background(len(patients)):
+                job = BulkInvoiceJob.objects.create(
+                    patient_ids=[patient.pk for patient in patients],
+                    total=len(patients),
+                    created_by=request.user,
+                    **options
                 )
-                
-                # Agregar elemento de servicio
-                InvoiceItem.objects.create(
-                    invoice=invoice,
-                    service=service,
-                    quantity=1,
-                    unit_price=service.price,
-                    tax_rate=service.tax_rate
+                bulk.start_job(job)
+                messages.info(
+                    request,
+                    f'Se están creando {job.total} facturas en segundo plano (lote #{job.pk}).'
                 )
-                
-                # Calcular totales
-                invoice.calculate_totals()
-                invoice.save()
-                
-                created_count += 1
+                return redirect('billing:invoices')
             
+            created_count = bulk.create_invoices(patients, user=request.user, **options)
             messages.success(request, f'{created_count} facturas creadas exitosamente.')
             return redirect('billing:invoices')
     else:
@@ -415,36 +391,43 @@ def api_service_price(request, pk):
 def api_invoice_totals(request, pk):
     """API para obtener totales de una factura"""
     try:
-        invoice = Invoice.objects.get(pk=pk)
+        invoice = Invoice.scoped.get(pk=pk)
         totals = invoice.calculate_totals()
         return JsonResponse(totals)
     except Invoice.DoesNotExist:
         return JsonResponse({'error': 'Factura no encontrada'}, status=404)
 
+@login_required
+def api_bulk_invoice_job(request, pk):
+    """API para consultar el avance de una facturación en lote"""
+    try:
+        job = BulkInvoiceJob.objects.get(pk=pk, created_by=request.user)
+    except BulkInvoiceJob.DoesNotExist:
+        return JsonResponse({'error': 'Lote no encontrado'}, status=404)
+    return JsonResponse({
+        'id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'total': job.total,
+        'processed': job.processed,
+        'progress': job.progress,
+        'error': job.error,
+    })
+
+
+PAYMENT_EXPORT_COLUMNS = [
+    exports.Column('Número', 'payment_number'),
+    exports.Column('Factura', 'invoice__invoice_number'),
+    exports.Column('Paciente', 'invoice__patient__first_name', 'invoice__patient__last_name',
+                   'invoice__patient__mother_last_name', format=exports.full_name),
+    exports.Column('Fecha', 'payment_date', format=exports.date_format('%d/%m/%Y %H:%M')),
+    exports.Column('Método', 'payment_method', choices=Payment.PAYMENT_METHOD_CHOICES),
+    exports.Column('Monto', 'amount', format=exports.money),
+    exports.Column('Estado', 'status', choices=Payment.STATUS_CHOICES),
+]
 
 @login_required
 def export_payments(request):
     """Exportar pagos a CSV"""
-    import csv
-    from django.http import HttpResponse
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="pagos.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Número', 'Factura', 'Paciente', 'Fecha', 'Método', 'Monto', 'Estado'])
-    
-    payments = Payment.objects.select_related('invoice', 'invoice__patient').all()
-    for payment in payments:
-        writer.writerow([
-            payment.payment_number,
-            payment.invoice.invoice_number,
-            payment.invoice.patient.get_full_name(),
-            payment.payment_date.strftime('%d/%m/%Y %H:%M'),
-            payment.get_payment_method_display(),
-            f'{payment.amount:.2f}',
-            payment.get_status_display()
-        ])
-    
-    return response
+    return exports.Export(Payment.scoped.all(), PAYMENT_EXPORT_COLUMNS, 'pagos').csv_response()
 
@@ -0,0 +1,149 @@
+"""
+TopicTales Biomédica - Métricas del dashboard
+Calcula los indicadores del dashboard a partir de las métricas diarias y
+guarda en caché una instantánea por organización
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from patients.models import Patient
+from appointments.models import Appointment
+from reports.models import DailyOrgMetrics, DailyAppointmentMetrics
+
+
+METRICS_KEY = 'dashboard:metrics:{organization_id}'
+
+TREND_MONTHS = 6
+
+
+def metrics_cache_key(organization_id):
+    return METRICS_KEY.format(organization_id=organization_id)
+
+
+def _percent(part, total):
+    return (part / total * 100) if total > 0 else 0
+
+
+def _growth(current, previous):
+    if previous > 0:
+        return (current - previous) / previous * 100
+    return 100 if current > 0 else 0
+
+
+def _month_starts(this_month_start, months):
+    """Primer día de los últimos ``months`` meses, del más antiguo al actual"""
+    starts = [this_month_start]
+    for _ in range(months - 1):
+        starts.append((starts[-1] - timedelta(days=1)).replace(day=1))
+    return list(reversed(starts))
+
+
+def compute_dashboard_metrics(organization):
+    """
+    Calcula los contadores del dashboard de una organización. Los conteos
+    por fecha se leen de las métricas diarias, así que el costo no crece con
+    el tamaño de la tabla de citas.
+    """
+    # Fecha local, la misma con la que agrupan las métricas diarias
+    today = timezone.localdate()
+    this_week_start = today - timedelta(days=today.weekday())
+    last_week_start = this_week_start - timedelta(days=7)
+    this_month_start = today.replace(day=1)
+    last_month_start = (this_month_start - timedelta(days=1)).replace(day=1)
+    month_starts = _month_starts(this_month_start, TREND_MONTHS)
+
+    is_today = Q(date=today)
+    this_month = Q(date__gte=this_month_start)
+
+    def total(condition=None):
+        return Coalesce(Sum('count', filter=condition), 0)
+
+    status_counts = {
+        f'status_{status}': total(this_month & Q(status=status))
+        for status, _ in Appointment.STATUS_CHOICES
+    }
+    appointments = DailyAppointmentMetrics.objects.filter(organization=organization).aggregate(
+        total=total(),
+        today=total(is_today),
+        completed_today=total(is_today & Q(status='completed')),
+        pending_today=total(is_today & Q(status__in=['scheduled', 'confirmed'])),
+        this_week=total(Q(date__gte=this_week_start, date__lte=today)),
+        last_week=total(Q(date__gte=last_week_start, date__lt=this_week_start)),
+        this_month=total(this_month),
+        **status_counts
+    )
+
+    # Tendencia mensual y pacientes nuevos por mes, agrupados en la base de datos
+    by_month = {
+        row['month']: row
+        for row in DailyOrgMetrics.objects.filter(
+            organization=organization,
+            date__gte=month_starts[0]
+        ).annotate(
+            month=TruncMonth('date')
+        ).values('month').annotate(
+            appointments_count=Sum('appointments'),
+            new_patients_count=Sum('new_patients')
+        ).order_by()
+    }
+    monthly_data = [
+        {
+            'month': month_start.strftime('%B'),
+            'count': by_month.get(month_start, {}).get('appointments_count') or 0
+        }
+        for month_start in month_starts
+    ]
+    new_this_month = by_month.get(this_month_start, {}).get('new_patients_count') or 0
+    new_last_month = by_month.get(last_month_start, {}).get('new_patients_count') or 0
+
+    total_patients = Patient.objects.filter(organization=organization, is_active=True).count()
+    active_patients = Appointment.objects.filter(
+        organization=organization,
+        start_datetime__date__gte=today - timedelta(days=30)
+    ).values('patient').distinct().count()
+
+    appointment_status_data = [
+        {'status': status, 'count': appointments[f'status_{status}']}
+        for status, _ in Appointment.STATUS_CHOICES
+        if appointments[f'status_{status}']
+    ]
+
+    month_total = appointments['this_month']
+    new_growth = _growth(new_this_month, new_last_month)
+
+    return {
+        'total_patients': total_patients,
+        'total_appointments_today': appointments['today'],
+        'appointments_this_week': appointments['this_week'],
+        'new_patients_this_month': new_this_month,
+        'appointment_status_data': appointment_status_data,
+        'monthly_data': monthly_data,
+        'completion_rate': round(_percent(appointments['status_completed'], month_total), 1),
+        'no_show_rate': round(_percent(appointments['status_no_show'], month_total), 1),
+        'patient_growth': round(new_growth, 1),
+        'completed_today': appointments['completed_today'],
+        'weekly_growth': round(_growth(appointments['this_week'], appointments['last_week']), 1),
+        'monthly_new_growth': round(new_growth, 1),
+        'active_patients': active_patients,
+        'total_appointments': appointments['total'],
+        'pending_appointments': appointments['pending_today'],
+        'generated_at': timezone.now().isoformat(),
+    }
+
+
+def get_dashboard_metrics(organization, refresh=False):
+    """
+    Instantánea de métricas en caché de la organización; se calcula si no
+    está en caché o si se pide ``refresh``
+    """
+    key = metrics_cache_key(organization.id)
+    metrics = None if refresh else cache.get(key)
+    if metrics is None:
+        metrics = compute_dashboard_metrics(organization)
+        cache.set(key, metrics, settings.DASHBOARD_METRICS_CACHE_TIMEOUT)
+    return metrics
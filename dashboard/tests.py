@@ -1,3 +1,115 @@
-from django.test import TestCase
+from datetime import datetime, time, timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Organization
+from accounts.tests import LOCMEM_CACHE, create_view_fixtures
+from appointments.models import Appointment, AppointmentType
+from patients.models import Patient
+from .metrics import compute_dashboard_metrics, get_dashboard_metrics
+
+
+def at_noon(day):
+    return timezone.make_aware(datetime.combine(day, time(12)))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DashboardMetricsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.user, cls.patients = create_view_fixtures(rows=2)
+        cls.other = Organization.objects.create(
+            name='Otra Clínica', legal_name='Otra Clínica SA', tax_id='OTRA010101',
+            address='Calle 3', phone='5550000001', email='otra@test.com',
+            director_name='Directora', director_license='654321'
+        )
+        appointment_type = AppointmentType.objects.get(organization=cls.organization)
+        today = timezone.localdate()
+        days = [today, today, today, today - timedelta(days=3), today - timedelta(days=9), today - timedelta(days=40)]
+        statuses = ['completed', 'confirmed', 'no_show', 'completed', 'cancelled', 'scheduled']
+        for hour, (day, status) in enumerate(zip(days, statuses)):
+            Appointment.objects.create(
+                patient=cls.patients[hour % 2], doctor=cls.user, appointment_type=appointment_type,
+                organization=cls.organization, start_datetime=at_noon(day) + timedelta(hours=hour % 3),
+                status=status, reason='Control'
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_match_the_appointment_table(self):
+        today = timezone.localdate()
+        week_start = today - timedelta(days=today.weekday())
+        month_start = today.replace(day=1)
+        appointments = Appointment.objects.filter(organization=self.organization)
+        todays = appointments.filter(start_datetime__date=today)
+        this_month = appointments.filter(start_datetime__date__gte=month_start)
+
+        metrics = compute_dashboard_metrics(self.organization)
+
+        self.assertEqual(metrics['total_appointments'], appointments.count())
+        self.assertEqual(metrics['total_appointments_today'], todays.count())
+        self.assertEqual(metrics['completed_today'], todays.filter(status='completed').count())
+        self.assertEqual(metrics['pending_appointments'], todays.filter(status__in=['scheduled', 'confirmed']).count())
+        self.assertEqual(
+            metrics['appointments_this_week'],
+            appointments.filter(start_datetime__date__gte=week_start, start_datetime__date__lte=today).count()
+        )
+        self.assertEqual(
+            {row['status']: row['count'] for row in metrics['appointment_status_data']},
+            {
+                status: this_month.filter(status=status).count()
+                for status, _ in Appointment.STATUS_CHOICES
+                if this_month.filter(status=status).exists()
+            }
+        )
+        self.assertEqual(
+            metrics['completion_rate'], round(this_month.filter(status='completed').count() / this_month.count() * 100, 1)
+        )
+        self.assertEqual(
+            metrics['new_patients_this_month'],
+            Patient.objects.filter(organization=self.organization, registration_date__date__gte=month_start).count()
+        )
+        self.assertEqual(metrics['total_patients'], 2)
+        self.assertEqual(metrics['active_patients'], 2)
+        self.assertEqual(metrics['monthly_data'][-1]['count'], this_month.count())
+
+    def test_empty_organization(self):
+        metrics = compute_dashboard_metrics(self.other)
+
+        self.assertEqual(
+            (metrics['total_appointments'], metrics['completion_rate'], metrics['patient_growth']), (0, 0, 0)
+        )
+        self.assertEqual(metrics['appointment_status_data'], [])
+
+    def test_snapshot_is_cached_per_organization(self):
+        first = get_dashboard_metrics(self.organization)
+        self.assertEqual(get_dashboard_metrics(self.other)['total_patients'], 0)
+
+        patient = self.patients[0]
+        patient.pk, patient.patient_id = None, 'PAC999'
+        patient.save()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_dashboard_metrics(self.organization), first)
+            self.assertEqual(get_dashboard_metrics(self.other)['total_patients'], 0)
+        self.assertEqual(get_dashboard_metrics(self.organization, refresh=True)['total_patients'], 3)
+
+    def test_force_refresh_views(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('dashboard:quick_stats')).json()['total_patients'], 2)
+
+        patient = self.patients[0]
+        patient.pk, patient.patient_id = None, 'PAC999'
+        patient.save()
+
+        self.assertEqual(self.client.get(reverse('dashboard:quick_stats')).json()['total_patients'], 2)
+        response = self.client.get(reverse('dashboard:refresh'))
+        self.assertEqual(response.json()['metrics']['total_patients'], 2)
+        response = self.client.get(reverse('dashboard:refresh'), {'force': '1'})
+        self.assertEqual(response.json()['metrics']['total_patients'], 3)
+        self.assertEqual(self.client.get(reverse('dashboard:quick_stats')).json()['total_patients'], 3)
@@ -8,6 +8,7 @@ from datetime import datetime, timedelta
 from patients.models import Patient, VitalSigns
 from appointments.models import Appointment
 from accounts.models import User
+from .metrics import get_dashboard_metrics
 
 
 @login_required
@@ -25,31 +26,13 @@ def index(request):
         messages.error(request, "No tienes un perfil organizacional configurado. Contacta al administrador.")
         return redirect('accounts:profile')
     
-    # Date ranges for comparisons
+    # Los contadores salen de la instantánea de métricas en caché de la organización
+    metrics = get_dashboard_metrics(organization)
+    total_patients = metrics['total_patients']
+    appointments_this_week = metrics['appointments_this_week']
+    
     today = timezone.now().date()
-    this_week_start = today - timedelta(days=today.weekday())
     this_month_start = today.replace(day=1)
-    last_month_start = (this_month_start - timedelta(days=1)).replace(day=1)
-    
-    # Basic Stats
-    total_patients = Patient.objects.filter(organization=organization, is_active=True).count()
-    total_appointments_today = Appointment.objects.filter(
-        organization=organization,
-        start_datetime__date=today
-    ).count()
-    
-    # Appointments this week
-    appointments_this_week = Appointment.objects.filter(
-        organization=organization,
-        start_datetime__date__gte=this_week_start,
-        start_datetime__date__lte=today
-    ).count()
-    
-    # New patients this month
-    new_patients_this_month = Patient.objects.filter(
-        organization=organization,
-        registration_date__date__gte=this_month_start
-    ).count()
     
     # Upcoming appointments (next 7 days)
     upcoming_appointments = Appointment.objects.filter(
@@ -70,28 +53,6 @@ def index(request):
         organization=organization
     ).order_by('-registration_date')[:8]
     
-    # Appointment status distribution for charts
-    appointment_status_data = Appointment.objects.filter(
-        organization=organization,
-        start_datetime__date__gte=this_month_start
-    ).values('status').annotate(count=Count('id'))
-    
-    # Monthly appointments trend (last 6 months)
-    monthly_data = []
-    for i in range(6):
-        month_start = (this_month_start - timedelta(days=32*i)).replace(day=1)
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        count = Appointment.objects.filter(
-            organization=organization,
-            start_datetime__date__gte=month_start,
-            start_datetime__date__lte=month_end
-        ).count()
-        monthly_data.append({
-            'month': month_start.strftime('%B'),
-            'count': count
-        })
-    monthly_data.reverse()
-    
     # Doctor performance (appointments this month)
     doctor_performance = User.objects.filter(
         role='doctor',
@@ -103,94 +64,6 @@ def index(request):
         )
     ).order_by('-appointments_count')[:5]
     
-    # Calculate completion rate for this month
-    total_appointments_month = Appointment.objects.filter(
-        organization=organization,
-        start_datetime__date__gte=this_month_start
-    ).count()
-    
-    completed_appointments_month = Appointment.objects.filter(
-        organization=organization,
-        start_datetime__date__gte=this_month_start,
-        status='completed'
-    ).count()
-    
-    completion_rate = (completed_appointments_month / total_appointments_month * 100) if total_appointments_month > 0 else 0
-    
-    # No-show rate
-    no_show_appointments = Appointment.objects.filter(
-        organization=organization,
-        start_datetime__date__gte=this_month_start,
-        status='no_show'
-    ).count()
-    
-    no_show_rate = (no_show_appointments / total_appointments_month * 100) if total_appointments_month > 0 else 0
-    
-    # Calculate growth rates and additional metrics
-    # Patient growth (this month vs last month)
-    last_month_patients = Patient.objects.filter(
-        organization=organization,
-        registration_date__date__gte=last_month_start,
-        registration_date__date__lt=this_month_start
-    ).count()
-    
-    patient_growth = 0
-    if last_month_patients > 0:
-        patient_growth = ((new_patients_this_month - last_month_patients) / last_month_patients * 100)
-    elif new_patients_this_month > 0:
-        patient_growth = 100
-    
-    # Completed appointments today
-    completed_today = Appointment.objects.filter(
-        organization=organization,
-        start_datetime__date=today,
-        status='completed'
-    ).count()
-    
-    # Weekly growth
-    last_week_start = this_week_start - timedelta(days=7)
-    last_week_end = this_week_start - timedelta(days=1)
-    appointments_last_week = Appointment.objects.filter(
-        organization=organization,
-        start_datetime__date__gte=last_week_start,
-        start_datetime__date__lte=last_week_end
-    ).count()
-    
-    weekly_growth = 0
-    if appointments_last_week > 0:
-        weekly_growth = ((appointments_this_week - appointments_last_week) / appointments_last_week * 100)
-    elif appointments_this_week > 0:
-        weekly_growth = 100
-    
-    # Monthly new patients growth
-    last_month_new_patients = Patient.objects.filter(
-        organization=organization,
-        registration_date__date__gte=last_month_start,
-        registration_date__date__lt=this_month_start
-    ).count()
-    
-    monthly_new_growth = 0
-    if last_month_new_patients > 0:
-        monthly_new_growth = ((new_patients_this_month - last_month_new_patients) / last_month_new_patients * 100)
-    elif new_patients_this_month > 0:
-        monthly_new_growth = 100
-    
-    # Active patients (patients with appointments in last 30 days)
-    active_patients = Patient.objects.filter(
-        organization=organization,
-        appointments__start_datetime__date__gte=today - timedelta(days=30)
-    ).distinct().count()
-    
-    # Total appointments (all time)
-    total_appointments = Appointment.objects.filter(organization=organization).count()
-    
-    # Pending appointments (scheduled/confirmed today)
-    pending_appointments = Appointment.objects.filter(
-        organization=organization,
-        start_datetime__date=today,
-        status__in=['scheduled', 'confirmed']
-    ).count()
-    
     # Active specialties count (simplified)
     active_specialties = 3  # Psychology, Nutrition, General Medicine
     
@@ -220,28 +93,13 @@ def index(request):
     ]
     
     context = {
-        'total_patients': total_patients,
-        'total_appointments_today': total_appointments_today,
-        'appointments_this_week': appointments_this_week,
-        'new_patients_this_month': new_patients_this_month,
+        **metrics,
         'upcoming_appointments': upcoming_appointments,
         'today_appointments': today_appointments,
         'recent_patients': recent_patients,
-        'appointment_status_data': list(appointment_status_data),
-        'monthly_data': monthly_data,
         'doctor_performance': doctor_performance,
-        'completion_rate': round(completion_rate, 1),
-        'no_show_rate': round(no_show_rate, 1),
         'organization': organization,
         'subscription': getattr(organization, 'subscription', None),
-        # New variables for template
-        'patient_growth': round(patient_growth, 1),
-        'completed_today': completed_today,
-        'weekly_growth': round(weekly_growth, 1),
-        'monthly_new_growth': round(monthly_new_growth, 1),
-        'active_patients': active_patients,
-        'total_appointments': total_appointments,
-        'pending_appointments': pending_appointments,
         'active_specialties': active_specialties,
         'avg_satisfaction': avg_satisfaction,
         'medical_specialties': medical_specialties,
@@ -262,24 +120,14 @@ def quick_stats(request):
         organization = request.user.profile.organization
     except AttributeError:
         return JsonResponse({'error': 'No profile found'}, status=400)
-    today = timezone.now().date()
+    metrics = get_dashboard_metrics(organization)
     
     stats = {
-        'total_patients': Patient.objects.filter(organization=organization, is_active=True).count(),
-        'appointments_today': Appointment.objects.filter(
-            organization=organization,
-            start_datetime__date=today
-        ).count(),
-        'pending_appointments': Appointment.objects.filter(
-            organization=organization,
-            start_datetime__date=today,
-            status__in=['scheduled', 'confirmed']
-        ).count(),
-        'completed_today': Appointment.objects.filter(
-            organization=organization,
-            start_datetime__date=today,
-            status='completed'
-        ).count(),
+        'total_patients': metrics['total_patients'],
+        'appointments_today': metrics['total_appointments_today'],
+        'pending_appointments': metrics['pending_appointments'],
+        'completed_today': metrics['completed_today'],
+        'generated_at': metrics['generated_at'],
     }
     
     return JsonResponse(stats)
@@ -290,10 +138,17 @@ def dashboard_refresh(request):
     """
     Refresh dashboard data and return success response
     """
-    # This endpoint just confirms the dashboard can be refreshed
-    # The actual refresh happens on the frontend by reloading
+    try:
+        organization = request.user.profile.organization
+    except AttributeError:
+        return JsonResponse({'error': 'No profile found'}, status=400)
+    
+    # Se sirve la instantánea compartida; solo ?force=1 la recalcula
+    metrics = get_dashboard_metrics(organization, refresh=request.GET.get('force') == '1')
+    
     return JsonResponse({
         'success': True,
         'message': 'Dashboard data refreshed',
-        'timestamp': timezone.now().isoformat()
+        'timestamp': timezone.now().isoformat(),
+        'metrics': metrics
     })
@@ -183,6 +183,8 @@ class EquipmentForm(forms.ModelForm):
         equipment = super().save(commit=False)
         if self.user:
             equipment.created_by = self.user
+            if equipment.organization_id is None and hasattr(self.user, 'profile'):
+                equipment.organization = self.user.profile.organization
         
         if commit:
             equipment.save()
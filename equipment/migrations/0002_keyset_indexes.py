@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['name', 'id'], name='equipment_name_id_idx'),
+        ),
+    ]
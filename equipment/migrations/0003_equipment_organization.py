@@ -0,0 +1,37 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:56
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def organization_from_creator(apps, schema_editor):
+    # Los equipos no tenían organización; pertenecen a la de quien los creó.
+    # Las filas cuyo creador no tiene perfil se quedan sin organización y
+    # salen de las listas acotadas
+    Equipment = apps.get_model('equipment', 'Equipment')
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    Equipment.objects.update(organization=Subquery(
+        UserProfile.objects.filter(user=OuterRef('created_by')).values('organization')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_synctombstone'),
+        ('equipment', '0002_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='organization',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='equipment', to='accounts.organization', verbose_name='Organización'),
+        ),
+        migrations.RunPython(organization_from_creator, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['organization', 'name', 'id'], name='equipment_org_name_idx'),
+        ),
+    ]
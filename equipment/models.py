@@ -3,6 +3,8 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 from datetime import date, timedelta
 from decimal import Decimal
+from accounts.models import Organization
+from accounts.tenancy import TenantManager
 
 User = get_user_model()
 
@@ -120,13 +122,21 @@ class Equipment(models.Model):
     
     # Metadatos
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Creado por")
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, null=True, blank=True, related_name='equipment', verbose_name="Organización")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
     
+    objects = models.Manager()
+    scoped = TenantManager()
+    
     class Meta:
         verbose_name = "Equipo"
         verbose_name_plural = "Equipos"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name', 'id'], name='equipment_name_id_idx'),
+            models.Index(fields=['organization', 'name', 'id'], name='equipment_org_name_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.model} ({self.serial_number})"
@@ -226,6 +236,9 @@ class MaintenanceRecord(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
     
+    objects = models.Manager()
+    scoped = TenantManager('equipment__organization')
+    
     class Meta:
         verbose_name = "Registro de Mantenimiento"
         verbose_name_plural = "Registros de Mantenimiento"
@@ -361,6 +374,9 @@ class EquipmentAlert(models.Model):
     resolved_at = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Resolución")
     resolved_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, verbose_name="Resuelto por")
     
+    objects = models.Manager()
+    scoped = TenantManager('equipment__organization')
+    
     class Meta:
         verbose_name = "Alerta de Equipo"
         verbose_name_plural = "Alertas de Equipos"
@@ -15,12 +15,14 @@ from .forms import (
     EquipmentForm, EquipmentCategoryForm, LocationForm, SupplierForm,
     MaintenanceRecordForm, EquipmentUsageLogForm, EquipmentFilterForm, EquipmentAlertForm
 )
+from reports import exports
+from accounts.pagination import paginate
 
 @login_required  
 def equipment_list(request):
     """Lista de equipos con filtros"""
     form = EquipmentFilterForm(request.GET or None)
-    equipment_list = Equipment.objects.select_related('category', 'location', 'supplier').order_by('name')
+    equipment_list = Equipment.scoped.select_related('category', 'location', 'supplier').order_by('name')
     
     # Aplicar filtros
     if form.is_valid():
@@ -53,16 +55,14 @@ def equipment_list(request):
         )
     
     # Paginación
-    paginator = Paginator(equipment_list, 20)
-    page_number = request.GET.get('page')
-    equipment = paginator.get_page(page_number)
+    paginator, equipment = paginate(request, equipment_list, 20)
     
     # Estadísticas
     stats = {
-        'total': Equipment.objects.count(),
-        'operational': Equipment.objects.filter(status='operational').count(),
-        'maintenance_due': Equipment.objects.filter(next_maintenance__lte=date.today()).count(),
-        'warranty_expiring': Equipment.objects.filter(
+        'total': Equipment.scoped.count(),
+        'operational': Equipment.scoped.filter(status='operational').count(),
+        'maintenance_due': Equipment.scoped.filter(next_maintenance__lte=date.today()).count(),
+        'warranty_expiring': Equipment.scoped.filter(
             warranty_expiry__lte=date.today() + timedelta(days=30),
             warranty_expiry__gte=date.today()
         ).count(),
@@ -100,7 +100,7 @@ def equipment_create(request):
 @login_required
 def equipment_detail(request, pk):
     """Detalle de un equipo específico"""
-    equipment = get_object_or_404(Equipment, pk=pk)
+    equipment = get_object_or_404(Equipment.scoped, pk=pk)
     
     # Registros de mantenimiento recientes
     maintenance_records = equipment.maintenance_records.order_by('-scheduled_date')[:10]
@@ -128,7 +128,7 @@ def equipment_detail(request, pk):
 @login_required
 def equipment_edit(request, pk):
     """Editar equipo existente"""
-    equipment = get_object_or_404(Equipment, pk=pk)
+    equipment = get_object_or_404(Equipment.scoped, pk=pk)
     
     if request.method == 'POST':
         form = EquipmentForm(request.POST, instance=equipment, user=request.user)
@@ -150,7 +150,7 @@ def equipment_edit(request, pk):
 @login_required
 def maintenance_schedule(request, pk):
     """Programar mantenimiento para un equipo"""
-    equipment = get_object_or_404(Equipment, pk=pk)
+    equipment = get_object_or_404(Equipment.scoped, pk=pk)
     
     if request.method == 'POST':
         form = MaintenanceRecordForm(request.POST, equipment=equipment)
@@ -172,7 +172,7 @@ def maintenance_schedule(request, pk):
 @login_required
 def maintenance_list(request):
     """Lista de todos los mantenimientos"""
-    maintenance_list = MaintenanceRecord.objects.select_related('equipment', 'technician').order_by('-scheduled_date')
+    maintenance_list = MaintenanceRecord.scoped.select_related('equipment', 'technician').order_by('-scheduled_date')
     
     # Filtros
     status_filter = request.GET.get('status')
@@ -200,7 +200,7 @@ def maintenance_list(request):
 @login_required
 def usage_log_create(request, pk):
     """Crear registro de uso para un equipo"""
-    equipment = get_object_or_404(Equipment, pk=pk)
+    equipment = get_object_or_404(Equipment.scoped, pk=pk)
     
     if request.method == 'POST':
         form = EquipmentUsageLogForm(request.POST, equipment=equipment, user=request.user)
@@ -224,32 +224,32 @@ def dashboard(request):
     """Dashboard principal de equipos"""
     # Estadísticas generales
     stats = {
-        'total_equipment': Equipment.objects.count(),
-        'operational': Equipment.objects.filter(status='operational').count(),
-        'in_maintenance': Equipment.objects.filter(status='maintenance').count(),
-        'out_of_service': Equipment.objects.filter(status='out_of_service').count(),
+        'total_equipment': Equipment.scoped.count(),
+        'operational': Equipment.scoped.filter(status='operational').count(),
+        'in_maintenance': Equipment.scoped.filter(status='maintenance').count(),
+        'out_of_service': Equipment.scoped.filter(status='out_of_service').count(),
     }
     
     # Equipos con mantenimiento vencido
-    maintenance_due = Equipment.objects.filter(
+    maintenance_due = Equipment.scoped.filter(
         next_maintenance__lte=date.today(),
         status='operational'
     ).select_related('category', 'location')[:10]
     
     # Equipos con garantía por vencer (próximos 30 días)
-    warranty_expiring = Equipment.objects.filter(
+    warranty_expiring = Equipment.scoped.filter(
         warranty_expiry__lte=date.today() + timedelta(days=30),
         warranty_expiry__gte=date.today()
     ).select_related('category', 'location')[:10]
     
     # Alertas activas
-    active_alerts = EquipmentAlert.objects.filter(
+    active_alerts = EquipmentAlert.scoped.filter(
         is_active=True,
         is_resolved=False
     ).select_related('equipment').order_by('-priority', '-created_at')[:10]
     
     # Mantenimientos recientes
-    recent_maintenance = MaintenanceRecord.objects.select_related(
+    recent_maintenance = MaintenanceRecord.scoped.select_related(
         'equipment', 'technician'
     ).order_by('-created_at')[:10]
     
@@ -311,7 +311,7 @@ def suppliers_list(request):
 def api_equipment_alerts(request, pk):
     """API para obtener alertas de un equipo"""
     try:
-        equipment = Equipment.objects.get(pk=pk)
+        equipment = Equipment.scoped.get(pk=pk)
         alerts = equipment.alerts.filter(is_active=True, is_resolved=False)
         
         alerts_data = []
@@ -330,31 +330,21 @@ def api_equipment_alerts(request, pk):
         return JsonResponse({'error': 'Equipo no encontrado'}, status=404)
 
 
+EXPORT_COLUMNS = [
+    exports.Column('Código', 'asset_tag'),
+    exports.Column('Nombre', 'name'),
+    exports.Column('Marca', 'brand'),
+    exports.Column('Modelo', 'model'),
+    exports.Column('Categoría', 'category__name'),
+    exports.Column('Estado', 'status', choices=Equipment.STATUS_CHOICES),
+    exports.Column('Ubicación', 'location__name'),
+]
+
+
 @login_required
 def equipment_export(request):
     """Exportar lista de equipos a CSV"""
-    import csv
-    from django.http import HttpResponse
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="equipos.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Código', 'Nombre', 'Marca', 'Modelo', 'Categoría', 'Estado', 'Ubicación'])
-    
-    equipments = Equipment.objects.select_related('category', 'location').all()
-    for equipment in equipments:
-        writer.writerow([
-            equipment.asset_tag,
-            equipment.name,
-            equipment.brand or '',
-            equipment.model or '',
-            equipment.category.name if equipment.category else '',
-            equipment.get_status_display(),
-            equipment.location.name if equipment.location else ''
-        ])
-    
-    return response
+    return exports.Export(Equipment.scoped.all(), EXPORT_COLUMNS, 'equipos').csv_response()
 
 
 @login_required
@@ -369,31 +359,11 @@ def bulk_actions(request):
             messages.error(request, 'No se seleccionaron equipos.')
             return redirect('equipment:list')
         
-        equipments = Equipment.objects.filter(id__in=selected_ids)
+        equipments = Equipment.scoped.filter(id__in=selected_ids)
         
         if action == 'export_selected':
             # Exportar equipos seleccionados
-            import csv
-            from django.http import HttpResponse
-            
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = 'attachment; filename="equipos_seleccionados.csv"'
-            
-            writer = csv.writer(response)
-            writer.writerow(['Código', 'Nombre', 'Marca', 'Modelo', 'Categoría', 'Estado', 'Ubicación'])
-            
-            for equipment in equipments.select_related('category', 'location'):
-                writer.writerow([
-                    equipment.asset_tag,
-                    equipment.name,
-                    equipment.brand or '',
-                    equipment.model or '',
-                    equipment.category.name if equipment.category else '',
-                    equipment.get_status_display(),
-                    equipment.location.name if equipment.location else ''
-                ])
-            
-            return response
+            return exports.Export(equipments, EXPORT_COLUMNS, 'equipos_seleccionados').csv_response()
             
         elif action == 'update_status':
             new_status = request.POST.get('new_status')
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medical_records', '0002_medicalrecordtemplate'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='consultation',
+            index=models.Index(fields=['organization', 'consultation_date'], name='consult_org_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consultation',
+            index=models.Index(fields=['patient', 'consultation_date'], name='consult_patient_date_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medical_records', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['organization', 'updated_at', 'id'], name='medrec_org_updated_idx'),
+        ),
+    ]
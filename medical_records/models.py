@@ -4,6 +4,7 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from accounts.models import User, Organization
 from patients.models import Patient
 from appointments.models import Appointment
+from accounts.tenancy import TenantManager
 
 
 class MedicalRecord(models.Model):
@@ -57,9 +58,17 @@ class MedicalRecord(models.Model):
     def __str__(self):
         return f"Expediente Médico - {self.patient.get_full_name()}"
     
+    objects = models.Manager()
+    scoped = TenantManager()
+    
     class Meta:
         verbose_name = "Expediente Médico"
         verbose_name_plural = "Expedientes Médicos"
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='medrec_created_id_idx'),
+            models.Index(fields=['organization', 'updated_at', 'id'], name='medrec_org_updated_idx'),
+            models.Index(fields=['organization', 'created_at', 'id'], name='medrec_org_created_idx'),
+        ]
 
 
 class Consultation(models.Model):
@@ -119,6 +128,10 @@ class Consultation(models.Model):
         verbose_name = "Consulta Médica"
         verbose_name_plural = "Consultas Médicas"
         ordering = ['-consultation_date']
+        indexes = [
+            models.Index(fields=['organization', 'consultation_date'], name='consult_org_date_idx'),
+            models.Index(fields=['patient', 'consultation_date'], name='consult_patient_date_idx'),
+        ]
 
 
 class VitalSigns(models.Model):
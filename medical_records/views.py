@@ -19,6 +19,8 @@ from .forms import (
 )
 from patients.models import Patient
 from accounts.models import User
+from accounts.pagination import paginate
+from reports.rollup import daily_totals
 
 
 @login_required  
@@ -34,7 +36,7 @@ def index(request):
     # Get recent consultations
     recent_consultations = Consultation.objects.filter(
         organization=organization
-    ).select_related('patient', 'doctor').order_by('-consultation_date')[:10]
+    ).select_related('patient', 'doctor__profile').order_by('-consultation_date')[:10]
     
     # Statistics
     total_patients = Patient.objects.filter(organization=organization).count()
@@ -506,7 +508,7 @@ def all_consultations(request):
     
     consultations = Consultation.objects.filter(
         organization=organization
-    ).select_related('patient', 'doctor').order_by('-consultation_date')
+    ).select_related('patient', 'doctor__profile').order_by('-consultation_date')
     
     # Apply filters
     consultation_type = request.GET.get('type')
@@ -529,9 +531,7 @@ def all_consultations(request):
         )
     
     # Pagination
-    paginator = Paginator(consultations, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator, page_obj = paginate(request, consultations, 20)
     
     # Get doctors for filter
     doctors = User.objects.filter(
@@ -704,16 +704,11 @@ def clinical_history(request):
     
     # Get statistics
     total_records = MedicalRecord.objects.filter(organization=organization).count()
-    total_consultations = Consultation.objects.filter(
-        organization=organization
-    ).count()
     
-    # Consultations this month
-    this_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    consultations_this_month = Consultation.objects.filter(
-        organization=organization,
-        consultation_date__gte=this_month
-    ).count()
+    # Los totales de consultas salen de las métricas diarias
+    this_month = timezone.localdate().replace(day=1)
+    total_consultations = daily_totals(organization)['consultations']
+    consultations_this_month = daily_totals(organization, date_from=this_month)['consultations']
     
     # Most active doctors
     active_doctors = Consultation.objects.filter(
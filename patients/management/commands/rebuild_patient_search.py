@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from patients.search import backend, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el texto de búsqueda de los pacientes y recarga el índice de búsqueda'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Pacientes actualizados por consulta (por defecto: 2000)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Reconstruyendo el índice de búsqueda de pacientes ({backend()})...')
+        updated = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Texto de búsqueda reconstruido para {updated} pacientes'))
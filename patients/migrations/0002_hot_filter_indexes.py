@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['organization', 'is_active'], name='patient_org_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['organization', 'registration_date'], name='patient_org_registered_idx'),
+        ),
+    ]
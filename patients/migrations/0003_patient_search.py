@@ -0,0 +1,68 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:25
+
+from django.db import OperationalError, migrations, models
+
+
+# Mantener en sincronía con patients.search
+FTS_TABLE = 'patients_patient_search'
+TSVECTOR_INDEX = 'patient_search_tsv_idx'
+
+
+def create_search_index(apps, schema_editor):
+    from patients.search import build_search_text
+
+    Patient = apps.get_model('patients', 'Patient')
+    batch = []
+    for patient in Patient.objects.order_by('id').iterator(chunk_size=2000):
+        patient.search_text = build_search_text(patient)
+        batch.append(patient)
+        if len(batch) >= 2000:
+            Patient.objects.bulk_update(batch, ['search_text'])
+            batch = []
+    Patient.objects.bulk_update(batch, ['search_text'])
+
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            f"CREATE INDEX {TSVECTOR_INDEX} ON patients_patient "
+            "USING gin (to_tsvector('simple', search_text))"
+        )
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+                'search_text, organization_id UNINDEXED, '
+                'tokenize="unicode61 remove_diacritics 2", prefix=\'2 3 4\')'
+            )
+        except OperationalError:
+            # SQLite compilado sin FTS5: patients.search recurre a LIKE
+            return
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, search_text, organization_id) '
+            'SELECT id, search_text, organization_id FROM patients_patient'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {TSVECTOR_INDEX}')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0002_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='search_text',
+            field=models.TextField(blank=True, editable=False, verbose_name='Texto de búsqueda'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
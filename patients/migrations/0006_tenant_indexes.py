@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0005_updated_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['organization', 'created_at', 'id'], name='patient_org_created_idx'),
+        ),
+    ]
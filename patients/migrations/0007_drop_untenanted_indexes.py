@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 12:06
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0006_tenant_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='patient',
+            name='patient_created_id_idx',
+        ),
+    ]
@@ -2,6 +2,9 @@ from django.db import models
 from django.core.validators import RegexValidator
 from django.utils import timezone
 from accounts.models import User, Organization
+from accounts.sequences import next_value, last_number
+from accounts.tenancy import TenantManager
+from .search import build_search_text
 
 
 class Patient(models.Model):
@@ -83,9 +86,29 @@ class Patient(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Nombre, ID, teléfono y email sin acentos, mantenidos al guardar (ver patients.search)
+    search_text = models.TextField(blank=True, editable=False, verbose_name="Texto de búsqueda")
+    
     def __str__(self):
         return f"{self.patient_id} - {self.get_full_name()}"
     
+    def save(self, *args, **kwargs):
+        if not self.patient_id:
+            self.patient_id = self.generate_patient_id()
+        self.search_text = build_search_text(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'search_text'}
+        super().save(*args, **kwargs)
+    
+    def generate_patient_id(self):
+        """Siguiente identificador PAC###; los IDs de paciente son únicos entre organizaciones"""
+        number = next_value(
+            'patient',
+            seed=lambda: last_number(Patient.objects.all(), 'patient_id', 'PAC')
+        )
+        return f"PAC{number:03d}"
+    
     def get_full_name(self):
         if self.mother_last_name:
             return f"{self.first_name} {self.last_name} {self.mother_last_name}"
@@ -116,10 +139,19 @@ class Patient(models.Model):
         else:
             return "Obesidad"
     
+    objects = models.Manager()
+    scoped = TenantManager()
+    
     class Meta:
         verbose_name = "Paciente"
         verbose_name_plural = "Pacientes"
         ordering = ['-registration_date']
+        indexes = [
+            models.Index(fields=['organization', 'is_active'], name='patient_org_active_idx'),
+            models.Index(fields=['organization', 'registration_date'], name='patient_org_registered_idx'),
+            models.Index(fields=['organization', 'updated_at', 'id'], name='patient_org_updated_idx'),
+            models.Index(fields=['organization', 'created_at', 'id'], name='patient_org_created_idx'),
+        ]
 
 
 class MedicalHistory(models.Model):
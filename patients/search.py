@@ -0,0 +1,192 @@
+"""
+TopicTales Biomédica - Búsqueda de pacientes
+Búsqueda por prefijos con ranking sobre un texto de búsqueda desnormalizado y
+sin acentos, respaldada por un índice tsvector/pg_trgm en PostgreSQL y una
+tabla FTS5 en SQLite
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import BooleanField, Case, FloatField, IntegerField, When
+from django.db.models.expressions import RawSQL
+
+
+FTS_TABLE = 'patients_patient_search'
+
+# Resultados que devuelven el selector de pacientes y la búsqueda global
+PICKER_LIMIT = 20
+
+# Coincidencias que se califican con bm25 por consulta en SQLite; prefijos
+# cortos como "a" coinciden con casi toda la tabla y calificarlas todas
+# domina la latencia
+RANK_CANDIDATES = 1000
+
+_fts_available = None
+
+
+def fold(text):
+    """``text`` en minúsculas y sin acentos: 'Martínez' -> 'martinez'"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def search_terms(query):
+    """Términos alfanuméricos normalizados de una consulta"""
+    return re.findall(r'\w+', fold(query))
+
+
+def build_search_text(patient):
+    """Texto de búsqueda que se guarda en ``Patient.search_text``"""
+    parts = [
+        patient.first_name,
+        patient.last_name,
+        patient.mother_last_name,
+        patient.patient_id,
+        re.sub(r'\D', '', patient.phone_number or ''),
+        patient.email,
+    ]
+    return ' '.join(search_terms(' '.join(part for part in parts if part)))
+
+
+def backend():
+    """'postgresql', 'fts5' o 'like' según la conexión por defecto"""
+    global _fts_available
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite':
+        if _fts_available is None:
+            with connection.cursor() as cursor:
+                _fts_available = FTS_TABLE in connection.introspection.table_names(cursor)
+        if _fts_available:
+            return 'fts5'
+    return 'like'
+
+
+def _fts_match(terms):
+    return ' AND '.join(f'"{term}"*' for term in terms)
+
+
+def _tsquery(terms):
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def filter_patients(queryset, query):
+    """
+    Restringe ``queryset`` a los pacientes que coinciden con cada término de
+    ``query`` como prefijo, conservando el orden de quien llama
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+
+    engine = backend()
+    if engine == 'postgresql':
+        return queryset.alias(search_match=RawSQL(
+            "to_tsvector('simple', patients_patient.search_text) @@ to_tsquery('simple', %s)",
+            [_tsquery(terms)],
+            output_field=BooleanField()
+        )).filter(search_match=True)
+    if engine == 'fts5':
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [_fts_match(terms)]
+        ))
+    for term in terms:
+        queryset = queryset.filter(search_text__contains=term)
+    return queryset
+
+
+def rank_patients(organization, query, limit=PICKER_LIMIT):
+    """
+    Los mejores ``limit`` pacientes para ``query``, el mejor primero.
+    ``organization`` es una instancia o su id, o ``None`` para buscar en
+    todas las organizaciones.
+    """
+    from .models import Patient
+
+    terms = search_terms(query)
+    if not terms:
+        return []
+    patients = Patient.objects.all()
+    if organization is not None:
+        patients = patients.filter(organization=organization)
+
+    engine = backend()
+    if engine == 'postgresql':
+        return list(filter_patients(patients, query).annotate(search_rank=RawSQL(
+            "ts_rank(to_tsvector('simple', patients_patient.search_text), to_tsquery('simple', %s))"
+            " + word_similarity(%s, patients_patient.search_text)",
+            [_tsquery(terms), ' '.join(terms)],
+            output_field=FloatField()
+        )).order_by('-search_rank', 'last_name', 'first_name')[:limit])
+
+    if engine == 'fts5':
+        sql = f'SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        params = [_fts_match(terms)]
+        if organization is not None:
+            sql += ' AND organization_id = %s'
+            params.append(getattr(organization, 'pk', organization))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM ({sql} LIMIT %s) ORDER BY rank LIMIT %s',
+                params + [RANK_CANDIDATES, limit]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return []
+        return list(patients.filter(id__in=ids).order_by(Case(
+            *[When(id=patient_id, then=position) for position, patient_id in enumerate(ids)],
+            output_field=IntegerField()
+        )))
+
+    return list(filter_patients(patients, query).order_by('last_name', 'first_name')[:limit])
+
+
+def index_patient(patient):
+    """Copia el texto de búsqueda de un paciente guardado a la tabla FTS5"""
+    if backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [patient.id])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, search_text, organization_id) VALUES (%s, %s, %s)',
+            [patient.id, patient.search_text, patient.organization_id]
+        )
+
+
+def unindex_patient(patient_id):
+    if backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [patient_id])
+
+
+def rebuild_index(batch_size=2000):
+    """
+    Recalcula ``search_text`` de todos los pacientes y recarga la tabla
+    FTS5. Hace falta después de bulk_create/update, que no pasan por
+    ``Patient.save``.
+    """
+    from .models import Patient
+
+    updated = 0
+    last_id = 0
+    while True:
+        batch = list(Patient.objects.filter(id__gt=last_id).order_by('id')[:batch_size])
+        if not batch:
+            break
+        for patient in batch:
+            patient.search_text = build_search_text(patient)
+        Patient.objects.bulk_update(batch, ['search_text'])
+        updated += len(batch)
+        last_id = batch[-1].id
+
+    if backend() == 'fts5':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, search_text, organization_id) '
+                f'SELECT id, search_text, organization_id FROM patients_patient'
+            )
+    return updated
@@ -0,0 +1,19 @@
+"""
+TopicTales Biomédica - Señales de pacientes
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Patient
+from .search import index_patient, unindex_patient
+
+
+@receiver(post_save, sender=Patient)
+def patient_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_patient(instance)
+
+
+@receiver(post_delete, sender=Patient)
+def patient_deleted(sender, instance, **kwargs):
+    unindex_patient(instance.id)
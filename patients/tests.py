@@ -1,3 +1,181 @@
+from datetime import date
+from io import BytesIO
+from unittest import mock
+
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import Organization, User, UserProfile
+from reports import exports
+from . import search
+from . import views as patient_views
+from .models import Patient
+
+
+def create_patient(organization, patient_id, first_name, last_name, mother_last_name='', **fields):
+    return Patient.objects.create(
+        patient_id=patient_id, first_name=first_name, last_name=last_name,
+        mother_last_name=mother_last_name, birth_date=date(1990, 1, 1), gender='F',
+        phone_number=fields.pop('phone_number', '5551234567'), address='Calle 2', city='CDMX',
+        state='CDMX', postal_code='01000', emergency_contact_name='Contacto',
+        emergency_contact_relationship='Familiar', emergency_contact_phone='5551234567',
+        organization=organization, **fields
+    )
+
+
+class SearchTextTests(TestCase):
+
+    def test_fold(self):
+        self.assertEqual(search.fold('Martínez ÑANDÚ Müller'), 'martinez nandu muller')
+        self.assertEqual(search.fold(None), '')
+        self.assertEqual(search.search_terms(' José-Luis, 55 12 '), ['jose', 'luis', '55', '12'])
+
+    def test_build_search_text(self):
+        patient = Patient(
+            first_name='Lucía', last_name='Pérez', mother_last_name='Núñez', patient_id='PAC001',
+            phone_number='(55) 1234-5678', email='Lucia.Perez@Correo.com'
+        )
+
+        self.assertEqual(
+            search.build_search_text(patient),
+            'lucia perez nunez pac001 5512345678 lucia perez correo com'
+        )
+
+
+class PatientSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(
+            name='Clínica Test', legal_name='Clínica Test SA', tax_id='TEST010101',
+            address='Calle 1', phone='5550000000', email='clinica@test.com',
+            director_name='Director', director_license='123456'
+        )
+        cls.other = Organization.objects.create(
+            name='Otra Clínica', legal_name='Otra Clínica SA', tax_id='OTRA010101',
+            address='Calle 3', phone='5550000001', email='otra@test.com',
+            director_name='Directora', director_license='654321'
+        )
+        cls.garcia = create_patient(cls.organization, 'PAC001', 'Lucía', 'García', 'García')
+        cls.garcia_perez = create_patient(
+            cls.organization, 'PAC002', 'Luis Alberto', 'García', 'Pérez', email='luis.alberto@correo.com'
+        )
+        cls.martinez = create_patient(cls.organization, 'PAC003', 'Martín', 'Martínez', phone_number='5559876543')
+        cls.other_garcia = create_patient(cls.other, 'PAC004', 'Lucía', 'García')
+
+    def _names(self, patients):
+        return [patient.patient_id for patient in patients]
+
+    def test_accent_folding_both_ways(self):
+        self.assertEqual(self._names(search.rank_patients(self.organization, 'MARTINEZ')), ['PAC003'])
+        self.assertEqual(self._names(search.rank_patients(self.organization, 'Martín')), ['PAC003'])
+
+    def test_every_term_matches_as_a_prefix(self):
+        queryset = Patient.objects.filter(organization=self.organization).order_by('patient_id')
+
+        self.assertEqual(self._names(search.filter_patients(queryset, 'garc')), ['PAC001', 'PAC002'])
+        self.assertEqual(self._names(search.filter_patients(queryset, 'gar lu per')), ['PAC002'])
+        self.assertEqual(self._names(search.filter_patients(queryset, '98765')), [])
+        self.assertEqual(self._names(search.filter_patients(queryset, '5559876543')), ['PAC003'])
+        self.assertEqual(self._names(search.filter_patients(queryset, 'arcia')), [])
+        self.assertEqual(search.filter_patients(queryset, ' ,. ').count(), 3)
+
+    def test_ranking_and_organization(self):
+        self.assertEqual(self._names(search.rank_patients(self.organization, 'garcia')), ['PAC001', 'PAC002'])
+        self.assertEqual(self._names(search.rank_patients(self.other, 'garcia')), ['PAC004'])
+        self.assertEqual(len(search.rank_patients(self.organization, 'garcia', limit=1)), 1)
+        self.assertEqual(search.rank_patients(self.organization, ''), [])
+
+    def test_like_fallback(self):
+        with mock.patch.object(search, 'backend', return_value='like'):
+            self.assertEqual(self._names(search.rank_patients(self.organization, 'garcía lu')), ['PAC001', 'PAC002'])
+
+    def test_save_and_delete_refresh_the_index(self):
+        self.martinez.last_name = 'Ortíz'
+        self.martinez.save(update_fields=['last_name'])
+
+        self.assertEqual(self._names(search.rank_patients(self.organization, 'ortiz')), ['PAC003'])
+        self.assertEqual(search.rank_patients(self.organization, 'martinez'), [])
+
+        patient_id = self.martinez.pk
+        self.martinez.delete()
+        self.assertEqual(search.rank_patients(self.organization, 'ortiz'), [])
+        if search.backend() == 'fts5':
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT COUNT(*) FROM {search.FTS_TABLE} WHERE rowid = %s', [patient_id])
+                self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_rebuild_index_after_bulk_update(self):
+        Patient.objects.filter(pk=self.garcia.pk).update(first_name='Valentina')
+        self.assertEqual(search.rank_patients(self.organization, 'valentina'), [])
+
+        self.assertEqual(search.rebuild_index(batch_size=2), 4)
+        self.assertEqual(self._names(search.rank_patients(self.organization, 'valentina')), ['PAC001'])
+
+
+class PatientExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(
+            name='Clínica Test', legal_name='Clínica Test SA', tax_id='TEST010101',
+            address='Calle 1', phone='5550000000', email='clinica@test.com',
+            director_name='Director', director_license='123456'
+        )
+        cls.user = User.objects.create_user(username='doctor', password='x', role='doctor')
+        UserProfile.objects.create(user=cls.user, organization=organization)
+        create_patient(organization, 'PAC001', 'Lucía', 'García', 'López')
+
+    def test_csv_keeps_the_original_headers(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('patients:export_csv'))
+
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lines[0], (
+            'ID Paciente,Nombre,Apellidos,Email,Telefono,Fecha Nacimiento,Genero,Fecha Registro,Estado'
+        ))
+        self.assertTrue(lines[1].startswith('PAC001,Lucía,García López,,5551234567,1990-01-01,'))
+
+    def test_xlsx_round_trip(self):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            self.skipTest('openpyxl is not installed')
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('patients:export_excel'))
+
+        workbook = load_workbook(BytesIO(b''.join(response.streaming_content)))
+        sheet = workbook['Pacientes']
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(list(rows[0]), [
+            'ID Paciente', 'Nombre', 'Apellidos', 'Email', 'Teléfono', 'Fecha Nacimiento',
+            'Género', 'Fecha Registro', 'Estado'
+        ])
+        self.assertEqual(list(rows[1][:7]), [
+            'PAC001', 'Lucía', 'García López', None, '5551234567', '1990-01-01', 'Femenino'
+        ])
+        self.assertEqual(rows[1][8], 'Activo')
+        self.assertEqual(len(rows), 2)
+
+    def test_xlsx_writes_every_chunk(self):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            self.skipTest('openpyxl is not installed')
+        organization = Organization.objects.get()
+        for index in range(2, 6):
+            create_patient(organization, f'PAC00{index}', f'Paciente{index}', 'Pérez')
+        written = []
+        export = exports.Export(
+            Patient.objects.order_by('patient_id'), patient_views.EXPORT_COLUMNS, 'pacientes',
+            chunk_size=2, progress=written.append
+        )
+        output = BytesIO()
+        export.write_xlsx(output, title='Pacientes')
 
-# Create your tests here.
+        rows = list(load_workbook(output).active.iter_rows(values_only=True))
+        self.assertEqual(rows[0][0], 'Pacientes')
+        self.assertEqual(rows[3][4], 'Teléfono')
+        self.assertEqual([row[0] for row in rows[4:]], ['PAC001', 'PAC002', 'PAC003', 'PAC004', 'PAC005'])
+        self.assertEqual(written, [2, 4])
@@ -20,4 +20,5 @@ urlpatterns = [
     
     # AJAX endpoints
     path('api/quick-actions/', views.patient_quick_actions, name='quick_actions'),
+    path('api/picker/', views.patient_picker, name='picker'),
 ]
\ No newline at end of file
@@ -2,16 +2,17 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q, Count
+from django.db.models import Count
 from django.utils import timezone
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse
 from datetime import timedelta
-import csv
 import json
-from io import BytesIO
 
 from .models import Patient
+from .search import filter_patients, rank_patients
+from reports import exports
 from appointments.models import Appointment
+from accounts.pagination import paginate
 
 @login_required
 def patient_list(request):
@@ -26,14 +27,7 @@ def patient_list(request):
     # Search functionality
     search_query = request.GET.get('search')
     if search_query:
-        patients = patients.filter(
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(mother_last_name__icontains=search_query) |
-            Q(patient_id__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(phone_number__icontains=search_query)
-        )
+        patients = filter_patients(patients, search_query)
     
     # Gender filter
     gender_filter = request.GET.get('gender')
@@ -89,9 +83,7 @@ def patient_list(request):
     except ValueError:
         per_page = 25
     
-    paginator = Paginator(patients, per_page)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator, page_obj = paginate(request, patients, per_page)
     
     context = {
         'title': 'Gestión de Pacientes',
@@ -127,19 +119,7 @@ def patient_create(request):
             patient.organization = request.user.profile.organization
             patient.created_by = request.user
             
-            # Auto-generate patient_id if not provided
-            if not patient.patient_id:
-                organization = request.user.profile.organization
-                last_patient = Patient.objects.filter(organization=organization).order_by('id').last()
-                if last_patient:
-                    try:
-                        last_id = int(last_patient.patient_id.replace('PAC', ''))
-                        patient.patient_id = f'PAC{str(last_id + 1).zfill(3)}'
-                    except:
-                        patient.patient_id = f'PAC{Patient.objects.filter(organization=organization).count() + 1:03d}'
-                else:
-                    patient.patient_id = 'PAC001'
-            
+            # Patient.save asigna patient_id cuando no se proporciona
             patient.save()
             messages.success(request, f'Paciente {patient.get_full_name()} creado exitosamente.')
             return redirect('patients:detail', patient_id=patient.id)
@@ -317,15 +297,9 @@ def patient_search(request):
     
     if request.GET.get('search'):
         search_query = request.GET.get('search')
-        patients = Patient.objects.filter(
-            organization=organization
-        ).filter(
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(mother_last_name__icontains=search_query) |
-            Q(patient_id__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(phone__icontains=search_query)
+        patients = filter_patients(
+            Patient.objects.filter(organization=organization),
+            search_query
         ).order_by('first_name', 'last_name')
     
     # Paginación
@@ -342,183 +316,85 @@ def patient_search(request):
     return render(request, 'patients/search.html', context)
 
 
+@login_required
+def patient_picker(request):
+    """
+    Endpoint AJAX del selector de pacientes: coincidencias por prefijo con
+    ranking en nombre, ID de paciente, teléfono y email
+    """
+    patients = rank_patients(request.user.profile.organization, request.GET.get('q', ''))
+    return JsonResponse({
+        'results': [
+            {
+                'id': patient.id,
+                'patient_id': patient.patient_id,
+                'name': patient.get_full_name(),
+                'phone': patient.phone_number,
+            }
+            for patient in patients
+        ]
+    })
+
+
+# El CSV conserva sus encabezados originales sin acentos, que usan las integraciones
+EXPORT_COLUMNS = [
+    exports.Column('ID Paciente', 'patient_id'),
+    exports.Column('Nombre', 'first_name'),
+    exports.Column('Apellidos', 'last_name', 'mother_last_name',
+                   format=lambda last_name, mother_last_name: f"{last_name} {mother_last_name}".strip()),
+    exports.Column('Email', 'email'),
+    exports.Column('Teléfono', 'phone_number', csv_header='Telefono'),
+    exports.Column('Fecha Nacimiento', 'birth_date', format=exports.date_format('%Y-%m-%d')),
+    exports.Column('Género', 'gender', choices=Patient.GENDER_CHOICES, csv_header='Genero'),
+    exports.Column('Fecha Registro', 'registration_date', format=exports.date_format('%Y-%m-%d')),
+    exports.Column('Estado', 'is_active', format=exports.label('Activo', 'Inactivo')),
+]
+
+
+PDF_EXPORT_COLUMNS = [
+    exports.Column('ID', 'patient_id', width=12),
+    exports.Column('Nombre Completo', 'first_name', 'last_name', 'mother_last_name',
+                   format=exports.full_name, width=30),
+    exports.Column('Email', 'email', width=28),
+    exports.Column('Teléfono', 'phone_number', width=14),
+    exports.Column('Fecha Registro', 'registration_date', format=exports.date_format('%d/%m/%Y'), width=12),
+]
+
+
+def patients_export(request, columns=EXPORT_COLUMNS):
+    organization = request.user.profile.organization
+    return exports.Export(
+        Patient.objects.filter(organization=organization).order_by('first_name', 'last_name'),
+        columns,
+        f'pacientes_{organization.name}_{timezone.localtime().strftime("%Y%m%d")}'
+    )
+
+
 @login_required
 def export_patients_csv(request):
     """
     Export patients to CSV format
     """
-    organization = request.user.profile.organization
-    patients = Patient.objects.filter(organization=organization).order_by('first_name', 'last_name')
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="pacientes_{organization.name}_{timezone.now().strftime("%Y%m%d")}.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow([
-        'ID Paciente', 'Nombre', 'Apellidos', 'Email', 'Telefono', 
-        'Fecha Nacimiento', 'Genero', 'Fecha Registro', 'Estado'
-    ])
-    
-    for patient in patients:
-        writer.writerow([
-            patient.patient_id,
-            patient.first_name,
-            f"{patient.last_name} {patient.mother_last_name}".strip(),
-            patient.email or '',
-            patient.phone_number or '',
-            patient.birth_date.strftime('%Y-%m-%d') if patient.birth_date else '',
-            patient.get_gender_display(),
-            patient.registration_date.strftime('%Y-%m-%d'),
-            'Activo' if patient.is_active else 'Inactivo'
-        ])
-    
-    return response
+    return patients_export(request).csv_response()
 
 
 @login_required
 def export_patients_excel(request):
     """
-    Export patients to Excel format (using CSV for now, can be enhanced with openpyxl)
+    Export patients to Excel format
     """
-    try:
-        import openpyxl
-        from openpyxl.styles import Font, PatternFill
-        from openpyxl.utils import get_column_letter
-        
-        organization = request.user.profile.organization
-        patients = Patient.objects.filter(organization=organization).order_by('first_name', 'last_name')
-        
-        # Create workbook
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Pacientes"
-        
-        # Headers
-        headers = [
-            'ID Paciente', 'Nombre', 'Apellidos', 'Email', 'Teléfono', 
-            'Fecha Nacimiento', 'Género', 'Fecha Registro', 'Estado'
-        ]
-        
-        # Style headers
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        
-        for i, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=i, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-        
-        # Data
-        for row_num, patient in enumerate(patients, 2):
-            ws.cell(row=row_num, column=1, value=patient.patient_id)
-            ws.cell(row=row_num, column=2, value=patient.first_name)
-            ws.cell(row=row_num, column=3, value=f"{patient.last_name} {patient.mother_last_name}".strip())
-            ws.cell(row=row_num, column=4, value=patient.email or '')
-            ws.cell(row=row_num, column=5, value=patient.phone_number or '')
-            ws.cell(row=row_num, column=6, value=patient.birth_date.strftime('%Y-%m-%d') if patient.birth_date else '')
-            ws.cell(row=row_num, column=7, value=patient.get_gender_display())
-            ws.cell(row=row_num, column=8, value=patient.registration_date.strftime('%Y-%m-%d'))
-            ws.cell(row=row_num, column=9, value='Activo' if patient.is_active else 'Inactivo')
-        
-        # Adjust column widths
-        for i in range(1, len(headers) + 1):
-            ws.column_dimensions[get_column_letter(i)].width = 15
-        
-        # Save to BytesIO
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-        
-        response = HttpResponse(
-            output.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="pacientes_{organization.name}_{timezone.now().strftime("%Y%m%d")}.xlsx"'
-        
-        return response
-        
-    except ImportError:
-        # Fallback to CSV if openpyxl is not available
-        return export_patients_csv(request)
+    return patients_export(request).xlsx_response(sheet_title="Pacientes")
 
 
 @login_required
 def export_patients_pdf(request):
     """
-    Export patients to PDF format (basic implementation)
+    Export patients to PDF format
     """
-    try:
-        from reportlab.lib.pagesizes import letter, A4
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib import colors
-        from reportlab.lib.units import inch
-        
-        organization = request.user.profile.organization
-        patients = Patient.objects.filter(organization=organization).order_by('first_name', 'last_name')
-        
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        
-        # Styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=30,
-        )
-        
-        # Content
-        story = []
-        
-        # Title
-        title = Paragraph(f"Lista de Pacientes - {organization.name}", title_style)
-        story.append(title)
-        story.append(Spacer(1, 20))
-        
-        # Table data
-        data = [['ID', 'Nombre Completo', 'Email', 'Teléfono', 'Fecha Registro']]
-        
-        for patient in patients:
-            data.append([
-                patient.patient_id,
-                f"{patient.first_name} {patient.last_name} {patient.mother_last_name}".strip(),
-                patient.email or '',
-                patient.phone_number or '',
-                patient.registration_date.strftime('%d/%m/%Y')
-            ])
-        
-        # Create table
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        story.append(table)
-        
-        # Build PDF
-        doc.build(story)
-        buffer.seek(0)
-        
-        response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="pacientes_{organization.name}_{timezone.now().strftime("%Y%m%d")}.pdf"'
-        
-        return response
-        
-    except ImportError:
-        # Fallback message if reportlab is not available
-        return HttpResponse(
-            "PDF export requires reportlab library. Please contact administrator.",
-            content_type='text/plain'
-        )
+    export = patients_export(request, PDF_EXPORT_COLUMNS)
+    return export.pdf_response(
+        f"Lista de Pacientes - {request.user.profile.organization.name}", landscape=False
+    )
 
 
 @login_required
@@ -4,6 +4,7 @@ from patients.models import Patient
 from django.core.validators import MinValueValidator, MaxValueValidator
 from decimal import Decimal
 import json
+from accounts.tenancy import TenantManager
 
 User = get_user_model()
 
@@ -80,6 +81,9 @@ class PsychologicalEvaluation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = models.Manager()
+    scoped = TenantManager('patient__organization')
+    
     class Meta:
         verbose_name = 'Evaluación Psicológica'
         verbose_name_plural = 'Evaluaciones Psicológicas'
@@ -216,6 +220,9 @@ class TherapySession(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = models.Manager()
+    scoped = TenantManager('patient__organization')
+    
     class Meta:
         verbose_name = 'Sesión de Terapia'
         verbose_name_plural = 'Sesiones de Terapia'
@@ -290,6 +297,9 @@ class TreatmentPlan(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = models.Manager()
+    scoped = TenantManager('evaluation__patient__organization')
+    
     class Meta:
         verbose_name = 'Plan de Tratamiento'
         verbose_name_plural = 'Planes de Tratamiento'
@@ -360,6 +370,9 @@ class PsychologicalGoal(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = models.Manager()
+    scoped = TenantManager('treatment_plan__evaluation__patient__organization')
+    
     class Meta:
         verbose_name = 'Objetivo Psicológico'
         verbose_name_plural = 'Objetivos Psicológicos'
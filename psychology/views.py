@@ -77,7 +77,7 @@ def psychology_dashboard(request):
 @login_required
 def evaluation_list(request):
     """Lista de evaluaciones psicológicas"""
-    evaluations = PsychologicalEvaluation.objects.filter(
+    evaluations = PsychologicalEvaluation.scoped.filter(
         psychologist=request.user
     ).select_related('patient').order_by('-evaluation_date')
     
@@ -259,7 +259,7 @@ def test_create(request):
 @login_required
 def session_list(request):
     """Lista de sesiones de terapia"""
-    sessions = TherapySession.objects.filter(
+    sessions = TherapySession.scoped.filter(
         psychologist=request.user
     ).select_related('patient', 'evaluation').order_by('-session_date')
     
@@ -357,7 +357,7 @@ def session_detail(request, pk):
 @login_required
 def treatment_plan_list(request):
     """Lista de planes de tratamiento"""
-    plans = TreatmentPlan.objects.filter(
+    plans = TreatmentPlan.scoped.filter(
         created_by=request.user
     ).select_related('evaluation__patient').order_by('-created_at')
     
@@ -442,7 +442,7 @@ def treatment_plan_detail(request, pk):
 @login_required
 def goal_list(request):
     """Lista de objetivos psicológicos"""
-    goals = PsychologicalGoal.objects.filter(
+    goals = PsychologicalGoal.scoped.filter(
         treatment_plan__created_by=request.user
     ).select_related('treatment_plan__evaluation__patient').order_by('-priority', 'target_date')
     
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils import timezone
-from .models import Report, ReportTemplate, ReportShare
+from .models import Report, ReportTemplate, ReportShare, ReportCacheEntry
 
 @admin.register(Report)
 class ReportAdmin(admin.ModelAdmin):
@@ -15,13 +15,17 @@ class ReportAdmin(admin.ModelAdmin):
         'file_format'
     ]
     search_fields = ['title', 'description', 'created_by__username']
-    readonly_fields = ['created_at', 'updated_at', 'file_size_display']
+    readonly_fields = ['created_at', 'updated_at', 'file_size_display', 'progress', 'error', 'started_at', 'finished_at', 'scheduled_for', 'coalesced_into', 'cache_entry']
     date_hierarchy = 'created_at'
     
     fieldsets = (
         ('Información Básica', {
             'fields': ('title', 'description', 'report_type', 'status')
         }),
+        ('Generación', {
+            'fields': ('progress', 'error', 'started_at', 'finished_at'),
+            'classes': ('collapse',)
+        }),
         ('Fechas del Reporte', {
             'fields': ('date_from', 'date_to')
         }),
@@ -30,11 +34,11 @@ class ReportAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Programación', {
-            'fields': ('is_scheduled', 'schedule_frequency', 'next_run'),
+            'fields': ('is_scheduled', 'schedule_frequency', 'next_run', 'scheduled_for', 'coalesced_into'),
             'classes': ('collapse',)
         }),
         ('Archivo', {
-            'fields': ('file_path', 'file_size_display'),
+            'fields': ('file_path', 'cache_entry', 'file_size_display'),
             'classes': ('collapse',)
         }),
         ('Metadatos', {
@@ -58,7 +62,14 @@ class ReportAdmin(admin.ModelAdmin):
     file_size_display.short_description = "Tamaño del Archivo"
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('created_by')
+        return super().get_queryset(request).select_related('created_by', 'cache_entry')
+
+@admin.register(ReportCacheEntry)
+class ReportCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['key', 'report_type', 'extension', 'organization', 'size', 'hits', 'created_at', 'last_used_at']
+    list_filter = ['report_type', 'extension', 'created_at']
+    search_fields = ['key']
+    readonly_fields = ['key', 'organization', 'report_type', 'extension', 'file', 'size', 'hits', 'created_at', 'last_used_at']
 
 @admin.register(ReportTemplate)
 class ReportTemplateAdmin(admin.ModelAdmin):
@@ -0,0 +1,195 @@
+"""
+TopicTales Biomédica - Contadores del dashboard
+Totales por organización que sirve la API del dashboard sin contar las
+tablas en cada consulta. Las señales aplican la diferencia de cada cambio;
+``reconcile()`` los recalcula desde la BD al crearlos y periódicamente desde
+run_report_scheduler, lo que corrige los cambios hechos con update() o
+bulk_create(), que no emiten señales.
+
+Cada cambio renueva además una versión por organización en la caché, que
+las esperas largas de la API consultan sin leer la BD.
+"""
+import time
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import DailyOrgMetrics, DashboardCounters
+
+
+# Contribuciones de cada modelo de origen: {org_id: {campo: valor}}
+
+def patient_contributions(patient):
+    return {patient.organization_id: {'patients': 1}}
+
+
+def appointment_contributions(appointment):
+    return {
+        appointment.organization_id: {
+            'appointments': 1,
+            'scheduled_appointments': int(appointment.status == 'scheduled'),
+        },
+    }
+
+
+def specialty_consultation_contributions(consultation):
+    from patients.models import Patient
+
+    organization_id = Patient.objects.filter(
+        pk=consultation.patient_id
+    ).values_list('organization_id', flat=True).first()
+    if organization_id is None:
+        return {}
+    return {organization_id: {'specialty_consultations': 1}}
+
+
+def invoice_contributions(invoice):
+    return {
+        invoice.organization_id: {
+            'sent_invoices': int(invoice.status == 'sent'),
+            'paid_revenue': invoice.total_amount if invoice.status == 'paid' else 0,
+        },
+    }
+
+
+def apply_contributions(before, after):
+    """
+    Aplica la diferencia entre dos conjuntos de contribuciones. Solo se
+    actualizan las filas existentes: la de una organización que aún no
+    consultó el dashboard se crea completa con ``reconcile()``.
+    """
+    for organization_id in set(before) | set(after):
+        old = before.get(organization_id, {})
+        new = after.get(organization_id, {})
+        updates = {}
+        for field in set(old) | set(new):
+            delta = new.get(field, 0) - old.get(field, 0)
+            if delta:
+                updates[field] = F(field) + delta
+        if updates:
+            DashboardCounters.objects.filter(organization_id=organization_id).update(
+                **updates, updated_at=timezone.now()
+            )
+    # También sin diferencias: un cambio de fecha mueve las citas de hoy
+    bump_version(set(before) | set(after))
+
+
+# Versión en caché
+
+def version_key(organization_id):
+    return f'dashboard_counters_version:{organization_id}'
+
+
+def bump_version(organization_ids):
+    """Renueva la versión de las organizaciones al confirmar la transacción"""
+    keys = [version_key(organization_id) for organization_id in organization_ids if organization_id is not None]
+    if keys:
+        transaction.on_commit(lambda: cache.set_many(dict.fromkeys(keys, uuid4().hex), None))
+
+
+def version(organization_id):
+    return cache.get(version_key(organization_id))
+
+
+def wait_for_change(organization_id, seen, deadline):
+    """
+    Espera hasta ``deadline`` (time.monotonic()) a que la versión de la
+    organización deje de ser ``seen``; solo lee la caché. Devuelve si cambió.
+    """
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(settings.DASHBOARD_LONG_POLL_INTERVAL, remaining))
+        if version(organization_id) != seen:
+            return True
+
+
+# Conciliación con las tablas de origen
+
+def count(organization_id):
+    """Valores de los contadores calculados desde la BD"""
+    from patients.models import Patient
+    from appointments.models import Appointment
+    from specialties.models import SpecialtyConsultation
+    from billing.models import Invoice
+
+    appointments = Appointment.objects.filter(organization_id=organization_id).aggregate(
+        appointments=Count('id'),
+        scheduled_appointments=Count('id', filter=Q(status='scheduled')),
+    )
+    invoices = Invoice.objects.filter(organization_id=organization_id).aggregate(
+        sent_invoices=Count('id', filter=Q(status='sent')),
+        paid_revenue=Sum('total_amount', filter=Q(status='paid')),
+    )
+    return {
+        'patients': Patient.objects.filter(organization_id=organization_id).count(),
+        **appointments,
+        'specialty_consultations': SpecialtyConsultation.objects.filter(
+            patient__organization_id=organization_id
+        ).count(),
+        'sent_invoices': invoices['sent_invoices'],
+        'paid_revenue': invoices['paid_revenue'] or 0,
+    }
+
+
+def reconcile(organization_id):
+    """Recalcula los contadores de la organización y los guarda"""
+    defaults = {**count(organization_id), 'reconciled_at': timezone.now()}
+    try:
+        with transaction.atomic():
+            counters, _ = DashboardCounters.objects.update_or_create(
+                organization_id=organization_id, defaults=defaults
+            )
+    except IntegrityError:
+        # Otra petición creó la fila al mismo tiempo
+        counters, _ = DashboardCounters.objects.update_or_create(
+            organization_id=organization_id, defaults=defaults
+        )
+    bump_version([organization_id])
+    return counters
+
+
+def reconcile_stale(max_age=None):
+    """Concilia los contadores no conciliados en ``max_age`` segundos; devuelve cuántos"""
+    cutoff = timezone.now() - timedelta(seconds=max_age or settings.DASHBOARD_COUNTERS_RECONCILE_SECONDS)
+    stale = DashboardCounters.objects.filter(reconciled_at__lt=cutoff).values_list('organization_id', flat=True)
+    organization_ids = list(stale)
+    for organization_id in organization_ids:
+        reconcile(organization_id)
+    return len(organization_ids)
+
+
+# Lectura
+
+def stats(organization_id):
+    """
+    Estadísticas del dashboard de la organización: sus contadores (creados
+    la primera vez) y las citas de hoy de las métricas diarias
+    """
+    if organization_id is None:
+        counters = DashboardCounters()
+        appointments_today = 0
+    else:
+        counters = DashboardCounters.objects.filter(organization_id=organization_id).first()
+        if counters is None:
+            counters = reconcile(organization_id)
+            # Los valores tal como se leen de la BD (p. ej. 0.00 y no 0)
+            counters.refresh_from_db()
+        appointments_today = DailyOrgMetrics.objects.filter(
+            organization_id=organization_id, date=timezone.localdate()
+        ).values_list('appointments', flat=True).first() or 0
+    return {
+        'total_patients': counters.patients,
+        'total_appointments': counters.appointments,
+        'appointments_today': appointments_today,
+        'pending_appointments': counters.scheduled_appointments,
+        'total_consultations': counters.specialty_consultations,
+        'pending_invoices': counters.sent_invoices,
+        'total_revenue': counters.paid_revenue,
+    }
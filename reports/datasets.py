@@ -0,0 +1,165 @@
+"""
+TopicTales Biomédica - Conjuntos de datos de reportes
+Consulta y columnas de exportación de cada tipo de reporte, compartidas por
+las vistas y por el generador en segundo plano
+"""
+from django.utils import timezone
+
+from patients.models import Patient
+from appointments.models import Appointment
+from medical_records.models import Consultation
+from billing.models import Payment
+
+from . import exports
+from .models import DailyOrgMetrics
+
+
+AGE_RANGES = {
+    '0-18': (0, 18),
+    '19-30': (19, 30),
+    '31-50': (31, 50),
+    '51-70': (51, 70),
+    '70+': (70, None),
+}
+
+
+def years_before(day, years):
+    """La misma fecha ``years`` años antes; el 29 de febrero pasa al 28"""
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+
+def filter_patients(queryset, filters):
+    """
+    Aplica los filtros de PatientsReportForm (``cleaned_data`` o los
+    ``Report.filters`` guardados) a un queryset de pacientes
+    """
+    if filters.get('date_from'):
+        queryset = queryset.filter(registration_date__date__gte=filters['date_from'])
+    if filters.get('date_to'):
+        queryset = queryset.filter(registration_date__date__lte=filters['date_to'])
+    if filters.get('gender'):
+        queryset = queryset.filter(gender=filters['gender'])
+    if filters.get('city'):
+        queryset = queryset.filter(city__icontains=filters['city'])
+    if filters.get('active_only'):
+        queryset = queryset.filter(is_active=True)
+
+    age_range = AGE_RANGES.get(filters.get('age_range') or '')
+    if age_range:
+        # Edad exacta: entre youngest y oldest años cumplidos, ambos incluidos
+        today = timezone.localdate()
+        youngest, oldest = age_range
+        queryset = queryset.filter(birth_date__lte=years_before(today, youngest))
+        if oldest is not None:
+            queryset = queryset.filter(birth_date__gt=years_before(today, oldest + 1))
+    return queryset
+
+
+def patient_columns():
+    return [
+        exports.Column('ID Paciente', 'patient_id'),
+        exports.Column('Nombre Completo', 'first_name', 'last_name', 'mother_last_name',
+                       format=exports.full_name, width=30),
+        exports.Column('Género', 'gender', choices=Patient.GENDER_CHOICES),
+        exports.Column('Edad', 'birth_date', format=exports.age()),
+        exports.Column('Ciudad', 'city', default='-'),
+        exports.Column('Teléfono', 'phone_number', default='-'),
+        exports.Column('Email', 'email', default='-', width=30),
+        exports.Column('Estado', 'is_active', format=exports.label('Activo', 'Inactivo')),
+    ]
+
+
+def appointment_columns():
+    return [
+        exports.Column('Fecha', 'start_datetime', format=exports.date_format('%d/%m/%Y %H:%M')),
+        exports.Column('Paciente', 'patient__first_name', 'patient__last_name', 'patient__mother_last_name',
+                       format=exports.full_name, width=30),
+        exports.Column('Médico', 'doctor__first_name', 'doctor__last_name', format=exports.full_name, width=25),
+        exports.Column('Tipo', 'appointment_type__name', width=20),
+        exports.Column('Estado', 'status', choices=Appointment.STATUS_CHOICES),
+        exports.Column('Motivo', 'reason', width=40),
+    ]
+
+
+def payment_columns():
+    return [
+        exports.Column('Número', 'payment_number'),
+        exports.Column('Factura', 'invoice__invoice_number'),
+        exports.Column('Paciente', 'invoice__patient__first_name', 'invoice__patient__last_name',
+                       'invoice__patient__mother_last_name', format=exports.full_name, width=30),
+        exports.Column('Fecha', 'payment_date', format=exports.date_format('%d/%m/%Y %H:%M')),
+        exports.Column('Método', 'payment_method', choices=Payment.PAYMENT_METHOD_CHOICES),
+        exports.Column('Monto', 'amount', format=exports.money),
+    ]
+
+
+def consultation_columns():
+    return [
+        exports.Column('Fecha', 'consultation_date', format=exports.date_format('%d/%m/%Y %H:%M')),
+        exports.Column('Paciente', 'patient__first_name', 'patient__last_name', 'patient__mother_last_name',
+                       format=exports.full_name, width=30),
+        exports.Column('Médico', 'doctor__first_name', 'doctor__last_name', format=exports.full_name, width=25),
+        exports.Column('Tipo', 'consultation_type',
+                       choices=Consultation._meta.get_field('consultation_type').choices),
+        exports.Column('Motivo', 'chief_complaint', width=40),
+        exports.Column('Diagnóstico', 'diagnosis_primary', width=40),
+    ]
+
+
+def daily_metrics_columns():
+    return [
+        exports.Column('Fecha', 'date', format=exports.date_format('%d/%m/%Y')),
+        exports.Column('Citas', 'appointments'),
+        exports.Column('Pacientes Nuevos', 'new_patients'),
+        exports.Column('Consultas', 'consultations'),
+        exports.Column('Consultas de Especialidad', 'specialty_consultations'),
+        exports.Column('Ingresos', 'revenue', format=exports.money),
+    ]
+
+
+def _date_range(queryset, lookup, report):
+    if report.date_from:
+        queryset = queryset.filter(**{f'{lookup}__gte': report.date_from})
+    if report.date_to:
+        queryset = queryset.filter(**{f'{lookup}__lte': report.date_to})
+    return queryset
+
+
+def report_dataset(report, organization):
+    """Queryset y columnas de un ``Report`` guardado, según su tipo"""
+    if report.report_type == 'patients':
+        queryset = filter_patients(
+            Patient.objects.filter(organization=organization),
+            dict(report.filters, date_from=report.date_from, date_to=report.date_to)
+        )
+        return queryset.order_by('last_name', 'first_name'), patient_columns()
+
+    if report.report_type == 'appointments':
+        queryset = _date_range(
+            Appointment.objects.filter(organization=organization), 'start_datetime__date', report
+        )
+        if report.filters.get('status'):
+            queryset = queryset.filter(status=report.filters['status'])
+        if report.filters.get('doctor'):
+            queryset = queryset.filter(doctor_id=report.filters['doctor'])
+        return queryset.order_by('start_datetime'), appointment_columns()
+
+    if report.report_type == 'financial':
+        queryset = _date_range(
+            Payment.objects.filter(invoice__patient__organization=organization, status='completed'),
+            'payment_date__date', report
+        )
+        return queryset.order_by('payment_date'), payment_columns()
+
+    if report.report_type == 'medical':
+        queryset = _date_range(
+            Consultation.objects.filter(organization=organization), 'consultation_date__date', report
+        )
+        return queryset.order_by('consultation_date'), consultation_columns()
+
+    # Análisis y personalizados: serie diaria de métricas de la organización
+    queryset = _date_range(DailyOrgMetrics.objects.filter(organization=organization), 'date', report)
+    return queryset.order_by('date'), daily_metrics_columns()
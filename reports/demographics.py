@@ -0,0 +1,132 @@
+"""
+TopicTales Biomédica - Demografía de pacientes
+Estadísticas de edad, género, ciudad y tipo de sangre sin instanciar
+pacientes: las fechas de nacimiento llegan agrupadas por SQL y las edades,
+percentiles, histogramas y tablas cruzadas se calculan con NumPy
+"""
+import numpy as np
+from django.db.models import Count
+from django.utils import timezone
+
+from patients.models import Patient
+
+from .datasets import AGE_RANGES
+
+
+GENDERS = [code for code, _ in Patient.GENDER_CHOICES]
+
+# Límites inferiores de cada rango de AGE_RANGES a partir del segundo; en el
+# histograma cada edad cae en un solo rango (70 años cuenta en 51-70)
+AGE_RANGE_EDGES = [oldest + 1 for _, oldest in AGE_RANGES.values() if oldest is not None]
+
+AGE_PERCENTILES = (25, 50, 75, 90)
+
+HISTOGRAM_WIDTH = 10
+
+
+def ages(years, months, days, today):
+    """Edad exacta en años cumplidos para arreglos de año, mes y día de nacimiento"""
+    before_birthday = (months > today.month) | ((months == today.month) & (days > today.day))
+    return today.year - years - before_birthday.astype(years.dtype)
+
+
+def _birth_columns(queryset):
+    """
+    Año, mes, día, género y número de pacientes por fecha de nacimiento y
+    género; como arreglos, una fila por grupo. Se agrupa por la columna tal
+    cual (sin funciones por fila) y las fechas se separan con NumPy.
+    """
+    rows = list(
+        queryset.order_by().values('birth_date', 'gender').annotate(count=Count('id'))
+        .values_list('birth_date', 'gender', 'count')
+    )
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, np.zeros(0, dtype=object), empty
+    birth_dates, genders, counts = zip(*rows)
+    birth_dates = np.array(birth_dates, dtype='datetime64[D]')
+    months = birth_dates.astype('datetime64[M]')
+    return (
+        birth_dates.astype('datetime64[Y]').astype(np.int64) + 1970,
+        months.astype(np.int64) % 12 + 1,
+        (birth_dates - months).astype(np.int64) + 1,
+        np.array(genders, dtype=object),
+        np.array(counts, dtype=np.int64),
+    )
+
+
+def _age_summary(patient_ages, counts):
+    if not counts.sum():
+        return {'min': None, 'max': None, 'avg': 0}
+    expanded = np.repeat(patient_ages, counts)
+    summary = {
+        'min': int(expanded.min()),
+        'max': int(expanded.max()),
+        'avg': round(float(expanded.mean()), 1),
+    }
+    for percentile, value in zip(AGE_PERCENTILES, np.percentile(expanded, AGE_PERCENTILES)):
+        summary[f'p{percentile}'] = round(float(value), 1)
+    return summary
+
+
+def summarize(queryset, today=None):
+    """
+    Estadísticas demográficas de un queryset de pacientes. Devuelve listas y
+    diccionarios (no querysets), listos para la plantilla o para la caché.
+    """
+    today = today or timezone.localdate()
+    years, months, days, genders, counts = _birth_columns(queryset)
+    # Fechas de nacimiento futuras (datos erróneos) cuentan como 0 años
+    patient_ages = np.maximum(ages(years, months, days, today), 0)
+
+    gender_index = np.full(genders.size, len(GENDERS), dtype=np.int64)
+    for index, gender in enumerate(GENDERS):
+        gender_index[genders == gender] = index
+    gender_labels = GENDERS + ['']
+    gender_totals = np.bincount(gender_index, weights=counts, minlength=len(gender_labels))
+
+    # Rangos de edad por género
+    range_index = np.digitize(patient_ages, AGE_RANGE_EDGES)
+    crosstab = np.zeros((len(AGE_RANGES), len(gender_labels)), dtype=np.int64)
+    np.add.at(crosstab, (range_index, gender_index), counts)
+
+    # Histograma por décadas hasta la edad máxima
+    decades = np.bincount(patient_ages // HISTOGRAM_WIDTH, weights=counts) if counts.size else np.zeros(0)
+
+    gender_blood_type = {}
+    for row in queryset.order_by().values('gender', 'blood_type').annotate(count=Count('id')):
+        gender_blood_type.setdefault(row['blood_type'], {})[row['gender']] = row['count']
+    by_blood_type = sorted(
+        ({'blood_type': blood_type, 'count': sum(by_gender.values())}
+         for blood_type, by_gender in gender_blood_type.items()),
+        key=lambda row: -row['count']
+    )
+
+    return {
+        'total': int(counts.sum()),
+        'age': _age_summary(patient_ages, counts),
+        'by_gender': [
+            {'gender': gender, 'count': int(total)}
+            for gender, total in zip(gender_labels, gender_totals) if total
+        ],
+        'by_city': list(
+            queryset.order_by().values('city').annotate(count=Count('id')).order_by('-count')[:10]
+        ),
+        'by_age_range': [
+            {
+                'range': label,
+                'count': int(row.sum()),
+                'by_gender': {gender: int(value) for gender, value in zip(gender_labels, row) if value},
+            }
+            for label, row in zip(AGE_RANGES, crosstab)
+        ],
+        'age_histogram': [
+            {'range': f'{start * HISTOGRAM_WIDTH}-{start * HISTOGRAM_WIDTH + HISTOGRAM_WIDTH - 1}', 'count': int(total)}
+            for start, total in enumerate(decades)
+        ],
+        'by_blood_type': by_blood_type,
+        'gender_blood_type': [
+            {'blood_type': blood_type, 'by_gender': by_gender}
+            for blood_type, by_gender in sorted(gender_blood_type.items())
+        ],
+    }
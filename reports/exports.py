@@ -0,0 +1,234 @@
+"""
+TopicTales Biomédica - Exportaciones
+Columnas declarativas sobre values() que se escriben por bloques: CSV en
+streaming, XLSX con openpyxl en modo write-only y PDF con reports.pdf, con
+memoria constante sin importar el número de filas
+"""
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+
+# Filas leídas por viaje a la base de datos
+CHUNK_SIZE = 2000
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class Column:
+    """
+    Columna exportada. ``fields`` son las claves de values() que necesita;
+    el valor es el del primer campo, traducido con ``choices`` o calculado
+    con ``format(*valores)``. ``csv_header`` reemplaza el encabezado solo en
+    el CSV.
+    """
+
+    def __init__(self, header, *fields, format=None, choices=None, default='', width=15, csv_header=None):
+        self.header = header
+        self.csv_header = csv_header or header
+        self.fields = fields
+        self.format = format
+        self.choices = dict(choices) if choices is not None else None
+        self.default = default
+        self.width = width
+
+    def value(self, row):
+        values = [row[field] for field in self.fields]
+        if self.format is not None:
+            value = self.format(*values)
+        elif self.choices is not None:
+            value = self.choices.get(values[0], values[0])
+        else:
+            value = values[0]
+        if value is None or value == '':
+            return self.default
+        return value
+
+
+# Formatos reutilizables para ``Column(format=...)``
+
+def full_name(first_name, last_name, mother_last_name=''):
+    return ' '.join(part for part in (first_name, last_name, mother_last_name) if part)
+
+
+def date_format(pattern):
+    """Fecha o fecha/hora (en hora local) con ``strftime(pattern)``"""
+    def formatter(value):
+        if value is None:
+            return ''
+        if hasattr(value, 'tzinfo') and timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime(pattern)
+    return formatter
+
+
+def age(today=None):
+    today = today or timezone.localdate()
+
+    def formatter(birth_date):
+        if birth_date is None:
+            return ''
+        return today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+    return formatter
+
+
+def label(true_label, false_label):
+    return lambda value: true_label if value else false_label
+
+
+def money(value):
+    return f'{value:.2f}' if value is not None else ''
+
+
+class _Echo:
+    """Buffer para csv.writer que devuelve cada línea en lugar de guardarla"""
+
+    def write(self, value):
+        return value
+
+
+class Export:
+    """
+    Exportación de ``queryset`` con ``columns``. Solo se consultan los campos
+    que piden las columnas, con values() e iterator(), así que no se crean
+    instancias de modelo ni se resuelven relaciones fila por fila.
+
+    ``progress`` se llama con el número de filas escritas al terminar cada
+    bloque de ``chunk_size``.
+    """
+
+    def __init__(self, queryset, columns, filename, chunk_size=CHUNK_SIZE, progress=None):
+        self.queryset = queryset
+        self.columns = columns
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.progress = progress
+
+    @property
+    def headers(self):
+        return [column.header for column in self.columns]
+
+    @property
+    def csv_headers(self):
+        return [column.csv_header for column in self.columns]
+
+    def fields(self):
+        fields = []
+        for column in self.columns:
+            for field in column.fields:
+                if field not in fields:
+                    fields.append(field)
+        return fields
+
+    def rows(self):
+        rows = self.queryset.values(*self.fields()).iterator(chunk_size=self.chunk_size)
+        for count, row in enumerate(rows, 1):
+            yield [column.value(row) for column in self.columns]
+            if self.progress is not None and count % self.chunk_size == 0:
+                self.progress(count)
+
+    def iter_csv(self, bom=False):
+        writer = csv.writer(_Echo())
+        if bom:
+            # BOM para que Excel reconozca UTF-8
+            yield '\ufeff'
+        yield writer.writerow(self.csv_headers)
+        for row in self.rows():
+            yield writer.writerow(row)
+
+    def write_csv(self, output, bom=False):
+        """Escribe el CSV en ``output``, un archivo de texto abierto con newline=''"""
+        for line in self.iter_csv(bom=bom):
+            output.write(line)
+
+    def csv_response(self, bom=False):
+        response = StreamingHttpResponse(self.iter_csv(bom=bom), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{self.filename}.csv"'
+        return response
+
+    def write_xlsx(self, output, sheet_title='Datos', title=None):
+        """
+        Escribe el libro en ``output`` con openpyxl en modo write-only, que
+        vuelca cada fila a disco en lugar de mantener la hoja en memoria
+        """
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, PatternFill
+        from openpyxl.utils import get_column_letter
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet(sheet_title)
+        for index, column in enumerate(self.columns, 1):
+            sheet.column_dimensions[get_column_letter(index)].width = column.width
+
+        if title:
+            title_cell = WriteOnlyCell(sheet, value=title)
+            title_cell.font = Font(bold=True, size=16)
+            sheet.append([title_cell])
+            sheet.append([f"Generado el: {timezone.localtime().strftime('%d/%m/%Y %H:%M')}"])
+            sheet.append([])
+
+        header_font = Font(bold=True, color="FFFFFF")
+        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        header = []
+        for text in self.headers:
+            cell = WriteOnlyCell(sheet, value=text)
+            cell.font = header_font
+            cell.fill = header_fill
+            header.append(cell)
+        sheet.append(header)
+
+        for row in self.rows():
+            sheet.append(row)
+        workbook.save(output)
+
+    def xlsx_response(self, sheet_title='Datos', title=None):
+        """
+        Genera el XLSX en un archivo temporal y lo envía por bloques. Sin
+        openpyxl se responde con CSV.
+        """
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            return self.csv_response(bom=True)
+
+        output = tempfile.TemporaryFile()
+        self.write_xlsx(output, sheet_title=sheet_title, title=title)
+        output.seek(0)
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=f'{self.filename}.xlsx',
+            content_type=XLSX_CONTENT_TYPE
+        )
+
+    def write_pdf(self, output, title, summary=None, notes=(), landscape=True):
+        """Escribe el PDF en ``output`` con tablas por bloques (reports.pdf)"""
+        from . import pdf
+
+        pdf.write_pdf(
+            output, title, self.headers, self.rows(), columns=self.columns, summary=summary,
+            notes=notes, pagesize=pdf.LANDSCAPE if landscape else pdf.PORTRAIT
+        )
+
+    def pdf_response(self, title, summary=None, notes=(), landscape=True):
+        """
+        Genera el PDF en un archivo temporal y lo envía por bloques. Sin
+        reportlab se responde con CSV.
+        """
+        try:
+            import reportlab  # noqa: F401
+        except ImportError:
+            return self.csv_response(bom=True)
+
+        output = tempfile.TemporaryFile()
+        self.write_pdf(output, title, summary=summary, notes=notes, landscape=landscape)
+        output.seek(0)
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=f'{self.filename}.pdf',
+            content_type='application/pdf'
+        )
@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth import get_user_model
 from .models import Report, ReportTemplate, ReportShare
+from . import renderers
 from datetime import date, timedelta
 
 User = get_user_model()
@@ -238,10 +239,25 @@ class AnalyticsReportForm(ReportFilterForm):
         widget=forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'})
     )
     
+    GRANULARITY_CHOICES = [
+        ('day', 'Diario'),
+        ('week', 'Semanal'),
+        ('month', 'Mensual'),
+    ]
+    
+    granularity = forms.ChoiceField(
+        choices=GRANULARITY_CHOICES,
+        label="Agrupar por",
+        initial='day',
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    
     chart_type = forms.ChoiceField(
         choices=CHART_TYPES,
         label="Tipo de Gráfico",
         initial='line',
+        required=False,
         widget=forms.Select(attrs={'class': 'form-select'})
     )
     
@@ -285,12 +301,7 @@ class ReportForm(forms.ModelForm):
                 'class': 'form-control'
             }),
             'file_format': forms.Select(
-                choices=[
-                    ('pdf', 'PDF'),
-                    ('excel', 'Excel'),
-                    ('csv', 'CSV'),
-                    ('json', 'JSON')
-                ],
+                choices=renderers.choices(),
                 attrs={'class': 'form-select'}
             ),
             'is_scheduled': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
@@ -455,11 +466,7 @@ class CustomReportForm(forms.Form):
     
     # Formato y configuración
     file_format = forms.ChoiceField(
-        choices=[
-            ('pdf', 'PDF'),
-            ('excel', 'Excel'),
-            ('csv', 'CSV'),
-        ],
+        choices=renderers.choices,
         label="Formato de Archivo",
         initial='pdf',
         widget=forms.Select(attrs={'class': 'form-select'})
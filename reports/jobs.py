@@ -0,0 +1,127 @@
+"""
+TopicTales Biomédica - Generación de reportes en segundo plano
+Los reportes pendientes se reclaman de la base de datos y se generan fuera de
+la petición web, por `manage.py run_report_worker` o por Celery si está
+configurado. El avance queda en ``Report.progress``.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import datasets, exports, renderers, result_cache
+from .models import Report
+
+
+logger = logging.getLogger(__name__)
+
+# Reportes pendientes revisados por intento de reclamo
+CLAIM_BATCH = 10
+
+
+def _celery_task():
+    if not settings.REPORTS_USE_CELERY:
+        return None
+    try:
+        from .tasks import generate_report_task
+    except ImportError:
+        return None
+    return generate_report_task
+
+
+def enqueue(report):
+    """Deja el reporte pendiente; con Celery además se envía la tarea al confirmar"""
+    Report.objects.filter(pk=report.pk).update(
+        status='pending', progress=0, error='', started_at=None, finished_at=None, coalesced_into=None
+    )
+    report.status = 'pending'
+    report.progress = 0
+    report.error = ''
+
+    task = _celery_task()
+    if task is not None:
+        transaction.on_commit(lambda: task.delay(report.pk))
+
+
+def claim(report_id=None):
+    """
+    Marca como 'processing' el reporte pendiente más antiguo (o ``report_id``)
+    y lo devuelve. El UPDATE condicionado a status='pending' evita que dos
+    workers tomen el mismo reporte.
+    """
+    candidates = Report.objects.filter(status='pending', coalesced_into__isnull=True)
+    if report_id is not None:
+        candidates = candidates.filter(pk=report_id)
+    for pk in candidates.order_by('created_at').values_list('pk', flat=True)[:CLAIM_BATCH]:
+        claimed = Report.objects.filter(pk=pk, status='pending').update(
+            status='processing', progress=0, error='', started_at=timezone.now(), finished_at=None
+        )
+        if claimed:
+            return Report.objects.select_related('created_by__profile__organization').get(pk=pk)
+    return None
+
+
+def requeue_stale(timeout=None):
+    """Devuelve a pendientes los reportes de workers que murieron a la mitad"""
+    cutoff = timezone.now() - timedelta(seconds=timeout or settings.REPORT_JOB_TIMEOUT)
+    return Report.objects.filter(status='processing', started_at__lt=cutoff).update(
+        status='pending', progress=0
+    )
+
+
+def generate(report):
+    """
+    Genera el archivo de un reporte ya reclamado, o reutiliza el de la caché
+    si otro reporte idéntico ya lo generó con los mismos datos
+    """
+    profile = getattr(report.created_by, 'profile', None)
+    organization = profile.organization if profile else None
+    renderer = renderers.get(report.file_format)
+
+    key = result_cache.report_key(report, organization)
+    entry = result_cache.lookup(key, organization)
+    if entry is None:
+        queryset, columns = datasets.report_dataset(report, organization)
+        total = queryset.count()
+
+        def progress(count):
+            if total:
+                Report.objects.filter(pk=report.pk).update(progress=min(count * 100 // total, 99))
+
+        export = exports.Export(queryset, columns, f'reporte_{report.pk}', progress=progress)
+        entry = result_cache.store(
+            key, report, organization, renderer.extension,
+            lambda output: renderer.render(export, output, report)
+        )
+
+    # Los archivos en caché se eliminan con result_cache.prune
+    previous = report.file_path.name if report.file_path and not report.cache_entry_id else None
+    finished_at = timezone.now()
+    Report.objects.filter(pk=report.pk).update(
+        status='completed', progress=100, file_path=entry.file.name, cache_entry=entry, finished_at=finished_at
+    )
+    report.coalesced_reports.filter(status='pending').update(
+        status='completed', progress=100, file_path=entry.file.name, cache_entry=entry,
+        started_at=report.started_at, finished_at=finished_at, coalesced_into=None
+    )
+    if previous and previous != entry.file.name and not Report.objects.filter(file_path=previous).exists():
+        report.file_path.storage.delete(previous)
+
+
+def run(report_id=None):
+    """Reclama y genera un reporte; devuelve el reporte o ``None`` si no había pendientes"""
+    report = claim(report_id)
+    if report is None:
+        return None
+    try:
+        generate(report)
+    except Exception as exc:
+        logger.exception('Report %s generation failed', report.pk)
+        Report.objects.filter(Q(pk=report.pk) | Q(coalesced_into=report, status='pending')).update(
+            status='failed', error=str(exc), finished_at=timezone.now(), coalesced_into=None
+        )
+    report.refresh_from_db()
+    return report
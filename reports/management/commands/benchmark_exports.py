@@ -0,0 +1,271 @@
+import csv
+import io
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from accounts.models import Organization
+from patients.models import Patient
+from reports import demographics, exports
+from reports.datasets import patient_columns
+
+
+BENCHMARK_TAX_ID = 'BENCH-EXPORTS'
+
+SEED_BATCH_SIZE = 10000
+
+LEGACY_HEADERS = [
+    'ID Paciente', 'Nombre Completo', 'Género', 'Edad',
+    'Ciudad', 'Teléfono', 'Email', 'Estado'
+]
+
+
+def legacy_csv(queryset):
+    """Exportación CSV anterior: instancias de modelo en un HttpResponse en memoria"""
+    from django.http import HttpResponse
+
+    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    response.write('\ufeff')
+    writer = csv.writer(response)
+    writer.writerow(LEGACY_HEADERS)
+    for patient in queryset:
+        writer.writerow([
+            patient.patient_id,
+            patient.get_full_name(),
+            patient.get_gender_display(),
+            patient.get_age(),
+            patient.city or "-",
+            patient.phone_number or "-",
+            patient.email or "-",
+            "Activo" if patient.is_active else "Inactivo"
+        ])
+    return len(response.content)
+
+
+def legacy_xlsx(queryset):
+    """Exportación XLSX anterior: libro completo de openpyxl en memoria"""
+    import openpyxl
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for column, header in enumerate(LEGACY_HEADERS, 1):
+        sheet.cell(row=1, column=column, value=header)
+    for row, patient in enumerate(queryset, 2):
+        sheet.cell(row=row, column=1, value=patient.patient_id)
+        sheet.cell(row=row, column=2, value=patient.get_full_name())
+        sheet.cell(row=row, column=3, value=patient.get_gender_display())
+        sheet.cell(row=row, column=4, value=patient.get_age())
+        sheet.cell(row=row, column=5, value=patient.city or "-")
+        sheet.cell(row=row, column=6, value=patient.phone_number or "-")
+        sheet.cell(row=row, column=7, value=patient.email or "-")
+        sheet.cell(row=row, column=8, value="Activo" if patient.is_active else "Inactivo")
+    output = io.BytesIO()
+    workbook.save(output)
+    return len(output.getvalue())
+
+
+def legacy_pdf(queryset):
+    """Exportación PDF anterior: estilos nuevos en cada llamada y una sola tabla en un BytesIO"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=18, spaceAfter=30)
+    story = [Paragraph('Lista de Pacientes', title_style), Spacer(1, 20)]
+    data = [['ID', 'Nombre Completo', 'Email', 'Teléfono', 'Fecha Registro']]
+    for patient in queryset:
+        data.append([
+            patient.patient_id,
+            f"{patient.first_name} {patient.last_name} {patient.mother_last_name}".strip(),
+            patient.email or '',
+            patient.phone_number or '',
+            patient.registration_date.strftime('%d/%m/%Y')
+        ])
+    table = Table(data)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    story.append(table)
+    doc.build(story)
+    return len(buffer.getvalue())
+
+
+def consume(response):
+    """Lee la respuesta por bloques como lo haría el servidor"""
+    size = 0
+    for chunk in response:
+        size += len(chunk)
+    response.close()
+    return size
+
+
+def streaming_csv(queryset):
+    return consume(exports.Export(queryset, patient_columns(), 'benchmark').csv_response(bom=True))
+
+
+def streaming_xlsx(queryset):
+    return consume(exports.Export(queryset, patient_columns(), 'benchmark').xlsx_response())
+
+
+def chunked_pdf(queryset):
+    from patients.views import PDF_EXPORT_COLUMNS
+
+    export = exports.Export(queryset, PDF_EXPORT_COLUMNS, 'benchmark')
+    return consume(export.pdf_response('Lista de Pacientes', landscape=False))
+
+
+def legacy_demographics(queryset):
+    """Estadísticas anteriores de patients_report: edad promedio sobre instancias"""
+    from django.db.models import Count
+
+    all_patients = queryset.all()
+    total_age = sum(patient.get_age() for patient in all_patients)
+    avg_age = total_age / len(all_patients) if len(all_patients) > 0 else 0
+    list(queryset.values('gender').annotate(count=Count('id')))
+    list(queryset.values('city').annotate(count=Count('id')).order_by('-count')[:10])
+    queryset.count()
+    return avg_age
+
+
+def vectorized_demographics(queryset):
+    demographics.summarize(queryset)
+    return None
+
+
+IMPLEMENTATIONS = {
+    'csv': [('anterior', legacy_csv), ('streaming', streaming_csv)],
+    'xlsx': [('anterior', legacy_xlsx), ('write-only', streaming_xlsx)],
+    'pdf': [('anterior', legacy_pdf), ('por bloques', chunked_pdf)],
+    'demographics': [('anterior', legacy_demographics), ('numpy', vectorized_demographics)],
+}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara tiempo, memoria máxima y consultas de las exportaciones y '
+        'estadísticas de pacientes anteriores contra las implementaciones actuales'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Pacientes a generar en una organización de benchmark (p. ej. 1000000)',
+        )
+        parser.add_argument(
+            '--format',
+            choices=sorted(IMPLEMENTATIONS),
+            action='append',
+            dest='formats',
+            help='Formato a medir; se puede repetir (por defecto: todos)',
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=0,
+            help='Limitar la exportación a las primeras N filas (p. ej. 20000 para PDF)',
+        )
+        parser.add_argument(
+            '--skip-legacy',
+            action='store_true',
+            help='Medir solo el exportador nuevo (la versión anterior puede agotar la memoria con 1M filas)',
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'])
+
+        organization = (
+            Organization.objects.filter(tax_id=BENCHMARK_TAX_ID).first()
+            or Organization.objects.first()
+        )
+        if not organization:
+            raise CommandError('No hay organizaciones. Use --seed para generar datos.')
+        queryset = Patient.objects.filter(organization=organization).order_by('patient_id')
+        if options['rows']:
+            queryset = queryset.filter(
+                pk__in=list(queryset.values_list('pk', flat=True)[:options['rows']])
+            )
+        self.stdout.write(f'Exportando {queryset.count()} pacientes de {organization}')
+
+        for export_format in options['formats'] or sorted(IMPLEMENTATIONS):
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(export_format.upper()))
+            for name, implementation in IMPLEMENTATIONS[export_format]:
+                if options['skip_legacy'] and name == 'anterior':
+                    continue
+                self.stdout.write(f'  {name:<11} {self.measure(implementation, queryset)}')
+
+    def measure(self, implementation, queryset):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            size = implementation(queryset.all())
+        elapsed = time.perf_counter() - started
+
+        # Segunda pasada solo para la memoria: tracemalloc distorsiona el tiempo
+        tracemalloc.start()
+        try:
+            implementation(queryset.all())
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        result = (
+            f'{elapsed:8.2f} s   memoria máx. {peak / 1024 / 1024:8.1f} MB   '
+            f'{counter.count:4d} consultas'
+        )
+        if size is not None:
+            result += f'   {size / 1024 / 1024:7.1f} MB generados'
+        return result
+
+    def seed(self, total):
+        organization, _ = Organization.objects.get_or_create(
+            tax_id=BENCHMARK_TAX_ID,
+            defaults={
+                'name': 'Benchmark exportaciones', 'legal_name': 'Benchmark', 'address': 'N/A',
+                'phone': '0000000000', 'email': 'benchmark@example.com',
+                'director_name': 'Benchmark', 'director_license': 'N/A',
+            }
+        )
+        existing = Patient.objects.filter(organization=organization).count()
+        self.stdout.write(f'Generando {max(total - existing, 0)} pacientes...')
+        for offset in range(existing, total, SEED_BATCH_SIZE):
+            with transaction.atomic():
+                Patient.objects.bulk_create([
+                    Patient(
+                        patient_id=f'BEXP{number:09d}', first_name='Paciente', last_name=str(number),
+                        mother_last_name='Benchmark', birth_date=date(1950, 1, 1) + timedelta(days=number % 25000),
+                        gender='MF'[number % 2], phone_number='5550000000', email=f'p{number}@example.com',
+                        address='N/A', city='Ciudad de México', state='CDMX', postal_code='00000',
+                        emergency_contact_name='N/A', emergency_contact_relationship='N/A',
+                        emergency_contact_phone='5550000000', organization=organization,
+                        is_active=number % 10 != 0
+                    )
+                    for number in range(offset, min(offset + SEED_BATCH_SIZE, total))
+                ])
+            self.stdout.write(f'  {min(offset + SEED_BATCH_SIZE, total)}/{total}')
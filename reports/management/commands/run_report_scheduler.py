@@ -0,0 +1,91 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts import sync
+from reports import counters, result_cache, scheduler
+
+
+class Command(BaseCommand):
+    help = (
+        'Encola los reportes programados vencidos y calcula su próxima ejecución. '
+        'Se pueden ejecutar varias instancias: solo la que tiene el bloqueo actúa. '
+        'También elimina los archivos en caché que ya nadie usa y los registros '
+        'de borrado vencidos de la sincronización incremental, y concilia los '
+        'contadores del dashboard con la base de datos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60,
+            help='Segundos entre revisiones (por defecto: 60)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Hacer una sola revisión y terminar',
+        )
+        parser.add_argument(
+            '--metrics',
+            action='store_true',
+            help='Mostrar retraso y duración de las ejecuciones programadas y terminar',
+        )
+
+    def handle(self, *args, **options):
+        if options['metrics']:
+            self.show_metrics()
+            return
+
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        owner = scheduler.worker_name()
+        # El bloqueo dura varias revisiones para tolerar una revisión lenta
+        ttl = max(options['interval'] * 3, 30)
+        try:
+            while not self.stopping:
+                close_old_connections()
+                if scheduler.acquire_leadership(owner, ttl):
+                    stats = scheduler.tick()
+                    if stats['due'] or options['verbosity'] > 1:
+                        self.stdout.write(
+                            f"{stats['due']} vencidos, {stats['enqueued']} encolados, "
+                            f"{stats['coalesced']} agrupados, {stats['skipped']} omitidos, "
+                            f"retraso máx. {stats['max_lag'].total_seconds():.0f} s"
+                        )
+                    pruned = result_cache.prune()
+                    if pruned:
+                        self.stdout.write(f'{pruned} archivos eliminados de la caché de reportes')
+                    pruned = sync.prune()
+                    if pruned:
+                        self.stdout.write(f'{pruned} registros de borrado vencidos eliminados')
+                    reconciled = counters.reconcile_stale()
+                    if reconciled:
+                        self.stdout.write(f'{reconciled} contadores del dashboard conciliados')
+                elif options['verbosity'] > 1:
+                    self.stdout.write('Otro proceso es el líder del programador')
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        finally:
+            scheduler.release_leadership(owner)
+
+    def show_metrics(self):
+        metrics = scheduler.metrics()
+        self.stdout.write(f"Ejecuciones programadas: {metrics['runs']} ({metrics['failed']} fallidas)")
+        for label, key in (('Retraso', 'lag'), ('Duración', 'duration')):
+            values = metrics[key]
+            if values['avg'] is None:
+                self.stdout.write(f'{label}: sin datos')
+            else:
+                self.stdout.write(
+                    f"{label}: promedio {values['avg']} s, p95 {values['p95']} s, máx. {values['max']} s"
+                )
+
+    def stop(self, signum, frame):
+        self.stopping = True
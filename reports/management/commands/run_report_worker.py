@@ -0,0 +1,67 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from reports import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera en segundo plano los reportes pendientes, consultando la base '
+        'de datos periódicamente; no requiere un broker de mensajes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Procesar los reportes pendientes y terminar',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=settings.REPORT_WORKER_POLL_INTERVAL,
+            help='Segundos de espera cuando no hay reportes pendientes',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=0,
+            help='Terminar después de generar N reportes (por defecto: sin límite)',
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        processed = 0
+        while not self.stopping:
+            close_old_connections()
+            requeued = jobs.requeue_stale()
+            if requeued:
+                self.stdout.write(self.style.WARNING(f'{requeued} reportes reencolados por tiempo excedido'))
+
+            report = jobs.run()
+            if report is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            processed += 1
+            if report.status == 'completed':
+                self.stdout.write(self.style.SUCCESS(f'Reporte #{report.pk} generado: {report.file_path.name}'))
+            else:
+                self.stdout.write(self.style.ERROR(f'Reporte #{report.pk} falló: {report.error}'))
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+
+        self.stdout.write(f'{processed} reportes procesados')
+
+    def stop(self, signum, frame):
+        # Termina el reporte en curso antes de salir
+        self.stopping = True
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0003_notification'),
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyOrgMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('appointments', models.IntegerField(default=0, verbose_name='Citas')),
+                ('new_patients', models.IntegerField(default=0, verbose_name='Pacientes Nuevos')),
+                ('consultations', models.IntegerField(default=0, verbose_name='Consultas')),
+                ('specialty_consultations', models.IntegerField(default=0, verbose_name='Consultas de Especialidad')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Ingresos')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_metrics', to='accounts.organization', verbose_name='Organización')),
+            ],
+            options={
+                'verbose_name': 'Métrica Diaria',
+                'verbose_name_plural': 'Métricas Diarias',
+                'ordering': ['date'],
+                'unique_together': {('organization', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyAppointmentMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('status', models.CharField(max_length=20, verbose_name='Estado')),
+                ('count', models.IntegerField(default=0, verbose_name='Citas')),
+                ('appointment_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_metrics', to='appointments.appointmenttype', verbose_name='Tipo de Cita')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_appointment_metrics', to=settings.AUTH_USER_MODEL, verbose_name='Médico')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_appointment_metrics', to='accounts.organization', verbose_name='Organización')),
+            ],
+            options={
+                'verbose_name': 'Métrica Diaria de Citas',
+                'verbose_name_plural': 'Métricas Diarias de Citas',
+                'ordering': ['date'],
+                'unique_together': {('organization', 'date', 'doctor', 'appointment_type', 'status')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_dailyorgmetrics_dailyappointmentmetrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='error',
+            field=models.TextField(blank=True, verbose_name='Error'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Fin de Generación'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Progreso (%)'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Inicio de Generación'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['status', 'created_at'], name='report_status_created_idx'),
+        ),
+    ]
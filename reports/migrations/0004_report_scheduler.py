@@ -0,0 +1,49 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:52
+
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def schedule_pending_reports(apps, schema_editor):
+    # Reportes programados antes de existir el programador: se ejecutan en la primera revisión
+    Report = apps.get_model('reports', 'Report')
+    Report.objects.filter(is_scheduled=True, next_run__isnull=True).update(next_run=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_report_generation_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchedulerLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Nombre')),
+                ('owner', models.CharField(blank=True, max_length=200, verbose_name='Proceso')),
+                ('expires_at', models.DateTimeField(verbose_name='Expira el')),
+            ],
+            options={
+                'verbose_name': 'Bloqueo del Programador',
+                'verbose_name_plural': 'Bloqueos del Programador',
+            },
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='coalesced_into',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='coalesced_reports', to='reports.report', verbose_name='Agrupado con'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='scheduled_for',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Ejecución Programada'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['is_scheduled', 'next_run'], name='report_scheduled_due_idx'),
+        ),
+        migrations.RunPython(schedule_pending_reports, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_numbersequence'),
+        ('reports', '0004_report_scheduler'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='Clave')),
+                ('report_type', models.CharField(choices=[('patients', 'Reporte de Pacientes'), ('appointments', 'Reporte de Citas'), ('financial', 'Reporte Financiero'), ('analytics', 'Análisis Avanzado'), ('medical', 'Reporte Médico'), ('custom', 'Reporte Personalizado')], max_length=20, verbose_name='Tipo de Reporte')),
+                ('extension', models.CharField(max_length=10, verbose_name='Extensión')),
+                ('file', models.FileField(upload_to='reports/cache/', verbose_name='Archivo (gzip)')),
+                ('size', models.PositiveBigIntegerField(default=0, verbose_name='Tamaño sin Comprimir')),
+                ('hits', models.PositiveIntegerField(default=0, verbose_name='Aciertos')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Último Uso')),
+                ('organization', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='report_cache_entries', to='accounts.organization', verbose_name='Organización')),
+            ],
+            options={
+                'verbose_name': 'Entrada de Caché de Reportes',
+                'verbose_name_plural': 'Caché de Reportes',
+                'ordering': ['-last_used_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='cache_entry',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reports', to='reports.reportcacheentry', verbose_name='Entrada de Caché'),
+        ),
+        migrations.CreateModel(
+            name='ReportDataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50, verbose_name='Fuente')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Versión')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_data_versions', to='accounts.organization', verbose_name='Organización')),
+            ],
+            options={
+                'verbose_name': 'Versión de Datos',
+                'verbose_name_plural': 'Versiones de Datos',
+                'unique_together': {('organization', 'source')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ReportCacheCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('preview', 'Vista previa'), ('file', 'Archivo')], max_length=10, verbose_name='Tipo')),
+                ('hits', models.PositiveBigIntegerField(default=0, verbose_name='Aciertos')),
+                ('misses', models.PositiveBigIntegerField(default=0, verbose_name='Fallos')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_cache_counters', to='accounts.organization', verbose_name='Organización')),
+            ],
+            options={
+                'verbose_name': 'Contador de Caché de Reportes',
+                'verbose_name_plural': 'Contadores de Caché de Reportes',
+                'unique_together': {('organization', 'kind')},
+            },
+        ),
+    ]
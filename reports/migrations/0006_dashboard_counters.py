@@ -0,0 +1,34 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_synctombstone'),
+        ('reports', '0005_report_result_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounters',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('patients', models.IntegerField(default=0, verbose_name='Pacientes')),
+                ('appointments', models.IntegerField(default=0, verbose_name='Citas')),
+                ('scheduled_appointments', models.IntegerField(default=0, verbose_name='Citas Programadas')),
+                ('specialty_consultations', models.IntegerField(default=0, verbose_name='Consultas de Especialidad')),
+                ('sent_invoices', models.IntegerField(default=0, verbose_name='Facturas Enviadas')),
+                ('paid_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Ingresos Facturados')),
+                ('reconciled_at', models.DateTimeField(verbose_name='Última Conciliación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('organization', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_counters', to='accounts.organization', verbose_name='Organización')),
+            ],
+            options={
+                'verbose_name': 'Contadores del Dashboard',
+                'verbose_name_plural': 'Contadores del Dashboard',
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.16 on 2026-10-18 12:10
+
+from django.db import migrations
+
+
+def backfill_daily_metrics(apps, schema_editor):
+    # El dashboard, los reportes y los análisis solo leen las métricas diarias,
+    # así que deben cubrir todo el historial y no solo la ventana reciente del
+    # comando
+    from reports.rollup import history_range, rebuild_in_chunks
+
+    history = history_range(apps)
+    if history is None:
+        return
+    for _ in rebuild_in_chunks(*history, chunk_days=366, apps=apps):
+        pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0006_tenant_indexes'),
+        ('billing', '0007_invoice_organization'),
+        ('medical_records', '0006_tenant_indexes'),
+        ('patients', '0006_tenant_indexes'),
+        ('specialties', '0001_initial'),
+        ('reports', '0006_dashboard_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_metrics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:39
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def anchor_scheduled_reports(apps, schema_editor):
+    Report = apps.get_model('reports', 'Report')
+    Report.objects.filter(is_scheduled=True).update(schedule_anchor=F('next_run'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0007_backfill_daily_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='schedule_anchor',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Inicio de la Programación'),
+        ),
+        migrations.RunPython(anchor_scheduled_reports, migrations.RunPython.noop),
+    ]
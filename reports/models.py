@@ -1,9 +1,28 @@
+import calendar
+from datetime import timedelta
+
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
 User = get_user_model()
 
+# Días y meses que avanza cada frecuencia de programación
+SCHEDULE_INTERVALS = {
+    'daily': (1, 0),
+    'weekly': (7, 0),
+    'monthly': (0, 1),
+    'quarterly': (0, 3),
+}
+
+
+def _add_months(moment, months):
+    month_index = moment.month - 1 + months
+    year = moment.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(moment.day, calendar.monthrange(year, month)[1])
+    return moment.replace(year=year, month=month, day=day)
+
 class Report(models.Model):
     """Modelo para almacenar reportes generados"""
     REPORT_TYPES = [
@@ -27,6 +46,12 @@ class Report(models.Model):
     report_type = models.CharField(max_length=20, choices=REPORT_TYPES, verbose_name="Tipo de Reporte")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Estado")
     
+    # Avance de la generación en segundo plano
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name="Progreso (%)")
+    error = models.TextField(blank=True, verbose_name="Error")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Inicio de Generación")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Fin de Generación")
+    
     # Filtros y parámetros del reporte (JSON)
     filters = models.JSONField(default=dict, blank=True, verbose_name="Filtros")
     parameters = models.JSONField(default=dict, blank=True, verbose_name="Parámetros")
@@ -48,15 +73,63 @@ class Report(models.Model):
     is_scheduled = models.BooleanField(default=False, verbose_name="Programado")
     schedule_frequency = models.CharField(max_length=20, blank=True, verbose_name="Frecuencia")
     next_run = models.DateTimeField(null=True, blank=True, verbose_name="Próxima Ejecución")
+    # Primera ejecución programada; las siguientes se cuentan desde aquí para
+    # que un mes corto no desplace el día del mes de las posteriores
+    schedule_anchor = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Inicio de la Programación")
+    scheduled_for = models.DateTimeField(null=True, blank=True, verbose_name="Ejecución Programada")
+    # Ejecución programada resuelta por otro reporte idéntico de la organización
+    coalesced_into = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='coalesced_reports', verbose_name="Agrupado con"
+    )
+    
+    # Resultado compartido en la caché de reportes (reports.result_cache)
+    cache_entry = models.ForeignKey(
+        'ReportCacheEntry', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='reports', verbose_name="Entrada de Caché"
+    )
     
     class Meta:
         verbose_name = "Reporte"
         verbose_name_plural = "Reportes"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='report_status_created_idx'),
+            models.Index(fields=['is_scheduled', 'next_run'], name='report_scheduled_due_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.get_report_type_display()}"
     
+    def save(self, *args, **kwargs):
+        if self.is_scheduled and self.next_run is None:
+            self.next_run = self.compute_next_run()
+        if not self.is_scheduled:
+            self.schedule_anchor = None
+        elif self.schedule_anchor is None:
+            self.schedule_anchor = self.next_run
+        super().save(*args, **kwargs)
+    
+    def compute_next_run(self, now=None):
+        """
+        Primera ejecución posterior a ``now`` según ``schedule_frequency``,
+        contada desde ``schedule_anchor`` (o ``next_run``) y conservando su
+        hora local. ``None`` si la frecuencia no es válida.
+        """
+        if self.schedule_frequency not in SCHEDULE_INTERVALS:
+            return None
+        now = now or timezone.now()
+        days, months = SCHEDULE_INTERVALS[self.schedule_frequency]
+        base = timezone.localtime(self.schedule_anchor or self.next_run or now)
+        step = 1
+        while True:
+            # Se calcula desde la base para que los meses cortos no desplacen el día
+            moment = _add_months(base, months * step) + timedelta(days=days * step)
+            moment = timezone.make_aware(moment.replace(tzinfo=None))
+            if moment > now:
+                return moment
+            step += 1
+    
     @property
     def is_ready(self):
         """Verifica si el reporte está listo para descargar"""
@@ -65,6 +138,9 @@ class Report(models.Model):
     @property
     def file_size(self):
         """Obtiene el tamaño del archivo en bytes"""
+        if self.cache_entry_id and self.file_path.name == self.cache_entry.file.name:
+            # El archivo en caché está comprimido; se informa el tamaño real
+            return self.cache_entry.size
         if self.file_path:
             try:
                 return self.file_path.size
@@ -72,6 +148,73 @@ class Report(models.Model):
                 return 0
         return 0
 
+class SchedulerLock(models.Model):
+    """Fila de bloqueo para que un solo proceso ejecute el programador"""
+    name = models.CharField(max_length=100, unique=True, verbose_name="Nombre")
+    owner = models.CharField(max_length=200, blank=True, verbose_name="Proceso")
+    expires_at = models.DateTimeField(verbose_name="Expira el")
+    
+    class Meta:
+        verbose_name = "Bloqueo del Programador"
+        verbose_name_plural = "Bloqueos del Programador"
+    
+    def __str__(self):
+        return f"{self.name} ({self.owner})"
+
+class ReportDataVersion(models.Model):
+    """Versión de los datos de una fuente por organización; la incrementan las señales"""
+    organization = models.ForeignKey('accounts.Organization', on_delete=models.CASCADE, related_name='report_data_versions', verbose_name="Organización")
+    source = models.CharField(max_length=50, verbose_name="Fuente")
+    version = models.PositiveBigIntegerField(default=0, verbose_name="Versión")
+    
+    class Meta:
+        verbose_name = "Versión de Datos"
+        verbose_name_plural = "Versiones de Datos"
+        unique_together = ['organization', 'source']
+    
+    def __str__(self):
+        return f"{self.organization} - {self.source}: {self.version}"
+
+class ReportCacheEntry(models.Model):
+    """Archivo generado y comprimido, compartido por los reportes con la misma clave"""
+    key = models.CharField(max_length=64, unique=True, verbose_name="Clave")
+    organization = models.ForeignKey('accounts.Organization', on_delete=models.CASCADE, null=True, blank=True, related_name='report_cache_entries', verbose_name="Organización")
+    report_type = models.CharField(max_length=20, choices=Report.REPORT_TYPES, verbose_name="Tipo de Reporte")
+    extension = models.CharField(max_length=10, verbose_name="Extensión")
+    file = models.FileField(upload_to='reports/cache/', verbose_name="Archivo (gzip)")
+    size = models.PositiveBigIntegerField(default=0, verbose_name="Tamaño sin Comprimir")
+    hits = models.PositiveIntegerField(default=0, verbose_name="Aciertos")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
+    last_used_at = models.DateTimeField(default=timezone.now, verbose_name="Último Uso")
+    
+    class Meta:
+        verbose_name = "Entrada de Caché de Reportes"
+        verbose_name_plural = "Caché de Reportes"
+        ordering = ['-last_used_at']
+    
+    def __str__(self):
+        return f"{self.get_report_type_display()} ({self.key[:12]})"
+
+class ReportCacheCounter(models.Model):
+    """Aciertos y fallos de la caché de reportes por organización"""
+    KIND_CHOICES = [
+        ('preview', 'Vista previa'),
+        ('file', 'Archivo'),
+    ]
+    
+    organization = models.ForeignKey('accounts.Organization', on_delete=models.CASCADE, related_name='report_cache_counters', verbose_name="Organización")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name="Tipo")
+    hits = models.PositiveBigIntegerField(default=0, verbose_name="Aciertos")
+    misses = models.PositiveBigIntegerField(default=0, verbose_name="Fallos")
+    
+    class Meta:
+        verbose_name = "Contador de Caché de Reportes"
+        verbose_name_plural = "Contadores de Caché de Reportes"
+        unique_together = ['organization', 'kind']
+    
+    def __str__(self):
+        return f"{self.organization} - {self.get_kind_display()}"
+
 class ReportTemplate(models.Model):
     """Plantillas predefinidas para reportes"""
     name = models.CharField(max_length=100, verbose_name="Nombre")
@@ -122,3 +265,71 @@ class ReportShare(models.Model):
         if self.expires_at:
             return timezone.now() > self.expires_at
         return False
+
+
+class DailyOrgMetrics(models.Model):
+    """Métricas diarias agregadas por organización"""
+    organization = models.ForeignKey('accounts.Organization', on_delete=models.CASCADE, related_name='daily_metrics', verbose_name="Organización")
+    date = models.DateField(verbose_name="Fecha")
+    
+    appointments = models.IntegerField(default=0, verbose_name="Citas")
+    new_patients = models.IntegerField(default=0, verbose_name="Pacientes Nuevos")
+    consultations = models.IntegerField(default=0, verbose_name="Consultas")
+    specialty_consultations = models.IntegerField(default=0, verbose_name="Consultas de Especialidad")
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Ingresos")
+    
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
+    
+    class Meta:
+        verbose_name = "Métrica Diaria"
+        verbose_name_plural = "Métricas Diarias"
+        unique_together = ['organization', 'date']
+        ordering = ['date']
+    
+    def __str__(self):
+        return f"{self.organization} - {self.date}"
+
+
+class DailyAppointmentMetrics(models.Model):
+    """Citas diarias por organización desglosadas por médico, tipo y estado"""
+    organization = models.ForeignKey('accounts.Organization', on_delete=models.CASCADE, related_name='daily_appointment_metrics', verbose_name="Organización")
+    date = models.DateField(verbose_name="Fecha")
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_appointment_metrics', verbose_name="Médico")
+    appointment_type = models.ForeignKey('appointments.AppointmentType', on_delete=models.CASCADE, related_name='daily_metrics', verbose_name="Tipo de Cita")
+    status = models.CharField(max_length=20, verbose_name="Estado")
+    count = models.IntegerField(default=0, verbose_name="Citas")
+    
+    class Meta:
+        verbose_name = "Métrica Diaria de Citas"
+        verbose_name_plural = "Métricas Diarias de Citas"
+        unique_together = ['organization', 'date', 'doctor', 'appointment_type', 'status']
+        ordering = ['date']
+    
+    def __str__(self):
+        return f"{self.organization} - {self.date} - {self.status}: {self.count}"
+
+
+class DashboardCounters(models.Model):
+    """
+    Totales de la organización que muestra el dashboard. Las señales los
+    actualizan con cada cambio y reports.counters los recalcula desde la BD
+    periódicamente.
+    """
+    organization = models.OneToOneField('accounts.Organization', on_delete=models.CASCADE, related_name='dashboard_counters', verbose_name="Organización")
+    
+    patients = models.IntegerField(default=0, verbose_name="Pacientes")
+    appointments = models.IntegerField(default=0, verbose_name="Citas")
+    scheduled_appointments = models.IntegerField(default=0, verbose_name="Citas Programadas")
+    specialty_consultations = models.IntegerField(default=0, verbose_name="Consultas de Especialidad")
+    sent_invoices = models.IntegerField(default=0, verbose_name="Facturas Enviadas")
+    paid_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Ingresos Facturados")
+    
+    reconciled_at = models.DateTimeField(verbose_name="Última Conciliación")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
+    
+    class Meta:
+        verbose_name = "Contadores del Dashboard"
+        verbose_name_plural = "Contadores del Dashboard"
+    
+    def __str__(self):
+        return f"{self.organization} - {self.updated_at}"
@@ -0,0 +1,156 @@
+"""
+TopicTales Biomédica - Generación de PDF
+Servicio compartido para reportes en PDF con ReportLab: estilos compilados
+una sola vez por proceso, anchos de columna fijos y tablas divididas en
+bloques que se construyen conforme se maquetan las páginas, así que la
+memoria no crece con el número de filas
+"""
+from functools import lru_cache
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from django.utils import timezone
+
+
+# Filas por tabla; cada bloque ocupa unas pocas páginas y se parte rápido
+PDF_TABLE_ROWS = 100
+
+# Ancho promedio de un carácter de Helvetica respecto al tamaño de fuente
+CHAR_WIDTH_RATIO = 0.5
+
+PORTRAIT = A4
+LANDSCAPE = landscape(A4)
+
+
+@lru_cache(maxsize=None)
+def stylesheet():
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(
+        'ReportTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=20,
+        alignment=TA_CENTER,
+    ))
+    return styles
+
+
+@lru_cache(maxsize=None)
+def table_style(font_size=8):
+    return TableStyle([
+        # Encabezado
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+        # Datos
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.beige, colors.white]),
+        ('FONTSIZE', (0, 0), (-1, -1), font_size),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ])
+
+
+@lru_cache(maxsize=None)
+def summary_style():
+    return TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ])
+
+
+def column_widths(columns, available_width):
+    """Reparte el ancho disponible en proporción a ``Column.width``"""
+    total = sum(column.width for column in columns) or 1
+    return [available_width * column.width / total for column in columns]
+
+
+def _fit(value, max_chars):
+    text = str(value)
+    if len(text) > max_chars:
+        return text[:max(max_chars - 3, 1)] + '...'
+    return text
+
+
+def table_chunks(headers, rows, widths, font_size=8, chunk_rows=PDF_TABLE_ROWS):
+    """
+    Tablas de ``chunk_rows`` filas con el encabezado repetido. Es un
+    generador: cada tabla se crea cuando el documento la necesita.
+    """
+    max_chars = [max(int(width / (font_size * CHAR_WIDTH_RATIO)), 4) for width in widths]
+    style = table_style(font_size)
+    chunk = []
+    produced = False
+    for row in rows:
+        chunk.append([_fit(value, limit) for value, limit in zip(row, max_chars)])
+        if len(chunk) == chunk_rows:
+            yield Table([headers] + chunk, colWidths=widths, repeatRows=1, style=style)
+            produced = True
+            chunk = []
+    if chunk or not produced:
+        yield Table([headers] + chunk, colWidths=widths, repeatRows=1, style=style)
+
+
+class _LazyStory(list):
+    """
+    Lista de flowables que se rellena desde un iterador. ReportLab consulta
+    ``len()`` antes de maquetar cada flowable, así que solo hay unas cuantas
+    tablas en memoria a la vez.
+    """
+
+    def __init__(self, flowables):
+        super().__init__()
+        self._pending = iter(flowables)
+
+    def __len__(self):
+        while super().__len__() < 2:
+            try:
+                self.append(next(self._pending))
+            except StopIteration:
+                break
+        return super().__len__()
+
+
+def write_pdf(output, title, headers, rows, widths=None, columns=None, subtitle=None,
+              summary=None, notes=(), pagesize=LANDSCAPE, font_size=8):
+    """
+    Escribe en ``output`` (de preferencia un archivo temporal) un PDF con
+    título, resumen opcional ``[(etiqueta, valor), ...]`` y la tabla de
+    ``rows``. Los anchos salen de ``widths`` o de ``columns`` (Column.width).
+    """
+    doc = SimpleDocTemplate(
+        output, pagesize=pagesize, title=title, pageCompression=1,
+        leftMargin=0.5 * inch, rightMargin=0.5 * inch, topMargin=0.5 * inch, bottomMargin=0.5 * inch,
+    )
+    if widths is None:
+        widths = column_widths(columns, doc.width) if columns else [doc.width / len(headers)] * len(headers)
+
+    styles = stylesheet()
+    if subtitle is None:
+        subtitle = f"TopicTales Biomédica - Generado el {timezone.localtime().strftime('%d/%m/%Y %H:%M')}"
+    header = [
+        Paragraph(title, styles['ReportTitle']),
+        Paragraph(subtitle, styles['Normal']),
+        Spacer(1, 12),
+    ]
+    if summary:
+        header += [
+            Table([[label, str(value)] for label, value in summary], colWidths=[3 * inch, 1.5 * inch], style=summary_style()),
+            Spacer(1, 12),
+        ]
+
+    def story():
+        yield from header
+        yield from table_chunks(headers, rows, widths, font_size)
+        for note in notes:
+            yield Spacer(1, 10)
+            yield Paragraph(note, styles['Normal'])
+
+    doc.build(_LazyStory(story()))
@@ -0,0 +1,169 @@
+"""
+TopicTales Biomédica - Formatos de archivo de reportes
+Registro de formatos de salida; ``Report.file_format`` elige el renderizador.
+Cada uno consume el iterador de filas de una Export (reports.exports) y
+escribe en un archivo binario sin juntar las filas en una lista.
+"""
+import io
+import json
+import shutil
+import tempfile
+from importlib import import_module
+
+from .exports import XLSX_CONTENT_TYPE
+
+
+# Formato usado cuando el pedido no existe o le falta su dependencia opcional
+FALLBACK = 'csv'
+
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class Renderer:
+    """
+    Formato de salida. ``write(export, output, report)`` escribe el archivo en
+    ``output``. Los formatos ``seekable`` regresan sobre lo ya escrito (el ZIP
+    de un XLSX) y se generan primero en un archivo temporal; los demás
+    escriben directo en la salida, aunque sea un flujo comprimido.
+    ``requires`` es el módulo opcional del que depende el formato.
+    """
+
+    def __init__(self, name, label, extension, content_type, write, seekable=False, requires=None):
+        self.name = name
+        self.label = label
+        self.extension = extension
+        self.content_type = content_type
+        self.write = write
+        self.seekable = seekable
+        self.requires = requires
+
+    @property
+    def available(self):
+        if self.requires is None:
+            return True
+        try:
+            import_module(self.requires)
+        except ImportError:
+            return False
+        return True
+
+    def render(self, export, output, report):
+        if not self.seekable:
+            self.write(export, output, report)
+            return
+        with tempfile.TemporaryFile() as buffer:
+            self.write(export, buffer, report)
+            buffer.seek(0)
+            shutil.copyfileobj(buffer, output, COPY_CHUNK_SIZE)
+
+
+RENDERERS = {}
+
+
+def register(renderer):
+    RENDERERS[renderer.name] = renderer
+    return renderer
+
+
+def get(name):
+    """Renderizador de ``name``; CSV si no existe o no está disponible"""
+    renderer = RENDERERS.get(name)
+    if renderer is None or not renderer.available:
+        return RENDERERS[FALLBACK]
+    return renderer
+
+
+def choices():
+    """Opciones de formato para los formularios, solo las disponibles"""
+    return [(renderer.name, renderer.label) for renderer in RENDERERS.values() if renderer.available]
+
+
+def content_type(extension):
+    for renderer in RENDERERS.values():
+        if renderer.extension == extension:
+            return renderer.content_type
+    return 'application/octet-stream'
+
+
+def _text(output):
+    # TextIOWrapper junta las líneas en bloques antes de escribir en ``output``
+    return io.TextIOWrapper(output, encoding='utf-8', newline='')
+
+
+def _write_csv(export, output, report):
+    text = _text(output)
+    export.write_csv(text, bom=True)
+    text.flush()
+    text.detach()
+
+
+def _write_excel(export, output, report):
+    export.write_xlsx(output, sheet_title='Reporte', title=report.title)
+
+
+def _write_pdf(export, output, report):
+    export.write_pdf(output, title=report.title)
+
+
+def _write_json(export, output, report):
+    headers = export.headers
+    text = _text(output)
+    text.write('[')
+    for index, row in enumerate(export.rows()):
+        if index:
+            text.write(',')
+        text.write(json.dumps(dict(zip(headers, row)), ensure_ascii=False, default=str))
+    text.write(']')
+    text.flush()
+    text.detach()
+
+
+def _write_jsonl(export, output, report):
+    headers = export.headers
+    text = _text(output)
+    for row in export.rows():
+        text.write(json.dumps(dict(zip(headers, row)), ensure_ascii=False, default=str))
+        text.write('\n')
+    text.flush()
+    text.detach()
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _write_parquet(export, output, report):
+    """
+    Un grupo de filas de Parquet por bloque de la Export. Todas las columnas
+    son texto: los valores ya vienen formateados y una misma columna puede
+    mezclar números con su valor por defecto ('-').
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(header, pa.string()) for header in export.headers])
+    with pq.ParquetWriter(output, schema) as writer:
+        for batch in _batches(export.rows(), export.chunk_size):
+            columns = [
+                pa.array([None if value is None else str(value) for value in values], type=pa.string())
+                for values in zip(*batch)
+            ]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+
+
+register(Renderer('pdf', 'PDF', 'pdf', 'application/pdf', _write_pdf, requires='reportlab'))
+register(Renderer('excel', 'Excel', 'xlsx', XLSX_CONTENT_TYPE, _write_excel, seekable=True, requires='openpyxl'))
+register(Renderer('csv', 'CSV', 'csv', 'text/csv; charset=utf-8', _write_csv))
+register(Renderer('json', 'JSON', 'json', 'application/json', _write_json))
+register(Renderer('jsonl', 'JSON Lines', 'jsonl', 'application/x-ndjson', _write_jsonl))
+register(Renderer(
+    'parquet', 'Parquet', 'parquet', 'application/vnd.apache.parquet', _write_parquet,
+    seekable=True, requires='pyarrow.parquet'
+))
@@ -0,0 +1,229 @@
+"""
+TopicTales Biomédica - Caché de resultados de reportes
+Los resultados se guardan bajo un hash de (tipo, filtros normalizados,
+organización, versión de datos); los archivos generados agregan a la clave el
+título y el formato, que van dentro del archivo. Las señales de los modelos de
+origen incrementan la versión, así que un cambio invalida las entradas sin
+borrarlas.
+Las vistas previas se guardan comprimidas en el backend de caché y los
+archivos generados, comprimidos con gzip en disco (ReportCacheEntry).
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import pickle
+import tempfile
+import zlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Sum
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.http import content_disposition_header
+
+from .models import ReportCacheCounter, ReportCacheEntry, ReportDataVersion
+
+
+ALL_SOURCES = ('appointments', 'consultations', 'patients', 'payments', 'specialty_consultations')
+
+# Fuentes de datos de cada tipo de reporte; análisis y personalizados usan todas
+REPORT_SOURCES = {
+    'patients': ('patients',),
+    'appointments': ('appointments', 'patients'),
+    'financial': ('patients', 'payments'),
+    'medical': ('consultations', 'patients'),
+}
+
+PREVIEW_PREFIX = 'reports:preview:'
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Los filtros vacíos no cambian el resultado (filter_patients los ignora)
+EMPTY_VALUES = (None, '', False, [], (), {})
+
+
+def _increment(model, lookup, field):
+    if model.objects.filter(**lookup).update(**{field: F(field) + 1}):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **{field: 1})
+    except IntegrityError:
+        model.objects.filter(**lookup).update(**{field: F(field) + 1})
+
+
+def bump_versions(source, organization_ids):
+    """Invalida los resultados de ``source`` en las organizaciones indicadas"""
+    for organization_id in set(organization_ids):
+        if organization_id is not None:
+            _increment(ReportDataVersion, {'organization_id': organization_id, 'source': source}, 'version')
+
+
+def normalize(value):
+    """Filtros en una forma estable para el hash: pks, fechas ISO y listas ordenadas"""
+    if isinstance(value, models.Model):
+        return value.pk
+    if isinstance(value, models.QuerySet):
+        return sorted(value.values_list('pk', flat=True))
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, dict):
+        return {
+            str(key): normalize(item) for key, item in value.items()
+            if item not in EMPTY_VALUES
+        }
+    if isinstance(value, (list, tuple, set)):
+        return sorted((normalize(item) for item in value), key=lambda item: json.dumps(item, default=str))
+    return value
+
+
+def result_key(report_type, filters, organization, file_format=''):
+    organization_id = getattr(organization, 'pk', organization)
+    sources = REPORT_SOURCES.get(report_type, ALL_SOURCES)
+    versions = dict(ReportDataVersion.objects.filter(
+        organization_id=organization_id, source__in=sources
+    ).values_list('source', 'version'))
+    payload = {
+        'type': report_type,
+        'filters': normalize(filters),
+        'organization': organization_id,
+        'versions': {source: versions.get(source, 0) for source in sources},
+        # Las edades y los rangos de edad dependen del día
+        'day': timezone.localdate().isoformat(),
+        'format': file_format,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def record(organization, kind, hit):
+    organization_id = getattr(organization, 'pk', organization)
+    if organization_id is not None:
+        _increment(
+            ReportCacheCounter, {'organization_id': organization_id, 'kind': kind}, 'hits' if hit else 'misses'
+        )
+
+
+def hit_ratio(organization):
+    """Aciertos, fallos y porcentaje de aciertos de la organización"""
+    totals = ReportCacheCounter.objects.filter(organization=organization).aggregate(
+        hits=Sum('hits'), misses=Sum('misses')
+    )
+    hits, misses = totals['hits'] or 0, totals['misses'] or 0
+    return {
+        'hits': hits,
+        'misses': misses,
+        'ratio': round(hits * 100 / (hits + misses), 1) if hits + misses else None,
+    }
+
+
+# Vistas previas
+
+def cached_preview(report_type, filters, organization, compute):
+    """
+    Devuelve la vista previa en caché o la calcula con ``compute()``. El
+    resultado debe ser serializable con pickle (listas, no querysets).
+    """
+    key = PREVIEW_PREFIX + result_key(report_type, filters, organization)
+    raw = cache.get(key)
+    if raw is not None:
+        record(organization, 'preview', hit=True)
+        return pickle.loads(zlib.decompress(raw))
+
+    payload = compute()
+    cache.set(key, zlib.compress(pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)), settings.REPORT_CACHE_TIMEOUT)
+    record(organization, 'preview', hit=False)
+    return payload
+
+
+# Archivos generados
+
+def report_key(report, organization):
+    # El título entra en la clave porque los archivos PDF y Excel lo incluyen
+    filters = dict(report.filters, date_from=report.date_from, date_to=report.date_to, title=report.title)
+    return result_key(report.report_type, filters, organization, report.file_format)
+
+
+def lookup(key, organization):
+    """Entrada vigente para ``key`` o ``None``; cuenta el acierto"""
+    entry = ReportCacheEntry.objects.filter(key=key).first()
+    if entry is None or not entry.file.storage.exists(entry.file.name):
+        return None
+    ReportCacheEntry.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    record(organization, 'file', hit=True)
+    return entry
+
+
+def store(key, report, organization, extension, write):
+    """
+    Genera el archivo con ``write(salida)`` directamente en un flujo gzip, sin
+    copia intermedia sin comprimir, y lo guarda bajo ``key``
+    """
+    with tempfile.TemporaryFile() as compressed:
+        with gzip.GzipFile(fileobj=compressed, mode='wb', mtime=0) as gz:
+            write(gz)
+            size = gz.tell()
+        compressed.seek(0)
+
+        entry = ReportCacheEntry(
+            key=key, organization=organization, report_type=report.report_type,
+            extension=extension, size=size
+        )
+        entry.file.save(f'{key}.{extension}.gz', File(compressed), save=False)
+
+    try:
+        with transaction.atomic():
+            entry.save()
+    except IntegrityError:
+        # Otro worker guardó la misma clave mientras se generaba
+        entry.file.delete(save=False)
+        entry = ReportCacheEntry.objects.get(key=key)
+    record(organization, 'file', hit=False)
+    return entry
+
+
+def prune(max_age=None):
+    """Borra las entradas sin reportes que no se han usado en ``max_age`` días"""
+    cutoff = timezone.now() - timedelta(days=max_age or settings.REPORT_CACHE_MAX_AGE)
+    removed = 0
+    for entry in ReportCacheEntry.objects.filter(last_used_at__lt=cutoff, reports__isnull=True):
+        entry.file.delete(save=False)
+        entry.delete()
+        removed += 1
+    return removed
+
+
+def _decompressed(fileobj):
+    with fileobj, gzip.GzipFile(fileobj=fileobj) as gz:
+        while True:
+            chunk = gz.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def file_response(request, entry, filename, content_type=None):
+    """
+    Sirve el archivo en caché tal como está guardado si el cliente acepta gzip;
+    si no, lo descomprime por bloques
+    """
+    content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        response = FileResponse(
+            entry.file.open('rb'), as_attachment=True, filename=filename, content_type=content_type
+        )
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse(_decompressed(entry.file.open('rb')), content_type=content_type)
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+        response['Content-Length'] = entry.size
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
@@ -0,0 +1,289 @@
+"""
+TopicTales Biomédica - Métricas diarias por organización
+Mantiene DailyOrgMetrics y DailyAppointmentMetrics de forma incremental y
+permite reconstruir cualquier rango de fechas desde las tablas de origen
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.apps import apps as global_apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyOrgMetrics, DailyAppointmentMetrics
+
+
+# Claves de contribución: ('daily', org_id, fecha) o
+# ('appointments', org_id, fecha, doctor_id, tipo_id, estado)
+DAILY = 'daily'
+APPOINTMENTS = 'appointments'
+
+
+def local_date(value):
+    """Fecha local de un datetime, igual a la que usa TruncDate"""
+    if timezone.is_aware(value):
+        return timezone.localdate(value)
+    return value.date()
+
+
+def _apply_increment(model, lookup, deltas):
+    """Suma ``deltas`` a la fila ``lookup`` con F(), creándola si no existe"""
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Otra transacción creó la fila entre el update y el create
+        model.objects.filter(**lookup).update(**updates)
+
+
+def apply_contributions(before, after):
+    """
+    Aplica la diferencia entre dos conjuntos de contribuciones
+    ``{clave: {campo: valor}}`` a las tablas de métricas
+    """
+    for key in set(before) | set(after):
+        old = before.get(key, {})
+        new = after.get(key, {})
+        deltas = {}
+        for field in set(old) | set(new):
+            delta = new.get(field, 0) - old.get(field, 0)
+            if delta:
+                deltas[field] = delta
+        if not deltas:
+            continue
+
+        if key[0] == DAILY:
+            _, organization_id, day = key
+            _apply_increment(
+                DailyOrgMetrics,
+                {'organization_id': organization_id, 'date': day},
+                deltas
+            )
+        else:
+            _, organization_id, day, doctor_id, appointment_type_id, status = key
+            _apply_increment(
+                DailyAppointmentMetrics,
+                {
+                    'organization_id': organization_id,
+                    'date': day,
+                    'doctor_id': doctor_id,
+                    'appointment_type_id': appointment_type_id,
+                    'status': status,
+                },
+                deltas
+            )
+
+
+# Contribuciones de cada modelo de origen
+
+def appointment_contributions(appointment):
+    day = local_date(appointment.start_datetime)
+    return {
+        (DAILY, appointment.organization_id, day): {'appointments': 1},
+        (APPOINTMENTS, appointment.organization_id, day, appointment.doctor_id,
+         appointment.appointment_type_id, appointment.status): {'count': 1},
+    }
+
+
+def patient_contributions(patient):
+    if not patient.registration_date:
+        return {}
+    return {
+        (DAILY, patient.organization_id, local_date(patient.registration_date)): {'new_patients': 1},
+    }
+
+
+def consultation_contributions(consultation):
+    return {
+        (DAILY, consultation.organization_id, local_date(consultation.consultation_date)): {'consultations': 1},
+    }
+
+
+def specialty_consultation_contributions(consultation):
+    from patients.models import Patient
+
+    organization_id = Patient.objects.filter(
+        pk=consultation.patient_id
+    ).values_list('organization_id', flat=True).first()
+    if organization_id is None:
+        return {}
+    return {
+        (DAILY, organization_id, local_date(consultation.date)): {'specialty_consultations': 1},
+    }
+
+
+def payment_contributions(payment):
+    from billing.models import Invoice
+
+    if payment.status != 'completed':
+        return {}
+    organization_id = Invoice.objects.filter(
+        pk=payment.invoice_id
+    ).values_list('patient__organization_id', flat=True).first()
+    if organization_id is None:
+        return {}
+    return {
+        (DAILY, organization_id, local_date(payment.payment_date)): {'revenue': payment.amount},
+    }
+
+
+# Reconstrucción desde las tablas de origen
+
+def _source_models(apps):
+    return {
+        name: apps.get_model(app_label, name)
+        for app_label, name in [
+            ('patients', 'Patient'),
+            ('appointments', 'Appointment'),
+            ('medical_records', 'Consultation'),
+            ('specialties', 'SpecialtyConsultation'),
+            ('billing', 'Payment'),
+            ('reports', 'DailyOrgMetrics'),
+            ('reports', 'DailyAppointmentMetrics'),
+        ]
+    }
+
+
+def rebuild(date_from, date_to, organization_ids=None, apps=global_apps):
+    """
+    Recalcula las métricas de ``date_from`` a ``date_to`` (inclusive) con
+    consultas agrupadas y reemplaza las filas existentes del rango.
+    ``apps`` permite usar los modelos históricos desde una migración.
+    """
+    models = _source_models(apps)
+    Patient, Appointment, Consultation = models['Patient'], models['Appointment'], models['Consultation']
+    SpecialtyConsultation, Payment = models['SpecialtyConsultation'], models['Payment']
+    DailyOrgMetrics, DailyAppointmentMetrics = models['DailyOrgMetrics'], models['DailyAppointmentMetrics']
+
+    def scoped(queryset, date_field, organization_field='organization'):
+        queryset = queryset.annotate(day=TruncDate(date_field)).filter(
+            day__gte=date_from,
+            day__lte=date_to
+        )
+        if organization_ids is not None:
+            queryset = queryset.filter(**{f'{organization_field}__in': organization_ids})
+        return queryset.order_by()
+
+    daily = defaultdict(lambda: defaultdict(int))
+    appointment_rows = []
+
+    for row in scoped(Appointment.objects.all(), 'start_datetime').values(
+        'organization_id', 'day', 'doctor_id', 'appointment_type_id', 'status'
+    ).annotate(count=Count('id')):
+        daily[(row['organization_id'], row['day'])]['appointments'] += row['count']
+        appointment_rows.append(DailyAppointmentMetrics(
+            organization_id=row['organization_id'],
+            date=row['day'],
+            doctor_id=row['doctor_id'],
+            appointment_type_id=row['appointment_type_id'],
+            status=row['status'],
+            count=row['count']
+        ))
+
+    sources = [
+        ('new_patients', scoped(Patient.objects.all(), 'registration_date'), 'organization_id', Count('id')),
+        ('consultations', scoped(Consultation.objects.all(), 'consultation_date'), 'organization_id', Count('id')),
+        ('specialty_consultations', scoped(
+            SpecialtyConsultation.objects.all(), 'date', 'patient__organization'
+        ), 'patient__organization_id', Count('id')),
+        ('revenue', scoped(
+            Payment.objects.filter(status='completed'), 'payment_date', 'invoice__patient__organization'
+        ), 'invoice__patient__organization_id', Sum('amount')),
+    ]
+    for field, queryset, organization_field, aggregate in sources:
+        for row in queryset.values(organization_field, 'day').annotate(value=aggregate):
+            daily[(row[organization_field], row['day'])][field] += row['value'] or 0
+
+    with transaction.atomic():
+        for model in (DailyOrgMetrics, DailyAppointmentMetrics):
+            stale = model.objects.filter(date__gte=date_from, date__lte=date_to)
+            if organization_ids is not None:
+                stale = stale.filter(organization_id__in=organization_ids)
+            stale.delete()
+
+        DailyOrgMetrics.objects.bulk_create([
+            DailyOrgMetrics(organization_id=organization_id, date=day, **values)
+            for (organization_id, day), values in daily.items()
+        ], batch_size=1000)
+        DailyAppointmentMetrics.objects.bulk_create(appointment_rows, batch_size=1000)
+
+    return len(daily), len(appointment_rows)
+
+
+def history_range(apps=global_apps):
+    """
+    Primer y último día con datos de origen, o None si no hay ninguno;
+    es el rango que hay que reconstruir para cubrir todo el historial
+    """
+    models = _source_models(apps)
+    Patient, Appointment, Consultation = models['Patient'], models['Appointment'], models['Consultation']
+    SpecialtyConsultation, Payment = models['SpecialtyConsultation'], models['Payment']
+
+    bounds = []
+    for queryset, field in [
+        (Appointment.objects.all(), 'start_datetime'),
+        (Patient.objects.all(), 'registration_date'),
+        (Consultation.objects.all(), 'consultation_date'),
+        (SpecialtyConsultation.objects.all(), 'date'),
+        (Payment.objects.filter(status='completed'), 'payment_date'),
+    ]:
+        values = queryset.aggregate(first=Min(field), last=Max(field))
+        bounds += [local_date(value) for value in values.values() if value is not None]
+    if not bounds:
+        return None
+    return min(bounds), max(bounds)
+
+
+def rebuild_in_chunks(date_from, date_to, organization_ids=None, chunk_days=31, apps=global_apps):
+    """
+    Reconstruye el rango en transacciones de ``chunk_days`` días y genera
+    ``(inicio, fin, días, filas de citas)`` por cada tramo
+    """
+    chunk = timedelta(days=max(chunk_days, 1))
+    start = date_from
+    while start <= date_to:
+        end = min(start + chunk - timedelta(days=1), date_to)
+        yield (start, end) + rebuild(start, end, organization_ids, apps)
+        start = end + timedelta(days=1)
+
+
+# Lectura
+
+def daily_totals(organization, date_from=None, date_to=None):
+    """Suma de las métricas diarias de una organización en un rango"""
+    queryset = DailyOrgMetrics.objects.filter(organization=organization)
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+    totals = queryset.aggregate(
+        appointments=Sum('appointments'),
+        new_patients=Sum('new_patients'),
+        consultations=Sum('consultations'),
+        specialty_consultations=Sum('specialty_consultations'),
+        revenue=Sum('revenue'),
+    )
+    return {
+        field: value if value is not None else (Decimal('0') if field == 'revenue' else 0)
+        for field, value in totals.items()
+    }
+
+
+def appointment_metrics(organization, date_from=None, date_to=None, status=None, doctor=None):
+    """QuerySet de DailyAppointmentMetrics filtrado para desgloses"""
+    queryset = DailyAppointmentMetrics.objects.filter(organization=organization)
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+    if status:
+        queryset = queryset.filter(status=status)
+    if doctor:
+        queryset = queryset.filter(doctor=doctor)
+    return queryset
@@ -0,0 +1,141 @@
+"""
+TopicTales Biomédica - Programador de reportes
+Encola los reportes programados cuya ``next_run`` ya pasó y calcula la
+siguiente. Un solo proceso actúa como líder gracias a una fila de bloqueo, y
+las definiciones idénticas de una organización se generan una sola vez.
+"""
+import json
+import os
+import socket
+import statistics
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import jobs
+from .models import Report, SchedulerLock
+
+
+LOCK_NAME = 'reports.scheduler'
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def acquire_leadership(owner, ttl):
+    """
+    Toma o renueva el bloqueo del programador por ``ttl`` segundos. Devuelve
+    ``True`` si ``owner`` es el líder.
+    """
+    now = timezone.now()
+    if not SchedulerLock.objects.filter(name=LOCK_NAME).exists():
+        try:
+            with transaction.atomic():
+                SchedulerLock.objects.create(name=LOCK_NAME, owner='', expires_at=now)
+        except IntegrityError:
+            pass
+    taken = SchedulerLock.objects.filter(name=LOCK_NAME).filter(
+        Q(owner=owner) | Q(expires_at__lte=now)
+    ).update(owner=owner, expires_at=now + timedelta(seconds=ttl))
+    return bool(taken)
+
+
+def release_leadership(owner):
+    SchedulerLock.objects.filter(name=LOCK_NAME, owner=owner).update(expires_at=timezone.now())
+
+
+def definition_key(report):
+    """
+    Reportes con la misma clave producen el mismo archivo; el título entra en
+    la clave porque los formatos PDF y Excel lo escriben en el documento
+    """
+    profile = getattr(report.created_by, 'profile', None)
+    return (
+        profile.organization_id if profile else None,
+        report.title,
+        report.report_type,
+        json.dumps(report.filters, sort_keys=True, default=str),
+        report.date_from,
+        report.date_to,
+        report.file_format,
+    )
+
+
+def due_reports(now=None):
+    """Reportes programados vencidos; usa el índice (is_scheduled, next_run)"""
+    return Report.objects.filter(
+        is_scheduled=True, next_run__lte=now or timezone.now()
+    ).select_related('created_by__profile').order_by('next_run')
+
+
+def tick(now=None):
+    """
+    Encola los reportes vencidos y adelanta su ``next_run``. Dentro de cada
+    grupo con la misma definición solo el primero se genera; los demás
+    quedan ``coalesced_into`` él y reciben su archivo al terminar.
+    """
+    now = now or timezone.now()
+    stats = {'due': 0, 'enqueued': 0, 'coalesced': 0, 'skipped': 0, 'max_lag': timedelta(0)}
+    groups = defaultdict(list)
+
+    with transaction.atomic():
+        for report in due_reports(now).select_for_update(of=('self',)):
+            stats['due'] += 1
+            stats['max_lag'] = max(stats['max_lag'], now - report.next_run)
+            scheduled_for = report.next_run
+            Report.objects.filter(pk=report.pk).update(next_run=report.compute_next_run(now))
+            if report.status in ('pending', 'processing'):
+                # La ejecución anterior sigue en curso; se omite esta
+                stats['skipped'] += 1
+                continue
+            report.scheduled_for = scheduled_for
+            groups[definition_key(report)].append(report)
+
+        for primary, *followers in groups.values():
+            jobs.enqueue(primary)
+            Report.objects.filter(pk=primary.pk).update(scheduled_for=primary.scheduled_for)
+            stats['enqueued'] += 1
+            for follower in followers:
+                Report.objects.filter(pk=follower.pk).update(
+                    status='pending', progress=0, error='', started_at=None, finished_at=None,
+                    scheduled_for=follower.scheduled_for, coalesced_into=primary
+                )
+                stats['coalesced'] += 1
+    return stats
+
+
+def metrics(since=None):
+    """
+    Retraso (de ``scheduled_for`` al inicio de la generación) y duración de
+    las últimas ejecuciones programadas, en segundos
+    """
+    runs = Report.objects.filter(
+        scheduled_for__isnull=False, started_at__isnull=False, finished_at__isnull=False
+    )
+    if since is not None:
+        runs = runs.filter(scheduled_for__gte=since)
+    lags, durations = [], []
+    for scheduled_for, started_at, finished_at in runs.values_list('scheduled_for', 'started_at', 'finished_at'):
+        lags.append(max((started_at - scheduled_for).total_seconds(), 0))
+        durations.append(max((finished_at - started_at).total_seconds(), 0))
+
+    def summary(values):
+        if not values:
+            return {'avg': None, 'p95': None, 'max': None}
+        ordered = sorted(values)
+        return {
+            'avg': round(statistics.mean(ordered), 2),
+            'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+            'max': round(ordered[-1], 2),
+        }
+
+    return {
+        'runs': len(lags),
+        'lag': summary(lags),
+        'duration': summary(durations),
+        'failed': runs.filter(status='failed').count(),
+    }
@@ -0,0 +1,86 @@
+"""
+TopicTales Biomédica - Señales de reportes
+Mantienen las métricas diarias y los contadores del dashboard al día cuando
+cambian los datos de origen e invalidan la caché de resultados de reportes
+"""
+from django.db.models.signals import pre_save, post_save, post_delete
+
+from patients.models import Patient
+from appointments.models import Appointment
+from medical_records.models import Consultation
+from specialties.models import SpecialtyConsultation
+from billing.models import Invoice, Payment
+
+from . import counters, result_cache, rollup
+
+
+ROLLUP_SOURCES = {
+    Appointment: rollup.appointment_contributions,
+    Patient: rollup.patient_contributions,
+    Consultation: rollup.consultation_contributions,
+    SpecialtyConsultation: rollup.specialty_consultation_contributions,
+    Payment: rollup.payment_contributions,
+}
+
+# Fuente de datos de la caché de reportes que invalida cada modelo
+CACHE_SOURCES = {
+    Appointment: 'appointments',
+    Patient: 'patients',
+    Consultation: 'consultations',
+    SpecialtyConsultation: 'specialty_consultations',
+    Payment: 'payments',
+}
+
+COUNTER_SOURCES = {
+    Appointment: counters.appointment_contributions,
+    Patient: counters.patient_contributions,
+    SpecialtyConsultation: counters.specialty_consultation_contributions,
+    Invoice: counters.invoice_contributions,
+}
+
+
+def _organizations(*contributions):
+    # Las claves de contribución llevan la organización en la segunda posición
+    return {key[1] for contribution in contributions for key in contribution}
+
+
+def capture_previous_contributions(sender, instance, raw=False, **kwargs):
+    """Guarda las contribuciones actuales en BD antes de sobrescribirlas"""
+    instance._rollup_before = {}
+    instance._counters_before = {}
+    if raw or not instance.pk:
+        return
+    previous = sender._default_manager.filter(pk=instance.pk).first()
+    if previous is None:
+        return
+    if sender in ROLLUP_SOURCES:
+        instance._rollup_before = ROLLUP_SOURCES[sender](previous)
+    if sender in COUNTER_SOURCES:
+        instance._counters_before = COUNTER_SOURCES[sender](previous)
+
+
+def apply_saved_contributions(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if sender in ROLLUP_SOURCES:
+        before = getattr(instance, '_rollup_before', {})
+        after = ROLLUP_SOURCES[sender](instance)
+        rollup.apply_contributions(before, after)
+        result_cache.bump_versions(CACHE_SOURCES[sender], _organizations(before, after))
+    if sender in COUNTER_SOURCES:
+        counters.apply_contributions(getattr(instance, '_counters_before', {}), COUNTER_SOURCES[sender](instance))
+
+
+def remove_deleted_contributions(sender, instance, **kwargs):
+    if sender in ROLLUP_SOURCES:
+        before = ROLLUP_SOURCES[sender](instance)
+        rollup.apply_contributions(before, {})
+        result_cache.bump_versions(CACHE_SOURCES[sender], _organizations(before))
+    if sender in COUNTER_SOURCES:
+        counters.apply_contributions(COUNTER_SOURCES[sender](instance), {})
+
+
+for model in {**ROLLUP_SOURCES, **COUNTER_SOURCES}:
+    pre_save.connect(capture_previous_contributions, sender=model, dispatch_uid=f'rollup_pre_save_{model.__name__}')
+    post_save.connect(apply_saved_contributions, sender=model, dispatch_uid=f'rollup_post_save_{model.__name__}')
+    post_delete.connect(remove_deleted_contributions, sender=model, dispatch_uid=f'rollup_post_delete_{model.__name__}')
@@ -0,0 +1,13 @@
+"""
+TopicTales Biomédica - Tareas de Celery de reportes
+Solo se usan con REPORTS_USE_CELERY; sin Celery el worker de base de datos
+(`manage.py run_report_worker`) genera los mismos reportes
+"""
+from celery import shared_task
+
+from . import jobs
+
+
+@shared_task(name='reports.generate_report')
+def generate_report_task(report_id):
+    jobs.run(report_id)
@@ -1,3 +1,946 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import json
+import re
+import shutil
+import tempfile
+import threading
+import zlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+import numpy as np
+
+from accounts.models import Organization
+from accounts.tests import LOCMEM_CACHE, create_view_fixtures
+from appointments.models import Appointment
+from billing.models import Payment
+from patients.models import Patient
+from patients.tests import create_patient
+from . import (
+    datasets, demographics, exports, jobs, pdf, renderers, result_cache, rollup, scheduler, timeseries, views
+)
+from .datasets import AGE_RANGES
+from .models import DailyAppointmentMetrics, DailyOrgMetrics, Report, ReportCacheEntry, SchedulerLock
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+
+def create_other_organization():
+    return Organization.objects.create(
+        name='Otra Clínica', legal_name='Otra Clínica SA', tax_id='OTRA010101',
+        address='Calle 3', phone='5550000001', email='otra@test.com',
+        director_name='Directora', director_license='654321'
+    )
+
+
+class DailyRollupTests(TestCase):
+    """The signal deltas must leave the rollup equal to a fresh recount"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.user, cls.patients = create_view_fixtures(rows=3)
+        cls.other = create_other_organization()
+
+    def _snapshot(self):
+        daily = {
+            (row.organization_id, row.date): (
+                row.appointments, row.new_patients, row.consultations,
+                row.specialty_consultations, row.revenue
+            )
+            for row in DailyOrgMetrics.objects.all()
+            if any((row.appointments, row.new_patients, row.consultations,
+                    row.specialty_consultations, row.revenue))
+        }
+        appointments = {
+            (row.organization_id, row.date, row.doctor_id, row.appointment_type_id, row.status): row.count
+            for row in DailyAppointmentMetrics.objects.all()
+            if row.count
+        }
+        return daily, appointments
+
+    def assertMatchesRecount(self):
+        incremental = self._snapshot()
+        rollup.rebuild(*rollup.history_range())
+        self.assertEqual(incremental, self._snapshot())
+
+    def test_fixture_inserts(self):
+        self.assertTrue(DailyOrgMetrics.objects.exists())
+        self.assertMatchesRecount()
+
+    def test_appointment_status_date_and_organization_changes(self):
+        from appointments.models import Appointment
+
+        first, second, third = Appointment.objects.order_by('pk')
+        first.status = 'completed'
+        first.save()
+        second.start_datetime -= timedelta(days=40)
+        second.end_datetime -= timedelta(days=40)
+        second.save()
+        third.organization = self.other
+        third.save()
+
+        self.assertMatchesRecount()
+
+    def test_payment_amount_status_and_date_changes(self):
+        from billing.models import Payment
+
+        first, second, third = Payment.objects.order_by('pk')
+        first.status = 'completed'
+        first.save()
+        second.status = 'completed'
+        second.save()
+        second.amount = Decimal('75.50')
+        second.payment_date -= timedelta(days=3)
+        second.save()
+        third.status = 'completed'
+        third.save()
+        third.status = 'refunded'
+        third.save()
+
+        self.assertMatchesRecount()
+        self.assertEqual(rollup.daily_totals(self.organization)['revenue'], Decimal('125.50'))
+
+    def test_patient_and_consultation_changes(self):
+        from medical_records.models import Consultation
+
+        patient = self.patients[0]
+        patient.organization = self.other
+        patient.save()
+        consultation = Consultation.objects.order_by('pk').first()
+        consultation.consultation_date -= timedelta(days=10)
+        consultation.save()
+
+        self.assertMatchesRecount()
+
+    def test_deletes(self):
+        from appointments.models import Appointment
+        from billing.models import Payment
+
+        Payment.objects.update(status='completed')
+        rollup.rebuild(*rollup.history_range())
+        Appointment.objects.order_by('pk').first().delete()
+        Payment.objects.order_by('pk').first().delete()
+        # Cascades to the patient's appointments, consultations and payments
+        self.patients[1].delete()
+
+        self.assertMatchesRecount()
+
+    def test_history_range_covers_every_source(self):
+        from medical_records.models import Consultation
+
+        old = timezone.now() - timedelta(days=400)
+        Consultation.objects.filter(pk=Consultation.objects.order_by('pk').first().pk).update(consultation_date=old)
+
+        date_from, date_to = rollup.history_range()
+        self.assertEqual(date_from, timezone.localdate(old))
+        self.assertGreaterEqual(date_to, timezone.localdate())
+
+    def test_backfill_and_command_default_cover_all_history(self):
+        backfill = import_module('reports.migrations.0007_backfill_daily_metrics').backfill_daily_metrics
+        from medical_records.models import Consultation
+
+        old = timezone.now() - timedelta(days=400)
+        Consultation.objects.filter(pk=Consultation.objects.order_by('pk').first().pk).update(consultation_date=old)
+        rollup.rebuild(*rollup.history_range())
+        expected = self._snapshot()
+
+        DailyOrgMetrics.objects.all().delete()
+        DailyAppointmentMetrics.objects.all().delete()
+        backfill(apps, None)
+        self.assertEqual(self._snapshot(), expected)
+
+        DailyOrgMetrics.objects.all().delete()
+        DailyAppointmentMetrics.objects.all().delete()
+        call_command('rebuild_daily_metrics', stdout=StringIO())
+        self.assertEqual(self._snapshot(), expected)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ReportJobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.user, cls.patients = create_view_fixtures(rows=5)
+        Report.objects.all().delete()
+
+    def _report(self, **fields):
+        fields = {'title': 'Pacientes', 'report_type': 'patients', 'file_format': 'csv', **fields}
+        return Report.objects.create(created_by=self.user, **fields)
+
+    def test_each_pending_report_is_claimed_once(self):
+        first, second = self._report(), self._report()
+
+        claimed = [jobs.claim(), jobs.claim(), jobs.claim()]
+        self.assertEqual([report and report.pk for report in claimed], [first.pk, second.pk, None])
+        self.assertEqual(set(Report.objects.values_list('status', flat=True)), {'processing'})
+        self.assertIsNone(jobs.claim(first.pk))
+
+    def test_claim_skips_a_report_taken_by_another_worker(self):
+        first, second = self._report(), self._report()
+        real_filter = Report.objects.filter
+
+        def filter_losing_first(*args, **kwargs):
+            queryset = real_filter(*args, **kwargs)
+            if kwargs == {'pk': first.pk, 'status': 'pending'}:
+                # Another worker claims ``first`` between the SELECT and the UPDATE
+                real_filter(pk=first.pk).update(status='processing')
+            return queryset
+
+        with mock.patch.object(Report.objects, 'filter', side_effect=filter_losing_first):
+            claimed = jobs.claim()
+
+        self.assertEqual(claimed.pk, second.pk)
+
+    def test_progress_is_stored_while_rendering(self):
+        report = self._report()
+        seen = []
+        export = exports.Export
+
+        def small_chunks(queryset, columns, filename, progress):
+            def spy(count):
+                progress(count)
+                seen.append(Report.objects.get(pk=report.pk).progress)
+            return export(queryset, columns, filename, chunk_size=2, progress=spy)
+
+        with mock.patch.object(exports, 'Export', side_effect=small_chunks):
+            jobs.run(report.pk)
+
+        report.refresh_from_db()
+        self.assertEqual(seen, [40, 80])
+        self.assertEqual((report.status, report.progress, report.error), ('completed', 100, ''))
+        with report.cache_entry.file.open('rb') as stored:
+            self.assertTrue(stored.read())
+
+    def test_failure_reaches_coalesced_reports(self):
+        primary = self._report()
+        follower = self._report(coalesced_into=primary)
+
+        with mock.patch.object(jobs.datasets, 'report_dataset', side_effect=RuntimeError('sin conexión')):
+            with self.assertLogs('reports.jobs', 'ERROR'):
+                report = jobs.run()
+
+        self.assertEqual(report.pk, primary.pk)
+        for report in (primary, follower):
+            report.refresh_from_db()
+            self.assertEqual((report.status, report.error), ('failed', 'sin conexión'))
+            self.assertIsNone(report.coalesced_into)
+            self.assertIsNotNone(report.finished_at)
+
+    def test_coalesced_reports_get_the_primary_file(self):
+        primary = self._report()
+        follower = self._report(coalesced_into=primary)
+
+        self.assertEqual(jobs.run().pk, primary.pk)
+        self.assertIsNone(jobs.run())
+
+        primary.refresh_from_db()
+        follower.refresh_from_db()
+        self.assertEqual(follower.status, 'completed')
+        self.assertEqual(follower.file_path.name, primary.file_path.name)
+
+    def test_identical_reports_share_the_cached_file_only_with_the_same_title(self):
+        first = jobs.run(self._report(file_format='pdf').pk)
+        same = jobs.run(self._report(file_format='pdf').pk)
+        renamed = jobs.run(self._report(file_format='pdf', title='Pacientes de Ana').pk)
+
+        self.assertEqual(same.cache_entry_id, first.cache_entry_id)
+        self.assertNotEqual(renamed.cache_entry_id, first.cache_entry_id)
+        with renamed.cache_entry.file.open('rb') as stored:
+            self.assertIn(b'Pacientes de Ana', gzip.decompress(stored.read()))
+
+    def test_stale_processing_reports_are_requeued(self):
+        stale = self._report(status='processing', progress=60, started_at=timezone.now() - timedelta(hours=2))
+        running = self._report(status='processing', started_at=timezone.now())
+
+        self.assertEqual(jobs.requeue_stale(timeout=1800), 1)
+
+        stale.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual((stale.status, stale.progress), ('pending', 0))
+        self.assertEqual(running.status, 'processing')
+        self.assertEqual(jobs.run().pk, stale.pk)
+
+
+class ReportRendererTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.user, cls.patients = create_view_fixtures(rows=5)
+        Report.objects.all().delete()
+
+    def setUp(self):
+        # A media directory per test, so stored names never get a collision suffix
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def _render(self, file_format):
+        report = jobs.run(Report.objects.create(
+            created_by=self.user, title='Pacientes', report_type='patients', file_format=file_format
+        ).pk)
+        self.assertEqual(report.status, 'completed', report.error)
+        with report.cache_entry.file.open('rb') as stored:
+            content = gzip.decompress(stored.read())
+        export = exports.Export(*datasets.report_dataset(report, self.organization), 'esperado')
+        return report, content, export.headers, list(export.rows())
+
+    def _records(self, headers, rows):
+        return json.loads(json.dumps([dict(zip(headers, row)) for row in rows], default=str))
+
+    def test_csv(self):
+        report, content, headers, rows = self._render('csv')
+
+        self.assertTrue(report.cache_entry.file.name.endswith('.csv.gz'))
+        parsed = list(csv.reader(StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual(parsed, [headers] + [[str(value) for value in row] for row in rows])
+        self.assertEqual(len(parsed), 6)
+
+    def test_json(self):
+        report, content, headers, rows = self._render('json')
+
+        self.assertTrue(report.cache_entry.file.name.endswith('.json.gz'))
+        self.assertEqual(json.loads(content.decode('utf-8')), self._records(headers, rows))
+
+    def test_jsonl(self):
+        report, content, headers, rows = self._render('jsonl')
+
+        self.assertTrue(report.cache_entry.file.name.endswith('.jsonl.gz'))
+        lines = content.decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self._records(headers, rows))
+
+    def test_excel(self):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            self.skipTest('openpyxl is not installed')
+        report, content, headers, rows = self._render('excel')
+
+        self.assertTrue(report.cache_entry.file.name.endswith('.xlsx.gz'))
+        sheet = load_workbook(BytesIO(content))['Reporte']
+        parsed = [list(row) for row in sheet.iter_rows(values_only=True)]
+        self.assertEqual(parsed[0][0], 'Pacientes')
+        self.assertEqual(parsed[3], headers)
+        self.assertEqual(len(parsed[4:]), len(rows))
+
+    def test_pdf(self):
+        report, content, headers, rows = self._render('pdf')
+
+        self.assertTrue(report.cache_entry.file.name.endswith('.pdf.gz'))
+        self.assertTrue(content.startswith(b'%PDF'))
+
+    def test_parquet(self):
+        if not renderers.RENDERERS['parquet'].available:
+            self.skipTest('pyarrow is not installed')
+        import pyarrow.parquet as pq
+
+        report, content, headers, rows = self._render('parquet')
+
+        self.assertTrue(report.cache_entry.file.name.endswith('.parquet.gz'))
+        table = pq.read_table(BytesIO(content))
+        self.assertEqual(table.column_names, headers)
+        self.assertEqual(table.to_pylist(), [
+            {header: None if value is None else str(value) for header, value in zip(headers, row)}
+            for row in rows
+        ])
+
+    def test_parquet_without_pyarrow_falls_back_to_csv(self):
+        real_import = renderers.import_module
+
+        def without_pyarrow(name, *args):
+            if name.startswith('pyarrow'):
+                raise ImportError(name)
+            return real_import(name, *args)
+
+        with mock.patch.object(renderers, 'import_module', side_effect=without_pyarrow):
+            self.assertIs(renderers.get('parquet'), renderers.RENDERERS['csv'])
+            self.assertNotIn('parquet', dict(renderers.choices()))
+            report, content, headers, rows = self._render('parquet')
+
+        self.assertEqual(report.cache_entry.extension, 'csv')
+        self.assertTrue(report.cache_entry.file.name.endswith('.csv.gz'))
+        self.assertEqual(next(csv.reader(StringIO(content.decode('utf-8-sig')))), headers)
+
+    def test_registry(self):
+        self.assertIs(renderers.get('csv'), renderers.RENDERERS['csv'])
+        self.assertIs(renderers.get('desconocido'), renderers.RENDERERS[renderers.FALLBACK])
+        self.assertIn(('json', 'JSON'), renderers.choices())
+        self.assertEqual(renderers.content_type('csv'), 'text/csv; charset=utf-8')
+        self.assertEqual(renderers.content_type('xlsx'), exports.XLSX_CONTENT_TYPE)
+        self.assertEqual(renderers.content_type('jsonl'), 'application/x-ndjson')
+        self.assertEqual(renderers.content_type('zip'), 'application/octet-stream')
+
+    def test_seekable_formats_are_written_to_a_temporary_file(self):
+        def write_then_rewind(export, output, report):
+            output.write(b'....datos')
+            output.seek(0)
+            output.write(b'cab:')
+
+        seekable = renderers.Renderer('prueba', 'Prueba', 'bin', 'x', write_then_rewind, seekable=True)
+        compressed = BytesIO()
+        with gzip.GzipFile(fileobj=compressed, mode='wb') as gz:
+            seekable.render(None, gz, None)
+        self.assertEqual(gzip.decompress(compressed.getvalue()), b'cab:datos')
+
+        direct = renderers.Renderer('prueba', 'Prueba', 'bin', 'x', write_then_rewind)
+        with gzip.GzipFile(fileobj=BytesIO(), mode='wb') as gz:
+            with self.assertRaises(OSError):
+                direct.render(None, gz, None)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ResultCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.user, cls.patients = create_view_fixtures(rows=2)
+        Report.objects.all().delete()
+
+    def setUp(self):
+        cache.clear()
+
+    def _recomputed(self, report_type, organization=None):
+        compute = mock.Mock(return_value=['fila'])
+        preview = result_cache.cached_preview(report_type, {}, organization or self.organization, compute)
+        self.assertEqual(preview, ['fila'])
+        return compute.called
+
+    def _run(self, title='Pacientes'):
+        return jobs.run(Report.objects.create(
+            created_by=self.user, title=title, report_type='patients', file_format='csv'
+        ).pk)
+
+    def test_patient_changes_invalidate_previews_and_files(self):
+        first = self._run()
+        self.assertTrue(self._recomputed('patients'))
+        self.assertEqual(self._run().cache_entry_id, first.cache_entry_id)
+        self.assertFalse(self._recomputed('patients'))
+
+        patient = self.patients[0]
+        patient.first_name = 'Renombrada'
+        patient.save()
+
+        self.assertTrue(self._recomputed('patients'))
+        changed = self._run()
+        self.assertNotEqual(changed.cache_entry_id, first.cache_entry_id)
+        with changed.cache_entry.file.open('rb') as stored:
+            self.assertIn('Renombrada', gzip.decompress(stored.read()).decode('utf-8-sig'))
+
+    def test_appointment_changes_only_invalidate_the_reports_that_read_them(self):
+        for report_type in ('appointments', 'patients'):
+            self.assertTrue(self._recomputed(report_type))
+
+        appointment = Appointment.objects.filter(organization=self.organization).first()
+        appointment.status = 'completed'
+        appointment.save()
+
+        self.assertTrue(self._recomputed('appointments'))
+        self.assertFalse(self._recomputed('patients'))
+
+    def test_payment_changes_invalidate_financial_previews(self):
+        self.assertTrue(self._recomputed('financial'))
+        payment = Payment.objects.filter(invoice__patient__organization=self.organization).first()
+        payment.status = 'completed'
+        payment.save()
+        self.assertTrue(self._recomputed('financial'))
+        self.assertFalse(self._recomputed('financial'))
+
+        payment.delete()
+        self.assertTrue(self._recomputed('financial'))
+
+    def test_changes_in_another_organization_keep_the_cache(self):
+        other = create_other_organization()
+        self.assertTrue(self._recomputed('patients'))
+        self.assertTrue(self._recomputed('patients', other))
+
+        create_patient(other, 'OTRA001', 'Ana', 'Ruiz')
+
+        self.assertFalse(self._recomputed('patients'))
+        self.assertTrue(self._recomputed('patients', other))
+
+    def test_normalize(self):
+        queryset = Patient.objects.filter(organization=self.organization)
+        pks = sorted(patient.pk for patient in self.patients)
+
+        self.assertEqual(result_cache.normalize({
+            'gender': 'F', 'city': '', 'doctor': None, 'active_only': False, 'status': [], 'tags': {},
+        }), {'gender': 'F'})
+        self.assertEqual(result_cache.normalize(queryset.order_by('-pk')), pks)
+        self.assertEqual(result_cache.normalize(queryset.order_by('pk')), pks)
+        self.assertEqual(result_cache.normalize(['b', 'a']), ['a', 'b'])
+        self.assertEqual(result_cache.normalize({'b', 'a'}), ['a', 'b'])
+        self.assertEqual(result_cache.normalize({
+            'patient': self.patients[0], 'date_from': date(2026, 3, 1), 'amount': Decimal('10.50'),
+        }), {'patient': self.patients[0].pk, 'date_from': '2026-03-01', 'amount': '10.50'})
+
+        self.assertEqual(
+            result_cache.result_key('patients', {'gender': 'F', 'city': ''}, self.organization),
+            result_cache.result_key('patients', {'city': None, 'gender': 'F'}, self.organization),
+        )
+        self.assertNotEqual(
+            result_cache.result_key('patients', {'gender': 'F'}, self.organization),
+            result_cache.result_key('patients', {'gender': 'M'}, self.organization),
+        )
+
+    def test_hit_ratio(self):
+        self.assertEqual(
+            result_cache.hit_ratio(self.organization), {'hits': 0, 'misses': 0, 'ratio': None}
+        )
+
+        self._recomputed('patients')
+        self._recomputed('patients')
+        self._recomputed('patients')
+        self._run()
+
+        self.assertEqual(
+            result_cache.hit_ratio(self.organization), {'hits': 2, 'misses': 2, 'ratio': 50.0}
+        )
+        self._run()
+        self.assertEqual(result_cache.hit_ratio(self.organization)['ratio'], 60.0)
+        self.assertEqual(result_cache.hit_ratio(create_other_organization())['ratio'], None)
+
+    def test_prune_removes_old_unreferenced_entries(self):
+        stale = self._run(title='Antiguo').cache_entry
+        Report.objects.filter(cache_entry=stale).delete()
+        referenced = self._run(title='Referenciado').cache_entry
+        recent = self._run(title='Reciente').cache_entry
+        Report.objects.filter(cache_entry=recent).delete()
+        old = timezone.now() - timedelta(days=40)
+        ReportCacheEntry.objects.filter(pk__in=[stale.pk, referenced.pk]).update(last_used_at=old)
+
+        self.assertEqual(result_cache.prune(max_age=30), 1)
+
+        self.assertEqual(
+            set(ReportCacheEntry.objects.values_list('pk', flat=True)), {referenced.pk, recent.pk}
+        )
+        self.assertFalse(stale.file.storage.exists(stale.file.name))
+        self.assertTrue(referenced.file.storage.exists(referenced.file.name))
+
+
+class PdfTests(TestCase):
+
+    def _page_text(self, content):
+        # ReportLab compresses each page stream with Flate and then ASCII85
+        return b''.join(
+            zlib.decompress(base64.a85decode(stream.strip(), adobe=True))
+            for stream in re.findall(rb'stream\r?\n(.*?)endstream', content, re.S)
+        )
+
+    def test_table_chunks_split_the_rows(self):
+        rows = ([f'FILA-{index:04d}', index] for index in range(250))
+        tables = list(pdf.table_chunks(['Fila', 'Número'], rows, [200, 100]))
+
+        self.assertEqual([len(table._cellvalues) for table in tables], [101, 101, 51])
+        self.assertTrue(all(table._cellvalues[0] == ['Fila', 'Número'] for table in tables))
+        self.assertEqual(len(list(pdf.table_chunks(['Fila'], iter(()), [200]))), 1)
+
+    def test_every_row_reaches_the_output(self):
+        total = pdf.PDF_TABLE_ROWS * 2 + 50
+        output = BytesIO()
+        pdf.write_pdf(output, 'Pacientes', ['Fila', 'Nombre', 'Número'], (
+            [f'FILA-{index:04d}', 'Paciente', index] for index in range(total)
+        ))
+
+        content = output.getvalue()
+        self.assertTrue(content.startswith(b'%PDF'))
+        written = re.findall(rb'\((FILA-\d{4})\) Tj', self._page_text(content))
+        self.assertEqual(written, [f'FILA-{index:04d}'.encode() for index in range(total)])
+
+
+class DemographicsTests(TestCase):
+
+    TODAY = date(2026, 2, 28)
+
+    BIRTHS = [
+        (date(2000, 2, 29), 'F', 'O+'),
+        (date(2000, 2, 28), 'M', 'O+'),
+        (date(2000, 3, 1), 'M', 'A+'),
+        (date(1955, 2, 28), 'F', 'O+'),
+        (date(1956, 3, 1), 'O', 'B-'),
+        (date(1950, 6, 15), 'F', 'U'),
+        (date(2008, 2, 28), 'N', 'U'),
+        (date(2026, 5, 1), 'F', 'U'),
+        (date(1990, 1, 1), 'F', 'A+'),
+        (date(1990, 1, 1), 'F', 'A+'),
+        (date(1990, 1, 1), 'M', 'A+'),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        organization = create_other_organization()
+        for index, (birth_date, gender, blood_type) in enumerate(cls.BIRTHS):
+            Patient.objects.create(
+                patient_id=f'DEM{index:03d}', first_name='Paciente', last_name=str(index),
+                birth_date=birth_date, gender=gender, blood_type=blood_type, phone_number='5551234567',
+                address='Calle 2', city='Puebla' if index % 3 else 'CDMX', state='CDMX', postal_code='01000',
+                emergency_contact_name='Contacto', emergency_contact_relationship='Familiar',
+                emergency_contact_phone='5551234567', organization=organization
+            )
+
+    def _expected_ages(self):
+        now = timezone.make_aware(datetime.combine(self.TODAY, datetime.min.time().replace(hour=12)))
+        with mock.patch.object(timezone, 'now', return_value=now):
+            return [(patient.gender, max(patient.get_age(), 0)) for patient in Patient.objects.all()]
+
+    def test_ages_match_get_age(self):
+        self.assertEqual(
+            demographics.ages(np.array([2000, 2000, 2000]), np.array([2, 2, 3]), np.array([29, 28, 1]), self.TODAY).tolist(),
+            [25, 26, 25]
+        )
+        expected = sorted(age for _, age in self._expected_ages())
+        summary = demographics.summarize(Patient.objects.all(), today=self.TODAY)
+
+        self.assertEqual(summary['total'], len(self.BIRTHS))
+        self.assertEqual(summary['age']['min'], 0)
+        self.assertEqual(summary['age']['max'], expected[-1])
+        self.assertEqual(summary['age']['avg'], round(sum(expected) / len(expected), 1))
+        for percentile in demographics.AGE_PERCENTILES:
+            self.assertEqual(summary['age'][f'p{percentile}'], round(float(np.percentile(expected, percentile)), 1))
+
+    def test_age_ranges_by_gender(self):
+        expected = {label: {} for label in AGE_RANGES}
+        for gender, age in self._expected_ages():
+            # 70 falls in 51-70; 70+ starts at 71
+            label = next(label for label, (youngest, oldest) in AGE_RANGES.items()
+                         if oldest is None or youngest <= age <= oldest)
+            expected[label][gender] = expected[label].get(gender, 0) + 1
+
+        summary = demographics.summarize(Patient.objects.all(), today=self.TODAY)
+
+        self.assertEqual(
+            {row['range']: row['by_gender'] for row in summary['by_age_range']}, expected
+        )
+        self.assertEqual(
+            {row['range']: row['count'] for row in summary['by_age_range']},
+            {label: sum(by_gender.values()) for label, by_gender in expected.items()}
+        )
+
+    def test_gender_histogram_and_blood_type(self):
+        summary = demographics.summarize(Patient.objects.all(), today=self.TODAY)
+
+        self.assertEqual(
+            {row['gender']: row['count'] for row in summary['by_gender']}, {'F': 6, 'M': 3, 'O': 1, 'N': 1}
+        )
+        histogram = {row['range']: row['count'] for row in summary['age_histogram']}
+        self.assertEqual(histogram['0-9'], 1)
+        self.assertEqual(histogram['20-29'], 3)
+        self.assertEqual(histogram['70-79'], 2)
+        self.assertEqual(sum(histogram.values()), len(self.BIRTHS))
+        self.assertEqual(summary['by_blood_type'][0], {'blood_type': 'A+', 'count': 4})
+        self.assertEqual(sum(row['count'] for row in summary['by_city']), len(self.BIRTHS))
+
+    def test_empty_queryset(self):
+        summary = demographics.summarize(Patient.objects.none(), today=self.TODAY)
+
+        self.assertEqual(summary['total'], 0)
+        self.assertEqual(summary['age'], {'min': None, 'max': None, 'avg': 0})
+        self.assertEqual([row['count'] for row in summary['by_age_range']], [0] * len(AGE_RANGES))
+        self.assertEqual(summary['by_gender'], [])
+        self.assertEqual(summary['age_histogram'], [])
+        self.assertEqual(summary['by_blood_type'], [])
+
+
+class PatientExportScopingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.user, cls.patients = create_view_fixtures(rows=2)
+        other = create_other_organization()
+        Patient.objects.create(
+            patient_id='OTR001', first_name='Paciente', last_name='Ajeno', birth_date=date(1990, 1, 1),
+            gender='F', phone_number='5551234567', address='Calle 2', city='CDMX', state='CDMX',
+            postal_code='01000', emergency_contact_name='Contacto', emergency_contact_relationship='Familiar',
+            emergency_contact_phone='5551234567', organization=other
+        )
+
+    def test_only_the_users_organization_is_exported(self):
+        request = RequestFactory().get('/reports/patients/export/excel/')
+        request.user = self.user
+
+        queryset = views.get_filtered_patients_queryset(request)
+
+        self.assertEqual(sorted(queryset.values_list('patient_id', flat=True)), ['PAC000', 'PAC001'])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class TimeSeriesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.user, _ = create_view_fixtures(rows=1)
+        cls.other = create_other_organization()
+
+    def setUp(self):
+        cache.clear()
+
+    def _metrics(self, organization, *days):
+        for day, new_patients in days:
+            DailyOrgMetrics.objects.update_or_create(
+                organization=organization, date=day, defaults={'new_patients': new_patients}
+            )
+
+    def test_periods_roll_over_months_and_start_weeks_on_monday(self):
+        self.assertEqual(timeseries.next_period(date(2025, 1, 1), 'month'), date(2025, 2, 1))
+        self.assertEqual(timeseries.next_period(date(2025, 12, 1), 'month'), date(2026, 1, 1))
+        self.assertEqual(
+            timeseries.periods(date(2025, 1, 31), date(2025, 3, 1), 'month'),
+            [date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1)]
+        )
+        self.assertEqual(timeseries.period_start(date(2025, 3, 9), 'week'), date(2025, 3, 3))
+        self.assertEqual(
+            timeseries.periods(date(2025, 3, 5), date(2025, 3, 17), 'week'),
+            [date(2025, 3, 3), date(2025, 3, 10), date(2025, 3, 17)]
+        )
+        self.assertEqual(len(timeseries.periods(date(2024, 2, 27), date(2024, 3, 1), 'day')), 4)
+
+    def test_week_buckets_match_trunc_week(self):
+        self._metrics(self.organization, (date(2025, 3, 9), 2), (date(2025, 3, 10), 3))
+
+        result = timeseries.series(self.organization, 'patient_growth', 'week', date(2025, 3, 3), date(2025, 3, 16))
+
+        self.assertEqual(result['periods'], ['2025-03-03', '2025-03-10'])
+        self.assertEqual(result['values'], [2.0, 3.0])
+
+    def test_gaps_are_filled_with_zero(self):
+        self._metrics(self.organization, (date(2025, 3, 1), 4), (date(2025, 3, 4), 2))
+        self._metrics(self.other, (date(2025, 3, 2), 9))
+
+        result = timeseries.series(self.organization, 'patient_growth', 'day', date(2025, 3, 1), date(2025, 3, 5))
+
+        self.assertEqual(result['values'], [4.0, 0.0, 0.0, 2.0, 0.0])
+        self.assertEqual((result['total'], result['average']), (6.0, 1.2))
+        self.assertEqual(result['moving_average'], [None] * 5)
+
+    def test_moving_average_and_forecast_with_short_series(self):
+        self.assertEqual(timeseries.moving_average(np.array([]), 3), [])
+        self.assertEqual(timeseries.moving_average(np.array([1.0, 2.0]), 3), [None, None])
+        self.assertEqual(timeseries.moving_average(np.array([1.0, 2.0, 3.0, 4.0]), 3), [None, None, 2.0, 3.0])
+        self.assertEqual(timeseries.forecast(np.array([]), 2), [0.0, 0.0])
+        self.assertEqual(timeseries.forecast(np.array([5.0]), 2), [5.0, 5.0])
+        self.assertEqual(timeseries.forecast(np.array([6.0, 3.0]), 3), [0.0, 0.0, 0.0])
+
+    def test_compare_previous_uses_the_window_before_the_range(self):
+        self._metrics(
+            self.organization,
+            (date(2025, 2, 28), 100), (date(2025, 3, 1), 1), (date(2025, 3, 10), 3), (date(2025, 3, 11), 6)
+        )
+
+        result = timeseries.series(
+            self.organization, 'patient_growth', 'day', date(2025, 3, 11), date(2025, 3, 20), compare_previous=True
+        )
+
+        self.assertEqual(result['previous'], {
+            'date_from': '2025-03-01', 'date_to': '2025-03-10', 'total': 4.0, 'change': 50.0,
+        })
+        empty = timeseries.series(
+            self.other, 'patient_growth', 'day', date(2025, 3, 11), date(2025, 3, 20), compare_previous=True
+        )
+        self.assertIsNone(empty['previous']['change'])
+
+    def test_api_analytics(self):
+        self._metrics(self.organization, (date(2025, 1, 15), 2), (date(2025, 3, 1), 5))
+        self._metrics(self.other, (date(2025, 1, 15), 9))
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('reports:api_analytics'), {
+            'metrics': ['patient_growth', 'patient_satisfaction'], 'granularity': 'month',
+            'date_from': '2025-01-01', 'date_to': '2025-03-31', 'include_predictions': 'on',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['unavailable'], ['patient_satisfaction'])
+        [result] = data['series']
+        self.assertEqual(result['periods'], ['2025-01-01', '2025-02-01', '2025-03-01'])
+        self.assertEqual(result['values'], [2.0, 0.0, 5.0])
+        self.assertEqual(result['forecast']['periods'], ['2025-04-01', '2025-05-01', '2025-06-01'])
+
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.client.get(reverse('reports:api_analytics'), {'granularity': 'year'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.json()['errors']), ['granularity', 'metrics'])
+
+
+def local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class ComputeNextRunTests(TestCase):
+
+    def _runs(self, frequency, first_run, count):
+        report = Report(schedule_frequency=frequency, next_run=first_run, schedule_anchor=first_run)
+        runs = []
+        for _ in range(count):
+            report.next_run = report.compute_next_run(report.next_run)
+            runs.append(report.next_run)
+        return runs
+
+    def test_monthly_keeps_the_end_of_the_month(self):
+        self.assertEqual(self._runs('monthly', local(2026, 1, 31, 8), 4), [
+            local(2026, 2, 28, 8), local(2026, 3, 31, 8), local(2026, 4, 30, 8), local(2026, 5, 31, 8)
+        ])
+        self.assertEqual(self._runs('monthly', local(2027, 12, 31, 8), 2), [
+            local(2028, 1, 31, 8), local(2028, 2, 29, 8)
+        ])
+
+    def test_quarterly_keeps_the_end_of_the_month(self):
+        self.assertEqual(self._runs('quarterly', local(2025, 11, 30, 9, 30), 3), [
+            local(2026, 2, 28, 9, 30), local(2026, 5, 30, 9, 30), local(2026, 8, 30, 9, 30)
+        ])
+        self.assertEqual(self._runs('quarterly', local(2025, 8, 31, 7), 3), [
+            local(2025, 11, 30, 7), local(2026, 2, 28, 7), local(2026, 5, 31, 7)
+        ])
+
+    def test_local_time_survives_daylight_saving_changes(self):
+        with timezone.override('America/New_York'):
+            self.assertEqual(self._runs('weekly', local(2026, 3, 2, 9), 2), [local(2026, 3, 9, 9), local(2026, 3, 16, 9)])
+
+    def test_first_run_and_invalid_frequency(self):
+        report = Report(schedule_frequency='daily')
+        now = timezone.now()
+        self.assertEqual(report.compute_next_run(now), now + timedelta(days=1))
+        self.assertIsNone(Report(schedule_frequency='hourly').compute_next_run())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ReportSchedulerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization, cls.user, cls.patients = create_view_fixtures(rows=2)
+        Report.objects.all().delete()
+
+    def _scheduled(self, next_run, frequency='daily', **fields):
+        fields = {'title': 'Pacientes', 'report_type': 'patients', 'file_format': 'pdf', **fields}
+        return Report.objects.create(
+            created_by=self.user, is_scheduled=True, schedule_frequency=frequency,
+            next_run=next_run, status='completed', **fields
+        )
+
+    def test_anchor_is_set_on_save(self):
+        report = self._scheduled(local(2026, 1, 31, 8), frequency='monthly')
+        self.assertEqual(report.schedule_anchor, local(2026, 1, 31, 8))
+
+        report.is_scheduled = False
+        report.save()
+        self.assertIsNone(report.schedule_anchor)
+
+    def test_catch_up_after_downtime_runs_once(self):
+        now = local(2026, 3, 10, 12)
+        report = self._scheduled(local(2026, 2, 28, 6))
+
+        stats = scheduler.tick(now)
+
+        report.refresh_from_db()
+        self.assertEqual((stats['due'], stats['enqueued']), (1, 1))
+        self.assertEqual(stats['max_lag'], now - local(2026, 2, 28, 6))
+        self.assertEqual(report.status, 'pending')
+        self.assertEqual(report.scheduled_for, local(2026, 2, 28, 6))
+        self.assertEqual(report.next_run, local(2026, 3, 11, 6))
+        self.assertEqual(scheduler.tick(now)['due'], 0)
+
+    def test_run_still_in_progress_is_skipped(self):
+        now = local(2026, 3, 10, 12)
+        report = self._scheduled(local(2026, 3, 10, 6))
+        Report.objects.filter(pk=report.pk).update(status='processing')
+
+        stats = scheduler.tick(now)
+
+        report.refresh_from_db()
+        self.assertEqual((stats['due'], stats['skipped'], stats['enqueued']), (1, 1, 0))
+        self.assertEqual(report.status, 'processing')
+        self.assertEqual(report.next_run, local(2026, 3, 11, 6))
+
+    def test_identical_definitions_are_coalesced(self):
+        now = local(2026, 3, 10, 12)
+        primary = self._scheduled(local(2026, 3, 10, 6))
+        follower = self._scheduled(local(2026, 3, 10, 7))
+        other_title = self._scheduled(local(2026, 3, 10, 6), title='Pacientes de Ana')
+        other_format = self._scheduled(local(2026, 3, 10, 6), file_format='csv')
+
+        stats = scheduler.tick(now)
+
+        self.assertEqual((stats['enqueued'], stats['coalesced']), (3, 1))
+        follower.refresh_from_db()
+        self.assertEqual(follower.coalesced_into, primary)
+        for report in (primary, other_title, other_format):
+            report.refresh_from_db()
+            self.assertIsNone(report.coalesced_into)
+            self.assertEqual(report.status, 'pending')
+
+        while jobs.run():
+            pass
+        follower.refresh_from_db()
+        other_title.refresh_from_db()
+        self.assertEqual(follower.status, 'completed')
+        self.assertEqual(follower.file_path.name, Report.objects.get(pk=primary.pk).file_path.name)
+        self.assertNotEqual(other_title.file_path.name, follower.file_path.name)
+
+    def test_leadership_lease_takeover(self):
+        self.assertTrue(scheduler.acquire_leadership('a', ttl=60))
+        self.assertFalse(scheduler.acquire_leadership('b', ttl=60))
+        self.assertTrue(scheduler.acquire_leadership('a', ttl=60))
+
+        # The leader stops renewing and the lease expires
+        SchedulerLock.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(scheduler.acquire_leadership('b', ttl=60))
+        self.assertFalse(scheduler.acquire_leadership('a', ttl=60))
+
+        scheduler.release_leadership('a')
+        self.assertFalse(scheduler.acquire_leadership('a', ttl=60))
+        scheduler.release_leadership('b')
+        self.assertTrue(scheduler.acquire_leadership('a', ttl=60))
+        self.assertEqual(SchedulerLock.objects.count(), 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ConcurrentReportClaimTests(TransactionTestCase):
+
+    WORKERS = 6
+
+    def test_parallel_workers_claim_distinct_reports(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Threads cannot share an in-memory SQLite test database')
+        _, user, _ = create_view_fixtures(rows=1)
+        Report.objects.all().delete()
+        for index in range(self.WORKERS // 2):
+            Report.objects.create(title=f'Reporte {index}', report_type='patients', created_by=user)
+        barrier = threading.Barrier(self.WORKERS)
+        claimed = []
+
+        def work():
+            try:
+                barrier.wait()
+                report = jobs.claim()
+                claimed.append(report and report.pk)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work) for _ in range(self.WORKERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        pks = [pk for pk in claimed if pk is not None]
+        self.assertEqual(len(pks), self.WORKERS // 2)
+        self.assertEqual(len(set(pks)), len(pks))
@@ -0,0 +1,162 @@
+"""
+TopicTales Biomédica - Series de tiempo de análisis
+Series por día, semana o mes leídas de las métricas diarias (reports.rollup)
+con TruncWeek/TruncMonth, con los periodos sin datos en cero, promedio móvil
+y pronóstico lineal calculados con NumPy
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from . import result_cache
+from .models import DailyAppointmentMetrics, DailyOrgMetrics
+
+
+GRANULARITIES = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+# Periodos del promedio móvil y del pronóstico de cada granularidad
+MOVING_AVERAGE_WINDOWS = {'day': 7, 'week': 4, 'month': 3}
+FORECAST_PERIODS = {'day': 7, 'week': 4, 'month': 3}
+
+# Periodos recientes usados para ajustar la tendencia del pronóstico
+FORECAST_HISTORY = 12
+
+# Métrica: (etiqueta, modelo de métricas diarias, campo sumado, filtros adicionales)
+METRICS = {
+    'patient_growth': ('Pacientes nuevos', DailyOrgMetrics, 'new_patients', {}),
+    'appointment_trends': ('Citas', DailyOrgMetrics, 'appointments', {}),
+    'revenue_analysis': ('Ingresos', DailyOrgMetrics, 'revenue', {}),
+    'specialty_performance': ('Consultas de especialidad', DailyOrgMetrics, 'specialty_consultations', {}),
+    'doctor_productivity': ('Citas completadas', DailyAppointmentMetrics, 'count', {'status': 'completed'}),
+}
+
+
+def period_start(day, granularity):
+    """Inicio del periodo que contiene ``day``, igual al de Trunc*"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_period(start, granularity):
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def periods(date_from, date_to, granularity):
+    """Inicios de todos los periodos entre ``date_from`` y ``date_to``"""
+    result = []
+    current = period_start(date_from, granularity)
+    while current <= date_to:
+        result.append(current)
+        current = next_period(current, granularity)
+    return result
+
+
+def moving_average(values, window):
+    """Promedio de los últimos ``window`` periodos; ``None`` donde aún no hay suficientes"""
+    if values.size < window:
+        return [None] * values.size
+    cumulative = np.cumsum(np.insert(values, 0, 0.0))
+    averages = (cumulative[window:] - cumulative[:-window]) / window
+    return [None] * (window - 1) + [round(float(value), 2) for value in averages]
+
+
+def forecast(values, horizon, history=FORECAST_HISTORY):
+    """Extiende la tendencia lineal de los últimos ``history`` periodos; nunca negativa"""
+    recent = values[-history:]
+    if recent.size < 2:
+        return [round(float(recent[-1]), 2) if recent.size else 0.0] * horizon
+    slope, intercept = np.polyfit(np.arange(recent.size), recent, 1)
+    future = intercept + slope * np.arange(recent.size, recent.size + horizon)
+    return [round(float(value), 2) for value in np.maximum(future, 0)]
+
+
+def _totals(organization, metric, granularity, date_from, date_to):
+    _, model, field, extra = METRICS[metric]
+    rows = model.objects.filter(
+        organization=organization, date__gte=date_from, date__lte=date_to, **extra
+    ).annotate(
+        period=GRANULARITIES[granularity]('date')
+    ).values('period').annotate(total=Sum(field)).values_list('period', 'total')
+    return dict(rows)
+
+
+def series(organization, metric, granularity='day', date_from=None, date_to=None,
+           include_forecast=False, compare_previous=False):
+    """
+    Serie de ``metric`` para la organización. Devuelve un diccionario listo
+    para JSON: periodos ISO, valores, promedio móvil y, si se piden,
+    pronóstico y comparación con el periodo anterior de la misma duración.
+    """
+    date_to = date_to or timezone.localdate()
+    date_from = date_from or date_to - timedelta(days=30)
+    label = METRICS[metric][0]
+
+    starts = periods(date_from, date_to, granularity)
+    totals = _totals(organization, metric, granularity, date_from, date_to)
+    values = np.zeros(len(starts))
+    position = {start: index for index, start in enumerate(starts)}
+    for start, total in totals.items():
+        if start in position:
+            values[position[start]] = float(total or 0)
+
+    window = MOVING_AVERAGE_WINDOWS[granularity]
+    result = {
+        'metric': metric,
+        'label': label,
+        'granularity': granularity,
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'periods': [start.isoformat() for start in starts],
+        'values': [round(float(value), 2) for value in values],
+        'total': round(float(values.sum()), 2),
+        'average': round(float(values.mean()), 2) if values.size else 0.0,
+        'moving_average': moving_average(values, window),
+        'moving_average_window': window,
+    }
+
+    if include_forecast:
+        future = []
+        start = starts[-1] if starts else period_start(date_to, granularity)
+        for _ in range(FORECAST_PERIODS[granularity]):
+            start = next_period(start, granularity)
+            future.append(start.isoformat())
+        result['forecast'] = {
+            'periods': future,
+            'values': forecast(values, len(future)),
+        }
+
+    if compare_previous:
+        length = date_to - date_from
+        previous_to = date_from - timedelta(days=1)
+        previous_from = previous_to - length
+        previous = _totals(organization, metric, granularity, previous_from, previous_to)
+        previous_total = round(float(sum(total or 0 for total in previous.values())), 2)
+        result['previous'] = {
+            'date_from': previous_from.isoformat(),
+            'date_to': previous_to.isoformat(),
+            'total': previous_total,
+            'change': round((result['total'] - previous_total) * 100 / previous_total, 1) if previous_total else None,
+        }
+    return result
+
+
+def cached_series(organization, metric, **options):
+    """``series`` en la caché de resultados, por organización, métrica, granularidad y rango"""
+    filters = dict(options, metric=metric)
+    return result_cache.cached_preview(
+        'analytics', filters, organization, lambda: series(organization, metric, **options)
+    )
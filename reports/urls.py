@@ -30,4 +30,5 @@ urlpatterns = [
     # API endpoints
     path('api/<int:pk>/status/', views.api_report_status, name='api_status'),
     path('api/<int:pk>/delete/', views.api_delete_report, name='api_delete'),
+    path('api/analytics/', views.api_analytics, name='api_analytics'),
 ]
\ No newline at end of file
@@ -1,21 +1,14 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse, Http404
+from django.http import JsonResponse, Http404, FileResponse
 from django.db.models import Count, Sum, Avg, Q
 from django.utils import timezone
 from django.core.paginator import Paginator
-from datetime import date, timedelta
-import json
-import io
-import csv
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
+import os
 
 from .models import Report, ReportTemplate, ReportShare
+from . import datasets, demographics, exports, jobs, renderers, result_cache, rollup, timeseries
 from .forms import (
     ReportForm, PatientsReportForm, AppointmentsReportForm, 
     FinancialReportForm, AnalyticsReportForm, ReportTemplateForm,
@@ -55,11 +48,14 @@ def index(request):
         is_active=True
     )[:5]
     
+    profile = getattr(request.user, 'profile', None)
+    
     context = {
         'title': 'Reportes',
         'recent_reports': recent_reports,
         'stats': stats,
         'templates': templates,
+        'cache_stats': result_cache.hit_ratio(profile.organization if profile else None),
     }
     
     return render(request, 'reports/index.html', context)
@@ -121,58 +117,20 @@ def patients_report(request):
     patients_data = None
     
     if form.is_valid():
-        # Construir consulta base
-        queryset = Patient.objects.all()
-        
-        # Aplicar filtros
-        if form.cleaned_data.get('date_from'):
-            queryset = queryset.filter(registration_date__date__gte=form.cleaned_data['date_from'])
-        if form.cleaned_data.get('date_to'):
-            queryset = queryset.filter(registration_date__date__lte=form.cleaned_data['date_to'])
-        if form.cleaned_data.get('gender'):
-            queryset = queryset.filter(gender=form.cleaned_data['gender'])
-        if form.cleaned_data.get('city'):
-            queryset = queryset.filter(city__icontains=form.cleaned_data['city'])
-        if form.cleaned_data.get('active_only'):
-            queryset = queryset.filter(is_active=True)
-        
-        # Filtro por rango de edad
-        age_range = form.cleaned_data.get('age_range')
-        if age_range:
-            today = date.today()
-            if age_range == '0-18':
-                min_birth = today - timedelta(days=18*365)
-                queryset = queryset.filter(birth_date__gte=min_birth)
-            elif age_range == '19-30':
-                min_birth = today - timedelta(days=30*365)
-                max_birth = today - timedelta(days=19*365)
-                queryset = queryset.filter(birth_date__range=[min_birth, max_birth])
-            elif age_range == '31-50':
-                min_birth = today - timedelta(days=50*365)
-                max_birth = today - timedelta(days=31*365)
-                queryset = queryset.filter(birth_date__range=[min_birth, max_birth])
-            elif age_range == '51-70':
-                min_birth = today - timedelta(days=70*365)
-                max_birth = today - timedelta(days=51*365)
-                queryset = queryset.filter(birth_date__range=[min_birth, max_birth])
-            elif age_range == '70+':
-                max_birth = today - timedelta(days=70*365)
-                queryset = queryset.filter(birth_date__lte=max_birth)
-        
-        # Calculate average age manually to avoid SQLite aggregation issues
-        all_patients = queryset.all()
-        total_age = sum(patient.get_age() for patient in all_patients)
-        avg_age = total_age / len(all_patients) if len(all_patients) > 0 else 0
+        organization = request.user.profile.organization
+        queryset = datasets.filter_patients(
+            Patient.objects.filter(organization=organization), form.cleaned_data
+        )
         
-        patients_data = {
-            'patients': queryset.order_by('-registration_date')[:100],  # Limitar para preview
-            'total_count': queryset.count(),
-            'stats': {
-                'by_gender': queryset.values('gender').annotate(count=Count('id')),
-                'by_city': queryset.values('city').annotate(count=Count('id')).order_by('-count')[:10],
-                'avg_age': round(avg_age, 1),
+        def compute():
+            stats = demographics.summarize(queryset)
+            return {
+                'patients': list(queryset.order_by('-registration_date')[:100]),  # Limitar para preview
+                'total_count': stats['total'],
+                'stats': stats,
             }
-        }
+        
+        patients_data = result_cache.cached_preview('patients', form.cleaned_data, organization, compute)
     
     context = {
         'title': 'Reporte de Pacientes',
@@ -189,28 +147,40 @@ def appointments_report(request):
     appointments_data = None
     
     if form.is_valid():
-        # Construir consulta base
-        queryset = Appointment.objects.select_related('patient', 'doctor')
+        organization = request.user.profile.organization
+        date_from = form.cleaned_data.get('date_from')
+        date_to = form.cleaned_data.get('date_to')
+        status = form.cleaned_data.get('status')
+        doctor = form.cleaned_data.get('doctor')
+        
+        # Construir consulta base para la vista previa
+        queryset = Appointment.objects.filter(organization=organization).select_related('patient', 'doctor')
         
         # Aplicar filtros
-        if form.cleaned_data.get('date_from'):
-            queryset = queryset.filter(appointment_date__date__gte=form.cleaned_data['date_from'])
-        if form.cleaned_data.get('date_to'):
-            queryset = queryset.filter(appointment_date__date__lte=form.cleaned_data['date_to'])
-        if form.cleaned_data.get('status'):
-            queryset = queryset.filter(status=form.cleaned_data['status'])
-        if form.cleaned_data.get('doctor'):
-            queryset = queryset.filter(doctor=form.cleaned_data['doctor'])
+        if date_from:
+            queryset = queryset.filter(start_datetime__date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(start_datetime__date__lte=date_to)
+        if status:
+            queryset = queryset.filter(status=status)
+        if doctor:
+            queryset = queryset.filter(doctor=doctor)
         
-        appointments_data = {
-            'appointments': queryset.order_by('-appointment_date')[:100],
-            'total_count': queryset.count(),
-            'stats': {
-                'by_status': queryset.values('status').annotate(count=Count('id')),
-                'by_doctor': queryset.values('doctor__first_name', 'doctor__last_name').annotate(count=Count('id')).order_by('-count')[:10],
-                'by_day': queryset.values('appointment_date__date').annotate(count=Count('id')).order_by('appointment_date__date')[:30],
+        # Totales y desgloses desde las métricas diarias
+        metrics = rollup.appointment_metrics(organization, date_from, date_to, status, doctor)
+        
+        def compute():
+            return {
+                'appointments': list(queryset.order_by('-start_datetime')[:100]),
+                'total_count': metrics.aggregate(total=Sum('count'))['total'] or 0,
+                'stats': {
+                    'by_status': list(metrics.values('status').annotate(count=Sum('count')).order_by('status')),
+                    'by_doctor': list(metrics.values('doctor__first_name', 'doctor__last_name').annotate(count=Sum('count')).order_by('-count')[:10]),
+                    'by_day': list(metrics.values('date').annotate(count=Sum('count')).order_by('date')[:30]),
+                }
             }
-        }
+        
+        appointments_data = result_cache.cached_preview('appointments', form.cleaned_data, organization, compute)
     
     context = {
         'title': 'Reporte de Citas',
@@ -256,24 +226,7 @@ def analytics_report(request):
     analytics_data = None
     
     if form.is_valid():
-        metrics = form.cleaned_data.get('metrics', [])
-        analytics_data = {}
-        
-        if 'patient_growth' in metrics:
-            # Crecimiento de pacientes por mes
-            patient_growth = Patient.objects.extra(
-                select={'month': "DATE_FORMAT(created_at, '%%Y-%%m')"}
-            ).values('month').annotate(count=Count('id')).order_by('month')
-            analytics_data['patient_growth'] = list(patient_growth)
-        
-        if 'appointment_trends' in metrics:
-            # Tendencias de citas
-            appointment_trends = Appointment.objects.extra(
-                select={'week': "WEEK(appointment_date)"}
-            ).values('week').annotate(count=Count('id')).order_by('week')
-            analytics_data['appointment_trends'] = list(appointment_trends)
-        
-        # Más métricas...
+        analytics_data = analytics_series(request.user.profile.organization, form.cleaned_data)
     
     context = {
         'title': 'Análisis Avanzado',
@@ -283,6 +236,25 @@ def analytics_report(request):
     
     return render(request, 'reports/analytics.html', context)
 
+def analytics_series(organization, cleaned_data):
+    """Series de las métricas elegidas en AnalyticsReportForm (reports.timeseries)"""
+    options = {
+        'granularity': cleaned_data.get('granularity') or 'day',
+        'date_from': cleaned_data.get('date_from'),
+        'date_to': cleaned_data.get('date_to'),
+        'include_forecast': cleaned_data.get('include_predictions', False),
+        'compare_previous': cleaned_data.get('compare_previous_period', False),
+    }
+    metrics = cleaned_data.get('metrics', [])
+    return {
+        'series': [
+            timeseries.cached_series(organization, metric, **options)
+            for metric in metrics if metric in timeseries.METRICS
+        ],
+        # Métricas sin datos de origen en el sistema (p. ej. satisfacción)
+        'unavailable': [metric for metric in metrics if metric not in timeseries.METRICS],
+    }
+
 @login_required
 def create_report(request):
     """Crear un nuevo reporte"""
@@ -290,7 +262,8 @@ def create_report(request):
         form = ReportForm(request.POST, user=request.user)
         if form.is_valid():
             report = form.save()
-            messages.success(request, f'Reporte "{report.title}" creado exitosamente.')
+            jobs.enqueue(report)
+            messages.success(request, f'Reporte "{report.title}" creado; se está generando en segundo plano.')
             return redirect('reports:detail', pk=report.pk)
     else:
         form = ReportForm(user=request.user)
@@ -402,34 +375,20 @@ def download_report(request, pk):
         messages.error(request, "El reporte aún no está listo para descargar.")
         return redirect('reports:detail', pk=pk)
     
-    # Generar y servir archivo para descarga
-    try:
-        from django.http import HttpResponse
-        import json
-        
-        # Generar contenido del reporte
-        report_data = report.generate_export_data()
-        
-        if report.report_format == 'pdf':
-            response = HttpResponse(content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="reporte_{report.id}.pdf"'
-            # Aquí se podría usar reportlab para generar PDF real
-            response.write(b'%PDF-1.4\n%Sample PDF content\n')
-        elif report.report_format == 'excel':
-            response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            response['Content-Disposition'] = f'attachment; filename="reporte_{report.id}.xlsx"'
-            # Aquí se podría usar openpyxl para generar Excel real
-            response.write(b'Sample Excel content')
-        else:  # JSON por defecto
-            response = HttpResponse(json.dumps(report_data, indent=2), content_type='application/json')
-            response['Content-Disposition'] = f'attachment; filename="reporte_{report.id}.json"'
-        
-        messages.success(request, "Reporte descargado exitosamente.")
-        return response
-        
-    except Exception as e:
-        messages.error(request, f"Error al generar el archivo de descarga: {str(e)}")
-        return redirect('reports:detail', pk=pk)
+    # El archivo lo genera el worker de reportes (reports.jobs); los que vienen
+    # de la caché se sirven comprimidos tal como están guardados
+    entry = report.cache_entry
+    if entry is not None and report.file_path.name == entry.file.name:
+        return result_cache.file_response(
+            request, entry,
+            f"reporte_{report.pk}_{timezone.localtime(report.finished_at or entry.created_at):%Y%m%d_%H%M%S}.{entry.extension}",
+            content_type=renderers.content_type(entry.extension)
+        )
+    return FileResponse(
+        report.file_path.open('rb'),
+        as_attachment=True,
+        filename=os.path.basename(report.file_path.name)
+    )
 
 # API Views
 @login_required
@@ -439,13 +398,22 @@ def api_report_status(request, pk):
         report = Report.objects.get(pk=pk, created_by=request.user)
         return JsonResponse({
             'status': report.status,
-            'progress': 100 if report.status == 'completed' else 50,
-            'is_ready': report.is_ready,
+            'progress': report.progress,
+            'is_ready': bool(report.is_ready),
             'file_size': report.file_size,
+            'error': report.error,
         })
     except Report.DoesNotExist:
         return JsonResponse({'error': 'Reporte no encontrado'}, status=404)
 
+@login_required
+def api_analytics(request):
+    """API con las series de análisis; acepta los mismos parámetros que el reporte HTML"""
+    form = AnalyticsReportForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    return JsonResponse(analytics_series(request.user.profile.organization, form.cleaned_data))
+
 @login_required
 def api_delete_report(request, pk):
     """API para eliminar un reporte"""
@@ -462,252 +430,55 @@ def api_delete_report(request, pk):
 def get_filtered_patients_queryset(request):
     """Helper function to get filtered patients based on request parameters"""
     form = PatientsReportForm(request.GET or None)
-    queryset = Patient.objects.all()
-    
+    queryset = Patient.objects.filter(organization=request.user.profile.organization)
     if form.is_valid():
-        # Apply filters (same logic as patients_report view)
-        if form.cleaned_data.get('date_from'):
-            queryset = queryset.filter(registration_date__date__gte=form.cleaned_data['date_from'])
-        if form.cleaned_data.get('date_to'):
-            queryset = queryset.filter(registration_date__date__lte=form.cleaned_data['date_to'])
-        if form.cleaned_data.get('gender'):
-            queryset = queryset.filter(gender=form.cleaned_data['gender'])
-        if form.cleaned_data.get('city'):
-            queryset = queryset.filter(city__icontains=form.cleaned_data['city'])
-        if form.cleaned_data.get('active_only'):
-            queryset = queryset.filter(is_active=True)
-            
-        # Age range filtering
-        age_range = form.cleaned_data.get('age_range')
-        if age_range:
-            today = date.today()
-            if age_range == '0-18':
-                min_birth = today - timedelta(days=18*365)
-                queryset = queryset.filter(birth_date__gte=min_birth)
-            elif age_range == '19-30':
-                min_birth = today - timedelta(days=30*365)
-                max_birth = today - timedelta(days=19*365)
-                queryset = queryset.filter(birth_date__range=[min_birth, max_birth])
-            elif age_range == '31-50':
-                min_birth = today - timedelta(days=50*365)
-                max_birth = today - timedelta(days=31*365)
-                queryset = queryset.filter(birth_date__range=[min_birth, max_birth])
-            elif age_range == '51-70':
-                min_birth = today - timedelta(days=70*365)
-                max_birth = today - timedelta(days=51*365)
-                queryset = queryset.filter(birth_date__range=[min_birth, max_birth])
-            elif age_range == '70+':
-                max_birth = today - timedelta(days=70*365)
-                queryset = queryset.filter(birth_date__lte=max_birth)
-    
+        queryset = datasets.filter_patients(queryset, form.cleaned_data)
     return queryset
 
+def patients_export(request):
+    return exports.Export(
+        get_filtered_patients_queryset(request),
+        datasets.patient_columns(),
+        f'reporte_pacientes_{timezone.localtime().strftime("%Y%m%d_%H%M")}'
+    )
+
 @login_required
 def export_patients_excel(request):
     """Export patients report to Excel format"""
-    try:
-        import openpyxl
-        from openpyxl.styles import Font, Alignment, PatternFill
-        from openpyxl.utils.dataframe import dataframe_to_rows
-        import pandas as pd
-    except ImportError:
-        # Fallback to CSV if openpyxl is not available
-        return export_patients_csv(request)
-    
-    # Get filtered patients
-    queryset = get_filtered_patients_queryset(request)
-    
-    # Create workbook and worksheet
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Reporte de Pacientes"
-    
-    # Header style
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Add title
-    ws.merge_cells('A1:H1')
-    ws['A1'] = "REPORTE DE PACIENTES - TOPICTALES BIOMÉDICA"
-    ws['A1'].font = Font(bold=True, size=16)
-    ws['A1'].alignment = header_alignment
-    
-    # Add date
-    ws.merge_cells('A2:H2')
-    ws['A2'] = f"Generado el: {timezone.now().strftime('%d/%m/%Y %H:%M')}"
-    ws['A2'].alignment = header_alignment
-    
-    # Headers
-    headers = [
-        'ID Paciente', 'Nombre Completo', 'Género', 'Edad', 
-        'Ciudad', 'Teléfono', 'Email', 'Estado'
-    ]
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=4, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    # Data rows
-    for row, patient in enumerate(queryset, 5):
-        ws.cell(row=row, column=1, value=patient.patient_id)
-        ws.cell(row=row, column=2, value=patient.get_full_name())
-        ws.cell(row=row, column=3, value=patient.get_gender_display())
-        ws.cell(row=row, column=4, value=patient.get_age())
-        ws.cell(row=row, column=5, value=patient.city or "-")
-        ws.cell(row=row, column=6, value=patient.phone_number or "-")
-        ws.cell(row=row, column=7, value=patient.email or "-")
-        ws.cell(row=row, column=8, value="Activo" if patient.is_active else "Inactivo")
-    
-    # Adjust column widths
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            if cell.value:
-                max_length = max(max_length, len(str(cell.value)))
-        ws.column_dimensions[column_letter].width = min(max_length + 2, 50)
-    
-    # Create response
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return patients_export(request).xlsx_response(
+        sheet_title="Reporte de Pacientes",
+        title="REPORTE DE PACIENTES - TOPICTALES BIOMÉDICA"
     )
-    response['Content-Disposition'] = f'attachment; filename="reporte_pacientes_{timezone.now().strftime("%Y%m%d_%H%M")}.xlsx"'
-    
-    wb.save(response)
-    return response
 
+@login_required
 def export_patients_csv(request):
-    """Fallback CSV export for patients"""
-    queryset = get_filtered_patients_queryset(request)
-    
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = f'attachment; filename="reporte_pacientes_{timezone.now().strftime("%Y%m%d_%H%M")}.csv"'
-    
-    # Add BOM for proper UTF-8 encoding in Excel
-    response.write('\ufeff')
-    
-    writer = csv.writer(response)
-    writer.writerow([
-        'ID Paciente', 'Nombre Completo', 'Género', 'Edad',
-        'Ciudad', 'Teléfono', 'Email', 'Estado'
-    ])
-    
-    for patient in queryset:
-        writer.writerow([
-            patient.patient_id,
-            patient.get_full_name(),
-            patient.get_gender_display(),
-            patient.get_age(),
-            patient.city or "-",
-            patient.phone_number or "-", 
-            patient.email or "-",
-            "Activo" if patient.is_active else "Inactivo"
-        ])
-    
-    return response
+    """Export patients report to CSV format"""
+    return patients_export(request).csv_response(bom=True)
 
 @login_required
 def export_patients_pdf(request):
     """Export patients report to PDF format"""
     queryset = get_filtered_patients_queryset(request)
-    
-    # Create PDF buffer
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    
-    # Styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1  # Center alignment
+    totals = queryset.aggregate(total=Count('id'), active=Count('id', filter=Q(is_active=True)))
+    
+    columns = [
+        exports.Column('ID', 'patient_id', width=10),
+        exports.Column('Nombre', 'first_name', 'last_name', 'mother_last_name', format=exports.full_name, width=28),
+        exports.Column('Género', 'gender', choices=Patient.GENDER_CHOICES, width=10),
+        exports.Column('Edad', 'birth_date', format=exports.age(), width=6),
+        exports.Column('Ciudad', 'city', default='-', width=16),
+        exports.Column('Estado', 'is_active', format=exports.label('Activo', 'Inactivo'), width=10),
+    ]
+    export = exports.Export(
+        queryset, columns, f'reporte_pacientes_{timezone.localtime().strftime("%Y%m%d_%H%M")}'
     )
-    
-    # Title
-    title = Paragraph("REPORTE DE PACIENTES", title_style)
-    elements.append(title)
-    
-    subtitle = Paragraph(
-        f"TopicTales Biomédica - Generado el {timezone.now().strftime('%d/%m/%Y %H:%M')}",
-        styles['Normal']
+    return export.pdf_response(
+        "REPORTE DE PACIENTES",
+        summary=[
+            ('Total de Pacientes:', totals['total']),
+            ('Pacientes Activos:', totals['active']),
+            ('Pacientes Inactivos:', totals['total'] - totals['active']),
+        ],
+        landscape=False
     )
-    elements.append(subtitle)
-    elements.append(Spacer(1, 20))
-    
-    # Summary statistics
-    total_patients = queryset.count()
-    active_patients = queryset.filter(is_active=True).count()
-    
-    summary_data = [
-        ['Total de Pacientes:', str(total_patients)],
-        ['Pacientes Activos:', str(active_patients)],
-        ['Pacientes Inactivos:', str(total_patients - active_patients)]
-    ]
-    
-    summary_table = Table(summary_data, colWidths=[3*inch, 1*inch])
-    summary_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    
-    elements.append(summary_table)
-    elements.append(Spacer(1, 20))
-    
-    # Patients table
-    data = [['ID', 'Nombre', 'Género', 'Edad', 'Ciudad', 'Estado']]
-    
-    for patient in queryset[:50]:  # Limit to first 50 for PDF
-        data.append([
-            patient.patient_id,
-            patient.get_full_name()[:25] + '...' if len(patient.get_full_name()) > 25 else patient.get_full_name(),
-            patient.get_gender_display(),
-            str(patient.get_age()),
-            (patient.city or "-")[:15] + '...' if patient.city and len(patient.city) > 15 else (patient.city or "-"),
-            "Activo" if patient.is_active else "Inactivo"
-        ])
-    
-    # Create table
-    table = Table(data, colWidths=[0.8*inch, 2.2*inch, 0.8*inch, 0.6*inch, 1.2*inch, 0.8*inch])
-    table.setStyle(TableStyle([
-        # Header
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        
-        # Data
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.beige, colors.white]),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    elements.append(table)
-    
-    if queryset.count() > 50:
-        elements.append(Spacer(1, 10))
-        note = Paragraph(
-            f"Nota: Se muestran los primeros 50 pacientes de {queryset.count()} total.",
-            styles['Normal']
-        )
-        elements.append(note)
-    
-    # Build PDF
-    doc.build(elements)
-    buffer.seek(0)
-    
-    response = HttpResponse(buffer.read(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="reporte_pacientes_{timezone.now().strftime("%Y%m%d_%H%M")}.pdf"'
-    
-    return response
 
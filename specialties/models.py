@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from patients.models import Patient
+from accounts.tenancy import TenantManager
 
 User = get_user_model()
 
@@ -137,6 +138,9 @@ class SpecialtyConsultation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
     
+    objects = models.Manager()
+    scoped = TenantManager('patient__organization')
+    
     class Meta:
         verbose_name = "Consulta de Especialidad"
         verbose_name_plural = "Consultas de Especialidades"
@@ -185,6 +189,9 @@ class SpecialtyTreatment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
     
+    objects = models.Manager()
+    scoped = TenantManager('patient__organization')
+    
     class Meta:
         verbose_name = "Tratamiento de Especialidad"
         verbose_name_plural = "Tratamientos de Especialidades"
@@ -239,6 +246,9 @@ class SpecialtyReferral(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
     
+    objects = models.Manager()
+    scoped = TenantManager('patient__organization')
+    
     class Meta:
         verbose_name = "Referencia de Especialidad"
         verbose_name_plural = "Referencias de Especialidades"
@@ -16,6 +16,7 @@ from .forms import (
     SpecialtyTreatmentForm, SpecialtyReferralForm, SpecialtyFilterForm
 )
 from patients.models import Patient
+from reports.rollup import daily_totals
 
 @login_required  
 def index(request):
@@ -28,16 +29,18 @@ def index(request):
     week_ago = today - timedelta(days=7)
     month_ago = today - timedelta(days=30)
     
-    # Estadísticas generales
-    total_consultations = SpecialtyConsultation.objects.count()
-    consultations_this_week = SpecialtyConsultation.objects.filter(date__gte=week_ago).count()
-    consultations_this_month = SpecialtyConsultation.objects.filter(date__gte=month_ago).count()
+    # Estadísticas generales desde las métricas diarias de la organización
+    organization = request.user.profile.organization
+    total_consultations = daily_totals(organization)['specialty_consultations']
+    consultations_this_week = daily_totals(organization, date_from=week_ago)['specialty_consultations']
+    consultations_this_month = daily_totals(organization, date_from=month_ago)['specialty_consultations']
     
     # Calcular porcentajes de cambio
-    prev_week_consultations = SpecialtyConsultation.objects.filter(
-        date__gte=week_ago - timedelta(days=7), 
-        date__lt=week_ago
-    ).count()
+    prev_week_consultations = daily_totals(
+        organization,
+        date_from=week_ago - timedelta(days=7),
+        date_to=week_ago - timedelta(days=1)
+    )['specialty_consultations']
     week_change = ((consultations_this_week - prev_week_consultations) / max(prev_week_consultations, 1)) * 100
     
     stats = {
@@ -47,34 +50,36 @@ def index(request):
         'consultations_this_week': consultations_this_week,
         'consultations_this_month': consultations_this_month,
         'week_change': round(week_change, 1),
-        'pending_referrals': SpecialtyReferral.objects.filter(status='pending').count(),
-        'active_treatments': SpecialtyTreatment.objects.filter(status='in_progress').count(),
-        'completed_consultations': SpecialtyConsultation.objects.filter(is_completed=True).count(),
-        'urgent_referrals': SpecialtyReferral.objects.filter(
+        'pending_referrals': SpecialtyReferral.scoped.filter(status='pending').count(),
+        'active_treatments': SpecialtyTreatment.scoped.filter(status='in_progress').count(),
+        'completed_consultations': SpecialtyConsultation.scoped.filter(is_completed=True).count(),
+        'urgent_referrals': SpecialtyReferral.scoped.filter(
             status='pending', urgency__in=['urgent', 'emergency']
         ).count(),
-        'consultations_today': SpecialtyConsultation.objects.filter(date__date=today).count(),
-        'upcoming_consultations': SpecialtyConsultation.objects.filter(
+        'consultations_today': SpecialtyConsultation.scoped.filter(date__date=today).count(),
+        'upcoming_consultations': SpecialtyConsultation.scoped.filter(
             date__gt=timezone.now(),
             date__date__lte=today + timedelta(days=7)
         ).count(),
     }
     
-    # Especialidades con estadísticas detalladas
+    # Especialidades con estadísticas detalladas (catálogo compartido, conteos de la organización)
+    own_consultations = Q(specialtyconsultation__patient__organization=organization)
+    own_treatments = Q(specialtytreatment__patient__organization=organization)
     specialties = Specialty.objects.filter(is_active=True).annotate(
         doctors_count=Count('doctor', distinct=True),
-        consultations_count=Count('specialtyconsultation', distinct=True),
-        active_treatments_count=Count('specialtytreatment', filter=Q(specialtytreatment__status='in_progress'), distinct=True),
-        this_month_consultations=Count('specialtyconsultation', filter=Q(specialtyconsultation__date__gte=month_ago), distinct=True)
+        consultations_count=Count('specialtyconsultation', filter=own_consultations, distinct=True),
+        active_treatments_count=Count('specialtytreatment', filter=own_treatments & Q(specialtytreatment__status='in_progress'), distinct=True),
+        this_month_consultations=Count('specialtyconsultation', filter=own_consultations & Q(specialtyconsultation__date__gte=month_ago), distinct=True)
     ).order_by('-consultations_count')
     
     # Consultas recientes con más detalles
-    recent_consultations = SpecialtyConsultation.objects.select_related(
+    recent_consultations = SpecialtyConsultation.scoped.select_related(
         'patient', 'doctor__user', 'specialty'
     ).order_by('-date')[:10]
     
     # Referencias pendientes ordenadas por urgencia
-    pending_referrals = SpecialtyReferral.objects.filter(
+    pending_referrals = SpecialtyReferral.scoped.filter(
         status='pending'
     ).select_related(
         'patient', 'from_specialty', 'to_specialty', 'referring_doctor__user'
@@ -85,19 +90,19 @@ def index(request):
     
     # Doctores más activos
     active_doctors = Doctor.objects.filter(is_active=True).annotate(
-        consultations_count=Count('specialtyconsultation', distinct=True),
-        this_month_consultations=Count('specialtyconsultation', filter=Q(specialtyconsultation__date__gte=month_ago), distinct=True)
+        consultations_count=Count('specialtyconsultation', filter=own_consultations, distinct=True),
+        this_month_consultations=Count('specialtyconsultation', filter=own_consultations & Q(specialtyconsultation__date__gte=month_ago), distinct=True)
     ).filter(consultations_count__gt=0).select_related('user').order_by('-this_month_consultations')[:5]
     
     # Distribución de consultas por tipo
-    consultation_types = SpecialtyConsultation.objects.filter(
+    consultation_types = SpecialtyConsultation.scoped.filter(
         date__gte=month_ago
     ).values('consultation_type').annotate(
         count=Count('id')
     ).order_by('-count')
     
     # Tratamientos por estado
-    treatment_status_distribution = SpecialtyTreatment.objects.values('status').annotate(
+    treatment_status_distribution = SpecialtyTreatment.scoped.values('status').annotate(
         count=Count('id')
     ).order_by('-count')
     
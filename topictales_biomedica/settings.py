@@ -56,11 +56,13 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'accounts.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.TenantMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'accounts.middleware.DisableCacheMiddleware',
@@ -109,6 +111,13 @@ else:
         }
     }
 
+# Vigencia en caché de los datos de la barra lateral (segundos)
+SIDEBAR_MODULES_CACHE_TIMEOUT = config('SIDEBAR_MODULES_CACHE_TIMEOUT', default=3600, cast=int)
+SIDEBAR_COUNTERS_CACHE_TIMEOUT = config('SIDEBAR_COUNTERS_CACHE_TIMEOUT', default=60, cast=int)
+
+# Vigencia de la instantánea de métricas del dashboard (segundos)
+DASHBOARD_METRICS_CACHE_TIMEOUT = config('DASHBOARD_METRICS_CACHE_TIMEOUT', default=60, cast=int)
+
 # Database Configuration
 DATABASES = {
     'default': {
@@ -185,6 +194,48 @@ DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@topictales-bi
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/0')
 
+# Facturación en lote: los lotes más grandes que esto corren en segundo plano
+BULK_INVOICE_ASYNC_THRESHOLD = config('BULK_INVOICE_ASYNC_THRESHOLD', default=200, cast=int)
+# Los lotes de facturación en 'running' por más de esto (segundos) se reencolan
+BULK_INVOICE_JOB_TIMEOUT = config('BULK_INVOICE_JOB_TIMEOUT', default=1800, cast=int)
+
+# Generación de reportes: los reportes encolados los genera `manage.py run_report_worker`,
+# o Celery cuando REPORTS_USE_CELERY está activo y celery está instalado
+REPORTS_USE_CELERY = config('REPORTS_USE_CELERY', default=False, cast=bool)
+REPORT_WORKER_POLL_INTERVAL = config('REPORT_WORKER_POLL_INTERVAL', default=5, cast=int)
+# Los reportes en 'processing' por más de esto (segundos) se reencolan
+REPORT_JOB_TIMEOUT = config('REPORT_JOB_TIMEOUT', default=1800, cast=int)
+# Caché de resultados de reportes: vigencia de las vistas previas (segundos) y días
+# que se conserva un archivo en caché sin usar
+REPORT_CACHE_TIMEOUT = config('REPORT_CACHE_TIMEOUT', default=3600, cast=int)
+REPORT_CACHE_MAX_AGE = config('REPORT_CACHE_MAX_AGE', default=7, cast=int)
+
+# Presupuesto de consultas: las peticiones con más de QUERY_BUDGET consultas, o que
+# repiten una sentencia QUERY_REPEAT_LIMIT veces (probable N+1), se registran como
+# advertencias
+QUERY_BUDGET = config('QUERY_BUDGET', default=50, cast=int)
+QUERY_REPEAT_LIMIT = config('QUERY_REPEAT_LIMIT', default=10, cast=int)
+# Encabezado Server-Timing con consultas y tiempo en BD (expone los tiempos a los clientes)
+QUERY_BUDGET_SERVER_TIMING = config('QUERY_BUDGET_SERVER_TIMING', default=DEBUG, cast=bool)
+# Vistas excluidas de las advertencias del presupuesto de consultas (long polls)
+QUERY_BUDGET_EXCLUDED_VIEWS = ['api:dashboard_stats']
+
+# API de sincronización incremental: segundos que cada sincronización vuelve a leer
+# antes de su marca de agua (filas confirmadas tarde) y días que se conservan los
+# registros de borrado (marcas más antiguas necesitan una sincronización completa);
+# los depura `manage.py run_report_scheduler`
+SYNC_OVERLAP_SECONDS = config('SYNC_OVERLAP_SECONDS', default=60, cast=int)
+SYNC_TOMBSTONE_DAYS = config('SYNC_TOMBSTONE_DAYS', default=30, cast=int)
+
+# Contadores de la API del dashboard: segundos entre conciliaciones contra la base
+# de datos (las ejecuta `manage.py run_report_scheduler`), la espera máxima de long
+# poll que puede pedir un cliente (muy por debajo del timeout del worker WSGI, ya
+# que la espera ocupa un worker) y cada cuánto revisa un long poll la versión de
+# los contadores en la caché
+DASHBOARD_COUNTERS_RECONCILE_SECONDS = config('DASHBOARD_COUNTERS_RECONCILE_SECONDS', default=900, cast=int)
+DASHBOARD_LONG_POLL_SECONDS = config('DASHBOARD_LONG_POLL_SECONDS', default=10, cast=int)
+DASHBOARD_LONG_POLL_INTERVAL = config('DASHBOARD_LONG_POLL_INTERVAL', default=1, cast=float)
+
 # Login/Logout URLs
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
@@ -269,5 +320,11 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': True,
         },
+        # Advertencias del presupuesto de consultas (QueryBudgetMiddleware)
+        'accounts.middleware': {
+            'handlers': ['file', 'console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
 }